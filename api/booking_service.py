@@ -1,8 +1,29 @@
+import json
 import logging
-import uuid
 from datetime import datetime
-from flask import Blueprint, request, jsonify
-from models import db, Booking, ConversationLog
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from models import db, Booking, ConversationLog, WaitlistEntry
+from sqlalchemy import tuple_
+from sqlalchemy.orm.exc import StaleDataError
+from utils.availability import AvailabilityEngine, SlotUnavailableError, UnknownOutletError, holds_table
+from utils.booking_cache import BookingCache
+from utils.booking_sweeper import BookingSweeper
+from utils.booking_ids import normalize_booking_id
+from utils.waitlist import Waitlist
+from utils.idempotency import IdempotencyStore, idempotent, make_idempotency_key
+from utils.deadline import DEADLINE_HEADER
+from utils.helpers import encode_cursor, decode_cursor
+from utils.booking_io import (
+    BOOKING_FIELDS,
+    format_booking_row,
+    parse_booking_data,
+    parse_booking_changes,
+    generate_booking_id,
+    read_booking_rows,
+    import_bookings,
+    export_bookings
+)
+from config import Config
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -11,10 +32,110 @@ logger = logging.getLogger(__name__)
 # Create blueprint
 booking_bp = Blueprint('booking', __name__, url_prefix='/api/booking')
 
+# Shared store so a resubmitted booking form does not create a second booking
+idempotency_store = IdempotencyStore(
+    ttl_seconds=Config.IDEMPOTENCY_TTL_SECONDS,
+    max_entries=Config.IDEMPOTENCY_MAX_ENTRIES
+)
+
+def booking_idempotency_key():
+    """Idempotency key from the client's Idempotency-Key header, if any"""
+    key = request.headers.get('Idempotency-Key')
+    return make_idempotency_key('booking-create', key) if key else None
+
+def waitlist_idempotency_key():
+    """Idempotency key for joining the waitlist, from the Idempotency-Key header"""
+    key = request.headers.get('Idempotency-Key')
+    return make_idempotency_key('waitlist-join', key) if key else None
+
+def apply_statement_timeout():
+    """
+    Bound database work by the caller's remaining latency budget.
+    
+    Only PostgreSQL supports a per-transaction statement timeout; on other
+    databases this is a no-op.
+    """
+    header = request.headers.get(DEADLINE_HEADER)
+    if not header or db.engine.dialect.name != 'postgresql':
+        return
+    try:
+        timeout_ms = max(int(float(header)), 1)
+    except ValueError:
+        return
+    db.session.execute(
+        db.text("SELECT set_config('statement_timeout', :timeout, true)"),
+        {"timeout": str(timeout_ms)}
+    )
+
 # Import data at function level to avoid circular imports
 def get_bbq_outlets_info():
     from data.bbq_knowledge_base import bbq_outlets_info
     return bbq_outlets_info
+
+# Occupancy counters per outlet and time slot, updated with every booking change
+availability_engine = AvailabilityEngine(
+    get_bbq_outlets_info(),
+    slot_minutes=Config.BOOKING_SLOT_MINUTES,
+    last_seating_minutes=Config.BOOKING_LAST_SEATING_MINUTES
+)
+
+# Parties waiting for full slots, promoted when seats are freed
+waitlist = Waitlist(availability_engine)
+
+# Outlet records by ID, for name lookups
+outlets_by_id = {outlet.get('id'): outlet for outlet in get_bbq_outlets_info()}
+
+# Read-through cache for find, keyed by booking ID and by phone
+booking_cache = BookingCache(
+    max_entries=Config.BOOKING_CACHE_MAX_ENTRIES,
+    ttl_seconds=Config.BOOKING_CACHE_TTL_SECONDS,
+    redis_url=Config.BOOKING_CACHE_REDIS_URL
+)
+
+# Keyset ordering for listings, served by the (outlet_id, booking_date, booking_time) index
+LIST_ORDER = (Booking.booking_date, Booking.booking_time, Booking.id)
+LIST_PAGE_SIZE = 50
+LIST_MAX_PAGE_SIZE = 500
+
+# Closes out bookings whose slot has passed; scheduled from app.py
+booking_sweeper = BookingSweeper(
+    booking_cache,
+    after_minutes=Config.BOOKING_SWEEP_AFTER_MINUTES,
+    unseated_status=Config.BOOKING_SWEEP_UNSEATED_STATUS,
+    batch_size=Config.BOOKING_SWEEP_BATCH_SIZE,
+    pause_seconds=Config.BOOKING_SWEEP_PAUSE_SECONDS,
+    interval_seconds=Config.BOOKING_SWEEP_INTERVAL_SECONDS
+)
+
+def get_outlet_name(outlet_id):
+    """Return an outlet's display name, or the brand name for an unknown outlet"""
+    return outlets_by_id.get(outlet_id, {}).get('name', "Barbeque Nation")
+
+def suggest_alternatives(error, guests):
+    """
+    Nearby slots with room for a party that did not fit.
+
+    Args:
+        error (SlotUnavailableError): The failed reservation
+        guests (int): Party size
+
+    Returns:
+        list: Suggestions, best first; empty if they could not be worked out
+    """
+    try:
+        return availability_engine.suggest_alternatives(
+            error.outlet_id, error.slot_date, error.slot_time, guests,
+            offsets=Config.ALTERNATIVE_SLOT_OFFSETS_MINUTES,
+            outlet_change_minutes=Config.ALTERNATIVE_OUTLET_CHANGE_MINUTES,
+            limit=Config.ALTERNATIVE_SUGGESTIONS
+        )
+    except Exception as e:
+        logger.error(f"Error suggesting alternative slots: {str(e)}")
+        return []
+
+def invalidate_booking(booking):
+    """Drop cached lookups for a booking; call after committing a change to it"""
+    booking_cache.invalidate(f"id:{booking.booking_id}", f"phone:{booking.phone}")
     
 # Helper function to create a test booking
 def create_test_booking():
@@ -48,61 +169,50 @@ def create_test_booking():
     )
     
     db.session.add(new_booking)
+    availability_engine.reserve(new_booking)
     db.session.commit()
+    invalidate_booking(new_booking)
     
     return new_booking
 
 
 @booking_bp.route('/create', methods=['POST'])
+@idempotent(idempotency_store, booking_idempotency_key)
 def create_booking():
     """Create a new booking"""
-    data = request.json
+    data = request.json or {}
     
-    # Validate required fields
-    required_fields = ['outlet_id', 'date', 'time', 'guests', 'customer_name', 'phone']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({
-                'status': 'error',
-                'message': f'Missing required field: {field}'
-            }), 400
+    # Validate required fields, parse date and time, and check the party fits the outlet
+    try:
+        fields = parse_booking_data(data, availability_engine)
+    except UnknownOutletError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     
     try:
-        # Generate unique booking ID
-        booking_id = f"BBQ-{str(uuid.uuid4())[:8].upper()}"
+        apply_statement_timeout()
         
-        # Parse date and time
-        try:
-            booking_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-            booking_time = datetime.strptime(data['time'], '%H:%M').time()
-        except ValueError as e:
-            return jsonify({
-                'status': 'error',
-                'message': f'Invalid date or time format: {str(e)}'
-            }), 400
+        # Generate unique booking ID
+        booking_id = generate_booking_id()
         
         # Create booking in database
-        new_booking = Booking(
-            booking_id=booking_id,
-            outlet_id=data['outlet_id'],
-            booking_date=booking_date,
-            booking_time=booking_time,
-            guests=int(data['guests']),
-            customer_name=data['customer_name'],
-            phone=data['phone'],
-            status='confirmed'
-        )
+        fields['status'] = 'confirmed'
+        new_booking = Booking(booking_id=booking_id, **fields)
         
         db.session.add(new_booking)
+        availability_engine.reserve(new_booking)
         db.session.commit()
+        invalidate_booking(new_booking)
         
         # Get outlet name from ID
-        outlet_name = "Barbeque Nation"
-        outlets = get_bbq_outlets_info()
-        for outlet in outlets:
-            if outlet.get('id') == data['outlet_id']:
-                outlet_name = outlet.get('name')
-                break
+        outlet_name = get_outlet_name(data['outlet_id'])
         
         # Return success response
         return jsonify({
@@ -119,6 +229,15 @@ def create_booking():
             }
         }), 201
         
+    except SlotUnavailableError as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e),
+            'available': e.available,
+            'alternatives': suggest_alternatives(e, fields['guests'])
+        }), 409
+        
     except Exception as e:
         logger.error(f"Error creating booking: {str(e)}")
         db.session.rollback()
@@ -131,7 +250,7 @@ def create_booking():
 @booking_bp.route('/update', methods=['PUT'])
 def update_booking():
     """Update an existing booking"""
-    data = request.json
+    data = request.json or {}
     
     # Validate booking ID
     booking_id = data.get('booking_id')
@@ -140,56 +259,73 @@ def update_booking():
             'status': 'error',
             'message': 'Booking ID is required'
         }), 400
+    booking_id = normalize_booking_id(booking_id)
     
+    # Parse every change before touching the booking or its slot
     try:
+        version, changes, updated_fields = parse_booking_changes(data)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    try:
+        apply_statement_timeout()
+        
         # Find booking in database
         booking = Booking.query.filter_by(booking_id=booking_id).first()
         if not booking:
+            db.session.rollback()
             return jsonify({
                 'status': 'error',
                 'message': f'Booking not found with ID: {booking_id}'
             }), 404
         
-        # Update booking fields
-        updated_fields = []
-        
-        if 'outlet_id' in data and data['outlet_id']:
-            booking.outlet_id = data['outlet_id']
-            updated_fields.append('outlet')
-        
-        if 'date' in data and data['date']:
-            try:
-                booking.booking_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-                updated_fields.append('date')
-            except ValueError:
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Invalid date format. Use YYYY-MM-DD.'
-                }), 400
+        # Reject edits based on a stale copy of the booking
+        if version is not None and version != booking.version:
+            db.session.rollback()
+            return jsonify({
+                'status': 'error',
+                'message': 'Booking was changed by another request. Please reload it and try again.',
+                'version': booking.version
+            }), 409
         
-        if 'time' in data and data['time']:
+        # Check the booking as it will be, so a bad change is refused before its slot is freed
+        updated = {
+            field: changes.get(field, getattr(booking, field))
+            for field in ('outlet_id', 'booking_date', 'booking_time', 'guests', 'status')
+        }
+        if holds_table(updated['status']):
             try:
-                booking.booking_time = datetime.strptime(data['time'], '%H:%M').time()
-                updated_fields.append('time')
-            except ValueError:
+                availability_engine.check_booking(updated['outlet_id'], updated['booking_time'], updated['guests'])
+            except ValueError as e:
+                db.session.rollback()
                 return jsonify({
                     'status': 'error',
-                    'message': 'Invalid time format. Use HH:MM.'
-                }), 400
+                    'message': str(e)
+                }), 404 if isinstance(e, UnknownOutletError) else 400
         
-        if 'guests' in data and data['guests']:
-            booking.guests = int(data['guests'])
-            updated_fields.append('guest count')
+        # Free the booking's current slot; it is counted again below with the new details
+        freed_slot = (booking.outlet_id, booking.booking_date, availability_engine.slot_start(booking.booking_time))
+        availability_engine.release(booking)
         
-        if 'status' in data and data['status']:
-            booking.status = data['status']
-            updated_fields.append('status')
+        # Update booking fields
+        for field, value in changes.items():
+            setattr(booking, field, value)
         
         # Update timestamp
         booking.updated_at = datetime.utcnow()
+        availability_engine.reserve(booking)
+        
+        # Seats given up in the old slot go to the waitlist
+        promoted = waitlist.promote(*freed_slot)
         
         # Save changes
         db.session.commit()
+        invalidate_booking(booking)
+        for promoted_booking in promoted:
+            invalidate_booking(promoted_booking)
         
         # Return success response
         return jsonify({
@@ -202,6 +338,22 @@ def update_booking():
             }
         }), 200
         
+    except SlotUnavailableError as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e),
+            'available': e.available,
+            'alternatives': suggest_alternatives(e, updated['guests'])
+        }), 409
+        
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': 'Booking was changed by another request. Please reload it and try again.'
+        }), 409
+        
     except Exception as e:
         logger.error(f"Error updating booking: {str(e)}")
         db.session.rollback()
@@ -225,8 +377,12 @@ def cancel_booking():
             'status': 'error',
             'message': 'Either booking ID or phone number is required'
         }), 400
+    if booking_id:
+        booking_id = normalize_booking_id(booking_id)
     
     try:
+        apply_statement_timeout()
+        
         # Find booking in database
         if booking_id:
             booking = Booking.query.filter_by(booking_id=booking_id).first()
@@ -240,11 +396,20 @@ def cancel_booking():
             }), 404
         
         # Update booking status
+        availability_engine.release(booking)
         booking.status = 'cancelled'
         booking.updated_at = datetime.utcnow()
         
+        # Hand the freed seats to waiting parties in the same transaction
+        promoted = waitlist.promote(
+            booking.outlet_id, booking.booking_date, availability_engine.slot_start(booking.booking_time)
+        )
+        
         # Save changes
         db.session.commit()
+        invalidate_booking(booking)
+        for promoted_booking in promoted:
+            invalidate_booking(promoted_booking)
         
         # Return success response
         return jsonify({
@@ -252,10 +417,18 @@ def cancel_booking():
             'data': {
                 'booking_id': booking.booking_id,
                 'message': 'Booking cancelled successfully',
-                'status': 'cancelled'
+                'status': 'cancelled',
+                'waitlist_promoted': len(promoted)
             }
         }), 200
         
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': 'Booking was changed by another request. Please reload it and try again.'
+        }), 409
+        
     except Exception as e:
         logger.error(f"Error cancelling booking: {str(e)}")
         db.session.rollback()
@@ -265,26 +438,435 @@ def cancel_booking():
         }), 500
 
 
+@booking_bp.route('/availability', methods=['GET'])
+def get_availability():
+    """Report free seats per time slot for an outlet on a date"""
+    outlet_id = request.args.get('outlet_id')
+    date = request.args.get('date')
+    guests = request.args.get('guests', type=int)
+    
+    if not outlet_id or not date:
+        return jsonify({
+            'status': 'error',
+            'message': 'Outlet ID and date are required'
+        }), 400
+    
+    capacity = availability_engine.capacity(outlet_id)
+    if capacity is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'Outlet not found with ID: {outlet_id}'
+        }), 404
+    
+    try:
+        slot_date = datetime.strptime(date, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': 'Invalid date format. Use YYYY-MM-DD.'
+        }), 400
+    
+    try:
+        slots = availability_engine.availability(outlet_id, slot_date, guests)
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'outlet_id': outlet_id,
+                'outlet': availability_engine.outlets[outlet_id].get('name'),
+                'date': date,
+                'capacity': capacity,
+                'slot_minutes': availability_engine.slot_minutes,
+                'slots': slots
+            }
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error checking availability: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to check availability: {str(e)}'
+        }), 500
+
+
+def booking_query_from_args(args):
+    """
+    Parse listing and export filters from query parameters.
+    
+    Args:
+        args (dict): Query parameters: outlet_id, date_from, date_to, status, fields
+        
+    Returns:
+        tuple: (filter expressions, date_from or None, field names)
+        
+    Raises:
+        ValueError: If a date or field name is invalid
+    """
+    filters = []
+    date_from = None
+    
+    if args.get('outlet_id'):
+        filters.append(Booking.outlet_id == args['outlet_id'])
+    
+    try:
+        if args.get('date_from'):
+            date_from = datetime.strptime(args['date_from'], '%Y-%m-%d').date()
+        if args.get('date_to'):
+            filters.append(Booking.booking_date <= datetime.strptime(args['date_to'], '%Y-%m-%d').date())
+    except ValueError:
+        raise ValueError('Invalid date format. Use YYYY-MM-DD.')
+    
+    if args.get('status'):
+        filters.append(Booking.status.in_(args['status'].split(',')))
+    
+    fields = args['fields'].split(',') if args.get('fields') else list(BOOKING_FIELDS)
+    unknown = [field for field in fields if field not in BOOKING_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    
+    return filters, date_from, fields
+
+
+def list_bookings_page(filters, fields, after, limit, date_from=None):
+    """
+    Fetch one keyset page of bookings.
+    
+    Args:
+        filters (list): SQLAlchemy filter expressions
+        fields (list): Names from BOOKING_FIELDS to return
+        after (tuple): Sort key of the last row already returned, or None
+        limit (int): Maximum rows to return
+        date_from (datetime.date, optional): Earliest booking date
+        
+    Returns:
+        tuple: (list of booking dicts, sort key of the last row or None)
+    """
+    columns = [BOOKING_FIELDS[field][0] for field in fields]
+    query = db.session.query(*columns, *LIST_ORDER).filter(*filters)
+    
+    # Give the planner a single lower bound on booking_date so the index
+    # range starts at the cursor rather than at date_from
+    if after is not None:
+        date_from = max(date_from, after[0]) if date_from else after[0]
+    if date_from:
+        query = query.filter(Booking.booking_date >= date_from)
+    if after is not None:
+        query = query.filter(tuple_(*LIST_ORDER) > tuple_(*after))
+    rows = query.order_by(*LIST_ORDER).limit(limit).all()
+    
+    bookings = [format_booking_row(row, fields) for row in rows]
+    
+    last = tuple(rows[-1][-len(LIST_ORDER):]) if rows else None
+    return bookings, last
+
+
+@booking_bp.route('/list', methods=['GET'])
+def list_bookings():
+    """
+    List an outlet's bookings in date and time order, one keyset page at a time.
+    
+    Query parameters: outlet_id (required), date_from, date_to, status
+    (comma separated), fields (comma separated), limit, cursor (from the
+    previous page's next_cursor) and format ('json' or 'ndjson'). The ndjson
+    format streams every matching booking from the cursor onwards.
+    """
+    outlet_id = request.args.get('outlet_id')
+    if not outlet_id:
+        return jsonify({
+            'status': 'error',
+            'message': 'Outlet ID is required'
+        }), 400
+    
+    try:
+        filters, date_from, fields = booking_query_from_args(request.args)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    limit = min(max(request.args.get('limit', LIST_PAGE_SIZE, type=int), 1), LIST_MAX_PAGE_SIZE)
+    
+    after = None
+    if request.args.get('cursor'):
+        try:
+            booking_date, booking_time, booking_pk = decode_cursor(request.args['cursor'])
+            after = (
+                datetime.strptime(booking_date, '%Y-%m-%d').date(),
+                datetime.strptime(booking_time, '%H:%M:%S').time(),
+                int(booking_pk)
+            )
+        except (TypeError, ValueError):
+            return jsonify({
+                'status': 'error',
+                'message': 'Invalid cursor'
+            }), 400
+    
+    if request.args.get('format') == 'ndjson':
+        def generate():
+            last = after
+            while True:
+                bookings, last = list_bookings_page(filters, fields, last, limit, date_from)
+                for booking in bookings:
+                    yield json.dumps(booking) + "\n"
+                if len(bookings) < limit:
+                    break
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    try:
+        bookings, last = list_bookings_page(filters, fields, after, limit, date_from)
+        
+        next_cursor = None
+        if len(bookings) == limit:
+            next_cursor = encode_cursor([
+                last[0].strftime('%Y-%m-%d'), last[1].strftime('%H:%M:%S'), last[2]
+            ])
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'bookings': bookings,
+                'count': len(bookings),
+                'next_cursor': next_cursor
+            }
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error listing bookings: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to list bookings: {str(e)}'
+        }), 500
+
+
+@booking_bp.route('/import', methods=['POST'])
+def import_bookings_upload():
+    """
+    Bulk import bookings from the request body.
+    
+    The body is CSV with a header row (format=csv, the default) or NDJSON
+    (format=ndjson) and is read as a stream, so large files are not held in memory.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({
+            'status': 'error',
+            'message': "Format must be 'csv' or 'ndjson'"
+        }), 400
+    
+    try:
+        summary = import_bookings(
+            read_booking_rows(request.stream, fmt),
+            availability_engine,
+            booking_cache,
+            chunk_size=Config.BOOKING_IMPORT_CHUNK_SIZE
+        )
+        
+        return jsonify({
+            'status': 'success',
+            'data': summary
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error importing bookings: {str(e)}")
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to import bookings: {str(e)}'
+        }), 500
+
+
+@booking_bp.route('/export', methods=['GET'])
+def export_bookings_download():
+    """Stream bookings as CSV or NDJSON, filtered like /list"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({
+            'status': 'error',
+            'message': "Format must be 'csv' or 'ndjson'"
+        }), 400
+    
+    try:
+        filters, date_from, fields = booking_query_from_args(request.args)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    if date_from:
+        filters.append(Booking.booking_date >= date_from)
+    
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(export_bookings(filters, fields, fmt)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=bookings.{fmt}'
+    return response
+
+
+@booking_bp.route('/waitlist', methods=['POST'])
+@idempotent(idempotency_store, waitlist_idempotency_key)
+def join_waitlist():
+    """Join the waitlist for a full slot"""
+    data = request.json or {}
+    
+    try:
+        fields = parse_booking_data(data, availability_engine)
+    except UnknownOutletError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    try:
+        apply_statement_timeout()
+        
+        # Only full slots have a waitlist
+        slot_time = availability_engine.slot_start(fields['booking_time']).strftime('%H:%M')
+        slots = availability_engine.availability(fields['outlet_id'], fields['booking_date'], fields['guests'])
+        slot = next((slot for slot in slots if slot['time'] == slot_time), None)
+        if slot is None:
+            db.session.rollback()
+            return jsonify({
+                'status': 'error',
+                'message': 'No booking slot at this time.'
+            }), 400
+        if slot['bookable']:
+            db.session.rollback()
+            return jsonify({
+                'status': 'error',
+                'message': 'Seats are available for this time. Please book it directly.',
+                'available': slot['available']
+            }), 409
+        
+        entry = waitlist.join(fields)
+        position = waitlist.position(entry)
+        db.session.commit()
+        
+        entry_dict = entry.to_dict()
+        entry_dict['position'] = position
+        entry_dict['outlet'] = get_outlet_name(entry.outlet_id)
+        
+        return jsonify({
+            'status': 'success',
+            'data': entry_dict
+        }), 201
+        
+    except Exception as e:
+        logger.error(f"Error joining waitlist: {str(e)}")
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to join waitlist: {str(e)}'
+        }), 500
+
+
+@booking_bp.route('/waitlist', methods=['GET'])
+def get_waitlist_entry():
+    """Check a waitlist entry's status and place in the queue"""
+    entry_id = request.args.get('entry_id', type=int)
+    if not entry_id:
+        return jsonify({
+            'status': 'error',
+            'message': 'Entry ID is required'
+        }), 400
+    
+    entry = db.session.get(WaitlistEntry, entry_id)
+    if not entry:
+        return jsonify({
+            'status': 'error',
+            'message': f'Waitlist entry not found with ID: {entry_id}'
+        }), 404
+    
+    entry_dict = entry.to_dict()
+    entry_dict['position'] = waitlist.position(entry)
+    entry_dict['outlet'] = get_outlet_name(entry.outlet_id)
+    
+    return jsonify({
+        'status': 'success',
+        'data': entry_dict
+    }), 200
+
+
+@booking_bp.route('/waitlist/cancel', methods=['POST'])
+def leave_waitlist():
+    """Leave the waitlist"""
+    data = request.json or {}
+    entry_id = data.get('entry_id')
+    if not entry_id:
+        return jsonify({
+            'status': 'error',
+            'message': 'Entry ID is required'
+        }), 400
+    
+    try:
+        left = waitlist.leave(int(entry_id))
+        db.session.commit()
+        
+        if not left:
+            return jsonify({
+                'status': 'error',
+                'message': 'No waiting entry found with the provided ID'
+            }), 404
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'entry_id': int(entry_id),
+                'message': 'You have been removed from the waitlist',
+                'status': 'cancelled'
+            }
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error leaving waitlist: {str(e)}")
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to leave waitlist: {str(e)}'
+        }), 500
+
+
+@booking_bp.route('/waitlist/metrics', methods=['GET'])
+def get_waitlist_metrics():
+    """Report waitlist size and promotion latency for this worker"""
+    return jsonify({
+        'status': 'success',
+        'data': waitlist.stats()
+    }), 200
+
+
+@booking_bp.route('/cache-metrics', methods=['GET'])
+def get_cache_metrics():
+    """Report booking cache hit rate for this worker"""
+    return jsonify({
+        'status': 'success',
+        'data': booking_cache.stats()
+    }), 200
+
+
+@booking_bp.route('/sweeper/metrics', methods=['GET'])
+def get_sweeper_metrics():
+    """Report progress and totals of the past-booking sweeper in this worker"""
+    return jsonify({
+        'status': 'success',
+        'data': booking_sweeper.stats()
+    }), 200
+
+
 @booking_bp.route('/test', methods=['GET'])
 def test_booking():
     """Create a test booking for demo purposes"""
     try:
         test_booking = create_test_booking()
         
-        # Get outlet name
-        outlet_name = "Barbeque Nation"
-        try:
-            outlets = get_bbq_outlets_info()
-            for outlet in outlets:
-                if outlet.get('id') == test_booking.outlet_id:
-                    outlet_name = outlet.get('name')
-                    break
-        except Exception as outlet_error:
-            logger.error(f"Error finding outlet name: {str(outlet_error)}")
-        
         # Return the test booking details
         booking_dict = test_booking.to_dict()
-        booking_dict['outlet_name'] = outlet_name
+        booking_dict['outlet_name'] = get_outlet_name(test_booking.outlet_id)
         
         return jsonify({
             'status': 'success',
@@ -311,8 +893,22 @@ def find_booking():
             'status': 'error',
             'message': 'Either booking ID or phone number is required'
         }), 400
+    if booking_id:
+        booking_id = normalize_booking_id(booking_id)
+    
+    # Repeat lookups during a call are served from the cache
+    cache_key = f"id:{booking_id}" if booking_id else f"phone:{phone}"
+    booking_dict = booking_cache.get(cache_key)
+    if booking_dict is not None:
+        return jsonify({
+            'status': 'success',
+            'data': booking_dict
+        }), 200
     
     try:
+        apply_statement_timeout()
+        generation = booking_cache.generation(cache_key)
+        
         logger.info(f"Searching for booking: booking_id={booking_id}, phone={phone}")
         
         # Find booking in database
@@ -330,22 +926,10 @@ def find_booking():
         
         logger.info(f"Found booking with ID: {booking.booking_id}, outlet_id: {booking.outlet_id}")
         
-        # Get outlet name
-        outlet_name = "Barbeque Nation"
-        try:
-            outlets = get_bbq_outlets_info()
-            for outlet in outlets:
-                if outlet.get('id') == booking.outlet_id:
-                    outlet_name = outlet.get('name')
-                    break
-            logger.info(f"Using outlet name: {outlet_name}")
-        except Exception as outlet_error:
-            logger.error(f"Error finding outlet name: {str(outlet_error)}")
-            # Continue even if outlet name lookup fails
-        
         # Convert booking to dict and add outlet name
         booking_dict = booking.to_dict()
-        booking_dict['outlet_name'] = outlet_name
+        booking_dict['outlet_name'] = get_outlet_name(booking.outlet_id)
+        booking_cache.set(cache_key, booking_dict, generation)
         
         # Return booking details
         return jsonify({
@@ -1,16 +1,24 @@
 import os
 import json
 import logging
+import time
+import threading
 import requests
-from flask import Blueprint, request, jsonify
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from utils.token_management import TokenManager
+from utils.helpers import format_sse_event
+from utils.idempotency import IdempotencyStore, make_idempotency_key, run_once
+from utils.deadline import Deadline, DEADLINE_HEADER, deadline_from_request
 from api.state_machine import StateTransition
+from config import Config
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Initialize token manager
-token_manager = TokenManager(max_tokens=800)
+token_manager = TokenManager(max_tokens=800, min_budget_ms=Config.TOKEN_OPTIMIZATION_MIN_MS)
 
 # Create blueprint
 conversation_bp = Blueprint('conversation', __name__)
@@ -26,6 +34,245 @@ HEADERS = {
 # State transition manager
 state_transition = StateTransition()
 
+# Shared store so retried function calls are not executed twice
+idempotency_store = IdempotencyStore(
+    ttl_seconds=Config.IDEMPOTENCY_TTL_SECONDS,
+    max_entries=Config.IDEMPOTENCY_MAX_ENTRIES
+)
+
+# Function calls with side effects; only these are deduplicated
+IDEMPOTENT_FUNCTIONS = ['create_booking', 'update_booking', 'cancel_booking', 'join_waitlist']
+
+# Functions that go through the booking API
+BOOKING_FUNCTIONS = IDEMPOTENT_FUNCTIONS + ['find_booking']
+
+# Recent knowledge base answers, used when a request is short on time
+KB_CACHE_SIZE = 512
+kb_answer_cache = OrderedDict()
+kb_answer_cache_lock = threading.Lock()
+
+KB_SHORT_ANSWER = {
+    "type": "general",
+    "message": "I can help you with our outlets in Delhi and Bangalore, our menu, and reservations. What would you like to know?"
+}
+
+# Bounded pool for batched function calls, shared by all requests in this worker
+batch_executor = ThreadPoolExecutor(
+    max_workers=Config.FUNCTION_BATCH_MAX_WORKERS,
+    thread_name_prefix='function-batch'
+)
+
+# Short acknowledgements sent before any work is done, so the caller can
+# start rendering (or speaking) while the answer is being prepared
+FUNCTION_ACKNOWLEDGEMENTS = {
+    'query_knowledge_base': "Let me check that for you.",
+    'find_booking': "Let me look up your booking.",
+    'create_booking': "Sure, let me book that table for you.",
+    'update_booking': "Sure, let me update your booking.",
+    'cancel_booking': "Sure, let me cancel that booking for you.",
+    'join_waitlist': "Sure, let me add you to the waitlist."
+}
+
+# Follow-up questions sent after the answer, keyed by result type
+FOLLOW_UP_QUESTIONS = {
+    'outlets': "Would you like to make a reservation at one of these locations?",
+    'menu': "Would you like to know about any other items or make a reservation?",
+    'faq': "Is there anything else you'd like to know?",
+    'booking_found': "Would you like to change or cancel this booking?",
+    'booking_created': "Is there anything else you'd like help with?",
+    'booking_updated': "Is there anything else you'd like help with?",
+    'booking_cancelled': "Is there anything else I can help you with?",
+    'waitlist_joined': "Is there anything else I can help you with?"
+}
+
+def build_knowledge_base_result(query, query_type='general'):
+    """
+    Build a knowledge base answer for a free-text query.
+    
+    Args:
+        query (str): The user's query
+        query_type (str): Hint for the kind of answer wanted (general, faq, outlets, menu, booking)
+        
+    Returns:
+        dict: Result with a 'type' key and either 'data' or 'message'
+    """
+    # Use direct lookup from our knowledge base rather than making an HTTP request
+    from data.bbq_knowledge_base import bbq_outlets_info, bbq_faq_info, bbq_menu_info
+    import random
+    
+    logger.info("Using direct knowledge base access")
+    
+    # Process based on query type and intent detection
+    # Check for booking intent
+    booking_keywords = ['book', 'reserve', 'reservation', 'table', 'saturday', 'sunday', 'tonight', 'tomorrow']
+    modification_keywords = ['change', 'modify', 'update', 'reschedule', 'cancel', 'booking']
+    
+    if any(word in query.lower() for word in booking_keywords) and 'cancel' not in query.lower():
+        # Handle booking intent
+        result = {
+            "type": "booking",
+            "message": "I'd be happy to help you make a reservation. To book a table at Barbeque Nation, I'll need:\n\n1. Which outlet would you prefer (Delhi or Bangalore)?\n2. What date would you like to reserve?\n3. What time would be convenient?\n4. How many guests will be joining?\n5. May I have your name and phone number for the reservation?\n\nPlease provide these details and I'll arrange the booking for you."
+        }
+    
+    elif any(word in query.lower() for word in modification_keywords):
+        # Handle booking modification intent
+        if 'cancel' in query.lower():
+            result = {
+                "type": "booking_cancellation",
+                "message": "I can help you cancel your reservation. To proceed, I'll need your booking ID or the phone number used for the reservation. Could you please provide that information?"
+            }
+        elif any(word in query.lower() for word in ['change', 'modify', 'update', 'reschedule']):
+            result = {
+                "type": "booking_modification",
+                "message": "I can help you modify your existing reservation. To proceed, I'll need your booking ID or the phone number used for the reservation. After that, please let me know what changes you'd like to make (date, time, number of guests, or outlet)."
+            }
+        else:
+            # If we detect "booking" but not other keywords, it might be a new booking
+            result = {
+                "type": "booking", 
+                "message": "I'd be happy to help you make a reservation. To book a table at Barbeque Nation, I'll need:\n\n1. Which outlet would you prefer (Delhi or Bangalore)?\n2. What date would you like to reserve?\n3. What time would be convenient?\n4. How many guests will be joining?\n5. May I have your name and phone number for the reservation?\n\nPlease provide these details and I'll arrange the booking for you."
+            }
+    
+    elif query_type == 'outlets' or any(word in query.lower() for word in ['outlet', 'location', 'address', 'where']):
+        # Filter for Delhi/Bangalore if mentioned
+        if 'delhi' in query.lower():
+            outlets = [o for o in bbq_outlets_info if o['city'].lower() == 'delhi']
+        elif 'bangalore' in query.lower() or 'bengaluru' in query.lower():
+            outlets = [o for o in bbq_outlets_info if o['city'].lower() == 'bangalore']
+        else:
+            outlets = bbq_outlets_info
+    
+        result = {
+            "type": "outlets",
+            "data": outlets[:3]  # Just send top 3 to keep response size manageable
+        }
+    
+    elif query_type == 'faq' or '?' in query:
+        # Find relevant FAQs
+        relevant_faqs = []
+        for faq in bbq_faq_info:
+            if any(word in faq['question'].lower() for word in query.lower().split()):
+                relevant_faqs.append(faq)
+    
+        if not relevant_faqs:
+            # If nothing matched, just pick a couple random FAQs
+            relevant_faqs = random.sample(bbq_faq_info, min(2, len(bbq_faq_info)))
+    
+        result = {
+            "type": "faq",
+            "data": relevant_faqs
+        }
+    
+    elif query_type == 'menu' or any(word in query.lower() for word in ['food', 'menu', 'eat', 'dish', 'vegetarian']):
+        # For vegetarian specific queries, filter only veg items
+        if any(word in query.lower() for word in ['veg', 'vegetarian']):
+            menu_items = [item for item in bbq_menu_info if item.get('is_vegetarian', False)]
+        else:
+            menu_items = bbq_menu_info
+    
+        # Return menu items
+        result = {
+            "type": "menu",
+            "data": menu_items[:5]  # Just return first 5 items
+        }
+    
+    else:
+        # Generic response
+        result = {
+            "type": "general",
+            "message": "I can help you with information about Barbeque Nation, including our outlets in Delhi and Bangalore, menu items, and reservation services. What would you like to know?"
+        }
+    
+    return result
+
+def answer_knowledge_base_query(query, query_type='general', deadline=None):
+    """
+    Answer a knowledge base query within the request's latency budget.
+    
+    With enough time left the answer is built and token-optimized as usual and
+    remembered. When the deadline is nearly spent the remembered answer for the
+    same query is returned, or failing that a short generic answer.
+    
+    Args:
+        query (str): The user's query
+        query_type (str): Hint for the kind of answer wanted
+        deadline (Deadline, optional): Request deadline
+        
+    Returns:
+        dict: Token-optimized knowledge base result
+    """
+    cache_key = (query_type, ' '.join(query.lower().split()))
+    
+    if deadline is not None and not deadline.has(Config.KB_LOOKUP_MIN_MS):
+        with kb_answer_cache_lock:
+            cached = kb_answer_cache.get(cache_key)
+        if cached is not None:
+            deadline.degrade('kb_cached_answer')
+            return cached
+        deadline.degrade('kb_short_answer')
+        return KB_SHORT_ANSWER
+    
+    result = token_manager.optimize_response(build_knowledge_base_result(query, query_type), deadline=deadline)
+    
+    with kb_answer_cache_lock:
+        kb_answer_cache[cache_key] = result
+        kb_answer_cache.move_to_end(cache_key)
+        if len(kb_answer_cache) > KB_CACHE_SIZE:
+            kb_answer_cache.popitem(last=False)
+    
+    return result
+
+def booking_api_headers(deadline, idempotency_key=None):
+    """Headers for booking API calls, carrying the remaining budget and idempotency key"""
+    headers = {
+        'Content-Type': 'application/json',
+        DEADLINE_HEADER: str(int(deadline.remaining_ms()))
+    }
+    if idempotency_key:
+        headers['Idempotency-Key'] = idempotency_key
+    return headers
+
+def function_call_idempotency_key(call, explicit_key=None, call_id=None):
+    """
+    Derive the idempotency key for a function call.
+    
+    An explicit key (Idempotency-Key header or 'idempotency_key' field) wins.
+    Otherwise RetellAI retries are recognised by hashing the call ID together
+    with the function name and arguments.
+    
+    Args:
+        call (dict): Function call with 'name' and 'arguments'
+        explicit_key (str, optional): Client-supplied idempotency key
+        call_id (str, optional): RetellAI call ID when not present in the call itself
+        
+    Returns:
+        str: Idempotency key, or None when the call has no side effects or no key can be derived
+    """
+    function_name = call.get('name', '')
+    
+    if function_name not in IDEMPOTENT_FUNCTIONS:
+        return None
+    
+    explicit_key = explicit_key or call.get('idempotency_key')
+    if explicit_key:
+        return make_idempotency_key('function-call', function_name, explicit_key)
+    
+    call_id = call.get('call_id') or (call.get('call') or {}).get('call_id') or call_id
+    if call_id:
+        return make_idempotency_key('function-call', call_id, function_name, call.get('arguments', {}))
+    
+    return None
+
+def function_call_fingerprint(call):
+    """Digest of what a function call asks for, so a reused key with other arguments is refused"""
+    return make_idempotency_key(call.get('name', ''), call.get('arguments', {}))
+
+def is_final_function_result(payload, status_code):
+    """Only remember successful results; failed attempts should be retried for real"""
+    result = payload.get('data')
+    return (status_code < 500 and payload.get('status') == 'success'
+            and isinstance(result, dict) and result.get('type') != 'error')
+
 @conversation_bp.route('/get-state-prompt', methods=['POST'])
 def get_state_prompt():
     """Get the prompt for the current state"""
@@ -212,21 +459,42 @@ def update_retell_agent():
             "error": str(e)
         }), 500
 
-@conversation_bp.route('/retell/function-call', methods=['POST'])
-def handle_function_call():
-    """Handle function calls from RetellAI platform"""
-    try:
-        data = request.json
-        function_name = data.get('name', '')
-        arguments = data.get('arguments', {})
+def execute_function_call(function_name, arguments, host_url, idempotency_key=None, deadline=None):
+    """
+    Execute a single function call.
+    
+    Args:
+        function_name (str): Name of the function to run
+        arguments (dict): Function arguments
+        host_url (str): Base URL of this service, used for booking API calls
+        idempotency_key (str, optional): Key forwarded to the booking API
+        deadline (Deadline, optional): Request deadline; stages degrade when it runs short
         
+    Returns:
+        tuple: (response payload dict, HTTP status code)
+    """
+    if deadline is None:
+        deadline = Deadline(Config.DEADLINE_DEFAULTS_MS['function_call'])
+    
+    try:
         logger.info(f"Function call received: {function_name} with arguments: {arguments}")
         
         if not function_name:
-            return jsonify({
+            return {
                 "status": "error",
                 "message": "Function name is required"
-            }), 400
+            }, 400
+        
+        # Skip booking API calls that could not finish in the time left
+        if function_name in BOOKING_FUNCTIONS and not deadline.has(Config.BOOKING_CALL_MIN_MS):
+            deadline.degrade('booking_call_skipped')
+            return {
+                "status": "success",
+                "data": {
+                    "type": "error",
+                    "message": "I'm still working on that. Could you give me a moment and ask again?"
+                }
+            }, 200
             
         # Handle different function calls
         if function_name == 'query_knowledge_base':
@@ -237,109 +505,72 @@ def handle_function_call():
             logger.info(f"Querying knowledge base with: {query} (type: {query_type})")
             
             try:
-                # Use direct lookup from our knowledge base rather than making an HTTP request
-                from data.bbq_knowledge_base import bbq_outlets_info, bbq_faq_info, bbq_menu_info
-                import random
-                
-                logger.info("Using direct knowledge base access")
+                # Build the answer, within token limits and the request's time budget
+                optimized_result = answer_knowledge_base_query(query, query_type, deadline)
                 
-                # Process based on query type and intent detection
-                # Check for booking intent
-                booking_keywords = ['book', 'reserve', 'reservation', 'table', 'saturday', 'sunday', 'tonight', 'tomorrow']
-                modification_keywords = ['change', 'modify', 'update', 'reschedule', 'cancel', 'booking']
-                
-                if any(word in query.lower() for word in booking_keywords) and 'cancel' not in query.lower():
-                    # Handle booking intent
-                    result = {
-                        "type": "booking",
-                        "message": "I'd be happy to help you make a reservation. To book a table at Barbeque Nation, I'll need:\n\n1. Which outlet would you prefer (Delhi or Bangalore)?\n2. What date would you like to reserve?\n3. What time would be convenient?\n4. How many guests will be joining?\n5. May I have your name and phone number for the reservation?\n\nPlease provide these details and I'll arrange the booking for you."
-                    }
-                
-                elif any(word in query.lower() for word in modification_keywords):
-                    # Handle booking modification intent
-                    if 'cancel' in query.lower():
-                        result = {
-                            "type": "booking_cancellation",
-                            "message": "I can help you cancel your reservation. To proceed, I'll need your booking ID or the phone number used for the reservation. Could you please provide that information?"
-                        }
-                    elif any(word in query.lower() for word in ['change', 'modify', 'update', 'reschedule']):
-                        result = {
-                            "type": "booking_modification",
-                            "message": "I can help you modify your existing reservation. To proceed, I'll need your booking ID or the phone number used for the reservation. After that, please let me know what changes you'd like to make (date, time, number of guests, or outlet)."
-                        }
-                    else:
-                        # If we detect "booking" but not other keywords, it might be a new booking
-                        result = {
-                            "type": "booking", 
-                            "message": "I'd be happy to help you make a reservation. To book a table at Barbeque Nation, I'll need:\n\n1. Which outlet would you prefer (Delhi or Bangalore)?\n2. What date would you like to reserve?\n3. What time would be convenient?\n4. How many guests will be joining?\n5. May I have your name and phone number for the reservation?\n\nPlease provide these details and I'll arrange the booking for you."
-                        }
-                
-                elif query_type == 'outlets' or any(word in query.lower() for word in ['outlet', 'location', 'address', 'where']):
-                    # Filter for Delhi/Bangalore if mentioned
-                    if 'delhi' in query.lower():
-                        outlets = [o for o in bbq_outlets_info if o['city'].lower() == 'delhi']
-                    elif 'bangalore' in query.lower() or 'bengaluru' in query.lower():
-                        outlets = [o for o in bbq_outlets_info if o['city'].lower() == 'bangalore']
-                    else:
-                        outlets = bbq_outlets_info
-                        
-                    result = {
-                        "type": "outlets",
-                        "data": outlets[:3]  # Just send top 3 to keep response size manageable
-                    }
-                    
-                elif query_type == 'faq' or '?' in query:
-                    # Find relevant FAQs
-                    relevant_faqs = []
-                    for faq in bbq_faq_info:
-                        if any(word in faq['question'].lower() for word in query.lower().split()):
-                            relevant_faqs.append(faq)
-                    
-                    if not relevant_faqs:
-                        # If nothing matched, just pick a couple random FAQs
-                        relevant_faqs = random.sample(bbq_faq_info, min(2, len(bbq_faq_info)))
-                    
-                    result = {
-                        "type": "faq",
-                        "data": relevant_faqs
-                    }
-                    
-                elif query_type == 'menu' or any(word in query.lower() for word in ['food', 'menu', 'eat', 'dish', 'vegetarian']):
-                    # For vegetarian specific queries, filter only veg items
-                    if any(word in query.lower() for word in ['veg', 'vegetarian']):
-                        menu_items = [item for item in bbq_menu_info if item.get('is_vegetarian', False)]
-                    else:
-                        menu_items = bbq_menu_info
-                    
-                    # Return menu items
-                    result = {
-                        "type": "menu",
-                        "data": menu_items[:5]  # Just return first 5 items
-                    }
-                    
-                else:
-                    # Generic response
-                    result = {
-                        "type": "general",
-                        "message": "I can help you with information about Barbeque Nation, including our outlets in Delhi and Bangalore, menu items, and reservation services. What would you like to know?"
-                    }
-                
-                # Ensure the response fits within token limits
-                optimized_result = token_manager.optimize_response(result)
-                
-                return jsonify({
+                return {
                     "status": "success",
                     "data": optimized_result
-                })
+                }, 200
             except Exception as e:
                 logger.error(f"Error querying knowledge base: {str(e)}")
-                return jsonify({
+                return {
                     "status": "success",
                     "data": {
                         "type": "general",
                         "message": "I can help you with information about Barbeque Nation, including our outlets in Delhi and Bangalore, menu items, and reservation services. What would you like to know?"
                     }
-                })
+                }, 200
+                
+        elif function_name == 'find_booking':
+            # Look up an existing booking by ID or phone
+            params = {k: arguments.get(k) for k in ('booking_id', 'phone') if arguments.get(k)}
+            
+            if not params:
+                return {
+                    "status": "success",
+                    "data": {
+                        "type": "error",
+                        "message": "I need your booking ID or the phone number used for the booking to look it up."
+                    }
+                }, 200
+            
+            try:
+                booking_response = requests.get(
+                    f"{host_url.rstrip('/')}/api/booking/find",
+                    headers=booking_api_headers(deadline),
+                    params=params,
+                    timeout=deadline.timeout()
+                )
+                
+                if booking_response.status_code == 200:
+                    booking_data = booking_response.json().get('data', {})
+                    return {
+                        "status": "success",
+                        "data": {
+                            "type": "booking_found",
+                            "booking": token_manager.optimize_response(booking_data, deadline=deadline)
+                        }
+                    }, 200
+                else:
+                    return {
+                        "status": "success",
+                        "data": {
+                            "type": "error",
+                            "message": "I couldn't find a booking with those details. Could you please check and try again?"
+                        }
+                    }, 200
+            except requests.RequestException as req_error:
+                if isinstance(req_error, requests.Timeout):
+                    deadline.degrade('booking_call_timed_out')
+                logger.error(f"Request error finding booking: {str(req_error)}")
+                return {
+                    "status": "success",
+                    "data": {
+                        "type": "error",
+                        "message": "I encountered a problem with our booking system. Please try again later or contact us directly by phone."
+                    }
+                }, 200
                 
         elif function_name == 'create_booking':
             # Create a new booking
@@ -355,13 +586,13 @@ def handle_function_call():
             logger.info(f"Creating booking with data: {booking_data}")
             
             try:
-                # Make actual API call to create the booking
+                # Make actual API call to create the booking, passing the idempotency
+                # key on so the booking itself is deduplicated too
                 booking_response = requests.post(
-                    f"{request.host_url.rstrip('/')}/api/booking/create",
-                    headers={
-                        'Content-Type': 'application/json'
-                    },
-                    json=booking_data
+                    f"{host_url.rstrip('/')}/api/booking/create",
+                    headers=booking_api_headers(deadline, idempotency_key),
+                    json=booking_data,
+                    timeout=deadline.timeout()
                 )
                 
                 logger.info(f"Booking response status: {booking_response.status_code}")
@@ -371,33 +602,54 @@ def handle_function_call():
                     
                     # Ensure the response fits within token limits
                     booking_data = booking_result.get('data', {})
-                    optimized_data = token_manager.optimize_response(booking_data)
+                    optimized_data = token_manager.optimize_response(booking_data, deadline=deadline)
                     
-                    return jsonify({
+                    return {
                         "status": "success",
                         "data": {
                             "type": "booking_created",
                             "booking": optimized_data
                         }
-                    })
+                    }, 200
+                elif booking_response.status_code == 409:
+                    # The slot is full; offer nearby slots and the waitlist
+                    unavailable = booking_response.json()
+                    alternatives = unavailable.get('alternatives', [])
+                    offers = [f"{option['time']} at {option['outlet']}" for option in alternatives]
+                    message = f"{unavailable.get('message')}. "
+                    if offers:
+                        message += f"I could offer {', or '.join(offers)} instead, or add you to the waitlist for that time."
+                    else:
+                        message += "I can add you to the waitlist for that time if you like."
+                    
+                    return {
+                        "status": "success",
+                        "data": {
+                            "type": "slot_unavailable",
+                            "message": message,
+                            "alternatives": alternatives
+                        }
+                    }, 200
                 else:
                     logger.error(f"Error creating booking: {booking_response.text}")
-                    return jsonify({
+                    return {
                         "status": "success",
                         "data": {
                             "type": "error",
                             "message": "I'm unable to complete your booking at the moment. Please check the information provided and try again."
                         }
-                    })
+                    }, 200
             except requests.RequestException as req_error:
+                if isinstance(req_error, requests.Timeout):
+                    deadline.degrade('booking_call_timed_out')
                 logger.error(f"Request error creating booking: {str(req_error)}")
-                return jsonify({
+                return {
                     "status": "success",
                     "data": {
                         "type": "error",
                         "message": "I encountered a problem with our booking system. Please try again later or contact us directly by phone."
                     }
-                })
+                }, 200
                 
         elif function_name == 'update_booking':
             # Update existing booking
@@ -417,11 +669,10 @@ def handle_function_call():
             try:
                 # Make actual API call to update the booking
                 booking_response = requests.put(
-                    f"{request.host_url.rstrip('/')}/api/booking/update",
-                    headers={
-                        'Content-Type': 'application/json'
-                    },
-                    json=booking_data
+                    f"{host_url.rstrip('/')}/api/booking/update",
+                    headers=booking_api_headers(deadline),
+                    json=booking_data,
+                    timeout=deadline.timeout()
                 )
                 
                 logger.info(f"Update booking response status: {booking_response.status_code}")
@@ -431,46 +682,57 @@ def handle_function_call():
                     
                     # Ensure the response fits within token limits
                     booking_data = booking_result.get('data', {})
-                    optimized_data = token_manager.optimize_response(booking_data)
+                    optimized_data = token_manager.optimize_response(booking_data, deadline=deadline)
                     
-                    return jsonify({
+                    return {
                         "status": "success",
                         "data": {
                             "type": "booking_updated",
                             "booking": optimized_data
                         }
-                    })
+                    }, 200
+                elif booking_response.status_code == 409:
+                    # The slot is full or the booking changed underneath us
+                    return {
+                        "status": "success",
+                        "data": {
+                            "type": "error",
+                            "message": booking_response.json().get('message')
+                        }
+                    }, 200
                 else:
                     logger.error(f"Error updating booking: {booking_response.text}")
-                    return jsonify({
+                    return {
                         "status": "success",
                         "data": {
                             "type": "error",
                             "message": "I'm unable to update your booking at the moment. Please check the booking ID and try again."
                         }
-                    })
+                    }, 200
             except requests.RequestException as req_error:
+                if isinstance(req_error, requests.Timeout):
+                    deadline.degrade('booking_call_timed_out')
                 logger.error(f"Request error updating booking: {str(req_error)}")
-                return jsonify({
+                return {
                     "status": "success",
                     "data": {
                         "type": "error",
                         "message": "I encountered a problem with our booking system. Please try again later or contact us directly by phone."
                     }
-                })
+                }, 200
                 
         elif function_name == 'cancel_booking':
             # Cancel booking
             booking_id = arguments.get('booking_id')
             
             if not booking_id:
-                return jsonify({
+                return {
                     "status": "success",
                     "data": {
                         "type": "error",
                         "message": "I need your booking ID to cancel your reservation. Could you please provide it?"
                     }
-                })
+                }, 200
             
             logger.info(f"Cancelling booking with ID: {booking_id}")
             
@@ -478,56 +740,348 @@ def handle_function_call():
                 # Make actual API call to cancel the booking
                 from flask import current_app
                 booking_response = requests.post(
-                    f"{request.host_url.rstrip('/')}/api/booking/cancel",
-                    headers={
-                        'Content-Type': 'application/json'
-                    },
+                    f"{host_url.rstrip('/')}/api/booking/cancel",
+                    headers=booking_api_headers(deadline),
                     json={
                         'booking_id': booking_id
-                    }
+                    },
+                    timeout=deadline.timeout()
                 )
                 
                 logger.info(f"Cancel booking response status: {booking_response.status_code}")
                 
                 if booking_response.status_code == 200:
-                    return jsonify({
+                    return {
                         "status": "success",
                         "data": {
                             "type": "booking_cancelled",
                             "message": "Your booking has been successfully cancelled."
                         }
-                    })
+                    }, 200
                 else:
                     logger.error(f"Error cancelling booking: {booking_response.text}")
-                    return jsonify({
+                    return {
                         "status": "success",
                         "data": {
                             "type": "error",
                             "message": "I'm unable to cancel your booking at the moment. Please check the booking ID and try again."
                         }
-                    })
+                    }, 200
             except requests.RequestException as req_error:
+                if isinstance(req_error, requests.Timeout):
+                    deadline.degrade('booking_call_timed_out')
                 logger.error(f"Request error cancelling booking: {str(req_error)}")
-                return jsonify({
+                return {
                     "status": "success",
                     "data": {
                         "type": "error",
                         "message": "I encountered a problem with our booking system. Please try again later or contact us directly by phone."
                     }
-                })
+                }, 200
+        elif function_name == 'join_waitlist':
+            # Queue for a full slot; the booking is made automatically when seats free up
+            waitlist_data = {
+                "outlet_id": arguments.get('outlet_id'),
+                "date": arguments.get('date'),
+                "time": arguments.get('time'),
+                "guests": arguments.get('guests'),
+                "customer_name": arguments.get('customer_name'),
+                "phone": arguments.get('phone')
+            }
+            
+            logger.info(f"Joining waitlist with data: {waitlist_data}")
+            
+            try:
+                waitlist_response = requests.post(
+                    f"{host_url.rstrip('/')}/api/booking/waitlist",
+                    headers=booking_api_headers(deadline, idempotency_key),
+                    json=waitlist_data,
+                    timeout=deadline.timeout()
+                )
+                
+                logger.info(f"Waitlist response status: {waitlist_response.status_code}")
+                
+                if waitlist_response.status_code == 201:
+                    entry = waitlist_response.json().get('data', {})
+                    return {
+                        "status": "success",
+                        "data": {
+                            "type": "waitlist_joined",
+                            "entry": token_manager.optimize_response(entry, deadline=deadline),
+                            "message": f"You're number {entry.get('position')} on the waitlist. "
+                                       "If a table frees up we'll book it for you automatically."
+                        }
+                    }, 200
+                else:
+                    logger.error(f"Error joining waitlist: {waitlist_response.text}")
+                    return {
+                        "status": "success",
+                        "data": {
+                            "type": "error",
+                            "message": waitlist_response.json().get('message') or
+                                       "I'm unable to add you to the waitlist at the moment."
+                        }
+                    }, 200
+            except requests.RequestException as req_error:
+                if isinstance(req_error, requests.Timeout):
+                    deadline.degrade('booking_call_timed_out')
+                logger.error(f"Request error joining waitlist: {str(req_error)}")
+                return {
+                    "status": "success",
+                    "data": {
+                        "type": "error",
+                        "message": "I encountered a problem with our booking system. Please try again later or contact us directly by phone."
+                    }
+                }, 200
         else:
             logger.warning(f"Unknown function called: {function_name}")
-            return jsonify({
+            return {
                 "status": "success",
                 "data": {
                     "type": "general",
                     "message": "I'm not sure how to help with that specific request. I can provide information about our outlets, menu, answer FAQs, or help with bookings. How can I assist you today?"
                 }
-            })
+            }, 200
             
     except Exception as e:
         logger.error(f"Error handling function call: {str(e)}")
-        return jsonify({
+        return {
             "status": "success",
             "data": "I apologize for the technical difficulties. I'm having trouble processing your request at the moment. Would you like to try a different question or maybe ask about our locations or menu?"
+        }, 200
+
+@conversation_bp.route('/retell/function-call', methods=['POST'])
+def handle_function_call():
+    """Handle function calls from RetellAI platform"""
+    deadline = deadline_from_request('function_call')
+    data = request.json or {}
+    idempotency_key = function_call_idempotency_key(data, request.headers.get('Idempotency-Key'))
+    
+    payload, status_code, replayed = run_once(
+        idempotency_store,
+        idempotency_key,
+        lambda: execute_function_call(
+            data.get('name', ''), data.get('arguments', {}), request.host_url, idempotency_key, deadline
+        ),
+        is_final_function_result,
+        function_call_fingerprint(data)
+    )
+    
+    # Report any shortcuts taken to stay within the latency budget
+    payload = {**payload, "degradations": deadline.degradations}
+    
+    response = jsonify(payload)
+    if deadline.degradations:
+        response.headers['X-Degradations'] = ','.join(deadline.degradations)
+    if replayed:
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response, status_code
+
+@conversation_bp.route('/retell/function-call/batch', methods=['POST'])
+def handle_function_call_batch():
+    """
+    Run several function calls from one turn.
+    
+    Read-only calls run concurrently on a bounded thread pool; calls with side
+    effects run one after another, in the order given, so they cannot race each
+    other. Results come back in request order with per-call timing. Calls still
+    running when the batch deadline passes are reported as timed out.
+    """
+    started = time.perf_counter()
+    data = request.json or {}
+    calls = data.get('calls')
+    
+    if not isinstance(calls, list) or not calls:
+        return jsonify({
+            "status": "error",
+            "message": "A non-empty 'calls' list is required"
+        }), 400
+    
+    if len(calls) > Config.FUNCTION_BATCH_MAX_CALLS:
+        return jsonify({
+            "status": "error",
+            "message": f"At most {Config.FUNCTION_BATCH_MAX_CALLS} calls are allowed per batch"
+        }), 400
+    
+    # An explicit per-batch deadline in the body takes precedence over the header
+    if data.get('deadline_ms') is not None:
+        try:
+            budget_ms = float(data['deadline_ms'])
+        except (TypeError, ValueError):
+            budget_ms = None
+        # NaN fails the comparison too
+        if budget_ms is None or not budget_ms > 0:
+            return jsonify({
+                "status": "error",
+                "message": "'deadline_ms' must be a positive number of milliseconds"
+            }), 400
+        deadline = Deadline(min(budget_ms, Config.DEADLINE_MAX_MS))
+    else:
+        deadline = deadline_from_request('batch')
+    deadline_ms = deadline.budget_ms
+    call_id = data.get('call_id') or (data.get('call') or {}).get('call_id')
+    app = current_app._get_current_object()
+    host_url = request.host_url
+    timings = [{} for _ in calls]
+    call_deadlines = [deadline.child() for _ in calls]
+    
+    # Filled in by worker threads as each call finishes
+    outcomes = {}
+    
+    def run_calls(indexes):
+        with app.app_context():
+            for index in indexes:
+                call = calls[index] if isinstance(calls[index], dict) else {}
+                timings[index]['queued_ms'] = round((time.perf_counter() - started) * 1000, 2)
+                call_started = time.perf_counter()
+                idempotency_key = function_call_idempotency_key(call, call_id=call_id)
+                try:
+                    outcome = run_once(
+                        idempotency_store,
+                        idempotency_key,
+                        lambda: execute_function_call(
+                            call.get('name', ''), call.get('arguments', {}), host_url,
+                            idempotency_key, call_deadlines[index]
+                        ),
+                        is_final_function_result,
+                        function_call_fingerprint(call)
+                    )
+                except Exception as e:
+                    logger.error(f"Error in batched function call: {str(e)}")
+                    outcome = ({
+                        "status": "error",
+                        "message": "Failed to execute function call"
+                    }, 500, False)
+                timings[index]['elapsed_ms'] = round((time.perf_counter() - call_started) * 1000, 2)
+                outcomes[index] = outcome
+    
+    # Side-effecting calls form one ordered group; everything else runs on its own
+    sequential = [i for i, call in enumerate(calls)
+                  if isinstance(call, dict) and call.get('name') in IDEMPOTENT_FUNCTIONS]
+    groups = [[i] for i in range(len(calls)) if i not in sequential]
+    if sequential:
+        groups.append(sequential)
+    
+    futures = [batch_executor.submit(run_calls, group) for group in groups]
+    done, not_done = wait(futures, timeout=deadline.remaining_ms() / 1000.0)
+    
+    for future in not_done:
+        # Not started calls are dropped; running ones finish in the background
+        future.cancel()
+    
+    finished = dict(outcomes)
+    results = []
+    for index, call in enumerate(calls):
+        name = call.get('name') if isinstance(call, dict) else None
+        if index in finished:
+            payload, status_code, replayed = finished[index]
+            results.append({
+                "index": index,
+                "name": name,
+                "status_code": status_code,
+                "replayed": replayed,
+                "queued_ms": timings[index].get('queued_ms'),
+                "elapsed_ms": timings[index].get('elapsed_ms'),
+                "degradations": call_deadlines[index].degradations,
+                "response": payload
+            })
+        else:
+            results.append({
+                "index": index,
+                "name": name,
+                "status_code": 504,
+                "timed_out": True,
+                "queued_ms": timings[index].get('queued_ms'),
+                "elapsed_ms": None,
+                "degradations": ['deadline_exceeded'],
+                "response": {
+                    "status": "error",
+                    "message": f"Function call did not finish within {deadline_ms:.0f} ms"
+                }
+            })
+    
+    return jsonify({
+        "status": "success",
+        "deadline_ms": deadline_ms,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        "results": results
+    })
+
+@conversation_bp.route('/stream', methods=['POST'])
+def stream_function_call():
+    """
+    Stream the reply to a function call as Server-Sent Events.
+    
+    Events are emitted in order: 'ack' as soon as the request is read,
+    'data' once the result is ready, 'follow_up' with the next question
+    (when there is one) and finally 'done', which lists any degradations
+    applied to stay within the latency budget. Every event carries the
+    milliseconds elapsed since the request started.
+    """
+    started = time.perf_counter()
+    deadline = deadline_from_request('stream')
+    data = request.json or {}
+    function_name = data.get('name', '')
+    arguments = data.get('arguments', {})
+    
+    def elapsed_ms():
+        return round((time.perf_counter() - started) * 1000, 2)
+    
+    def generate():
+        if not function_name:
+            yield format_sse_event('error', {
+                "message": "Function name is required",
+                "elapsed_ms": elapsed_ms()
+            })
+            return
+        
+        yield format_sse_event('ack', {
+            "message": FUNCTION_ACKNOWLEDGEMENTS.get(function_name, "One moment please."),
+            "elapsed_ms": elapsed_ms()
         })
+        
+        try:
+            if function_name == 'query_knowledge_base':
+                result = answer_knowledge_base_query(
+                    arguments.get('query', ''), arguments.get('type', 'general'), deadline
+                )
+            else:
+                # Booking functions share the regular function-call handler
+                idempotency_key = function_call_idempotency_key(data, request.headers.get('Idempotency-Key'))
+                payload, _, _ = run_once(
+                    idempotency_store,
+                    idempotency_key,
+                    lambda: execute_function_call(
+                        function_name, arguments, request.host_url, idempotency_key, deadline
+                    ),
+                    is_final_function_result,
+                    function_call_fingerprint(data)
+                )
+                result = payload.get('data')
+        except Exception as e:
+            logger.error(f"Error streaming function call: {str(e)}")
+            result = {
+                "type": "error",
+                "message": "I'm sorry, I couldn't complete that request. Please try again."
+            }
+        
+        yield format_sse_event('data', {"result": result, "elapsed_ms": elapsed_ms()})
+        
+        result_type = result.get('type') if isinstance(result, dict) else None
+        follow_up = FOLLOW_UP_QUESTIONS.get(result_type)
+        if follow_up:
+            yield format_sse_event('follow_up', {"message": follow_up, "elapsed_ms": elapsed_ms()})
+        
+        yield format_sse_event('done', {
+            "elapsed_ms": elapsed_ms(),
+            "degradations": deadline.degradations
+        })
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
@@ -1,11 +1,23 @@
+import io
 import os
+import glob
 import json
 import logging
 import datetime
 import pytz
-from flask import Blueprint, request, jsonify
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from config import Config
+from utils.sheets_client import SheetsClientHolder
+from utils.sheets_writer import SheetsWriter
+from utils.segment_log import (
+    SegmentLog, close_stale_segments, list_segments, read_segment, replayed_targets, mark_replayed, remove_segment
+)
+from utils.task_queue import TaskQueue
+from utils.bulk_analysis import BulkAnalyzer
+from utils.call_stats import CallStats, DIMENSIONS
+from utils.log_search import LogSearch, SearchUnavailableError
+from utils.log_retention import LogRetention, LOG_FIELDS
+from utils.log_export import export_logs
 from utils.helpers import (
     format_date, 
     format_time, 
@@ -13,7 +25,8 @@ from utils.helpers import (
     format_ist_time,
     validate_phone_number,
     classify_call_outcome,
-    generate_call_summary
+    generate_call_summary,
+    analyze_transcript
 )
 
 # Configure logging
@@ -22,42 +35,85 @@ logger = logging.getLogger(__name__)
 # Create blueprint
 post_call_bp = Blueprint('post_call', __name__)
 
-# Initialize Google Sheets connection
+# Authorized Sheets client and worksheet, shared by every request in this process
+sheets_holder = SheetsClientHolder(
+    refresh_margin_seconds=Config.GOOGLE_SHEETS_REFRESH_MARGIN_SECONDS,
+    api_base_url=Config.GOOGLE_SHEETS_API_URL,
+    timeout=Config.GOOGLE_SHEETS_TIMEOUT_SECONDS
+)
+
+# Fields of a Sheets row, in column order, as named in the local log
+LOCAL_LOG_FIELDS = [
+    "modality", "call_time", "phone_number", "call_outcome", "outlet_name",
+    "booking_date", "booking_time", "guests", "call_summary", "conversation_text"
+]
+
+IST = pytz.timezone('Asia/Kolkata')
+
+# Fallback log for conversations that could not be delivered, replayable later
+local_log = SegmentLog(
+    Config.LOCAL_LOG_DIR,
+    max_segment_bytes=Config.LOCAL_LOG_SEGMENT_BYTES,
+    max_segment_seconds=Config.LOCAL_LOG_SEGMENT_SECONDS,
+    compress=Config.LOCAL_LOG_COMPRESS
+)
+
+# Spools rows on local disk and appends them to Sheets in batches from a background thread;
+# rows Sheets rejects are kept in the local log for inspection
+sheets_writer = SheetsWriter(
+    sheets_holder,
+    spool_path=Config.SHEETS_SPOOL_PATH,
+    batch_size=Config.SHEETS_BATCH_SIZE,
+    max_wait_seconds=Config.SHEETS_BATCH_MAX_WAIT_SECONDS,
+    min_interval_seconds=Config.SHEETS_MIN_INTERVAL_SECONDS,
+    max_backoff_seconds=Config.SHEETS_MAX_BACKOFF_SECONDS,
+    dead_letter=lambda row: log_locally(row, pending=[])
+)
+
+# Post-call analysis and delivery run as durable tasks on worker threads, so logging a call is just an insert
+task_queue = TaskQueue(
+    visibility_timeout_seconds=Config.TASK_VISIBILITY_TIMEOUT_SECONDS,
+    max_attempts=Config.TASK_MAX_ATTEMPTS,
+    retry_backoff_seconds=Config.TASK_RETRY_BACKOFF_SECONDS,
+    max_backoff_seconds=Config.TASK_MAX_BACKOFF_SECONDS,
+    poll_seconds=Config.TASK_POLL_SECONDS,
+    claim_batch_size=Config.TASK_CLAIM_BATCH_SIZE
+)
+
+# Process pool for bulk transcript analysis, started on first use
+bulk_analyzer = BulkAnalyzer(
+    workers=Config.ANALYSIS_WORKERS,
+    chunk_size=Config.ANALYSIS_CHUNK_SIZE
+)
+
+# Hourly call counts kept in step with conversation_logs, for the stats endpoint
+call_stats = CallStats()
+
+# Full-text index over transcripts, filled as logs are saved
+log_search = LogSearch(snippet_chars=Config.SEARCH_SNIPPET_CHARS, max_ranked=Config.SEARCH_MAX_RANKED)
+
+# Moves months of logs past the retention period to archive files; scheduled from app.py
+log_retention = LogRetention(
+    log_search,
+    archive_dir=Config.LOG_ARCHIVE_DIR,
+    retention_days=Config.LOG_RETENTION_DAYS,
+    batch_size=Config.LOG_RETENTION_BATCH_SIZE,
+    pause_seconds=Config.LOG_RETENTION_PAUSE_SECONDS,
+    interval_seconds=Config.LOG_RETENTION_INTERVAL_SECONDS,
+    months_ahead=Config.LOG_PARTITION_MONTHS_AHEAD
+)
+
 def get_sheets_client():
-    """Initialize and return Google Sheets client"""
+    """Return the shared Google Sheets client, or None if it is not configured"""
     try:
-        # First check for credentials file path
-        creds_file = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
-        if creds_file and os.path.exists(creds_file):
-            # OAuth2 credentials from file
-            scope = ['https://spreadsheets.google.com/feeds',
-                    'https://www.googleapis.com/auth/drive']
-            credentials = ServiceAccountCredentials.from_json_keyfile_name(creds_file, scope)
-            return gspread.authorize(credentials)
-        
-        # Next try to use service account credentials from environment variable
-        creds_json = os.environ.get('GOOGLE_CREDENTIALS_JSON')
-        if creds_json:
-            # Parse JSON from environment variable
-            import json
-            creds_dict = json.loads(creds_json)
-            
-            # OAuth2 credentials from dict
-            scope = ['https://spreadsheets.google.com/feeds',
-                    'https://www.googleapis.com/auth/drive']
-            credentials = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-            
-            return gspread.authorize(credentials)
-        else:
-            logger.warning("Google credentials not found. Set GOOGLE_APPLICATION_CREDENTIALS or GOOGLE_CREDENTIALS_JSON environment variables to enable Google Sheets logging.")
-            return None
+        return sheets_holder.get_client()
     except Exception as e:
         logger.error(f"Error initializing Google Sheets client: {str(e)}")
         return None
 
 @post_call_bp.route('/log', methods=['POST'])
 def log_conversation():
-    """Log conversation data to Google Sheets"""
+    """Queue conversation data for analysis and logging to the database and Google Sheets"""
     try:
         data = request.json
         
@@ -82,107 +138,44 @@ def log_conversation():
                 "status": "error",
                 "message": "Invalid phone number format"
             }), 400
-            
-        # Get current time in IST
-        call_time = format_ist_time()
         
-        # Extract or use provided values
-        call_outcome = data.get('call_outcome') or classify_call_outcome(conversation)
-        outlet_name = data.get('outlet_name', 'NA')
-        booking_date = format_date(data.get('booking_date', 'NA'))
-        booking_time = format_time(data.get('booking_time', 'NA'))
-        customer_name = data.get('customer_name', 'NA')
-        guests = data.get('guests', 'NA')
-        call_summary = data.get('call_summary') or generate_call_summary(conversation)
-        
-        # Create row data for Google Sheets
-        row_data = [
-            modality,
-            call_time,
-            phone_number,
-            call_outcome,
-            outlet_name,
-            booking_date,
-            booking_time,
-            guests,
-            call_summary,
-            conversation[:1000]  # Truncated conversation text to avoid exceeding sheet limits
-        ]
+        # Analysis and delivery run on the task workers; the call time is when the log arrived
+        payload = {
+            'modality': modality,
+            'phone_number': phone_number,
+            'conversation': conversation,
+            'call_time': format_ist_time(),
+            'received_at': datetime.datetime.utcnow().isoformat(),
+            'call_outcome': data.get('call_outcome'),
+            'outlet_name': data.get('outlet_name', 'NA'),
+            'booking_date': data.get('booking_date', 'NA'),
+            'booking_time': data.get('booking_time', 'NA'),
+            'customer_name': data.get('customer_name', 'NA'),
+            'guests': data.get('guests', 'NA'),
+            'call_summary': data.get('call_summary')
+        }
         
-        # Also save to database
         try:
-            from models import db, ConversationLog
-            
-            # Create new conversation log entry
-            new_log = ConversationLog(
-                modality=modality,
-                phone_number=phone_number,
-                call_outcome=call_outcome,
-                outlet_name=outlet_name,
-                booking_date=booking_date,
-                booking_time=booking_time,
-                guests=str(guests),
-                call_summary=call_summary,
-                conversation_text=conversation
-            )
-            
-            # Save to database
-            db.session.add(new_log)
-            db.session.commit()
-            logger.info(f"Conversation log saved to database with ID: {new_log.id}")
-        except Exception as db_error:
-            logger.error(f"Error saving to database: {str(db_error)}")
-            # Continue with Google Sheets logging attempt even if DB fails
-        
-        # Try to log data to Google Sheets
-        sheets_client = get_sheets_client()
-        
-        if sheets_client:
-            # Open the sheet using the ID from config
-            sheet_id = os.environ.get('GOOGLE_SHEETS_ID')
-            
-            if not sheet_id:
-                logger.error("Google Sheets ID not found in environment variables")
-                # Fall back to local logging
-                log_locally(row_data)
-                
-                return jsonify({
-                    "status": "warning",
-                    "message": "Conversation logged locally due to missing Google Sheets ID",
-                    "data": row_data
-                })
-                
-            try:
-                sheet = sheets_client.open_by_key(sheet_id)
-                worksheet = sheet.sheet1  # Use the first sheet
-                
-                # Append the row
-                worksheet.append_row(row_data)
-                
-                return jsonify({
-                    "status": "success",
-                    "message": "Conversation logged successfully to Google Sheets",
-                    "data": row_data
-                })
-            except Exception as e:
-                logger.error(f"Error writing to Google Sheets: {str(e)}")
-                # Fall back to local logging
-                log_locally(row_data)
-                
-                return jsonify({
-                    "status": "warning",
-                    "message": f"Conversation logged locally due to Google Sheets error: {str(e)}",
-                    "data": row_data
-                })
-        else:
-            # Fall back to local logging
-            log_locally(row_data)
+            task_id = task_queue.enqueue('post_call.analyze', payload)
+        except Exception as e:
+            logger.error(f"Error queueing conversation for analysis: {str(e)}")
+            from models import db
+            db.session.rollback()
+            # Fall back to analysing now and logging locally for replay
+            row_data = build_log_row(payload)
+            log_locally(row_data, pending=['sheets', 'db'], conversation=conversation)
             
             return jsonify({
                 "status": "warning",
-                "message": "Conversation logged locally due to Google Sheets connection failure",
+                "message": f"Conversation logged locally due to task queue error: {str(e)}",
                 "data": row_data
             })
+        
+        return jsonify({
+            "status": "success",
+            "message": "Conversation queued for analysis and logging",
+            "task_id": task_id
+        }), 202
             
     except Exception as e:
         logger.error(f"Error logging conversation: {str(e)}")
@@ -192,39 +185,425 @@ def log_conversation():
             "error": str(e)
         }), 500
 
-def log_locally(row_data):
-    """Log data locally as a fallback"""
+def build_log_row(payload):
+    """
+    Classify and summarise a queued conversation, filling in fields the caller left out.
+    
+    Args:
+        payload (dict): Conversation as queued by log_conversation()
+    
+    Returns:
+        list: Row as sent to Google Sheets
+    """
+    conversation = payload['conversation']
+    return [
+        payload['modality'],
+        payload['call_time'],
+        payload['phone_number'],
+        payload.get('call_outcome') or classify_call_outcome(conversation),
+        payload.get('outlet_name', 'NA'),
+        format_date(payload.get('booking_date', 'NA')),
+        format_time(payload.get('booking_time', 'NA')),
+        payload.get('guests', 'NA'),
+        payload.get('call_summary') or generate_call_summary(conversation),
+        conversation[:1000]  # Truncated conversation text to avoid exceeding sheet limits
+    ]
+
+@task_queue.handler(
+    'post_call.analyze',
+    dead_letter=lambda payload, error: log_locally(
+        build_log_row(payload), pending=['sheets', 'db'], conversation=payload['conversation']
+    )
+)
+def analyze_and_save(payload):
+    """Analyse a logged conversation, save it to the database and queue its delivery to Sheets"""
+    from models import db, ConversationLog
+    
+    row_data = build_log_row(payload)
+    modality, _, phone_number, call_outcome, outlet_name, booking_date, booking_time, guests, call_summary, _ = row_data
+    
+    log = ConversationLog(
+        modality=modality,
+        call_time=datetime.datetime.fromisoformat(payload['received_at']),
+        phone_number=phone_number,
+        call_outcome=call_outcome,
+        outlet_name=outlet_name,
+        booking_date=booking_date,
+        booking_time=booking_time,
+        guests=str(guests),
+        call_summary=call_summary,
+        conversation_text=payload['conversation']
+    )
+    db.session.add(log)
+    call_stats.record(log)
+    log_search.record(log)
+    # Committed together with the log row, so delivery is queued exactly when the row is saved
+    task_queue.enqueue('post_call.deliver', {'row': row_data, 'conversation': payload['conversation']}, commit=False)
+
+@task_queue.handler(
+    'post_call.deliver',
+    dead_letter=lambda payload, error: log_locally(
+        payload['row'], pending=['sheets'], conversation=payload['conversation']
+    )
+)
+def deliver_to_sheets(payload):
+    """Spool an analysed conversation's row for the Sheets writer, or log it locally if Sheets is not set up"""
+    sheet_id = os.environ.get('GOOGLE_SHEETS_ID')
+    
+    if not sheets_holder.configured() or not sheet_id:
+        logger.warning("Google Sheets credentials or ID not configured; logging conversation locally")
+        log_locally(payload['row'], pending=['sheets'], conversation=payload['conversation'])
+        return
+    
+    sheets_writer.enqueue(sheet_id, payload['row'])
+
+@post_call_bp.route('/stats', methods=['GET'])
+def get_call_stats():
+    """
+    Report call counts and booking conversion from the hourly rollups.
+    
+    Query parameters: date_from and date_to (IST dates, YYYY-MM-DD; the last
+    30 days by default), group_by (comma separated: date, hour, outlet,
+    modality, outcome; default date) and outlet, modality or outcome filters.
+    """
+    try:
+        today = get_current_ist_time().date()
+        date_to = datetime.datetime.strptime(request.args['date_to'], '%Y-%m-%d').date() \
+            if request.args.get('date_to') else today
+        date_from = datetime.datetime.strptime(request.args['date_from'], '%Y-%m-%d').date() \
+            if request.args.get('date_from') else date_to - datetime.timedelta(days=29)
+    except ValueError:
+        return jsonify({
+            "status": "error",
+            "message": "Dates must be in YYYY-MM-DD format"
+        }), 400
+    
+    group_by = [name for name in request.args.get('group_by', 'date').split(',') if name]
+    unknown = [name for name in group_by if name not in DIMENSIONS]
+    if unknown:
+        return jsonify({
+            "status": "error",
+            "message": f"Cannot group by {', '.join(unknown)}; use {', '.join(DIMENSIONS)}"
+        }), 400
+    
     try:
-        # Create a unique filename based on timestamp
-        timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-        filename = f"conversation_log_{timestamp}.json"
+        filters = {name: request.args.get(name) for name in ('outlet', 'modality', 'outcome')}
+        groups = call_stats.query(date_from, date_to, group_by, **filters)
+        totals = call_stats.query(date_from, date_to, (), **filters)[0]
         
-        # Create logs directory if it doesn't exist
-        os.makedirs('logs', exist_ok=True)
+        return jsonify({
+            "status": "success",
+            "data": {
+                "date_from": date_from.strftime('%Y-%m-%d'),
+                "date_to": date_to.strftime('%Y-%m-%d'),
+                "group_by": group_by,
+                "groups": groups,
+                "totals": totals
+            }
+        })
+    except Exception as e:
+        logger.error(f"Error reading call stats: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": "Failed to read call stats",
+            "error": str(e)
+        }), 500
+
+def call_time_range(args):
+    """
+    Naive UTC bounds on call_time for whole IST days.
+    
+    Args:
+        args (dict): Query parameters: date_from and date_to (IST dates, YYYY-MM-DD)
         
-        # Map row data to named fields
-        log_data = {
-            "modality": row_data[0],
-            "call_time": row_data[1],
-            "phone_number": row_data[2],
-            "call_outcome": row_data[3],
-            "outlet_name": row_data[4],
-            "booking_date": row_data[5],
-            "booking_time": row_data[6],
-            "guests": row_data[7],
-            "call_summary": row_data[8],
-            "conversation_text": row_data[9] if len(row_data) > 9 else "N/A"
+    Returns:
+        tuple: (earliest call time, end of the last day) as naive UTC datetimes, or None for either
+        
+    Raises:
+        ValueError: If a date is not in YYYY-MM-DD format
+    """
+    call_time_from = call_time_to = None
+    if args.get('date_from'):
+        date_from = datetime.datetime.strptime(args['date_from'], '%Y-%m-%d')
+        call_time_from = IST.localize(date_from).astimezone(pytz.utc).replace(tzinfo=None)
+    if args.get('date_to'):
+        date_to = datetime.datetime.strptime(args['date_to'], '%Y-%m-%d') + datetime.timedelta(days=1)
+        call_time_to = IST.localize(date_to).astimezone(pytz.utc).replace(tzinfo=None)
+    return call_time_from, call_time_to
+
+@post_call_bp.route('/search', methods=['GET'])
+def search_logs():
+    """
+    Full-text search over conversation transcripts.
+    
+    Query parameters: q (words, "quoted phrases" and prefix* words; all must
+    match), sort (relevance or recent), page and per_page, date_from and
+    date_to (IST dates, YYYY-MM-DD), and outlet or outcome filters.
+    """
+    query = request.args.get('q', '').strip()
+    sort = request.args.get('sort', 'relevance')
+    if not query:
+        return jsonify({
+            "status": "error",
+            "message": "Missing search query 'q'"
+        }), 400
+    if sort not in ('relevance', 'recent'):
+        return jsonify({
+            "status": "error",
+            "message": "sort must be 'relevance' or 'recent'"
+        }), 400
+    
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(Config.SEARCH_MAX_PAGE_SIZE, max(1, int(request.args.get('per_page', Config.SEARCH_PAGE_SIZE))))
+        call_time_from, call_time_to = call_time_range(request.args)
+    except ValueError:
+        return jsonify({
+            "status": "error",
+            "message": "page and per_page must be numbers and dates in YYYY-MM-DD format"
+        }), 400
+    
+    try:
+        results, has_more = log_search.search(
+            query, page, per_page, call_time_from, call_time_to,
+            outlet=request.args.get('outlet') or None,
+            outcome=request.args.get('outcome') or None,
+            sort=sort
+        )
+        
+        return jsonify({
+            "status": "success",
+            "data": {
+                "query": query,
+                "sort": sort,
+                "page": page,
+                "per_page": per_page,
+                "has_more": has_more,
+                "results": results
+            }
+        })
+    except SearchUnavailableError as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 503
+    except Exception as e:
+        logger.error(f"Error searching conversation logs: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": "Failed to search conversation logs",
+            "error": str(e)
+        }), 500
+
+@post_call_bp.route('/export', methods=['GET'])
+def export_conversation_logs():
+    """
+    Stream conversation logs as CSV or NDJSON.
+    
+    Query parameters: format (csv or ndjson), date_from and date_to (IST
+    dates, YYYY-MM-DD), outlet and outcome filters, fields (comma separated;
+    all of them, transcript included, by default), archived=1 to include
+    archived months and gzip=1 to compress the download.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({
+            "status": "error",
+            "message": "Format must be 'csv' or 'ndjson'"
+        }), 400
+    
+    fields = request.args['fields'].split(',') if request.args.get('fields') else list(LOG_FIELDS)
+    unknown = [field for field in fields if field not in LOG_FIELDS]
+    if unknown:
+        return jsonify({
+            "status": "error",
+            "message": f"Unknown fields: {', '.join(unknown)}"
+        }), 400
+    
+    try:
+        call_time_from, call_time_to = call_time_range(request.args)
+    except ValueError:
+        return jsonify({
+            "status": "error",
+            "message": "Dates must be in YYYY-MM-DD format"
+        }), 400
+    
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    records = log_retention.iter_logs(
+        call_time_from, call_time_to,
+        outlet=request.args.get('outlet') or None,
+        outcome=request.args.get('outcome') or None,
+        include_archived=request.args.get('archived', '').lower() in ('1', 'true', 'yes'),
+        fields=fields,
+        batch_size=Config.LOG_EXPORT_BATCH_SIZE
+    )
+    
+    filename = f'conversation_logs.{fmt}' + ('.gz' if compress else '')
+    mimetype = 'application/gzip' if compress else 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(export_logs(records, fields, fmt, compress)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+@post_call_bp.route('/archives', methods=['GET'])
+def get_log_archives():
+    """List archived months of conversation logs, with the retention schedule and last run"""
+    try:
+        return jsonify({
+            "status": "success",
+            "data": {
+                "archives": log_retention.archives(),
+                "retention": log_retention.stats()
+            }
+        })
+    except Exception as e:
+        logger.error(f"Error listing log archives: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": "Failed to list log archives",
+            "error": str(e)
+        }), 500
+
+@post_call_bp.route('/tasks/metrics', methods=['GET'])
+def get_task_metrics():
+    """Report task queue depth, and outcomes, queue wait and run time per task for this worker"""
+    try:
+        return jsonify({
+            "status": "success",
+            "data": task_queue.stats()
+        })
+    except Exception as e:
+        logger.error(f"Error reading task queue metrics: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": "Failed to read task queue metrics",
+            "error": str(e)
+        }), 500
+
+@post_call_bp.route('/sheets/metrics', methods=['GET'])
+def get_sheets_metrics():
+    """Report Google Sheets client reuse and the background writer's spool for this worker"""
+    return jsonify({
+        "status": "success",
+        "data": {
+            "client": sheets_holder.stats(),
+            "writer": sheets_writer.stats()
         }
+    })
+
+def log_locally(row_data, pending=('sheets',), conversation=None):
+    """
+    Log data locally as a fallback.
+    
+    Records are appended to the segmented NDJSON log in LOCAL_LOG_DIR and
+    can be replayed later with replay_local_log().
+    
+    Args:
+        row_data (list): Row as sent to Google Sheets
+        pending (iterable): Destinations ('sheets', 'db') the row has not reached yet
+        conversation (str, optional): Full conversation text, if longer than the row's copy
+    """
+    try:
+        # Map row data to named fields
+        log_data = dict(zip(LOCAL_LOG_FIELDS, row_data))
+        log_data.setdefault("conversation_text", "N/A")
+        if conversation is not None:
+            log_data["conversation_text"] = conversation
+        log_data["pending"] = list(pending)
         
-        # Write to file
-        with open(f"logs/{filename}", 'w') as f:
-            json.dump(log_data, f, indent=2)
-            
-        logger.info(f"Conversation log saved locally to logs/{filename}")
+        local_log.append(log_data)
+        logger.info(f"Conversation log saved locally to {local_log.path}")
         
     except Exception as e:
         logger.error(f"Error logging locally: {str(e)}")
 
+def replay_local_log(target, delete=False):
+    """
+    Send locally logged conversations to Google Sheets or the database.
+    
+    Closed segments are read oldest first; records not pending for `target`
+    are skipped. One-file-per-call JSON logs from older versions are replayed
+    into Sheets too. Each file records the destinations it has been replayed
+    to, so replaying again never sends a record to the same place twice.
+    
+    Args:
+        target (str): 'sheets' (queued for the background writer) or 'db'
+        delete (bool): Remove each segment once replayed, unless a record in it
+            is still pending for a destination it has not been replayed to
+    
+    Returns:
+        dict: Counts of segments read and records replayed
+    """
+    from models import db, ConversationLog
+    
+    sheet_id = os.environ.get('GOOGLE_SHEETS_ID')
+    if target == 'sheets' and not sheet_id:
+        raise ValueError("Google Sheets ID not found in environment variables")
+    
+    close_stale_segments(Config.LOCAL_LOG_DIR)
+    summary = {'segments': 0, 'replayed': 0, 'skipped': 0, 'kept': 0}
+    
+    def replay(record):
+        """Replay one record; returns the destinations it was pending for"""
+        pending = record.get('pending', ['sheets'])
+        if target not in pending:
+            summary['skipped'] += 1
+            return set(pending)
+        if target == 'sheets':
+            row = [record.get(field, 'NA') for field in LOCAL_LOG_FIELDS]
+            row[-1] = (row[-1] or '')[:1000]
+            sheets_writer.enqueue(sheet_id, row)
+        else:
+            call_time = datetime.datetime.strptime(record['call_time'], '%Y-%m-%d %H:%M:%S')
+            log = ConversationLog(
+                modality=record['modality'],
+                call_time=IST.localize(call_time).astimezone(pytz.utc).replace(tzinfo=None),
+                phone_number=record['phone_number'],
+                call_outcome=record['call_outcome'],
+                outlet_name=record['outlet_name'],
+                booking_date=record['booking_date'],
+                booking_time=record['booking_time'],
+                guests=str(record['guests']),
+                call_summary=record['call_summary'],
+                conversation_text=record['conversation_text']
+            )
+            db.session.add(log)
+            call_stats.record(log)
+            log_search.record(log)
+        summary['replayed'] += 1
+        return set(pending)
+    
+    for path in list_segments(Config.LOCAL_LOG_DIR):
+        done = replayed_targets(path)
+        pending = set()
+        if target in done:
+            # Replayed to this destination by an earlier run; only deletion is left to decide
+            for _, record in read_segment(path):
+                pending.update(record.get('pending', ['sheets']))
+        else:
+            for _, record in read_segment(path):
+                pending.update(replay(record))
+            if target == 'db':
+                db.session.commit()
+            mark_replayed(path, target)
+            done.add(target)
+        summary['segments'] += 1
+        if delete and pending - done:
+            summary['kept'] += 1
+        elif delete:
+            remove_segment(path)
+    
+    if target == 'sheets':
+        for path in sorted(glob.glob(os.path.join(Config.LOCAL_LOG_DIR, 'conversation_log_*.json'))):
+            if target not in replayed_targets(path):
+                with open(path) as f:
+                    replay(json.load(f))
+                mark_replayed(path, target)
+            summary['segments'] += 1
+            if delete:
+                remove_segment(path)
+    
+    return summary
+
 @post_call_bp.route('/analyze', methods=['POST'])
 def analyze_conversation():
     """
@@ -241,52 +620,12 @@ def analyze_conversation():
                 "status": "error",
                 "message": "Conversation text is required for analysis"
             }), 400
-            
-        # Analyze conversation to extract key information
-        call_outcome = classify_call_outcome(conversation)
-        
-        # Extract entities using helper function
-        entities = {
-            'phone': None,
-            'date': 'NA',
-            'time': 'NA',
-            'guests': 'NA',
-            'name': 'NA'
-        }
-        
-        # Extract each entity type
-        for entity_type in entities.keys():
-            extracted = {}
-            if entity_type == 'phone':
-                # Look for phone numbers
-                import re
-                phone_matches = re.findall(r'(?:\+91|0)?[6-9][0-9]{9}', conversation)
-                if phone_matches:
-                    entities['phone'] = validate_phone_number(phone_matches[0])
-            else:
-                # Use helper function for other entity types
-                extracted = utils.helpers.extract_entities_from_text(
-                    conversation, [entity_type]
-                )
-                if entity_type in extracted:
-                    entities[entity_type] = extracted[entity_type]
-        
-        # Generate summary
-        call_summary = generate_call_summary(conversation)
         
         # Return the analysis
         return jsonify({
             "status": "success",
             "message": "Conversation analyzed successfully",
-            "analysis": {
-                "call_outcome": call_outcome,
-                "booking_date": entities['date'],
-                "booking_time": entities['time'],
-                "customer_name": entities['name'],
-                "guests": entities['guests'],
-                "phone_number": entities['phone'],
-                "call_summary": call_summary
-            }
+            "analysis": analyze_transcript(conversation)
         })
         
     except Exception as e:
@@ -296,3 +635,137 @@ def analyze_conversation():
             "message": "Failed to analyze conversation",
             "error": str(e)
         }), 500
+
+@post_call_bp.route('/analyze/bulk', methods=['POST'])
+def analyze_conversations_bulk():
+    """
+    Analyze many conversations on the analysis process pool.
+    
+    The body is NDJSON, one {"id": ..., "conversation": ...} object per line,
+    and is read as a stream. A JSON body of the form {"conversations": [...]}
+    is accepted too. Results are streamed back as NDJSON in input order, one
+    line per conversation with its index, id and analysis (or error).
+    """
+    if request.is_json:
+        conversations = (request.get_json(silent=True) or {}).get('conversations')
+        if not isinstance(conversations, list):
+            return jsonify({
+                "status": "error",
+                "message": "Body must be NDJSON or {\"conversations\": [...]}"
+            }), 400
+    else:
+        conversations = read_ndjson_conversations(request.stream)
+    
+    def generate():
+        try:
+            for result in bulk_analyzer.analyze(conversations):
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            logger.error(f"Error in bulk analysis: {str(e)}")
+            yield json.dumps({"error": f"Bulk analysis stopped: {str(e)}"}) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def read_ndjson_conversations(stream):
+    """
+    Read conversations to analyse from an NDJSON stream.
+    
+    Lines that are not JSON objects are passed on as plain transcripts, so a
+    file of JSON strings works too. Blank lines are skipped.
+    
+    Args:
+        stream: Binary file-like object
+    
+    Yields:
+        dict or str: Conversation records for BulkAnalyzer.analyze()
+    """
+    # Buffered: iterating the raw request stream reads it a byte at a time
+    for line in io.TextIOWrapper(stream, encoding='utf-8', errors='replace'):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield line
+
+def backfill_analysis(date_from=None, date_to=None, batch_size=1000):
+    """
+    Re-run analysis over stored conversation logs and save the results.
+    
+    Logs are read page by page in ID order and analysed on the process pool.
+    Outcome and summary are replaced; booking date, time and guests are only
+    filled in where they are missing. Each page is committed on its own, and
+    the call stats rollups of months not archived are rebuilt at the end.
+    
+    Args:
+        date_from (datetime, optional): Earliest call time (UTC)
+        date_to (datetime, optional): Latest call time (UTC), exclusive
+        batch_size (int): Logs read and updated per transaction
+    
+    Returns:
+        dict: Logs analysed, updated and failed
+    """
+    from sqlalchemy import update
+    from models import db, ConversationLog
+    
+    filters = []
+    if date_from:
+        filters.append(ConversationLog.call_time >= date_from)
+    if date_to:
+        filters.append(ConversationLog.call_time < date_to)
+    
+    def logs():
+        last_id = 0
+        while True:
+            page = db.session.query(
+                ConversationLog.id, ConversationLog.conversation_text, ConversationLog.booking_date,
+                ConversationLog.booking_time, ConversationLog.guests
+            ).filter(ConversationLog.id > last_id, *filters).order_by(ConversationLog.id).limit(batch_size).all()
+            if not page:
+                return
+            for row in page:
+                # Kept until its result comes back, so nothing is looked up twice
+                pending[row.id] = row
+                yield {'id': row.id, 'conversation': row.conversation_text}
+            last_id = page[-1].id
+    
+    summary = {'analysed': 0, 'updated': 0, 'failed': 0}
+    pending = {}
+    updates = []
+    
+    def save():
+        if updates:
+            db.session.execute(update(ConversationLog), updates)
+            summary['updated'] += len(updates)
+            updates.clear()
+        db.session.commit()
+    
+    for result in bulk_analyzer.analyze(logs()):
+        row = pending.pop(result['id'])
+        summary['analysed'] += 1
+        if 'error' in result:
+            summary['failed'] += 1
+            continue
+        analysis = result['analysis']
+        values = {
+            'id': row.id,
+            'call_outcome': analysis['call_outcome'],
+            'call_summary': analysis['call_summary']
+        }
+        if row.booking_date in (None, 'NA'):
+            values['booking_date'] = analysis['booking_date']
+        if row.booking_time in (None, 'NA'):
+            values['booking_time'] = analysis['booking_time']
+        if row.guests in (None, 'NA'):
+            values['guests'] = str(analysis['guests'])
+        updates.append(values)
+        if len(updates) >= batch_size:
+            save()
+    save()
+    
+    if summary['updated']:
+        # Rollups of archived months are kept as they are
+        call_stats.rebuild(since=log_retention.archived_until())
+    
+    return summary
@@ -0,0 +1,293 @@
+import re
+import json
+import time
+import logging
+import threading
+from flask import Blueprint, jsonify
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
+from api.conversation_service import (
+    state_transition,
+    answer_knowledge_base_query,
+    FOLLOW_UP_QUESTIONS
+)
+from utils.deadline import Deadline
+from utils.metrics import LatencyTracker
+from config import Config
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create blueprint and WebSocket extension
+retell_llm_bp = Blueprint('retell_llm', __name__)
+sock = Sock()
+
+GREETING = ("Welcome to Barbeque Nation! I can help you with bookings, enquiries, and more "
+            "for our outlets in Delhi and Bangalore. How may I assist you today?")
+REMINDER = "Are you still there? I can help you with bookings, our outlets or our menu."
+
+# Knowledge base query type to use in each conversation state
+STATE_QUERY_TYPES = {
+    'faq_enquiry': 'faq',
+    'booking_enquiry': 'booking',
+    'booking_confirmation': 'booking',
+    'booking_modification': 'booking_modification'
+}
+
+# Latency from a 'response_required' event to the first and last chunk sent back
+first_chunk_latency = LatencyTracker()
+turn_latency = LatencyTracker()
+
+# Sessions for calls currently connected, keyed by call ID
+active_sessions = {}
+active_sessions_lock = threading.Lock()
+
+
+def render_voice_reply(result):
+    """
+    Turn a knowledge base result into plain sentences suitable for speech.
+
+    Args:
+        result (dict): Result from answer_knowledge_base_query
+
+    Returns:
+        str: Text to be spoken, including any follow-up question
+    """
+    result_type = result.get('type')
+    items = result.get('data') or []
+
+    if result_type == 'outlets' and items:
+        reply = " ".join(f"{outlet['name']} is at {outlet['address']}." for outlet in items)
+    elif result_type == 'menu' and items:
+        names = [item['name'] for item in items]
+        listed = names[0] if len(names) == 1 else f"{', '.join(names[:-1])} and {names[-1]}"
+        reply = f"Some of our popular dishes are {listed}."
+    elif result_type == 'faq' and items:
+        reply = items[0].get('answer', '')
+    else:
+        reply = result.get('message') or GREETING
+
+    # Numbered lists and line breaks read badly on a call
+    reply = re.sub(r'\n+\d+\.\s*', ' ', reply)
+    reply = re.sub(r'\s*\n+\s*', ' ', reply).strip()
+
+    follow_up = FOLLOW_UP_QUESTIONS.get(result_type)
+    if follow_up:
+        reply = f"{reply} {follow_up}"
+
+    return reply
+
+
+def split_sentences(text):
+    """Split a reply into sentence-sized chunks for streaming"""
+    return [sentence for sentence in re.split(r'(?<=[.?!])\s+', text) if sentence]
+
+
+class RetellLLMSession:
+    """
+    Per-call conversation state for RetellAI's custom LLM WebSocket protocol.
+
+    Reuses the shared StateTransition and knowledge base engines. Replies are
+    produced as a sequence of protocol messages so the transport can send each
+    one as soon as it is ready.
+    """
+
+    def __init__(self, call_id):
+        """
+        Initialize the session.
+
+        Args:
+            call_id (str): RetellAI call ID
+        """
+        self.call_id = call_id
+        self.state = 'greeting'
+        self.context = {}
+        self.call_details = {}
+        self.latest_response_id = 0
+
+        # Reply computed from a partial transcript, reused if the final
+        # utterance matches: (state, utterance) -> (next_state, context, reply)
+        self.speculative = {}
+
+    def initial_messages(self):
+        """Messages sent as soon as the socket opens: config, then the greeting"""
+        return [
+            {
+                "response_type": "config",
+                "config": {
+                    "auto_reconnect": True,
+                    "call_details": True
+                }
+            },
+            self._response(0, GREETING, content_complete=True)
+        ]
+
+    def note_incoming(self, event):
+        """Record a newer response ID so any reply still streaming can be abandoned"""
+        if event.get('interaction_type') in ('response_required', 'reminder_required'):
+            self.latest_response_id = max(self.latest_response_id, event.get('response_id', 0))
+
+    def handle_event(self, event):
+        """
+        Handle one event from RetellAI.
+
+        Args:
+            event (dict): Decoded event
+
+        Yields:
+            dict: Protocol messages to send back, in order
+        """
+        interaction_type = event.get('interaction_type')
+
+        if interaction_type == 'ping_pong':
+            yield {"response_type": "ping_pong", "timestamp": event.get('timestamp')}
+
+        elif interaction_type == 'call_details':
+            self.call_details = event.get('call', {})
+            from_number = self.call_details.get('from_number')
+            if from_number and 'phone' not in self.context:
+                self.context['phone'] = from_number[-10:]
+
+        elif interaction_type == 'update_only':
+            # The caller is still talking; prepare the reply for what we have so far
+            utterance = self._latest_user_utterance(event.get('transcript', []))
+            if utterance and (self.state, utterance) not in self.speculative:
+                self.speculative = {(self.state, utterance): self._plan_reply(utterance)}
+
+        elif interaction_type in ('response_required', 'reminder_required'):
+            response_id = event.get('response_id', 0)
+            self.note_incoming(event)
+
+            if interaction_type == 'reminder_required':
+                reply, end_call = REMINDER, False
+            else:
+                utterance = self._latest_user_utterance(event.get('transcript', []))
+                planned = self.speculative.pop((self.state, utterance), None)
+                if planned is None:
+                    deadline = Deadline(Config.DEADLINE_DEFAULTS_MS['llm_websocket'])
+                    planned = self._plan_reply(utterance, deadline)
+                    if deadline.degradations:
+                        logger.info(f"Call {self.call_id}: degraded turn {response_id}: "
+                                    f"{', '.join(deadline.degradations)}")
+                self.state, self.context, reply = planned
+                end_call = self.state == 'goodbye'
+
+            for sentence in split_sentences(reply):
+                if response_id != self.latest_response_id:
+                    # RetellAI has moved on to a newer turn
+                    logger.info(f"Call {self.call_id}: abandoning stale response {response_id}")
+                    return
+                yield self._response(response_id, sentence + " ")
+
+            yield self._response(response_id, "", content_complete=True, end_call=end_call)
+
+    def _plan_reply(self, utterance, deadline=None):
+        """Run the state machine and knowledge base for an utterance within an optional deadline"""
+        next_state, context = state_transition.determine_next_state(self.state, utterance, self.context)
+
+        if next_state == 'goodbye':
+            reply = "Thank you for calling Barbeque Nation. Have a wonderful day!"
+        else:
+            query_type = STATE_QUERY_TYPES.get(next_state, 'general')
+            result = answer_knowledge_base_query(utterance, query_type, deadline)
+            reply = render_voice_reply(result)
+
+        return next_state, context, reply
+
+    def _latest_user_utterance(self, transcript):
+        """Return the content of the last user turn in a transcript"""
+        for turn in reversed(transcript):
+            if turn.get('role') == 'user':
+                return turn.get('content', '').strip()
+        return ''
+
+    def _response(self, response_id, content, content_complete=False, end_call=False):
+        return {
+            "response_type": "response",
+            "response_id": response_id,
+            "content": content,
+            "content_complete": content_complete,
+            "end_call": end_call
+        }
+
+
+def serve_session(session, receive, send):
+    """
+    Drive a session over a message transport until the connection closes.
+
+    Args:
+        session (RetellLLMSession): Session for this call
+        receive (callable): receive(timeout=None) returning a text frame, or None
+        send (callable): send(text) writing a text frame
+    """
+    for message in session.initial_messages():
+        send(json.dumps(message))
+
+    pending = []
+    while True:
+        raw = pending.pop(0) if pending else receive()
+        if raw is None:
+            break
+
+        try:
+            event = json.loads(raw)
+        except ValueError:
+            logger.warning(f"Call {session.call_id}: ignoring malformed frame")
+            continue
+
+        needs_response = event.get('interaction_type') in ('response_required', 'reminder_required')
+        started = time.perf_counter()
+        first_sent = False
+
+        for message in session.handle_event(event):
+            send(json.dumps(message))
+
+            if needs_response and not first_sent:
+                first_chunk_latency.record((time.perf_counter() - started) * 1000)
+                first_sent = True
+
+            # Peek for newer events so a stale reply stops streaming early
+            incoming = receive(timeout=0)
+            if incoming is not None:
+                pending.append(incoming)
+                try:
+                    session.note_incoming(json.loads(incoming))
+                except ValueError:
+                    pass
+
+        if needs_response:
+            turn_latency.record((time.perf_counter() - started) * 1000)
+
+
+@sock.route('/llm-websocket/<call_id>', bp=retell_llm_bp)
+def llm_websocket(ws, call_id):
+    """Custom LLM WebSocket for RetellAI voice calls"""
+    session = RetellLLMSession(call_id)
+    with active_sessions_lock:
+        active_sessions[call_id] = session
+
+    logger.info(f"RetellAI call connected: {call_id}")
+    try:
+        serve_session(session, ws.receive, ws.send)
+    except ConnectionClosed:
+        pass
+    finally:
+        with active_sessions_lock:
+            active_sessions.pop(call_id, None)
+        logger.info(f"RetellAI call disconnected: {call_id}")
+
+
+@retell_llm_bp.route('/llm-metrics', methods=['GET'])
+def get_llm_metrics():
+    """Report turn latency percentiles for the custom LLM WebSocket"""
+    with active_sessions_lock:
+        active_calls = len(active_sessions)
+
+    return jsonify({
+        "status": "success",
+        "data": {
+            "active_calls": active_calls,
+            "first_chunk_latency_ms": first_chunk_latency.percentiles(),
+            "turn_latency_ms": turn_latency.percentiles()
+        }
+    })
@@ -2,9 +2,13 @@ import os
 import logging
 from flask import Flask, jsonify, render_template
 from flask_cors import CORS
+from sqlalchemy import inspect
 from config import Config
 from models import db
 from routes import init_routes
+from commands import init_commands
+from migrations import pending_migrations, upgrade
+from utils.transcript_codec import transcript_codec
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, 
@@ -35,24 +39,74 @@ CORS(app)
 
 # Import route modules after app is created
 from api.knowledge_base import knowledge_base_bp
-from api.post_call_analysis import post_call_bp
+from api.post_call_analysis import post_call_bp, sheets_writer, task_queue, call_stats, log_search, log_retention
 from api.conversation_service import conversation_bp
-from api.booking_service import booking_bp
+from api.booking_service import booking_bp, availability_engine, booking_sweeper
+from api.retell_llm import retell_llm_bp, sock
 
 # Register blueprints
 app.register_blueprint(knowledge_base_bp, url_prefix='/api/knowledge')
 app.register_blueprint(post_call_bp, url_prefix='/api/logs')
 app.register_blueprint(conversation_bp, url_prefix='/api/conversation')
 app.register_blueprint(booking_bp)
+app.register_blueprint(retell_llm_bp, url_prefix='/api/conversation/retell')
+sock.init_app(app)
 
-# Initialize routes
+# Initialize routes and CLI commands
 init_routes(app)
+init_commands(app)
 
 # Create database tables
 with app.app_context():
     logger.info(f"Using database: {app.config['SQLALCHEMY_DATABASE_URI']}")
+    new_database = not inspect(db.engine).get_table_names()
     db.create_all()
     logger.info("Database tables created successfully")
+    if new_database:
+        # No rows to convert yet, so every migration is quick
+        upgrade()
+    pending = pending_migrations()
+
+if pending:
+    # Migrations can rewrite large tables and take far longer than a worker may take to boot,
+    # so they are applied by `flask db upgrade`, which still needs to import the app
+    message = f"Database migrations pending: {', '.join(pending)}. Run 'flask --app app db upgrade' first."
+    if os.environ.get('FLASK_RUN_FROM_CLI') != 'true':
+        raise RuntimeError(message)
+    logger.error(message)
+else:
+    with app.app_context():
+        transcript_codec.load()
+        availability_engine.ensure_built()
+        call_stats.ensure_built()
+        log_search.ensure_built()
+        log_retention.ensure_partitions()
+
+
+def start_background():
+    """
+    Start the background workers of a server process.
+
+    Called by the WSGI entry point (main.py) rather than at import, since every
+    `flask` CLI command imports the app too and a short-lived command would
+    otherwise claim queued tasks on threads that die with it.
+    """
+    # Send call log rows left in the Sheets spool by a previous run
+    sheets_writer.ensure_started()
+
+    # Run queued post-call analysis and delivery tasks
+    if app.config['TASK_WORKERS']:
+        task_queue.start(app, app.config['TASK_WORKERS'])
+
+    # Close out past bookings in the background
+    if app.config['BOOKING_SWEEP_INTERVAL_SECONDS']:
+        booking_sweeper.start(app)
+
+    # Archive months of conversation logs past the retention period
+    if app.config['LOG_RETENTION_DAYS'] and app.config['LOG_RETENTION_INTERVAL_SECONDS']:
+        log_retention.start(app)
+
 
 if __name__ == '__main__':
+    start_background()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,314 @@
+import click
+import logging
+
+logger = logging.getLogger(__name__)
+
+def init_commands(app):
+    @app.cli.group('db')
+    def database():
+        """Manage the database schema"""
+
+    @database.command('upgrade')
+    def upgrade_database():
+        """Create missing tables and apply pending migrations"""
+        from models import db
+        from migrations import upgrade
+        
+        db.create_all()
+        applied = upgrade()
+        click.echo(f"Applied {len(applied)} migration(s)" + (f": {', '.join(applied)}" if applied else ""))
+
+    @database.command('status')
+    def database_status():
+        """List migrations not yet applied"""
+        from migrations import pending_migrations
+        
+        pending = pending_migrations()
+        click.echo("Pending: " + ", ".join(pending) if pending else "Database is up to date")
+
+    @app.cli.group()
+    def availability():
+        """Manage slot occupancy counters"""
+
+    @availability.command('rebuild')
+    def rebuild_availability():
+        """Recompute slot occupancy from the bookings table"""
+        from api.booking_service import availability_engine
+        
+        slots = availability_engine.rebuild()
+        click.echo(f"Rebuilt occupancy for {slots} slots")
+
+    @app.cli.group()
+    def bookings():
+        """Bulk import, export and sweep bookings"""
+
+    @bookings.command('import')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help="Defaults to the file extension")
+    def import_bookings_command(path, fmt):
+        """Import bookings from a CSV or NDJSON file"""
+        from api.booking_service import availability_engine, booking_cache
+        from utils.booking_io import read_booking_rows, import_bookings
+        
+        fmt = fmt or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        with open(path, 'rb') as stream:
+            summary = import_bookings(
+                read_booking_rows(stream, fmt),
+                availability_engine,
+                booking_cache,
+                chunk_size=app.config['BOOKING_IMPORT_CHUNK_SIZE']
+            )
+        
+        click.echo(f"Imported {summary['imported']} bookings, skipped {summary['skipped']}")
+        for error in summary['errors']:
+            click.echo(f"  line {error['line']}: {error['message']}", err=True)
+
+    @bookings.command('export')
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default='csv')
+    @click.option('--output', type=click.File('w'), default='-', help="Defaults to stdout")
+    @click.option('--outlet-id')
+    @click.option('--date-from', help="YYYY-MM-DD")
+    @click.option('--date-to', help="YYYY-MM-DD")
+    @click.option('--status', help="Comma separated statuses")
+    def export_bookings_command(fmt, output, outlet_id, date_from, date_to, status):
+        """Export bookings as CSV or NDJSON"""
+        from models import Booking
+        from api.booking_service import booking_query_from_args
+        from utils.booking_io import export_bookings
+        
+        try:
+            filters, date_from, fields = booking_query_from_args({
+                'outlet_id': outlet_id, 'date_from': date_from, 'date_to': date_to, 'status': status
+            })
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+        if date_from:
+            filters.append(Booking.booking_date >= date_from)
+        
+        for chunk in export_bookings(filters, fields, fmt):
+            output.write(chunk)
+
+    @bookings.command('sweep')
+    def sweep_bookings():
+        """Close out bookings whose slot has passed"""
+        from api.booking_service import booking_sweeper
+        
+        run = booking_sweeper.sweep()
+        if run is None:
+            click.echo("A sweep is already running")
+            return
+        if run['error']:
+            raise click.ClickException(run['error'])
+        updated = ", ".join(f"{count} {status}" for status, count in run['updated'].items()) or "nothing to do"
+        click.echo(f"Swept bookings up to {run['cutoff']}: {updated} ({run['duration_ms']}ms)")
+
+    @app.cli.group()
+    def waitlist():
+        """Manage the booking waitlist"""
+
+    @waitlist.command('promote')
+    def promote_waitlist():
+        """Promote waiting parties into any seats that are free"""
+        from api.booking_service import waitlist as booking_waitlist, invalidate_booking
+        
+        promoted = booking_waitlist.promote_all()
+        for booking in promoted:
+            invalidate_booking(booking)
+        click.echo(f"Promoted {len(promoted)} waitlisted parties")
+
+    @app.cli.group()
+    def logs():
+        """Manage the local conversation log"""
+
+    @logs.command('replay')
+    @click.option('--to', 'target', type=click.Choice(['sheets', 'db']), default='sheets')
+    @click.option('--delete', is_flag=True, help="Remove segments once replayed")
+    def replay_logs(target, delete):
+        """Send locally logged conversations to Google Sheets or the database"""
+        from api.post_call_analysis import replay_local_log
+        
+        try:
+            summary = replay_local_log(target, delete=delete)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        
+        click.echo(f"Replayed {summary['replayed']} conversations from {summary['segments']} segments "
+                   f"to {target}, skipped {summary['skipped']}")
+        if summary['kept']:
+            click.echo(f"Kept {summary['kept']} segments with conversations still pending for another destination")
+        if target == 'sheets':
+            click.echo("Rows are queued in the Sheets spool; the server's background writer sends them")
+
+    @app.cli.group()
+    def tasks():
+        """Run and inspect background tasks"""
+
+    @tasks.command('work')
+    @click.option('--workers', type=int, default=4, show_default=True, help="Worker threads in this process")
+    def work_tasks(workers):
+        """Run queued tasks until interrupted"""
+        from api.post_call_analysis import task_queue
+        
+        task_queue.start(app, workers)
+        click.echo(f"Running {workers} task workers; press Ctrl+C to stop")
+        try:
+            while True:
+                task_queue.stopped.wait(60)
+        except KeyboardInterrupt:
+            task_queue.stop()
+            task_queue.join(timeout=task_queue.visibility_timeout.total_seconds())
+
+    @tasks.command('status')
+    def task_status():
+        """Show how many tasks are queued, running and dead"""
+        from api.post_call_analysis import task_queue
+        
+        counts = task_queue.counts()
+        click.echo(f"Queued: {counts['queued']}, running: {counts['running']}, dead: {counts['dead']}")
+        if counts['oldest_due_seconds'] is not None:
+            click.echo(f"Oldest due task has waited {counts['oldest_due_seconds']}s")
+
+    @tasks.command('retry')
+    @click.option('--name', help="Only tasks with this name, e.g. post_call.deliver")
+    def retry_tasks(name):
+        """Queue dead tasks again"""
+        from api.post_call_analysis import task_queue
+        
+        requeued = task_queue.retry_dead(name)
+        click.echo(f"Requeued {requeued} dead tasks")
+
+    @logs.command('analyze')
+    @click.argument('path', type=click.File('rb'))
+    @click.option('--output', type=click.File('w'), default='-', help="Defaults to stdout")
+    @click.option('--workers', type=int, help="Worker processes; defaults to ANALYSIS_WORKERS or the CPU count")
+    def analyze_logs(path, output, workers):
+        """Analyse NDJSON transcripts ({"id", "conversation"} per line; - for stdin) to NDJSON results"""
+        import json
+        from api.post_call_analysis import bulk_analyzer, read_ndjson_conversations
+        
+        if workers:
+            bulk_analyzer.workers = workers
+            bulk_analyzer.max_pending_chunks = workers * 2
+        try:
+            for result in bulk_analyzer.analyze(read_ndjson_conversations(path)):
+                output.write(json.dumps(result) + "\n")
+        finally:
+            bulk_analyzer.shutdown()
+
+    @logs.command('backfill-analysis')
+    @click.option('--date-from', type=click.DateTime(['%Y-%m-%d']), help="Earliest call date (UTC)")
+    @click.option('--date-to', type=click.DateTime(['%Y-%m-%d']), help="Day after the last call date (UTC)")
+    @click.option('--workers', type=int, help="Worker processes; defaults to ANALYSIS_WORKERS or the CPU count")
+    def backfill_logs_analysis(date_from, date_to, workers):
+        """Re-run analysis over stored conversation logs and save the results"""
+        import time
+        from api.post_call_analysis import bulk_analyzer, backfill_analysis
+        
+        if workers:
+            bulk_analyzer.workers = workers
+            bulk_analyzer.max_pending_chunks = workers * 2
+        started = time.perf_counter()
+        try:
+            summary = backfill_analysis(date_from, date_to)
+        finally:
+            bulk_analyzer.shutdown()
+        click.echo(f"Analysed {summary['analysed']} logs in {time.perf_counter() - started:.1f}s: "
+                   f"updated {summary['updated']}, failed {summary['failed']}")
+
+    @logs.command('rebuild-stats')
+    def rebuild_log_stats():
+        """Recompute the hourly call stats rollups from the conversation logs"""
+        from api.post_call_analysis import call_stats, log_retention
+        
+        # Logs of archived months are gone, so their rollups are kept as they are
+        rows = call_stats.rebuild(since=log_retention.archived_until())
+        click.echo(f"Rebuilt {rows} call stats rollups")
+
+    @logs.command('train-dictionary')
+    @click.option('--samples', default=2000, show_default=True, help="Most recent transcripts to learn from")
+    @click.option('--recompress', is_flag=True, help="Re-encode stored transcripts with the new dictionary")
+    def train_transcript_dictionary(samples, recompress):
+        """Train a new transcript compression dictionary on recent conversation logs"""
+        from models import db, ConversationLog
+        from utils.transcript_codec import transcript_codec
+        
+        transcript_codec.load()
+        transcripts = [
+            row[0] for row in db.session.query(ConversationLog.conversation_text)
+            .filter(ConversationLog.conversation_text.isnot(None))
+            .order_by(ConversationLog.id.desc()).limit(samples)
+        ]
+        dictionary_id = transcript_codec.train(transcripts)
+        if dictionary_id is None:
+            click.echo(f"Nothing to learn from {len(transcripts)} transcripts; no dictionary stored")
+            return
+        click.echo(f"Stored dictionary {dictionary_id}, trained on {len(transcripts)} transcripts")
+        if recompress:
+            click.echo(f"Re-encoded {transcript_codec.recompress()} transcripts")
+
+    @logs.command('rebuild-search')
+    def rebuild_log_search():
+        """Re-index every conversation transcript for full-text search"""
+        from api.post_call_analysis import log_search
+        
+        indexed = log_search.rebuild()
+        click.echo(f"Indexed {indexed} conversation logs")
+
+    @logs.command('archive')
+    @click.option('--older-than-days', type=int, help="Archive months older than this; defaults to LOG_RETENTION_DAYS")
+    def archive_logs(older_than_days):
+        """Move months of conversation logs past the retention period to archive files"""
+        from api.post_call_analysis import log_retention
+        
+        days = older_than_days if older_than_days is not None else log_retention.retention_days
+        if not days:
+            click.echo("No retention period set; pass --older-than-days or set LOG_RETENTION_DAYS")
+            return
+        run = log_retention.run(retention_days=days)
+        if run is None:
+            click.echo("Another process is archiving logs; try again later")
+            return
+        for month, rows in run['archived'].items():
+            click.echo(f"Archived {rows} logs from {month}")
+        click.echo(f"Done in {run['duration_ms'] / 1000:.1f}s" + (f" with error: {run['error']}" if run['error'] else ""))
+
+    @logs.command('export')
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default='csv')
+    @click.option('--output', type=click.File('wb'), default='-', help="Defaults to stdout")
+    @click.option('--date-from', help="IST date, YYYY-MM-DD")
+    @click.option('--date-to', help="IST date, YYYY-MM-DD")
+    @click.option('--outlet')
+    @click.option('--outcome')
+    @click.option('--fields', help="Comma separated; all of them by default")
+    @click.option('--archived', is_flag=True, help="Include archived months")
+    @click.option('--gzip', 'compress', is_flag=True, help="Gzip the output")
+    def export_logs_command(fmt, output, date_from, date_to, outlet, outcome, fields, archived, compress):
+        """Export conversation logs as CSV or NDJSON"""
+        from config import Config
+        from api.post_call_analysis import call_time_range, log_retention
+        from utils.log_retention import LOG_FIELDS
+        from utils.log_export import export_logs
+        
+        fields = fields.split(',') if fields else list(LOG_FIELDS)
+        unknown = [field for field in fields if field not in LOG_FIELDS]
+        if unknown:
+            raise click.BadParameter(f"Unknown fields: {', '.join(unknown)}")
+        try:
+            call_time_from, call_time_to = call_time_range({'date_from': date_from, 'date_to': date_to})
+        except ValueError:
+            raise click.BadParameter("Dates must be in YYYY-MM-DD format")
+        
+        records = log_retention.iter_logs(
+            call_time_from, call_time_to, outlet=outlet, outcome=outcome, include_archived=archived,
+            fields=fields, batch_size=Config.LOG_EXPORT_BATCH_SIZE
+        )
+        for chunk in export_logs(records, fields, fmt, compress):
+            output.write(chunk)
+
+    @logs.command('archives')
+    def list_log_archives():
+        """List archived months of conversation logs"""
+        from api.post_call_analysis import log_retention
+        
+        for archive in log_retention.archives():
+            click.echo(f"{archive['month']}  {archive['rows']:>9} logs  {archive['bytes'] / 1048576:8.1f}MB  {archive['path']}")
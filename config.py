@@ -15,6 +15,108 @@ class Config:
     RETELL_API_KEY = os.environ.get('RETELL_API_KEY')
     RETELL_ENDPOINT = "https://api.retellai.com/v1"
     
+    # Idempotency store for retried function calls and booking requests
+    IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 24 * 60 * 60))
+    IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', 50000))
+    
+    # Batched function calls
+    FUNCTION_BATCH_MAX_WORKERS = int(os.environ.get('FUNCTION_BATCH_MAX_WORKERS', 8))
+    FUNCTION_BATCH_MAX_CALLS = 10
+    
+    # Latency budgets in milliseconds per endpoint; callers may send X-Request-Deadline-Ms instead
+    DEADLINE_DEFAULTS_MS = {
+        'function_call': 1500,
+        'batch': 2000,
+        'stream': 3000,
+        'llm_websocket': 800
+    }
+    DEADLINE_MAX_MS = 10000
+    
+    # Minimum time left for a stage to do its full work rather than degrade
+    KB_LOOKUP_MIN_MS = 20
+    TOKEN_OPTIMIZATION_MIN_MS = 15
+    BOOKING_CALL_MIN_MS = 100
+    
+    # Table availability: bookings are counted against outlet capacity per time slot
+    BOOKING_SLOT_MINUTES = 30
+    BOOKING_LAST_SEATING_MINUTES = 60  # Last slot starts this long before closing
+    
+    # Alternatives offered for a full slot: shifts in minutes, and how many minutes a change of outlet is worth
+    ALTERNATIVE_SLOT_OFFSETS_MINUTES = (30, 60)
+    ALTERNATIVE_OUTLET_CHANGE_MINUTES = 45
+    ALTERNATIVE_SUGGESTIONS = 3
+    
+    # Background sweep of past bookings: 'seated' become 'completed', 'confirmed' become
+    # BOOKING_SWEEP_UNSEATED_STATUS ('no_show' once outlets mark arrivals as 'seated')
+    BOOKING_SWEEP_INTERVAL_SECONDS = int(os.environ.get('BOOKING_SWEEP_INTERVAL_SECONDS', 300))  # 0 disables
+    BOOKING_SWEEP_AFTER_MINUTES = 180
+    BOOKING_SWEEP_UNSEATED_STATUS = os.environ.get('BOOKING_SWEEP_UNSEATED_STATUS', 'completed')
+    BOOKING_SWEEP_BATCH_SIZE = 500
+    BOOKING_SWEEP_PAUSE_SECONDS = 0.05
+    
+    # Booking IDs: each process claims a worker number with a lock file in BOOKING_ID_LOCK_DIR.
+    # Hosts sharing a database should each pin a distinct BOOKING_ID_WORKER_ID (0-63) instead.
+    BOOKING_ID_WORKER_ID = int(os.environ['BOOKING_ID_WORKER_ID']) if os.environ.get('BOOKING_ID_WORKER_ID') else None
+    BOOKING_ID_LOCK_DIR = os.environ.get('BOOKING_ID_LOCK_DIR')
+    
+    # Rows inserted and committed together by bulk booking imports
+    BOOKING_IMPORT_CHUNK_SIZE = 1000
+    
+    # Booking lookup cache; set REDIS_URL to share it across workers
+    BOOKING_CACHE_MAX_ENTRIES = int(os.environ.get('BOOKING_CACHE_MAX_ENTRIES', 10000))
+    BOOKING_CACHE_TTL_SECONDS = int(os.environ.get('BOOKING_CACHE_TTL_SECONDS', 30))
+    BOOKING_CACHE_REDIS_URL = os.environ.get('REDIS_URL')
+    
+    # Google Sheets call log. GOOGLE_SHEETS_API_URL points the client at another server, such as a local fake.
+    GOOGLE_SHEETS_API_URL = os.environ.get('GOOGLE_SHEETS_API_URL')
+    GOOGLE_SHEETS_REFRESH_MARGIN_SECONDS = 300  # Refresh the access token this long before it expires
+    GOOGLE_SHEETS_TIMEOUT_SECONDS = 10
+    
+    # Call log rows are spooled here and appended in batches by a background writer
+    SHEETS_SPOOL_PATH = os.environ.get('SHEETS_SPOOL_PATH', 'logs/sheets_spool.db')
+    SHEETS_BATCH_SIZE = 100
+    SHEETS_BATCH_MAX_WAIT_SECONDS = 2.0
+    SHEETS_MIN_INTERVAL_SECONDS = 1.0  # Sheets allows about 60 write requests per minute
+    SHEETS_MAX_BACKOFF_SECONDS = 60.0
+    
+    # Durable task queue for post-call analysis and delivery, stored in the tasks table.
+    # TASK_WORKERS threads per process run tasks; set it to 0 and run `flask tasks work` to use separate workers.
+    TASK_WORKERS = int(os.environ.get('TASK_WORKERS', 2))
+    TASK_VISIBILITY_TIMEOUT_SECONDS = 60  # A claimed task is retried by another worker if not finished in time
+    TASK_MAX_ATTEMPTS = 5
+    TASK_RETRY_BACKOFF_SECONDS = 2.0
+    TASK_MAX_BACKOFF_SECONDS = 300.0
+    TASK_POLL_SECONDS = 1.0
+    TASK_CLAIM_BATCH_SIZE = 10  # Tasks leased per claim; all must finish within the visibility timeout
+    
+    # Bulk transcript analysis: worker processes (defaults to the CPU count) and transcripts per chunk
+    ANALYSIS_WORKERS = int(os.environ['ANALYSIS_WORKERS']) if os.environ.get('ANALYSIS_WORKERS') else None
+    ANALYSIS_CHUNK_SIZE = 64
+    
+    # Full-text search over transcripts: results per page (default and most) and snippet length
+    SEARCH_PAGE_SIZE = 20
+    SEARCH_MAX_PAGE_SIZE = 100
+    SEARCH_SNIPPET_CHARS = 160
+    SEARCH_MAX_RANKED = 10000  # Relevance ranks only this many of the newest matches, so common words stay fast
+    
+    # Conversation log retention: IST months older than LOG_RETENTION_DAYS are written to gzipped NDJSON
+    # files in LOG_ARCHIVE_DIR and removed from the database (0 keeps everything). Runs on one host only.
+    LOG_RETENTION_DAYS = int(os.environ.get('LOG_RETENTION_DAYS', 0))
+    LOG_ARCHIVE_DIR = os.environ.get('LOG_ARCHIVE_DIR', 'archive')
+    LOG_RETENTION_INTERVAL_SECONDS = int(os.environ.get('LOG_RETENTION_INTERVAL_SECONDS', 86400))  # 0 disables
+    LOG_RETENTION_BATCH_SIZE = 2000
+    LOG_RETENTION_PAUSE_SECONDS = 0.05
+    LOG_PARTITION_MONTHS_AHEAD = 2  # Postgres partitions created ahead of the current month
+    
+    # Conversation log export: logs read from the database per batch
+    LOG_EXPORT_BATCH_SIZE = 1000
+    
+    # Local fallback log: NDJSON segments, closed at a size or age limit and optionally gzipped
+    LOCAL_LOG_DIR = os.environ.get('LOCAL_LOG_DIR', 'logs')
+    LOCAL_LOG_SEGMENT_BYTES = 64 * 1024 * 1024
+    LOCAL_LOG_SEGMENT_SECONDS = 3600
+    LOCAL_LOG_COMPRESS = os.environ.get('LOCAL_LOG_COMPRESS', '').lower() in ('1', 'true', 'yes')
+    
     # Knowledge base configuration
     MAX_TOKEN_SIZE = 800  # Maximum token size for knowledge base responses
     
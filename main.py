@@ -1,4 +1,7 @@
-from app import app
+from app import app, start_background
+
+# gunicorn imports this module in each worker process
+start_background()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
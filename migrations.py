@@ -0,0 +1,227 @@
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import LargeBinary, bindparam, inspect, text
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# db.create_all() only creates missing tables, so changes to existing tables
+# are applied here. Each migration must be safe to run against a database
+# that create_all() has just built with the current models.
+
+
+def add_booking_version():
+    """Add the optimistic concurrency version column to bookings"""
+    columns = [column['name'] for column in inspect(db.engine).get_columns('bookings')]
+    if 'version' not in columns:
+        db.session.execute(text("ALTER TABLE bookings ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+def add_booking_lookup_indexes():
+    """Index bookings by phone and by outlet and slot"""
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_bookings_phone_created_at ON bookings (phone, created_at)"
+    ))
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_bookings_outlet_date_time "
+        "ON bookings (outlet_id, booking_date, booking_time)"
+    ))
+
+
+def add_booking_status_index():
+    """Index bookings by status and slot so past bookings can be swept without a table scan"""
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_bookings_status_date_time "
+        "ON bookings (status, booking_date, booking_time)"
+    ))
+
+
+def compress_conversation_text():
+    """
+    Move transcripts into the compressed conversation_compressed column.
+
+    A dictionary is trained on the most recent transcripts first, so existing
+    rows get the full benefit. Rows are converted in batches, each committed
+    on its own, so a large table does not need one huge transaction and an
+    interrupted run picks up where it stopped. The old column is dropped at
+    the end; on SQLite run VACUUM afterwards to return the space to the disk.
+    """
+    from utils.transcript_codec import transcript_codec
+
+    columns = [column['name'] for column in inspect(db.engine).get_columns('conversation_logs')]
+    if 'conversation_text' not in columns:
+        return
+    if 'conversation_compressed' not in columns:
+        column_type = LargeBinary().compile(dialect=db.engine.dialect)
+        db.session.execute(text(f"ALTER TABLE conversation_logs ADD COLUMN conversation_compressed {column_type}"))
+        db.session.commit()
+
+    transcript_codec.load()
+    if transcript_codec.current is None:
+        samples = [row[0] for row in db.session.execute(text(
+            "SELECT conversation_text FROM conversation_logs WHERE conversation_text IS NOT NULL "
+            "ORDER BY id DESC LIMIT 2000"
+        ))]
+        transcript_codec.train(samples)
+
+    batch_size = 5000
+    last_id = 0
+    while True:
+        page = db.session.execute(text(
+            "SELECT id, conversation_text FROM conversation_logs WHERE id > :last_id "
+            "AND conversation_compressed IS NULL AND conversation_text IS NOT NULL ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": batch_size}).all()
+        if not page:
+            break
+        db.session.execute(
+            text("UPDATE conversation_logs SET conversation_compressed = :encoded WHERE id = :id")
+            .bindparams(bindparam('encoded', type_=LargeBinary)),
+            [{"id": log_id, "encoded": transcript_codec.compress(conversation)} for log_id, conversation in page]
+        )
+        db.session.commit()
+        last_id = page[-1][0]
+
+    columns = [column['name'] for column in inspect(db.engine).get_columns('conversation_logs')]
+    if 'conversation_text' in columns:
+        db.session.execute(text("ALTER TABLE conversation_logs DROP COLUMN conversation_text"))
+
+
+def add_conversation_log_call_time_index():
+    """Index conversation logs by call time for retention and date-range reads"""
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_conversation_logs_call_time ON conversation_logs (call_time)"
+    ))
+
+
+def partition_conversation_logs():
+    """
+    On Postgres, rebuild conversation_logs as a table partitioned by IST month of call_time.
+
+    Retention can then drop a month's partition instead of deleting its rows.
+    The primary key becomes (id, call_time), as Postgres requires the
+    partition key in it; IDs still come from the same sequence. Partitions
+    are created for every month with logs and the next few, and a default
+    partition catches anything outside them. Existing logs are copied across
+    in this migration's transaction.
+    """
+    from utils.log_retention import month_bounds, month_of, next_month, partition_name
+
+    if db.engine.dialect.name != 'postgresql':
+        return
+    if db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('conversation_logs')"
+    )).first() is not None:
+        return
+
+    if db.session.execute(text("SELECT to_regclass('conversation_log_search')")).scalar() is not None:
+        db.session.execute(text(
+            "ALTER TABLE conversation_log_search DROP CONSTRAINT IF EXISTS conversation_log_search_log_id_fkey"
+        ))
+    sequence = db.session.execute(text("SELECT pg_get_serial_sequence('conversation_logs', 'id')")).scalar()
+    db.session.execute(text("ALTER TABLE conversation_logs RENAME TO conversation_logs_unpartitioned"))
+    db.session.execute(text(
+        "ALTER TABLE conversation_logs_unpartitioned RENAME CONSTRAINT conversation_logs_pkey "
+        "TO conversation_logs_unpartitioned_pkey"
+    ))
+    db.session.execute(text("DROP INDEX IF EXISTS ix_conversation_logs_call_time"))
+    if sequence:
+        # Kept for the new table; otherwise it would be dropped with the old one
+        db.session.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    db.session.execute(text(
+        "UPDATE conversation_logs_unpartitioned SET call_time = now() AT TIME ZONE 'utc' WHERE call_time IS NULL"
+    ))
+
+    db.session.execute(text(
+        "CREATE TABLE conversation_logs (LIKE conversation_logs_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (call_time)"
+    ))
+    db.session.execute(text("ALTER TABLE conversation_logs ALTER COLUMN call_time SET NOT NULL"))
+    db.session.execute(text("ALTER TABLE conversation_logs ADD PRIMARY KEY (id, call_time)"))
+    db.session.execute(text("CREATE INDEX ix_conversation_logs_call_time ON conversation_logs (call_time)"))
+    db.session.execute(text("CREATE TABLE conversation_logs_default PARTITION OF conversation_logs DEFAULT"))
+
+    oldest = db.session.execute(text("SELECT min(call_time) FROM conversation_logs_unpartitioned")).scalar()
+    month = month_of(min(oldest or datetime.utcnow(), datetime.utcnow()))
+    last = month_of(datetime.utcnow() + timedelta(days=62))
+    while month <= last:
+        start, end = month_bounds(month)
+        db.session.execute(text(
+            f"CREATE TABLE {partition_name(month)} PARTITION OF conversation_logs "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d %H:%M:%S}') TO ('{end:%Y-%m-%d %H:%M:%S}')"
+        ))
+        month = next_month(month)
+
+    db.session.execute(text("INSERT INTO conversation_logs SELECT * FROM conversation_logs_unpartitioned"))
+    if sequence:
+        db.session.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY conversation_logs.id"))
+    db.session.execute(text("DROP TABLE conversation_logs_unpartitioned"))
+
+
+def add_idempotency_fingerprint():
+    """Record a fingerprint of the request body with each idempotency key"""
+    columns = [column['name'] for column in inspect(db.engine).get_columns('idempotency_records')]
+    if 'fingerprint' not in columns:
+        db.session.execute(text("ALTER TABLE idempotency_records ADD COLUMN fingerprint VARCHAR(64)"))
+
+
+# Applied in order and recorded in the schema_migrations table
+MIGRATIONS = [
+    ('0001_booking_version', add_booking_version),
+    ('0002_booking_lookup_indexes', add_booking_lookup_indexes),
+    ('0003_booking_status_index', add_booking_status_index),
+    ('0004_compress_conversation_text', compress_conversation_text),
+    ('0005_conversation_log_call_time_index', add_conversation_log_call_time_index),
+    ('0006_partition_conversation_logs', partition_conversation_logs),
+    ('0007_idempotency_fingerprint', add_idempotency_fingerprint),
+]
+
+
+def applied_migrations():
+    """Return the IDs of migrations already applied"""
+    db.session.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "id VARCHAR(100) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)"
+    ))
+    db.session.commit()
+    return {row[0] for row in db.session.execute(text("SELECT id FROM schema_migrations"))}
+
+
+def pending_migrations():
+    """Return the IDs of migrations not yet applied, in order"""
+    done = applied_migrations()
+    return [migration_id for migration_id, _ in MIGRATIONS if migration_id not in done]
+
+
+def upgrade():
+    """
+    Apply pending migrations, each in its own transaction.
+
+    Returns:
+        list: IDs of the migrations applied by this call
+    """
+    done = applied_migrations()
+    applied = []
+
+    for migration_id, migration in MIGRATIONS:
+        if migration_id in done:
+            continue
+
+        try:
+            migration()
+            db.session.execute(
+                text("INSERT INTO schema_migrations (id, applied_at) VALUES (:id, :applied_at)"),
+                {"id": migration_id, "applied_at": datetime.utcnow()}
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            # Another worker starting at the same time may have applied it first
+            if migration_id in applied_migrations():
+                continue
+            logger.error(f"Error applying migration {migration_id}: {str(e)}")
+            raise
+
+        logger.info(f"Applied migration {migration_id}")
+        applied.append(migration_id)
+
+    return applied
@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from utils.transcript_codec import CompressedText
 
 # Initialize SQLAlchemy
 db = SQLAlchemy()
@@ -20,6 +21,17 @@ class Booking(db.Model):
     status = db.Column(db.String(20), default='confirmed')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    
+    # Optimistic concurrency: updates only apply if the version is unchanged since the row was read
+    __mapper_args__ = {'version_id_col': version}
+    
+    # Lookups by phone (latest first), by outlet and slot, and by status and slot for the sweeper
+    __table_args__ = (
+        db.Index('ix_bookings_phone_created_at', 'phone', 'created_at'),
+        db.Index('ix_bookings_outlet_date_time', 'outlet_id', 'booking_date', 'booking_time'),
+        db.Index('ix_bookings_status_date_time', 'status', 'booking_date', 'booking_time'),
+    )
     
     def to_dict(self):
         """Convert booking to dictionary"""
@@ -35,7 +47,8 @@ class Booking(db.Model):
             'phone': self.phone,
             'status': self.status,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'version': self.version
         }
 
 class ConversationLog(db.Model):
@@ -53,7 +66,13 @@ class ConversationLog(db.Model):
     booking_time = db.Column(db.String(5))   # HH:MM format
     guests = db.Column(db.String(10))
     call_summary = db.Column(db.Text)
-    conversation_text = db.Column(db.Text)
+    # Stored compressed and only loaded when accessed; to_dict() and list queries never need it
+    conversation_text = db.deferred(db.Column('conversation_compressed', CompressedText))
+    
+    # Logs by call time, for retention and date-range reads; on Postgres the table is partitioned by month on it
+    __table_args__ = (
+        db.Index('ix_conversation_logs_call_time', 'call_time'),
+    )
     
     def to_dict(self):
         """Convert log to dictionary"""
@@ -68,4 +87,134 @@ class ConversationLog(db.Model):
             'booking_time': self.booking_time,
             'guests': self.guests,
             'call_summary': self.call_summary
-        }
\ No newline at end of file
+        }
+
+class LogArchive(db.Model):
+    """Model for files of conversation logs moved out of the database, one or more per IST month"""
+    
+    __tablename__ = 'log_archives'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(7), nullable=False, index=True)  # IST month, YYYY-MM
+    path = db.Column(db.String(500), nullable=False)  # Gzipped NDJSON, one log per line
+    rows = db.Column(db.Integer, nullable=False)
+    bytes = db.Column(db.BigInteger, nullable=False)
+    max_log_id = db.Column(db.Integer, nullable=False)  # Logs of the month up to this ID are in this or an earlier file
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert archive to dictionary"""
+        return {
+            'month': self.month,
+            'path': self.path,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'archived_at': self.archived_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+class TranscriptDictionary(db.Model):
+    """Model for preset dictionaries used to compress transcripts; never changed once stored"""
+    
+    __tablename__ = 'transcript_dictionaries'
+    
+    id = db.Column(db.Integer, primary_key=True)  # Recorded in each transcript compressed with it
+    data = db.Column(db.LargeBinary, nullable=False)
+    samples = db.Column(db.Integer, nullable=False)  # Transcripts it was trained on
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CallStatsHourly(db.Model):
+    """Model for conversation log counts per IST hour, outlet, modality and outcome, kept in step with the logs"""
+    
+    __tablename__ = 'call_stats_hourly'
+    
+    stat_date = db.Column(db.Date, primary_key=True)  # IST date of the call
+    stat_hour = db.Column(db.Integer, primary_key=True)  # IST hour, 0-23
+    outlet_name = db.Column(db.String(100), primary_key=True)
+    modality = db.Column(db.String(20), primary_key=True)
+    call_outcome = db.Column(db.String(50), primary_key=True)
+    calls = db.Column(db.Integer, nullable=False, default=0)
+    booked = db.Column(db.Integer, nullable=False, default=0)  # Calls that captured a booking date and time
+
+class IdempotencyRecord(db.Model):
+    """Model for stored responses to idempotent requests, shared by all workers"""
+    
+    __tablename__ = 'idempotency_records'
+    
+    key = db.Column(db.String(64), primary_key=True)  # SHA-256 hex digest
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending' or 'complete'
+    status_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    fingerprint = db.Column(db.String(64))  # SHA-256 of the request body; a reused key must send the same body
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class Task(db.Model):
+    """Model for background work queued by requests and run by the task workers"""
+    
+    __tablename__ = 'tasks'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)  # Registered handler to run
+    payload = db.Column(db.Text, nullable=False)  # JSON arguments for the handler
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running' or 'dead'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    run_at = db.Column(db.DateTime, nullable=False)  # Due time; while running, when the lease expires
+    locked_by = db.Column(db.String(100))  # Worker holding the lease
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Due tasks in order, for claiming
+    __table_args__ = (
+        db.Index('ix_tasks_status_run_at', 'status', 'run_at'),
+    )
+
+class SlotOccupancy(db.Model):
+    """Model for guests booked per outlet, date and time slot, kept in step with bookings"""
+    
+    __tablename__ = 'slot_occupancy'
+    
+    outlet_id = db.Column(db.String(20), primary_key=True)
+    slot_date = db.Column(db.Date, primary_key=True)
+    slot_time = db.Column(db.Time, primary_key=True)  # Start of the slot
+    guests = db.Column(db.Integer, nullable=False, default=0)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class WaitlistEntry(db.Model):
+    """Model for parties waiting for seats in a full slot, served first come first served"""
+    
+    __tablename__ = 'waitlist_entries'
+    
+    id = db.Column(db.Integer, primary_key=True)  # Increasing, so it gives the queue order
+    outlet_id = db.Column(db.String(20), nullable=False)
+    slot_date = db.Column(db.Date, nullable=False)
+    slot_time = db.Column(db.Time, nullable=False)  # Start of the slot
+    booking_time = db.Column(db.Time, nullable=False)  # Time the party asked for
+    guests = db.Column(db.Integer, nullable=False)
+    customer_name = db.Column(db.String(100), nullable=False)
+    phone = db.Column(db.String(15), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='waiting')  # 'waiting', 'promoted' or 'cancelled'
+    booking_id = db.Column(db.String(20))  # Booking created on promotion
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    promoted_at = db.Column(db.DateTime)
+    
+    # Queue for a slot in order
+    __table_args__ = (
+        db.Index('ix_waitlist_slot_queue', 'outlet_id', 'slot_date', 'slot_time', 'status', 'id'),
+    )
+    
+    def to_dict(self):
+        """Convert waitlist entry to dictionary"""
+        return {
+            'entry_id': self.id,
+            'outlet_id': self.outlet_id,
+            'date': self.slot_date.strftime('%Y-%m-%d'),
+            'time': self.booking_time.strftime('%H:%M'),
+            'guests': self.guests,
+            'customer_name': self.customer_name,
+            'phone': self.phone,
+            'status': self.status,
+            'booking_id': self.booking_id,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
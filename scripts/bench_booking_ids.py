@@ -0,0 +1,107 @@
+"""
+Benchmark booking ID generation and insert locality.
+
+Compares the old scheme, 'BBQ-' plus 8 hex characters of a uuid4, with
+BookingIdGenerator: time per ID, and rows per second inserted into a SQLite
+table with a unique index on the ID. Random IDs land on random index pages,
+so their insert rate falls as the table grows; time-ordered IDs append at the
+right-hand edge. Random IDs that collide are counted and skipped.
+
+A worker issues at most 4096 IDs a second, so the generator runs on a
+simulated clock that moves on a little with every ID. The timings then show
+the work per ID rather than that limit.
+
+Run from the repository root:
+
+    python -m scripts.bench_booking_ids --rows 2000000
+"""
+import os
+import sys
+import shutil
+import time
+import uuid
+import sqlite3
+import argparse
+import tempfile
+import timeit
+from utils import booking_ids
+from utils.booking_ids import BookingIdGenerator
+
+
+class SimulatedClock:
+    """Stands in for the time module: every reading moves on by `step` seconds"""
+
+    def __init__(self, step):
+        self.now = time.time()
+        self.step = step
+
+    def time(self):
+        self.now += self.step
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def uuid_booking_id():
+    """The booking ID scheme before BookingIdGenerator"""
+    return f"BBQ-{uuid.uuid4().hex[:8].upper()}"
+
+
+def time_generation(generate, count):
+    """Microseconds per ID, best of three runs"""
+    return min(timeit.repeat(generate, number=count, repeat=3)) / count * 1e6
+
+
+def time_inserts(path, generate, rows, batch_size, tail_rows):
+    """
+    Insert `rows` IDs into a fresh table with a unique index, `batch_size` per commit.
+
+    Returns:
+        tuple: (rows/s overall, rows/s over the last `tail_rows`, collisions)
+    """
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE bookings (id INTEGER PRIMARY KEY, booking_id TEXT NOT NULL UNIQUE)")
+    collisions = 0
+    tail_started = None
+    started = time.perf_counter()
+    for done in range(0, rows, batch_size):
+        if tail_started is None and done >= rows - tail_rows:
+            tail_started = time.perf_counter()
+        cursor = connection.executemany(
+            "INSERT OR IGNORE INTO bookings (booking_id) VALUES (?)",
+            [(generate(),) for _ in range(batch_size)]
+        )
+        collisions += batch_size - cursor.rowcount
+        connection.commit()
+    finished = time.perf_counter()
+    connection.close()
+    return rows / (finished - started), tail_rows / (finished - tail_started), collisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000000, help='IDs inserted per scheme')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows per commit')
+    parser.add_argument('--generate', type=int, default=200000, help='IDs generated for the timing')
+    args = parser.parse_args()
+    tail_rows = min(200000, args.rows // 10)
+
+    directory = tempfile.mkdtemp(prefix='bench-booking-ids-')
+    booking_ids.time = SimulatedClock(1 / 4000)
+    generator = BookingIdGenerator(lock_dir=directory)
+    schemes = [('uuid4 hex', uuid_booking_id), ('time-ordered', generator.generate)]
+
+    print(f"{'scheme':<14}{'us/ID':>8}{'rows/s':>12}{f'last {tail_rows}':>16}{'collisions':>12}")
+    for name, generate in schemes:
+        per_id = time_generation(generate, args.generate)
+        path = os.path.join(directory, f"{name.split()[0]}.db")
+        rate, tail_rate, collisions = time_inserts(path, generate, args.rows, args.batch_size, tail_rows)
+        print(f"{name:<14}{per_id:>8.2f}{rate:>12,.0f}{tail_rate:>16,.0f}{collisions:>12}")
+        os.remove(path)
+    shutil.rmtree(directory)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Benchmark booking lookups before and after the booking lookup indexes.
+
+Fills a scratch SQLite database with synthetic bookings (1.2 million by
+default), drops the indexes that migration 0002_booking_lookup_indexes adds,
+and times the lookups the booking endpoints make: the latest booking for a
+phone number, as in find and cancel, and an outlet's bookings on a date. The
+migration is then applied and the same lookups are timed again.
+
+Run from the repository root:
+
+    python -m scripts.bench_booking_indexes --rows 1200000
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+from datetime import date, datetime, time as slot_time, timedelta
+from flask import Flask
+from sqlalchemy import insert, text
+from models import db, Booking
+from migrations import add_booking_lookup_indexes
+
+OUTLETS = ['BBQD001', 'BBQD002', 'BBQD003', 'BBQB001', 'BBQB002', 'BBQB003']
+FIRST_DATE = date(2025, 1, 1)
+DAYS = 700
+PHONES = 300000
+
+
+def fill(rows, batch_size=20000):
+    """Insert `rows` random bookings spread over DAYS days and PHONES phone numbers"""
+    random.seed(33)
+    created = datetime(2025, 1, 1)
+    for start in range(0, rows, batch_size):
+        db.session.execute(insert(Booking), [{
+            'booking_id': f"BENCH{index:08d}",
+            'outlet_id': random.choice(OUTLETS),
+            'booking_date': FIRST_DATE + timedelta(days=random.randrange(DAYS)),
+            'booking_time': slot_time(random.randrange(12, 22), random.choice((0, 30))),
+            'guests': random.randrange(1, 9),
+            'customer_name': 'Bench Guest',
+            'phone': str(9000000000 + random.randrange(PHONES)),
+            'status': 'confirmed',
+            'created_at': created + timedelta(minutes=index),
+            'updated_at': created + timedelta(minutes=index)
+        } for index in range(start, min(start + batch_size, rows))])
+        db.session.commit()
+
+
+def lookups():
+    """The lookups timed, as (name, function taking a random generator)"""
+    def latest_by_phone(rng):
+        phone = str(9000000000 + rng.randrange(PHONES))
+        return Booking.query.filter_by(phone=phone).order_by(Booking.created_at.desc()).first()
+
+    def outlet_on_date(rng):
+        booking_date = FIRST_DATE + timedelta(days=rng.randrange(DAYS))
+        return Booking.query.filter_by(outlet_id=rng.choice(OUTLETS), booking_date=booking_date).all()
+
+    return [('latest booking by phone', latest_by_phone), ('outlet bookings on a date', outlet_on_date)]
+
+
+def time_lookups(repeat):
+    """Median milliseconds per lookup"""
+    results = {}
+    for name, lookup in lookups():
+        rng = random.Random(name)
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            lookup(rng)
+            times.append((time.perf_counter() - started) * 1000)
+            db.session.rollback()
+        results[name] = statistics.median(times)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1200000, help='Bookings in the table')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs of each lookup')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='bench-booking-indexes-')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(text("DROP INDEX ix_bookings_phone_created_at"))
+        db.session.execute(text("DROP INDEX ix_bookings_outlet_date_time"))
+        db.session.commit()
+        started = time.perf_counter()
+        fill(args.rows)
+        print(f"Inserted {args.rows:,} bookings in {time.perf_counter() - started:.0f}s")
+
+        before = time_lookups(args.repeat)
+        started = time.perf_counter()
+        add_booking_lookup_indexes()
+        db.session.commit()
+        print(f"Built the indexes in {time.perf_counter() - started:.1f}s")
+        after = time_lookups(args.repeat)
+        db.engine.dispose()
+
+    print(f"{'lookup':<28}{'before ms':>12}{'after ms':>12}")
+    for name in before:
+        print(f"{name:<28}{before[name]:>12.2f}{after[name]:>12.2f}")
+    shutil.rmtree(directory)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
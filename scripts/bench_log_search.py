@@ -0,0 +1,179 @@
+"""
+Benchmark full-text search over conversation logs.
+
+Fills a scratch SQLite database with synthetic conversation logs (2 million by
+default), builds the FTS5 index with LogSearch.rebuild() and times searches
+through LogSearch.search(): common and rare words, a customer name as a
+phrase, a prefix, filters by outlet and month, deep pages and newest-first
+ordering. It also times saving a log with and without indexing it.
+
+Run from the repository root:
+
+    python -m scripts.bench_log_search --rows 2000000
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import insert, text
+from models import db, ConversationLog
+from utils.log_search import LogSearch, fts5_query
+from utils.transcript_codec import transcript_codec
+from scripts.bench_transcript_storage import LINES, OUTLETS
+
+FIRST_CALL = datetime(2026, 4, 20)
+DAYS = 180
+FIRST_NAMES = ['Asha', 'Ravi', 'Priya', 'Vikram', 'Neha', 'Arjun', 'Meera', 'Rahul', 'Kavya', 'Sanjay',
+               'Anita', 'Deepak', 'Pooja', 'Karan', 'Divya', 'Manoj', 'Sneha', 'Rohit', 'Isha', 'Amit']
+LAST_NAMES = ['Rao', 'Kumar', 'Singh', 'Shah', 'Gupta', 'Mehta', 'Iyer', 'Nair', 'Reddy', 'Patel',
+              'Joshi', 'Das', 'Bose', 'Menon', 'Verma', 'Kapoor', 'Malhotra', 'Chopra', 'Pillai', 'Saxena']
+# Lines in about one call in ten, for searches with fewer matches
+RARE_LINES = [
+    'USER: It is for an anniversary dinner.',
+    'USER: Do you serve Jain food?',
+    'AGENT: We have a kids menu as well.',
+    'USER: Can I get a window table?',
+    'USER: My previous visit had a billing problem.',
+    'AGENT: I am sorry about the refund delay.'
+]
+OUTCOMES = ['Enquiry', 'Availability', 'Post-Booking', 'Misc']
+
+# (query, filters) searched; September is a month of calls for the date filter
+SEPTEMBER = {'call_time_from': datetime(2026, 9, 1), 'call_time_to': datetime(2026, 10, 1)}
+SEARCHES = [
+    ('birthday', {}),
+    ('cancel booking', {}),
+    ('"Asha Rao"', {}),
+    ('anniversary', {}),
+    ('"jain food"', {}),
+    ('Malhotra', {}),
+    ('annivers*', {}),
+    ('refund', {'outlet': 'Saket'}),
+    ('birthday', {'outlet': 'Saket', **SEPTEMBER}),
+    ('anniversary', {'outlet': 'Saket', **SEPTEMBER}),
+    ('birthday', {'page': 50}),
+    ('birthday', {'sort': 'recent'}),
+    ('birthday', {'sort': 'recent', 'page': 50})
+]
+
+
+def transcript(rng):
+    """A synthetic transcript of 8 to 30 lines"""
+    lines = LINES + RARE_LINES if rng.random() < 0.1 else LINES
+    return '\n'.join(rng.choice(lines).format(
+        guests=rng.randint(1, 9), day=rng.randint(1, 28), hour=rng.randint(6, 10),
+        name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", outlet=rng.choice(OUTLETS),
+        phone='%05d' % rng.randint(0, 99999)
+    ) for _ in range(rng.randint(8, 30)))
+
+
+def new_log(rng, call_time):
+    return {
+        'modality': rng.choice(['Call', 'Chatbot']),
+        'call_time': call_time,
+        'phone_number': '98765%05d' % rng.randint(0, 99999),
+        'call_outcome': rng.choice(OUTCOMES),
+        'outlet_name': rng.choice(OUTLETS),
+        'booking_date': 'NA',
+        'booking_time': 'NA',
+        'guests': '2',
+        'call_summary': 'Customer called about a booking.',
+        'conversation_compressed': transcript(rng)
+    }
+
+
+def fill(rows, batch_size=20000):
+    """Insert `rows` logs at random times over DAYS days, compressed as the app stores them"""
+    rng = random.Random(48)
+    transcript_codec.train([transcript(rng) for _ in range(2000)])
+    for start in range(0, rows, batch_size):
+        db.session.execute(insert(ConversationLog.__table__), [
+            new_log(rng, FIRST_CALL + timedelta(seconds=rng.randrange(DAYS * 86400)))
+            for _ in range(min(batch_size, rows - start))
+        ])
+        db.session.commit()
+
+
+def time_searches(log_search, repeat):
+    """Median milliseconds for each search, with the logs matching its words before any filter"""
+    results = []
+    for query, options in SEARCHES:
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            found, _ = log_search.search(query, per_page=20, **options)
+            times.append((time.perf_counter() - started) * 1000)
+        matching = db.session.execute(text(
+            "SELECT count(*) FROM conversation_logs_fts WHERE conversation_logs_fts MATCH :match"
+        ), {'match': fts5_query(query)}).scalar()
+        db.session.commit()
+        label = query + ''.join(f" {name}={value}" for name, value in options.items()
+                                if not name.startswith('call_time'))
+        if 'call_time_from' in options:
+            label += f" in {options['call_time_from']:%B}"
+        results.append((label, statistics.median(times), matching, len(found)))
+    return results
+
+
+def time_saves(log_search, count):
+    """Milliseconds per log saved in its own transaction, without and with indexing"""
+    rng = random.Random(1)
+    timings = []
+    for indexed in (False, True):
+        started = time.perf_counter()
+        for _ in range(count):
+            log = ConversationLog(**{key: value for key, value in new_log(rng, datetime.utcnow()).items()
+                                     if key != 'conversation_compressed'})
+            log.conversation_text = transcript(rng)
+            db.session.add(log)
+            if indexed:
+                log_search.record(log)
+            db.session.commit()
+        timings.append((time.perf_counter() - started) / count * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000000, help='Conversation logs in the table')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs of each search')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='bench-log-search-')
+    path = os.path.join(directory, 'bench.db')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    log_search = LogSearch()
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        fill(args.rows)
+        print(f"Inserted {args.rows:,} logs in {time.perf_counter() - started:.0f}s")
+        size = os.path.getsize(path)
+        started = time.perf_counter()
+        log_search.rebuild()
+        print(f"Built the search index in {time.perf_counter() - started:.0f}s, "
+              f"{(os.path.getsize(path) - size) / 2**20:.0f}MB")
+
+        searches = time_searches(log_search, args.repeat)
+        plain, indexed = time_saves(log_search, 300)
+        db.engine.dispose()
+
+    print(f"{'search':<44}{'median ms':>10}{'matching':>12}{'returned':>10}")
+    for label, median_ms, matching, returned in searches:
+        print(f"{label:<44}{median_ms:>10.0f}{matching:>12,}{returned:>10}")
+    print(f"Saving a log: {plain:.2f}ms, {indexed:.2f}ms with indexing")
+    shutil.rmtree(directory)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Report storage and list-query speed before and after transcript compression.
+
+Builds a scratch SQLite table of synthetic conversation logs (500k by default)
+in the layout before migration 0004_compress_conversation_text, with plain
+TEXT transcripts that every query loads. It then times the log listings and
+records the file size. The migration function converts the table, VACUUM
+returns the freed pages, and the same listings are timed through the current
+ConversationLog model, whose transcript is deferred.
+
+The transcripts come from a small set of templates. That flatters the
+dictionary, so expect a smaller gain on real calls.
+
+Run from the repository root:
+
+    python -m scripts.bench_transcript_storage --rows 500000
+"""
+import gc
+import os
+import sys
+import time
+import zlib
+import random
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import Column, DateTime, Integer, String, Text, func, text
+from sqlalchemy.orm import Session, declarative_base
+from models import db, ConversationLog
+from migrations import compress_conversation_text
+from utils.transcript_codec import transcript_codec
+
+FIRST_CALL = datetime(2026, 4, 20)
+DAYS = 180
+NAMES = ['Asha Rao', 'Ravi Kumar', 'Priya Singh', 'Vikram Shah', 'Neha Gupta', 'Arjun Mehta']
+OUTLETS = ['Indiranagar', 'Koramangala', 'Whitefield', 'Connaught Place', 'Saket', 'Gurgaon']
+LINES = [
+    'AGENT: Welcome to Barbeque Nation, how can I help you today?',
+    'USER: I want to book a table for {guests} people on {day}/11/2026 at {hour}:30 pm.',
+    'AGENT: Sure, may I have your name please?',
+    'USER: my name is {name}.',
+    'USER: Is there a birthday decoration option available?',
+    'AGENT: Yes, we offer a complimentary cake for birthdays.',
+    'USER: I need to cancel my booking for tomorrow.',
+    'AGENT: Your booking has been cancelled.',
+    'USER: what is the price of the veg buffet on weekends?',
+    'AGENT: The weekend veg buffet is 899 plus taxes.',
+    'USER: Do you have parking at the {outlet} outlet?',
+    'AGENT: Yes, valet parking is available.',
+    'USER: Can I reschedule to {hour} pm instead?',
+    'AGENT: Done, your booking is moved.',
+    'USER: my number is 98765{phone}.',
+    'AGENT: Thank you for calling, have a great day!'
+]
+
+# conversation_logs as it was before migration 0004
+LEGACY_TABLE = """
+CREATE TABLE conversation_logs (
+    id INTEGER PRIMARY KEY, modality VARCHAR(20) NOT NULL, call_time DATETIME, phone_number VARCHAR(15),
+    call_outcome VARCHAR(50), outlet_name VARCHAR(100), booking_date VARCHAR(10), booking_time VARCHAR(5),
+    guests VARCHAR(10), call_summary TEXT, conversation_text TEXT
+)
+"""
+
+LegacyBase = declarative_base()
+
+
+class LegacyConversationLog(LegacyBase):
+    """ConversationLog before migration 0004: the transcript is loaded with every row"""
+
+    __tablename__ = 'conversation_logs'
+
+    id = Column(Integer, primary_key=True)
+    modality = Column(String(20))
+    call_time = Column(DateTime)
+    phone_number = Column(String(15))
+    call_outcome = Column(String(50))
+    outlet_name = Column(String(100))
+    booking_date = Column(String(10))
+    booking_time = Column(String(5))
+    guests = Column(String(10))
+    call_summary = Column(Text)
+    conversation_text = Column(Text)
+
+    to_dict = ConversationLog.to_dict
+
+
+def transcript(rng):
+    """A synthetic transcript of 8 to 30 lines"""
+    return '\n'.join(rng.choice(LINES).format(
+        guests=rng.randint(1, 9), day=rng.randint(1, 28), hour=rng.randint(6, 10), name=rng.choice(NAMES),
+        outlet=rng.choice(OUTLETS), phone='%05d' % rng.randint(0, 99999)
+    ) for _ in range(rng.randint(8, 30)))
+
+
+def fill(rows, batch_size=10000):
+    """Insert `rows` logs with plain-text transcripts, spread evenly over DAYS days"""
+    rng = random.Random(47)
+    for start in range(0, rows, batch_size):
+        db.session.execute(text(
+            "INSERT INTO conversation_logs (modality, call_time, phone_number, call_outcome, outlet_name, "
+            "booking_date, booking_time, guests, call_summary, conversation_text) VALUES (:modality, "
+            ":call_time, :phone_number, 'Enquiry', :outlet_name, 'NA', 'NA', '2', 'Customer asked about a booking.', "
+            ":conversation_text)"
+        ), [{
+            'modality': rng.choice(['Call', 'Chatbot']),
+            'call_time': FIRST_CALL + timedelta(seconds=index * DAYS * 86400 // rows),
+            'phone_number': '98765%05d' % rng.randint(0, 99999),
+            'outlet_name': rng.choice(OUTLETS),
+            'conversation_text': transcript(rng)
+        } for index in range(start, min(start + batch_size, rows))])
+        db.session.commit()
+
+
+def time_listings(model, session):
+    """Best of three milliseconds for each listing, turning every log into to_dict()"""
+    since = FIRST_CALL + timedelta(days=DAYS - 30)
+    listings = [
+        ('latest 100', lambda: session.query(model).order_by(model.id.desc()).limit(100)),
+        ('outlet page of 100, offset 5000', lambda: session.query(model).filter(
+            model.outlet_name == 'Saket').order_by(model.id.desc()).offset(5000).limit(100)),
+        ('last 30 days', lambda: session.query(model).filter(model.call_time >= since))
+    ]
+    results = {}
+    for name, query in listings:
+        best = None
+        for _ in range(3):
+            session.expunge_all()
+            gc.collect()
+            started = time.perf_counter()
+            logs = [log.to_dict() for log in query()]
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        session.rollback()
+        results[f"{name} ({len(logs):,} rows)"] = best
+    return results
+
+
+def transcript_bytes(sample):
+    """Average stored bytes per transcript: raw, deflated alone, and with the trained dictionary"""
+    raw = sum(len(log.encode('utf-8')) for log in sample)
+    deflated = sum(len(zlib.compress(log.encode('utf-8'))) for log in sample)
+    stored = sum(len(transcript_codec.compress(log)) for log in sample)
+    return raw / len(sample), deflated / len(sample), stored / len(sample)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500000, help='Conversation logs in the table')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='bench-transcript-storage-')
+    path = os.path.join(directory, 'bench.db')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+
+    with app.app_context():
+        db.session.execute(text(LEGACY_TABLE))
+        db.session.execute(text("CREATE INDEX ix_conversation_logs_call_time ON conversation_logs (call_time)"))
+        db.session.commit()
+        # Every other table, as create_all() would build it next to the old conversation_logs
+        db.create_all()
+        started = time.perf_counter()
+        fill(args.rows)
+        print(f"Inserted {args.rows:,} logs in {time.perf_counter() - started:.0f}s")
+
+        size_before = os.path.getsize(path)
+        with Session(db.engine) as session:
+            before = time_listings(LegacyConversationLog, session)
+            sample = [row[0] for row in session.execute(text(
+                "SELECT conversation_text FROM conversation_logs ORDER BY random() LIMIT 2000"))]
+
+        started = time.perf_counter()
+        compress_conversation_text()
+        db.session.commit()
+        migrated = time.perf_counter() - started
+        db.session.execute(text("VACUUM"))
+        size_after = os.path.getsize(path)
+
+        with Session(db.engine) as session:
+            after = time_listings(ConversationLog, session)
+        raw, deflated, stored = transcript_bytes(sample)
+        started = time.perf_counter()
+        encoded = [transcript_codec.compress(log) for log in sample]
+        compress_us = (time.perf_counter() - started) / len(sample) * 1e6
+        started = time.perf_counter()
+        for value in encoded:
+            transcript_codec.decompress(value)
+        decompress_us = (time.perf_counter() - started) / len(sample) * 1e6
+        stored_logs = db.session.query(func.count(ConversationLog.id)).scalar()
+        db.session.commit()
+        db.engine.dispose()
+
+    print(f"Migration 0004 converted {stored_logs:,} logs in {migrated:.0f}s")
+    print(f"Transcript bytes per log: {raw:.0f} raw, {deflated:.0f} deflated, {stored:.0f} with the dictionary")
+    print(f"Compress {compress_us:.0f}us, decompress {decompress_us:.0f}us per transcript")
+    print(f"Database file: {size_before / 2**20:.0f}MB before, {size_after / 2**20:.0f}MB after VACUUM")
+    print(f"{'listing, to_dict() per log':<48}{'before ms':>12}{'after ms':>12}")
+    for (name, before_ms), after_ms in zip(before.items(), after.values()):
+        print(f"{name:<48}{before_ms:>12.0f}{after_ms:>12.0f}")
+    shutil.rmtree(directory)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+Local fake of the Google Sheets API, for running the Sheets client offline.
+
+Serves the OAuth token endpoint, spreadsheet metadata and values:append,
+which is all SheetsClientHolder uses, and keeps appended rows in memory.
+Access tokens expire after `token_lifetime_seconds` and can be revoked, and
+status codes queued in `failures` are returned by the next API requests, to
+exercise token refresh and client rebuilds. `latency_seconds` is added to
+every response.
+
+Run from the repository root; it writes a service account key whose
+token_uri points at the server:
+
+    python -m scripts.fake_sheets_server --port 8099 --key fake-sheets-key.json
+    GOOGLE_SHEETS_API_URL=http://127.0.0.1:8099 GOOGLE_APPLICATION_CREDENTIALS=fake-sheets-key.json \\
+        GOOGLE_SHEETS_ID=fake-sheet gunicorn --bind 0.0.0.0:5000 main:app
+"""
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from urllib.parse import unquote, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+SPREADSHEET_PATH = re.compile(r'^/v4/spreadsheets/([^/]+)$')
+APPEND_PATH = re.compile(r'^/v4/spreadsheets/([^/]+)/values/(.+):append$')
+
+
+def service_account_info(token_uri):
+    """A service account key with a fresh RSA key, for credentials issued by the fake"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return {
+        'type': 'service_account',
+        'project_id': 'fake-project',
+        'private_key_id': 'fake-key',
+        'private_key': key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode('ascii'),
+        'client_email': 'call-log@fake-project.iam.gserviceaccount.com',
+        'client_id': '1',
+        'token_uri': token_uri
+    }
+
+
+class FakeSheetsServer:
+    """Threaded HTTP server standing in for oauth2.googleapis.com and sheets.googleapis.com"""
+
+    def __init__(self, host='127.0.0.1', port=0, token_lifetime_seconds=3600, latency_seconds=0.0):
+        """
+        Initialize the server; call start() to serve.
+
+        Args:
+            host (str): Address to bind
+            port (int): Port to bind; 0 picks a free one
+            token_lifetime_seconds (int): expires_in of issued access tokens
+            latency_seconds (float): Delay added to every response
+        """
+        self.token_lifetime_seconds = token_lifetime_seconds
+        self.latency_seconds = latency_seconds
+        self.lock = threading.Lock()
+        self.tokens = {}  # Access token -> expiry (time.time())
+        self.tokens_issued = 0
+        self.rows = {}  # Spreadsheet ID -> appended rows
+        self.requests = []  # (method, path) of every API request
+        self.failures = []  # Status codes for the next API requests
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='fake-sheets', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def revoke_tokens(self):
+        """Make every access token issued so far invalid, as when a key is rotated"""
+        with self.lock:
+            self.tokens.clear()
+
+    def _issue_token(self):
+        with self.lock:
+            self.tokens_issued += 1
+            token = f"fake-token-{self.tokens_issued}"
+            self.tokens[token] = time.time() + self.token_lifetime_seconds
+        return {'access_token': token, 'expires_in': self.token_lifetime_seconds, 'token_type': 'Bearer'}
+
+    def _authorized(self, header):
+        token = (header or '').removeprefix('Bearer ')
+        with self.lock:
+            return self.tokens.get(token, 0) > time.time()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._api('GET')
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if urlsplit(self.path).path == '/token':
+                    self._reply(200, fake._issue_token())
+                    return
+                self._api('POST', body)
+
+            def _api(self, method, body=b''):
+                path = unquote(urlsplit(self.path).path)
+                with fake.lock:
+                    fake.requests.append((method, path))
+                    failure = fake.failures.pop(0) if fake.failures else None
+                if failure is None and not fake._authorized(self.headers.get('Authorization')):
+                    failure = 401
+                if failure is not None:
+                    self._reply(failure, {'error': {
+                        'code': failure, 'message': f"Fake Sheets returned {failure}", 'status': 'FAILED'
+                    }})
+                    return
+
+                spreadsheet = SPREADSHEET_PATH.match(path)
+                if method == 'GET' and spreadsheet:
+                    self._reply(200, {
+                        'spreadsheetId': spreadsheet.group(1),
+                        'properties': {'title': 'Call log'},
+                        'sheets': [{'properties': {
+                            'sheetId': 0, 'title': 'Sheet1', 'index': 0,
+                            'gridProperties': {'rowCount': 1000, 'columnCount': 26}
+                        }}]
+                    })
+                    return
+
+                append = APPEND_PATH.match(path)
+                if method == 'POST' and append:
+                    values = json.loads(body or b'{}').get('values', [])
+                    with fake.lock:
+                        fake.rows.setdefault(append.group(1), []).extend(values)
+                    self._reply(200, {'spreadsheetId': append.group(1), 'updates': {'updatedRows': len(values)}})
+                    return
+
+                self._reply(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+
+            def _reply(self, status, payload):
+                if fake.latency_seconds:
+                    time.sleep(fake.latency_seconds)
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8099, help='Port to listen on')
+    parser.add_argument('--key', default='fake-sheets-key.json', help='Where to write the service account key')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Delay added to every response')
+    args = parser.parse_args()
+
+    server = FakeSheetsServer(port=args.port, latency_seconds=args.latency_ms / 1000)
+    with open(args.key, 'w') as key_file:
+        json.dump(service_account_info(f"{server.url}/token"), key_file)
+    print(f"Fake Sheets API at {server.url}, service account key in {args.key}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+        for sheet_id, rows in server.rows.items():
+            print(f"{sheet_id}: {len(rows)} rows appended")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
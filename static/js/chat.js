@@ -9,6 +9,9 @@ let currentPhone = '';
 // Store API base URL
 const API_BASE = window.location.origin;
 
+// Stream replies over Server-Sent Events when the browser can read response bodies incrementally
+const USE_STREAMING = typeof window.ReadableStream !== 'undefined' && typeof window.TextDecoder !== 'undefined';
+
 // DOM elements - will be initialized when DOM is ready
 let chatMessages;
 let chatForm;
@@ -114,14 +117,19 @@ async function handleUserSubmit(e) {
       conversationState = stateData.next_state;
       conversationContext = stateData.updated_context;
       
-      // Use function calling to get response from knowledge base or perform actions
-      const functionResponse = await handleFunctionCall(message);
-      
-      // Remove typing indicator
-      removeTypingIndicator();
-      
-      // Add assistant response to chat
-      addMessage(functionResponse, 'assistant');
+      if (USE_STREAMING) {
+        // Render the reply chunk by chunk as the server sends it
+        await streamFunctionCall(message);
+      } else {
+        // Use function calling to get response from knowledge base or perform actions
+        const functionResponse = await handleFunctionCall(message);
+        
+        // Remove typing indicator
+        removeTypingIndicator();
+        
+        // Add assistant response to chat
+        addMessage(functionResponse, 'assistant');
+      }
       
       // Save chat history
       saveChatHistory();
@@ -137,74 +145,126 @@ async function handleUserSubmit(e) {
   }
 }
 
+// Determine which function to call based on current state and user input
+function buildFunctionCall(userMessage) {
+  let functionName = 'query_knowledge_base';
+  let functionArgs = { query: userMessage, type: 'general' };
+  
+  // Check if we're in a booking state
+  if (conversationState === 'booking_enquiry' || conversationState === 'booking_confirmation') {
+    // Check if we have all required booking details for confirmation
+    if (conversationState === 'booking_confirmation' && 
+        conversationContext.outlet && 
+        conversationContext.booking_date && 
+        conversationContext.booking_time && 
+        conversationContext.guests && 
+        conversationContext.customer_name && 
+        conversationContext.phone) {
+      // Complete booking
+      functionName = 'create_booking';
+      functionArgs = {
+        outlet_id: conversationContext.outlet,
+        date: conversationContext.booking_date,
+        time: conversationContext.booking_time,
+        guests: conversationContext.guests,
+        customer_name: conversationContext.customer_name,
+        phone: conversationContext.phone || currentPhone
+      };
+    } else {
+      // Still collecting booking info
+      functionName = 'query_knowledge_base';
+      functionArgs = { query: userMessage, type: 'booking' };
+    }
+  } 
+  // Check if we're in a modification state
+  else if (conversationState === 'booking_modification' || 
+           conversationState === 'booking_update_confirmation' || 
+           conversationState === 'cancellation_confirmation') {
+    // Handle cancellation
+    if (conversationState === 'cancellation_confirmation' && conversationContext.booking_id) {
+      functionName = 'cancel_booking';
+      functionArgs = { booking_id: conversationContext.booking_id };
+    } 
+    // Handle update
+    else if (conversationState === 'booking_update_confirmation' && conversationContext.booking_id) {
+      functionName = 'update_booking';
+      functionArgs = { 
+        booking_id: conversationContext.booking_id,
+        outlet_id: conversationContext.new_outlet,
+        date: conversationContext.new_date,
+        time: conversationContext.new_time,
+        guests: conversationContext.new_guests
+      };
+    } else {
+      // Still collecting modification info
+      functionName = 'query_knowledge_base';
+      functionArgs = { query: userMessage, type: 'booking_modification' };
+    }
+  } 
+  // FAQ state
+  else if (conversationState === 'faq_enquiry') {
+    functionName = 'query_knowledge_base';
+    functionArgs = { query: userMessage, type: 'faq' };
+  }
+  
+  return { name: functionName, arguments: functionArgs };
+}
+
+// Turn a function call result into chat text. The follow-up question is left
+// out when it is streamed separately by the server.
+function formatFunctionResult(data, includeFollowUp = true) {
+  const defaultResponse = "I'm here to help with information about Barbeque Nation. What would you like to know?";
+  
+  if (!data) {
+    return defaultResponse;
+  }
+  
+  if (data.type === 'outlets') {
+    return generateOutletsResponse(data.data || [], includeFollowUp);
+  } else if (data.type === 'menu') {
+    return generateMenuResponse(data.data || [], includeFollowUp);
+  } else if (data.type === 'faq') {
+    return generateFaqResponse(data.data || [], includeFollowUp);
+  } else if (data.type === 'booking') {
+    return data.message || "To make a reservation, I'll need your name, contact number, preferred date, time, and number of guests.";
+  } else if (data.type === 'booking_created') {
+    // Update context with booking ID
+    conversationContext.booking_id = data.booking?.booking_id;
+    return `Great! I've successfully booked your table. Here are the details:\n\nBooking ID: ${data.booking?.booking_id || 'N/A'}\nOutlet: ${data.booking?.outlet || 'N/A'}\nDate: ${data.booking?.date || 'N/A'}\nTime: ${data.booking?.time || 'N/A'}\nGuests: ${data.booking?.guests || 'N/A'}` +
+      (includeFollowUp ? `\n\nIs there anything else you'd like help with?` : '');
+  } else if (data.type === 'booking_updated') {
+    return `Your booking has been successfully updated. Here are the new details:\n\nBooking ID: ${data.booking?.booking_id || 'N/A'}\nOutlet: ${data.booking?.outlet || 'N/A'}\nDate: ${data.booking?.date || 'N/A'}\nTime: ${data.booking?.time || 'N/A'}\nGuests: ${data.booking?.guests || 'N/A'}` +
+      (includeFollowUp ? `\n\nIs there anything else you'd like help with?` : '');
+  } else if (data.type === 'booking_found') {
+    return `I found your booking. Here are the details:\n\nBooking ID: ${data.booking?.booking_id || 'N/A'}\nOutlet: ${data.booking?.outlet_name || data.booking?.outlet || 'N/A'}\nDate: ${data.booking?.date || 'N/A'}\nTime: ${data.booking?.time || 'N/A'}\nGuests: ${data.booking?.guests || 'N/A'}\nStatus: ${data.booking?.status || 'N/A'}` +
+      (includeFollowUp ? `\n\nWould you like to change or cancel this booking?` : '');
+  } else if (data.type === 'booking_cancelled') {
+    return `Your booking has been successfully cancelled.` +
+      (includeFollowUp ? ` Is there anything else I can help you with?` : '');
+  } else if (data.type === 'slot_unavailable' || data.type === 'waitlist_joined') {
+    return data.message;
+  } else if (data.type === 'error') {
+    return data.message || "I'm sorry, I couldn't complete that request. Please try again.";
+  } else if (data.type === 'general') {
+    return data.message || defaultResponse;
+  } else if (typeof data === 'string') {
+    // Handle case where data is a string directly
+    return data;
+  } else {
+    // Handle other response types or raw text
+    return data.message || (typeof data === 'object' ? JSON.stringify(data) : String(data)) || defaultResponse;
+  }
+}
+
 // Handle function calling based on current state and user input
 async function handleFunctionCall(userMessage) {
   // Default response if function calling fails
   let defaultResponse = "I'm here to help with information about Barbeque Nation. What would you like to know?";
   
   try {
-    // Determine function to call based on state
-    let functionName = 'query_knowledge_base';
-    let functionArgs = { query: userMessage, type: 'general' };
+    const functionCall = buildFunctionCall(userMessage);
     
-    // Check if we're in a booking state
-    if (conversationState === 'booking_enquiry' || conversationState === 'booking_confirmation') {
-      // Check if we have all required booking details for confirmation
-      if (conversationState === 'booking_confirmation' && 
-          conversationContext.outlet && 
-          conversationContext.booking_date && 
-          conversationContext.booking_time && 
-          conversationContext.guests && 
-          conversationContext.customer_name && 
-          conversationContext.phone) {
-        // Complete booking
-        functionName = 'create_booking';
-        functionArgs = {
-          outlet_id: conversationContext.outlet,
-          date: conversationContext.booking_date,
-          time: conversationContext.booking_time,
-          guests: conversationContext.guests,
-          customer_name: conversationContext.customer_name,
-          phone: conversationContext.phone || currentPhone
-        };
-      } else {
-        // Still collecting booking info
-        functionName = 'query_knowledge_base';
-        functionArgs = { query: userMessage, type: 'booking' };
-      }
-    } 
-    // Check if we're in a modification state
-    else if (conversationState === 'booking_modification' || 
-             conversationState === 'booking_update_confirmation' || 
-             conversationState === 'cancellation_confirmation') {
-      // Handle cancellation
-      if (conversationState === 'cancellation_confirmation' && conversationContext.booking_id) {
-        functionName = 'cancel_booking';
-        functionArgs = { booking_id: conversationContext.booking_id };
-      } 
-      // Handle update
-      else if (conversationState === 'booking_update_confirmation' && conversationContext.booking_id) {
-        functionName = 'update_booking';
-        functionArgs = { 
-          booking_id: conversationContext.booking_id,
-          outlet_id: conversationContext.new_outlet,
-          date: conversationContext.new_date,
-          time: conversationContext.new_time,
-          guests: conversationContext.new_guests
-        };
-      } else {
-        // Still collecting modification info
-        functionName = 'query_knowledge_base';
-        functionArgs = { query: userMessage, type: 'booking_modification' };
-      }
-    } 
-    // FAQ state
-    else if (conversationState === 'faq_enquiry') {
-      functionName = 'query_knowledge_base';
-      functionArgs = { query: userMessage, type: 'faq' };
-    }
-    
-    console.log("Making function call:", functionName, functionArgs);
+    console.log("Making function call:", functionCall.name, functionCall.arguments);
     
     // Call function via API
     const response = await fetch(`${API_BASE}/api/conversation/retell/function-call`, {
@@ -212,50 +272,14 @@ async function handleFunctionCall(userMessage) {
       headers: {
         'Content-Type': 'application/json'
       },
-      body: JSON.stringify({
-        name: functionName,
-        arguments: functionArgs
-      })
+      body: JSON.stringify(functionCall)
     });
     
     const result = await response.json();
     console.log("API response:", result);
     
     if (result.status === 'success') {
-      // Process the response based on the data type
-      const data = result.data;
-      
-      if (!data) {
-        return defaultResponse;
-      }
-      
-      if (data.type === 'outlets') {
-        return generateOutletsResponse(data.data || []);
-      } else if (data.type === 'menu') {
-        return generateMenuResponse(data.data || []);
-      } else if (data.type === 'faq') {
-        return generateFaqResponse(data.data || []);
-      } else if (data.type === 'booking') {
-        return data.message || "To make a reservation, I'll need your name, contact number, preferred date, time, and number of guests.";
-      } else if (data.type === 'booking_created') {
-        // Update context with booking ID
-        conversationContext.booking_id = data.booking?.booking_id;
-        return `Great! I've successfully booked your table. Here are the details:\n\nBooking ID: ${data.booking?.booking_id || 'N/A'}\nOutlet: ${data.booking?.outlet || 'N/A'}\nDate: ${data.booking?.date || 'N/A'}\nTime: ${data.booking?.time || 'N/A'}\nGuests: ${data.booking?.guests || 'N/A'}\n\nIs there anything else you'd like help with?`;
-      } else if (data.type === 'booking_updated') {
-        return `Your booking has been successfully updated. Here are the new details:\n\nBooking ID: ${data.booking?.booking_id || 'N/A'}\nOutlet: ${data.booking?.outlet || 'N/A'}\nDate: ${data.booking?.date || 'N/A'}\nTime: ${data.booking?.time || 'N/A'}\nGuests: ${data.booking?.guests || 'N/A'}\n\nIs there anything else you'd like help with?`;
-      } else if (data.type === 'booking_cancelled') {
-        return `Your booking has been successfully cancelled. Is there anything else I can help you with?`;
-      } else if (data.type === 'error') {
-        return data.message || "I'm sorry, I couldn't complete that request. Please try again.";
-      } else if (data.type === 'general') {
-        return data.message || defaultResponse;
-      } else if (typeof data === 'string') {
-        // Handle case where data is a string directly
-        return data;
-      } else {
-        // Handle other response types or raw text
-        return data.message || (typeof data === 'object' ? JSON.stringify(data) : String(data)) || defaultResponse;
-      }
+      return formatFunctionResult(result.data);
     } else {
       return result.message || defaultResponse;
     }
@@ -265,8 +289,110 @@ async function handleFunctionCall(userMessage) {
   }
 }
 
+// Stream a function call over SSE, rendering each chunk as soon as it arrives
+async function streamFunctionCall(userMessage) {
+  const functionCall = buildFunctionCall(userMessage);
+  const startedAt = performance.now();
+  let firstChunkAt = null;
+  let messageElement = null;
+  let parts = [];
+  
+  // Replace the typing indicator with a message bubble on the first chunk
+  const appendChunk = (text) => {
+    if (!text) return;
+    if (!messageElement) {
+      removeTypingIndicator();
+      messageElement = createMessageElement('assistant');
+    }
+    parts.push(text);
+    renderMessageText(messageElement, parts.join('\n\n'));
+  };
+  
+  try {
+    console.log("Streaming function call:", functionCall.name, functionCall.arguments);
+    
+    const response = await fetch(`${API_BASE}/api/conversation/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Accept': 'text/event-stream'
+      },
+      body: JSON.stringify(functionCall)
+    });
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      
+      if (firstChunkAt === null) {
+        firstChunkAt = performance.now();
+        console.log(`Time to first byte: ${(firstChunkAt - startedAt).toFixed(1)} ms`);
+      }
+      
+      buffer += decoder.decode(value, { stream: true });
+      
+      // SSE messages are separated by a blank line
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        
+        const event = parseSseEvent(rawEvent);
+        if (!event) continue;
+        
+        if (event.name === 'ack' || event.name === 'follow_up' || event.name === 'error') {
+          appendChunk(event.data.message);
+        } else if (event.name === 'data') {
+          appendChunk(formatFunctionResult(event.data.result, false));
+        }
+      }
+    }
+  } catch (error) {
+    console.error('Streaming function call error:', error);
+    appendChunk("I apologize, but I'm having trouble processing your request right now. Could you please try again?");
+  }
+  
+  if (!messageElement) {
+    appendChunk("I'm here to help with information about Barbeque Nation. What would you like to know?");
+  }
+  
+  // Record the complete reply in chat history
+  chatHistory.push({
+    message: formatMessageText(parts.join('\n\n')),
+    sender: 'assistant',
+    timestamp: new Date()
+  });
+}
+
+// Parse a single SSE message into its event name and JSON payload
+function parseSseEvent(rawEvent) {
+  let name = 'message';
+  let dataLines = [];
+  
+  rawEvent.split('\n').forEach(line => {
+    if (line.startsWith('event:')) {
+      name = line.slice(6).trim();
+    } else if (line.startsWith('data:')) {
+      dataLines.push(line.slice(5).trim());
+    }
+  });
+  
+  if (dataLines.length === 0) return null;
+  
+  try {
+    return { name, data: JSON.parse(dataLines.join('\n')) };
+  } catch (error) {
+    console.error('Invalid SSE payload:', error);
+    return null;
+  }
+}
+
 // Helper functions for response generation
-function generateOutletsResponse(outlets) {
+function generateOutletsResponse(outlets, includeFollowUp = true) {
   if (!outlets || outlets.length === 0) {
     return "I don't have information about outlets matching your criteria.";
   }
@@ -280,10 +406,11 @@ function generateOutletsResponse(outlets) {
     response += `Hours: ${outlet.opening_hours}\n\n`;
   });
   
+  if (!includeFollowUp) return response.trim();
   return response + "Would you like to make a reservation at one of these locations?";
 }
 
-function generateMenuResponse(items) {
+function generateMenuResponse(items, includeFollowUp = true) {
   if (!items || items.length === 0) {
     return "I don't have information about menu items matching your criteria.";
   }
@@ -296,40 +423,46 @@ function generateMenuResponse(items) {
     response += `${item.description}\n\n`;
   });
   
+  if (!includeFollowUp) return response.trim();
   return response + "Would you like to know about any other items or make a reservation?";
 }
 
-function generateFaqResponse(faqs) {
+function generateFaqResponse(faqs, includeFollowUp = true) {
   if (!faqs || faqs.length === 0) {
     return "I don't have information about that in my knowledge base. Would you like to ask something else?";
   }
   
   // Take the most relevant FAQ (first one)
   const faq = faqs[0];
+  if (!includeFollowUp) return faq.answer;
   return `${faq.answer}\n\nIs there anything else you'd like to know?`;
 }
 
 // UI functions
-function addMessage(message, sender) {
-  // Verify chat container exists
-  if (!chatMessages) {
-    console.error("Chat messages container not found");
-    return;
-  }
-  
+function formatMessageText(message) {
+  // Format message text (handle markdown-like syntax)
+  message = message.replace(/\n/g, '<br>');
+  message = message.replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>');
+  message = message.replace(/\*(.*?)\*/g, '<em>$1</em>');
+  return message;
+}
+
+function createMessageElement(sender) {
   const messageContainer = document.createElement('div');
   messageContainer.className = 'message-container';
   
   const messageElement = document.createElement('div');
   messageElement.className = `message message-${sender}`;
   
-  // Format message text (handle markdown-like syntax)
-  message = message.replace(/\n/g, '<br>');
-  message = message.replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>');
-  message = message.replace(/\*(.*?)\*/g, '<em>$1</em>');
+  messageContainer.appendChild(messageElement);
+  chatMessages.appendChild(messageContainer);
   
+  return messageElement;
+}
+
+function renderMessageText(messageElement, message) {
   // Set innerHTML instead of textContent to preserve formatting
-  messageElement.innerHTML = message;
+  messageElement.innerHTML = formatMessageText(message);
   
   const timeElement = document.createElement('div');
   timeElement.className = 'message-time';
@@ -337,18 +470,27 @@ function addMessage(message, sender) {
   timeElement.textContent = `${now.getHours()}:${now.getMinutes().toString().padStart(2, '0')}`;
   
   messageElement.appendChild(timeElement);
-  messageContainer.appendChild(messageElement);
-  chatMessages.appendChild(messageContainer);
+  
+  // Scroll to bottom
+  chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+function addMessage(message, sender) {
+  // Verify chat container exists
+  if (!chatMessages) {
+    console.error("Chat messages container not found");
+    return;
+  }
+  
+  const messageElement = createMessageElement(sender);
+  renderMessageText(messageElement, message);
   
   // Save to chat history
   chatHistory.push({
-    message,
+    message: formatMessageText(message),
     sender,
-    timestamp: now
+    timestamp: new Date()
   });
-  
-  // Scroll to bottom
-  chatMessages.scrollTop = chatMessages.scrollHeight;
 }
 
 function showTypingIndicator() {
@@ -0,0 +1,38 @@
+import os
+import tempfile
+import pytest
+
+# The app configures itself from the environment when imported, so point it
+# at a scratch database and directories, with no background threads
+_scratch = tempfile.mkdtemp(prefix='bbq-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+os.environ['TASK_WORKERS'] = '0'
+os.environ['BOOKING_SWEEP_INTERVAL_SECONDS'] = '0'
+os.environ['LOG_RETENTION_DAYS'] = '0'
+os.environ['SHEETS_SPOOL_PATH'] = os.path.join(_scratch, 'sheets_spool.db')
+os.environ['LOCAL_LOG_DIR'] = os.path.join(_scratch, 'logs')
+os.environ['LOG_ARCHIVE_DIR'] = os.path.join(_scratch, 'archive')
+os.environ['BOOKING_ID_LOCK_DIR'] = _scratch
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(autouse=True)
+def clean_db(app):
+    """Empty the booking tables before each test"""
+    from models import db, Booking, SlotOccupancy, WaitlistEntry, IdempotencyRecord
+
+    with app.app_context():
+        for model in (Booking, SlotOccupancy, WaitlistEntry, IdempotencyRecord):
+            db.session.query(model).delete()
+        db.session.commit()
+    yield
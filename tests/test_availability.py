@@ -0,0 +1,92 @@
+import datetime
+import threading
+from models import db, Booking, SlotOccupancy
+
+OUTLET_ID = 'BBQD001'  # 120 seats
+SLOT_DATE = (datetime.date.today() + datetime.timedelta(days=7)).strftime('%Y-%m-%d')
+
+
+def booking(**fields):
+    data = {
+        'outlet_id': OUTLET_ID,
+        'date': SLOT_DATE,
+        'time': '19:00',
+        'guests': 4,
+        'customer_name': 'Test Guest',
+        'phone': '9876543210'
+    }
+    data.update(fields)
+    return data
+
+
+def booked_guests(app, slot_time=datetime.time(19, 0)):
+    with app.app_context():
+        occupancy = db.session.get(SlotOccupancy, (OUTLET_ID, datetime.date.fromisoformat(SLOT_DATE), slot_time))
+        counted = occupancy.guests if occupancy else 0
+        seated = db.session.query(db.func.coalesce(db.func.sum(Booking.guests), 0)).filter(
+            Booking.outlet_id == OUTLET_ID, Booking.status == 'confirmed'
+        ).scalar()
+        db.session.commit()
+    return counted, seated
+
+
+def test_concurrent_bookings_never_oversell_a_slot(app):
+    parties = 40  # 160 guests for 120 seats
+    statuses = []
+    start = threading.Barrier(parties)
+
+    def book(index):
+        client = app.test_client()
+        start.wait()
+        response = client.post('/api/booking/create', json=booking(phone=f"98765{index:05d}"))
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=book, args=(index,)) for index in range(parties)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses.count(201) == 30
+    assert statuses.count(409) == 10
+    assert booked_guests(app) == (120, 120)
+
+
+def test_guest_count_must_be_positive(app, client):
+    assert client.post('/api/booking/create', json=booking(guests=100)).status_code == 201
+
+    for guests in (-50, 0):
+        response = client.post('/api/booking/create', json=booking(guests=guests))
+        assert response.status_code == 400
+        assert 'at least 1' in response.get_json()['message']
+
+    assert booked_guests(app) == (100, 100)
+    assert client.post('/api/booking/create', json=booking(guests=21)).status_code == 409
+
+
+def test_party_larger_than_outlet_is_rejected(client):
+    response = client.post('/api/booking/create', json=booking(guests=121))
+
+    assert response.status_code == 400
+    assert 'at most 120' in response.get_json()['message']
+
+
+def test_booking_outside_opening_hours_is_rejected(app, client):
+    # Connaught Place seats from 12:00 to 22:29 (last seating an hour before 23:00)
+    for time in ('03:00', '11:59', '22:30'):
+        response = client.post('/api/booking/create', json=booking(time=time))
+        assert response.status_code == 400
+        assert 'takes bookings from 12:00 to 22:29' in response.get_json()['message']
+
+    assert client.post('/api/booking/create', json=booking(time='22:29')).status_code == 201
+    with app.app_context():
+        assert Booking.query.count() == 1
+
+
+def test_booking_at_unknown_outlet_is_rejected(app, client):
+    response = client.post('/api/booking/create', json=booking(outlet_id='NOPE'))
+
+    assert response.status_code == 404
+    with app.app_context():
+        assert Booking.query.count() == 0
+        assert SlotOccupancy.query.count() == 0
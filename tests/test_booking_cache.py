@@ -0,0 +1,146 @@
+import pytest
+from utils.booking_cache import BookingCache
+from tests.test_availability import booking
+
+PHONE = '9811111111'
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    from api.booking_service import booking_cache
+    with booking_cache.lock:
+        booking_cache.entries.clear()
+
+
+def find(client, **params):
+    response = client.get('/api/booking/find', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+
+def cache_counts(client):
+    metrics = client.get('/api/booking/cache-metrics').get_json()['data']
+    return metrics['hits'], metrics['misses']
+
+
+def test_repeat_lookups_are_hits(client):
+    booking_id = client.post('/api/booking/create', json=booking(phone=PHONE)).get_json()['data']['booking_id']
+    hits, misses = cache_counts(client)
+
+    find(client, booking_id=booking_id)
+    find(client, booking_id=booking_id)
+    find(client, phone=PHONE)
+
+    assert cache_counts(client) == (hits + 1, misses + 2)
+
+
+def test_writes_invalidate_cached_lookups(client):
+    first = client.post('/api/booking/create', json=booking(phone=PHONE)).get_json()['data']['booking_id']
+    assert find(client, phone=PHONE)['booking_id'] == first
+    assert find(client, booking_id=first)['guests'] == 4
+
+    # Create: the phone's newest booking changes
+    second = client.post('/api/booking/create', json=booking(phone=PHONE, time='20:00')).get_json()['data']['booking_id']
+    assert find(client, phone=PHONE)['booking_id'] == second
+
+    # Update
+    assert client.put('/api/booking/update', json={'booking_id': first, 'guests': 6}).status_code == 200
+    assert find(client, booking_id=first)['guests'] == 6
+
+    # Cancel
+    assert client.post('/api/booking/cancel', json={'booking_id': second}).status_code == 200
+    assert find(client, phone=PHONE)['status'] == 'cancelled'
+
+
+class FakeWatchError(Exception):
+    pass
+
+
+class FakeRedis:
+    """The commands BookingCache uses, with WATCH aborting on a changed key"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+        self.watched = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def watch(self, key):
+        self.watched[key] = self.redis.data.get(key)
+
+    def get(self, key):
+        return self.redis.data.get(key)
+
+    def multi(self):
+        pass
+
+    def set(self, key, value, ex=None):
+        self.commands.append(lambda data: data.__setitem__(key, value))
+
+    def incr(self, key):
+        self.commands.append(lambda data: data.__setitem__(key, int(data.get(key) or 0) + 1))
+
+    def expire(self, key, seconds):
+        pass
+
+    def delete(self, *keys):
+        self.commands.append(lambda data: [data.pop(key, None) for key in keys])
+
+    def execute(self):
+        if any(self.redis.data.get(key) != value for key, value in self.watched.items()):
+            raise FakeWatchError()
+        for command in self.commands:
+            command(self.redis.data)
+
+
+@pytest.mark.parametrize('backend', ['local', 'redis'])
+def test_value_read_before_an_invalidation_is_not_cached(backend):
+    cache = BookingCache()
+    if backend == 'redis':
+        cache.redis, cache.watch_error = FakeRedis(), FakeWatchError
+
+    generation = cache.generation('id:BK1')
+    cache.invalidate('id:BK1', 'phone:9811111111')
+    cache.set('id:BK1', {'status': 'confirmed'}, generation)
+    assert cache.get('id:BK1') is None
+
+    cache.set('id:BK1', {'status': 'cancelled'}, cache.generation('id:BK1'))
+    assert cache.get('id:BK1') == {'status': 'cancelled'}
+
+
+def test_invalidation_between_the_check_and_the_write_aborts_it():
+    cache = BookingCache()
+    cache.redis, cache.watch_error = FakeRedis(), FakeWatchError
+    generation = cache.generation('id:BK1')
+
+    # Another worker invalidates right after set() has checked the version
+    class RacingRedis(FakeRedis):
+        def pipeline(self):
+            pipe = FakePipeline(self)
+            multi = pipe.multi
+
+            def invalidate_then_multi():
+                self.data[cache._version_key('id:BK1')] = 1
+                multi()
+            pipe.multi = invalidate_then_multi
+            return pipe
+
+    cache.redis = RacingRedis()
+    cache.set('id:BK1', {'status': 'confirmed'}, generation)
+    assert cache.get('id:BK1') is None
@@ -0,0 +1,40 @@
+import datetime
+import threading
+from sqlalchemy import insert
+from models import db, Booking
+from utils.booking_io import BOOKING_FIELDS, export_bookings
+from tests.test_availability import OUTLET_ID, SLOT_DATE, booking
+
+
+def test_booking_can_be_made_while_an_export_is_paused(app):
+    with app.app_context():
+        db.session.execute(insert(Booking), [{
+            'booking_id': f"EXPORT{index:05d}",
+            'outlet_id': OUTLET_ID,
+            'booking_date': datetime.date.fromisoformat(SLOT_DATE),
+            'booking_time': datetime.time(12, 0),
+            'guests': 2,
+            'customer_name': 'Export Guest',
+            'phone': '9876543210',
+            'status': 'cancelled'
+        } for index in range(2000)])
+        db.session.commit()
+
+        # The first chunk is yielded part way through, as a slow download would leave it
+        export = export_bookings([Booking.outlet_id == OUTLET_ID], list(BOOKING_FIELDS), batch_size=100)
+        first = next(export)
+
+        # Another request, with its own connection, books meanwhile
+        responses = []
+        request = threading.Thread(target=lambda: responses.append(app.test_client().post(
+            '/api/booking/create', json=booking())))
+        request.start()
+        request.join()
+        response, = responses
+        assert response.status_code == 201
+
+        lines = (first + ''.join(export)).splitlines()
+
+    # Header, the imported bookings, and the one made during the export
+    assert len(lines) == 2002
+    assert lines[-1].split(',')[1] == response.get_json()['data']['booking_id']
@@ -0,0 +1,15 @@
+from utils.booking_ids import BookingIdGenerator
+
+
+def test_replacement_worker_does_not_repeat_ids(tmp_path):
+    # A worker issues IDs, exits, and the next process claims its number in the same second
+    first = BookingIdGenerator(lock_dir=str(tmp_path))
+    issued = [first.generate() for _ in range(100)]
+    first.lock_file.close()
+
+    replacement = BookingIdGenerator(lock_dir=str(tmp_path))
+    issued += [replacement.generate() for _ in range(100)]
+
+    assert replacement.worker_id == first.worker_id
+    assert len(set(issued)) == len(issued)
+    assert issued == sorted(issued)
@@ -0,0 +1,67 @@
+import json
+import datetime
+import threading
+from models import db, Booking
+from utils import booking_io
+from tests.test_availability import booking, booked_guests, OUTLET_ID, SLOT_DATE
+
+
+def upload(client, records):
+    body = ''.join(json.dumps(record) + '\n' for record in records)
+    response = client.post('/api/booking/import', query_string={'format': 'ndjson'}, data=body)
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+
+def stored_ids(app):
+    with app.app_context():
+        ids = {booking_id for (booking_id,) in db.session.query(Booking.booking_id)}
+        db.session.commit()
+    return ids
+
+
+def test_booking_ids_are_checked_and_normalized(app, client):
+    summary = upload(client, [
+        booking(booking_id=4711),
+        booking(booking_id='bbq-0h1k 2m3n4p'),
+        booking(booking_id='X' * 21),
+        booking(booking_id=['BBQ-1']),
+        booking(booking_id='   '),
+        booking()
+    ])
+
+    assert summary['imported'] == 3
+    assert [error['line'] for error in summary['errors']] == [3, 4, 5]
+    assert all(error['message'].startswith('Invalid booking ID') for error in summary['errors'])
+    assert {'4711', 'BBQ-0H1K2M3N4P'} < stored_ids(app)
+    assert booked_guests(app) == (12, 12)
+
+
+def test_id_taken_during_the_import_is_reported(app, client, monkeypatch):
+    # A booking takes one of the IDs after the duplicate check, before the insert
+    raced = []
+    insert = booking_io.insert
+
+    def create_booking():
+        with app.app_context():
+            db.session.add(Booking(booking_id='RACE-2', outlet_id=OUTLET_ID,
+                                   booking_date=datetime.date.fromisoformat(SLOT_DATE),
+                                   booking_time=datetime.time(19, 0), guests=2, customer_name='Walk In',
+                                   phone='9800000000', status='cancelled'))
+            db.session.commit()
+
+    def racing_insert(table):
+        if not raced:
+            raced.append(True)
+            writer = threading.Thread(target=create_booking)
+            writer.start()
+            writer.join()
+        return insert(table)
+
+    monkeypatch.setattr(booking_io, 'insert', racing_insert)
+    summary = upload(client, [booking(booking_id=f"RACE-{number}") for number in range(1, 5)])
+
+    assert summary['imported'] == 3
+    assert summary['errors'] == [{'line': 2, 'message': 'Booking ID already exists: RACE-2'}]
+    assert {'RACE-1', 'RACE-2', 'RACE-3', 'RACE-4'} <= stored_ids(app)
+    assert booked_guests(app) == (12, 12)
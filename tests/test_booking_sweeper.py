@@ -0,0 +1,44 @@
+import time
+import datetime
+import pytest
+from sqlalchemy import insert
+from models import db, Booking
+from utils.helpers import get_current_ist_time
+from tests.test_availability import OUTLET_ID
+
+
+@pytest.fixture
+def utc_server(monkeypatch):
+    """Run with the process clock in UTC, as on most servers"""
+    monkeypatch.setenv('TZ', 'UTC')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_sweep_closes_bookings_by_ist_time(app, utc_server):
+    from api.booking_service import booking_sweeper
+
+    # Past the sweep delay in IST, but still hours ahead on the server's UTC clock
+    started = (get_current_ist_time() - datetime.timedelta(minutes=booking_sweeper.after_minutes + 20)).replace(
+        second=0, microsecond=0, tzinfo=None)
+    with app.app_context():
+        db.session.execute(insert(Booking), [{
+            'booking_id': 'SWEEP00001',
+            'outlet_id': OUTLET_ID,
+            'booking_date': started.date(),
+            'booking_time': started.time(),
+            'guests': 2,
+            'customer_name': 'Sweep Guest',
+            'phone': '9876543210',
+            'status': 'confirmed'
+        }])
+        db.session.commit()
+
+        run = booking_sweeper.sweep()
+        status = db.session.query(Booking.status).filter_by(booking_id='SWEEP00001').scalar()
+        db.session.commit()
+
+    assert run['error'] is None
+    assert status == booking_sweeper.transitions['confirmed']
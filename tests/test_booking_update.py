@@ -0,0 +1,53 @@
+import datetime
+import pytest
+from tests.test_availability import booking, booked_guests
+
+
+@pytest.fixture
+def booked(client):
+    response = client.post('/api/booking/create', json=booking(guests=10))
+    assert response.status_code == 201
+    return response.get_json()['data']['booking_id']
+
+
+@pytest.mark.parametrize('change, message', [
+    ({'version': 'abc'}, 'Invalid version'),
+    ({'guests': 'abc'}, 'Invalid guest count'),
+    ({'guests': -5}, 'at least 1'),
+    ({'guests': 500}, 'at most 120'),
+    ({'date': '2026/01/01'}, 'Invalid date format'),
+    ({'time': '7pm'}, 'Invalid time format'),
+    ({'time': '03:00'}, 'takes bookings from'),
+])
+def test_invalid_update_is_rejected_and_keeps_the_slot(app, client, booked, change, message):
+    response = client.put('/api/booking/update', json={'booking_id': booked, **change})
+
+    assert response.status_code == 400
+    assert message in response.get_json()['message']
+    assert booked_guests(app) == (10, 10)
+
+
+def test_update_to_unknown_outlet_is_not_found(app, client, booked):
+    response = client.put('/api/booking/update', json={'booking_id': booked, 'outlet_id': 'NOPE'})
+
+    assert response.status_code == 404
+    assert booked_guests(app) == (10, 10)
+
+
+def test_update_moves_seats_between_slots(app, client, booked):
+    response = client.put('/api/booking/update', json={'booking_id': booked, 'time': '20:00', 'guests': '6'})
+
+    assert response.status_code == 200
+    assert response.get_json()['data']['updated_fields'] == 'time, guest count'
+    assert booked_guests(app) == (0, 6)
+    assert booked_guests(app, datetime.time(20, 0)) == (6, 6)
+
+
+def test_update_into_full_slot_conflicts(app, client, booked):
+    for _ in range(12):
+        assert client.post('/api/booking/create', json=booking(time='20:00', guests=10)).status_code == 201
+
+    response = client.put('/api/booking/update', json={'booking_id': booked, 'time': '20:00'})
+
+    assert response.status_code == 409
+    assert booked_guests(app)[0] == 10
@@ -0,0 +1,51 @@
+import os
+import json
+import pytest
+from utils import bulk_analysis
+from utils.bulk_analysis import BulkAnalyzer
+from utils.helpers import analyze_transcript
+
+
+def transcript(number):
+    return (f"USER: I want to book a table for {number % 9 + 1} people on 2026-05-{number % 28 + 1:02d} "
+            f"at {number % 4 + 6}:30 pm. My number is 98765{number:05d}.\n"
+            "AGENT: Your booking is confirmed.")
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = BulkAnalyzer(workers=2, chunk_size=4, max_pending_chunks=3)
+    yield analyzer
+    analyzer.shutdown()
+
+
+def test_results_stream_back_in_input_order(analyzer):
+    items = [{'id': f"call-{number}", 'conversation': transcript(number)} for number in range(30)]
+
+    results = list(analyzer.analyze(items))
+
+    assert analyzer.pool is not None
+    assert [result['index'] for result in results] == list(range(30))
+    assert [result['id'] for result in results] == [item['id'] for item in items]
+    assert [result['analysis'] for result in results] == [analyze_transcript(item['conversation']) for item in items]
+
+
+def test_endpoint_streams_results_in_order(client, monkeypatch, analyzer):
+    from api import post_call_analysis
+    monkeypatch.setattr(post_call_analysis, 'bulk_analyzer', analyzer)
+    body = ''.join(json.dumps({'id': number, 'conversation': transcript(number)}) + '\n' for number in range(17))
+
+    response = client.post('/api/logs/analyze/bulk', data=body, content_type='application/x-ndjson')
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['id'] for line in lines] == list(range(17))
+    assert all('analysis' in line for line in lines)
+
+
+def test_workers_are_not_forked_from_the_server_process(analyzer):
+    list(analyzer.analyze([transcript(number) for number in range(8)]))
+    start_method = bulk_analysis._pool_context().get_start_method()
+
+    assert start_method in ('forkserver', 'spawn')
+    if start_method == 'forkserver':
+        assert analyzer.pool.submit(os.getppid).result() != os.getpid()
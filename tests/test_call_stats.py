@@ -0,0 +1,63 @@
+import datetime
+import threading
+from models import db, ConversationLog, CallStatsHourly
+from utils import call_stats as call_stats_module
+
+CALL_TIME = datetime.datetime(2026, 3, 10, 8, 30)  # 14:00 IST
+
+
+def conversation_log():
+    return ConversationLog(modality='Call', call_time=CALL_TIME, phone_number='9333333333',
+                           call_outcome='Enquiry', outlet_name='Saket', booking_date='2026-03-12',
+                           booking_time='19:00', conversation_text='hello')
+
+
+def total_calls(call_stats):
+    groups = call_stats.query(CALL_TIME.date(), CALL_TIME.date(), group_by=())
+    db.session.commit()
+    return groups[0]['calls'], groups[0]['booked']
+
+
+def test_calls_saved_during_a_rebuild_are_counted_once(app, monkeypatch):
+    from api.post_call_analysis import call_stats
+
+    with app.app_context():
+        ConversationLog.query.delete()
+        CallStatsHourly.query.delete()
+        logs = [conversation_log() for _ in range(20)]
+        db.session.add_all(logs)
+        call_stats.add(logs)
+        db.session.commit()
+
+    # Once the rebuild has read the logs, another request saves a call
+    started, saved = [], []
+    is_booked = call_stats_module.is_booked
+
+    def save_call():
+        with app.app_context():
+            log = conversation_log()
+            db.session.add(log)
+            call_stats.record(log)
+            db.session.commit()
+            saved.append(True)
+
+    def hooked(booking_date, booking_time):
+        if not started:
+            started.append(True)
+            writer = threading.Thread(target=save_call)
+            writer.start()
+            writer.join()
+        return is_booked(booking_date, booking_time)
+
+    monkeypatch.setattr(call_stats_module, 'is_booked', hooked)
+    with app.app_context():
+        call_stats.rebuild()
+        monkeypatch.undo()
+        rebuilt = total_calls(call_stats)
+
+        # A rebuild with nothing saved meanwhile gives the same counts
+        call_stats.rebuild()
+        again = total_calls(call_stats)
+
+    assert saved == [True]
+    assert rebuilt == again == (21, 21)
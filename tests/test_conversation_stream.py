@@ -0,0 +1,46 @@
+import json
+import time
+import pytest
+
+LOOKUP_SECONDS = 0.3
+QUERY = {'name': 'query_knowledge_base', 'arguments': {'query': 'What are your timings?', 'type': 'faq'}}
+
+
+@pytest.fixture(autouse=True)
+def slow_lookup(monkeypatch):
+    """A knowledge-base lookup that takes LOOKUP_SECONDS"""
+    import api.conversation_service as conversation
+
+    def answer(query, query_type='general', deadline=None):
+        time.sleep(LOOKUP_SECONDS)
+        return {'type': 'faq', 'answer': 'We are open from 12 to 11.'}
+
+    monkeypatch.setattr(conversation, 'answer_knowledge_base_query', answer)
+
+
+def timed_chunks(client, path):
+    """Chunks of a streamed response, each with the seconds since the request was sent"""
+    started = time.perf_counter()
+    response = client.post(path, json=QUERY, buffered=False)
+    chunks = [(time.perf_counter() - started, chunk) for chunk in response.response]
+    response.close()
+    return chunks
+
+
+def test_stream_sends_first_byte_before_the_lookup_finishes(client):
+    chunks = timed_chunks(client, '/api/conversation/stream')
+
+    events = [chunk.decode().split('\n')[0] for _, chunk in chunks]
+    assert events == ['event: ack', 'event: data', 'event: follow_up', 'event: done']
+    ttfb = chunks[0][0]
+    assert ttfb < LOOKUP_SECONDS / 3
+    assert chunks[1][0] >= LOOKUP_SECONDS
+    payload = json.loads(chunks[1][1].decode().split('data: ', 1)[1])
+    assert payload['result']['answer'] == 'We are open from 12 to 11.'
+
+
+def test_json_reply_waits_for_the_whole_lookup(client):
+    chunks = timed_chunks(client, '/api/conversation/retell/function-call')
+
+    ttfb = chunks[0][0]
+    assert ttfb >= LOOKUP_SECONDS
@@ -0,0 +1,79 @@
+import pytest
+from config import Config
+from utils.deadline import Deadline, DEADLINE_HEADER, deadline_from_request
+
+FUNCTION_CALL = '/api/conversation/retell/function-call'
+
+
+@pytest.mark.parametrize('header, budget_ms', [
+    (None, Config.DEADLINE_DEFAULTS_MS['function_call']),
+    ('250', 250),
+    ('250.5', 250.5),
+    (str(Config.DEADLINE_MAX_MS * 10), Config.DEADLINE_MAX_MS),
+    ('-40', 0),
+    ('soon', Config.DEADLINE_DEFAULTS_MS['function_call']),
+    ('', Config.DEADLINE_DEFAULTS_MS['function_call'])
+])
+def test_budget_comes_from_the_header_within_limits(app, header, budget_ms):
+    headers = {DEADLINE_HEADER: header} if header is not None else {}
+    with app.test_request_context(FUNCTION_CALL, method='POST', headers=headers):
+        deadline = deadline_from_request('function_call')
+
+    assert deadline.budget_ms == budget_ms
+    assert deadline.remaining_ms() <= budget_ms
+    assert deadline.expired() == (budget_ms == 0)
+
+
+def test_unknown_endpoint_gets_the_maximum_budget(app):
+    with app.test_request_context(FUNCTION_CALL, method='POST'):
+        assert deadline_from_request('no-such-endpoint').budget_ms == Config.DEADLINE_MAX_MS
+
+
+def test_child_shares_the_expiry_but_not_the_degradations():
+    deadline = Deadline(1000)
+    child = deadline.child()
+    child.degrade('kb_short_answer')
+    child.degrade('kb_short_answer')
+
+    assert child.expires_at == deadline.expires_at
+    assert child.degradations == ['kb_short_answer']
+    assert deadline.degradations == []
+    assert Deadline(0).timeout() == 0.05
+
+
+def test_booking_call_is_skipped_when_the_budget_is_too_small(client, monkeypatch):
+    import api.conversation_service as conversation
+
+    def booking_api(*args, **kwargs):
+        raise AssertionError('the booking API should not be called')
+    monkeypatch.setattr(conversation.requests, 'post', booking_api)
+    monkeypatch.setattr(conversation.requests, 'get', booking_api)
+
+    response = client.post(FUNCTION_CALL, headers={DEADLINE_HEADER: str(Config.BOOKING_CALL_MIN_MS - 1)},
+                           json={'name': 'find_booking', 'arguments': {'phone': '9876500000'}})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['data']['type'] == 'error'
+    assert body['degradations'] == ['booking_call_skipped']
+    assert response.headers['X-Degradations'] == 'booking_call_skipped'
+
+
+def test_degradations_header_reports_the_knowledge_base_shortcut(client):
+    call = {'name': 'query_knowledge_base',
+            'arguments': {'query': 'Is there a kids menu at the Nehru Place outlet?', 'type': 'faq'}}
+
+    response = client.post(FUNCTION_CALL, headers={DEADLINE_HEADER: '5000'}, json=call)
+    assert response.get_json()['degradations'] == []
+    assert 'X-Degradations' not in response.headers
+    full_answer = response.get_json()['data']
+
+    # Out of time: the answer remembered from the first call is used
+    response = client.post(FUNCTION_CALL, headers={DEADLINE_HEADER: '0'}, json=call)
+    assert response.headers['X-Degradations'] == 'kb_cached_answer'
+    assert response.get_json()['data'] == full_answer
+
+    call['arguments']['query'] = 'Do you have a kids menu at Vasant Kunj?'
+    response = client.post(FUNCTION_CALL, headers={DEADLINE_HEADER: '0'}, json=call)
+    assert response.headers['X-Degradations'] == 'kb_short_answer'
+    assert response.get_json()['degradations'] == ['kb_short_answer']
@@ -0,0 +1,21 @@
+import pytest
+
+CALLS = [{'name': 'query_knowledge_base', 'arguments': {'query': 'timings', 'type': 'faq'}}]
+
+
+@pytest.mark.parametrize('deadline_ms', ['abc', '', 0, -250, 'nan', [500], {'ms': 500}])
+def test_invalid_deadline_is_rejected(client, deadline_ms):
+    response = client.post('/api/conversation/retell/function-call/batch',
+                           json={'calls': CALLS, 'deadline_ms': deadline_ms})
+
+    assert response.status_code == 400
+    assert 'deadline_ms' in response.get_json()['message']
+
+
+@pytest.mark.parametrize('deadline_ms', [1500, '1500', 10 ** 9])
+def test_deadline_is_capped_and_used(app, client, deadline_ms):
+    response = client.post('/api/conversation/retell/function-call/batch',
+                           json={'calls': CALLS, 'deadline_ms': deadline_ms})
+
+    assert response.status_code == 200
+    assert response.get_json()['deadline_ms'] == min(float(deadline_ms), app.config['DEADLINE_MAX_MS'])
@@ -0,0 +1,69 @@
+from urllib.parse import urlsplit
+from tests.test_availability import booking
+from tests.test_waitlist import fill_slot
+
+HEADERS = {'Idempotency-Key': 'test-key-1'}
+
+
+def test_refused_request_can_be_corrected_with_the_same_key(client):
+    fill_slot(client)
+
+    full = client.post('/api/booking/create', json=booking(), headers=HEADERS)
+    assert full.status_code == 409
+
+    bad_date = client.post('/api/booking/create', json=booking(time='20:00', date='2026/01/01'), headers=HEADERS)
+    assert bad_date.status_code == 400
+    assert 'Idempotent-Replayed' not in bad_date.headers
+
+    corrected = client.post('/api/booking/create', json=booking(time='20:00'), headers=HEADERS)
+    assert corrected.status_code == 201
+    assert 'Idempotent-Replayed' not in corrected.headers
+
+
+def test_success_is_replayed_for_the_same_body_only(client):
+    created = client.post('/api/booking/create', json=booking(), headers=HEADERS)
+    assert created.status_code == 201
+
+    replayed = client.post('/api/booking/create', json=booking(), headers=HEADERS)
+    assert replayed.status_code == 201
+    assert replayed.headers['Idempotent-Replayed'] == 'true'
+    assert replayed.get_json()['data']['booking_id'] == created.get_json()['data']['booking_id']
+
+    changed = client.post('/api/booking/create', json=booking(guests=6), headers=HEADERS)
+    assert changed.status_code == 422
+
+
+class _Forwarded:
+    """Enough of a requests.Response for the function-call handler"""
+
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.text = response.get_data(as_text=True)
+        self._json = response.get_json()
+
+    def json(self):
+        return self._json
+
+
+def test_function_call_key_reused_with_other_arguments_is_refused(app, client, monkeypatch):
+    from api import conversation_service as conversation
+
+    # Booking functions call this service's own API over HTTP
+    def post(url, headers=None, json=None, timeout=None):
+        return _Forwarded(app.test_client().post(urlsplit(url).path, json=json, headers=headers))
+    monkeypatch.setattr(conversation.requests, 'post', post)
+
+    def create(**fields):
+        return client.post('/api/conversation/retell/function-call', headers={'Idempotency-Key': 'call-key-1'},
+                           json={'name': 'create_booking', 'arguments': booking(**fields)})
+
+    created = create()
+    assert created.get_json()['data']['type'] == 'booking_created'
+
+    replayed = create()
+    assert replayed.headers['Idempotent-Replayed'] == 'true'
+    assert replayed.get_json()['data'] == created.get_json()['data']
+
+    changed = create(guests=6)
+    assert changed.status_code == 422
+    assert 'Idempotent-Replayed' not in changed.headers
@@ -0,0 +1,57 @@
+import os
+import pytest
+from models import db, ConversationLog
+from config import Config
+from utils.segment_log import list_segments
+
+PHONE = '9111111111'
+
+
+@pytest.fixture
+def segment(app, monkeypatch):
+    """One closed segment holding a conversation that reached neither Sheets nor the database"""
+    import api.post_call_analysis as post_call
+
+    sent = []
+    monkeypatch.setenv('GOOGLE_SHEETS_ID', 'test-sheet')
+    monkeypatch.setattr(post_call.sheets_writer, 'enqueue', lambda sheet_id, row: sent.append(row))
+    for path in list_segments(Config.LOCAL_LOG_DIR):
+        os.remove(path)
+    with app.app_context():
+        ConversationLog.query.filter_by(phone_number=PHONE).delete()
+        db.session.commit()
+
+    row = ['Call', '2026-10-01 19:00:00', PHONE, 'Enquiry', 'Saket', 'NA', 'NA', '2', 'Asked about timings', 'hi']
+    post_call.log_locally(row, pending=['sheets', 'db'])
+    post_call.local_log.close()
+    return sent
+
+
+def stored_logs(app):
+    with app.app_context():
+        return ConversationLog.query.filter_by(phone_number=PHONE).count()
+
+
+def test_each_destination_gets_a_segment_once(app, segment):
+    from api.post_call_analysis import replay_local_log
+
+    with app.app_context():
+        kept = [replay_local_log(target, delete=True)['kept'] for target in ('sheets', 'db', 'db', 'sheets')]
+        assert kept == [1, 0, 0, 0]
+        assert replay_local_log('db', delete=True)['segments'] == 0
+
+    assert len(segment) == 1
+    assert stored_logs(app) == 1
+    assert os.listdir(Config.LOCAL_LOG_DIR) == []
+
+
+def test_segment_is_kept_until_every_destination_has_it(app, segment):
+    from api.post_call_analysis import replay_local_log
+
+    with app.app_context():
+        assert replay_local_log('db', delete=True)['kept'] == 1
+        assert replay_local_log('db', delete=True)['kept'] == 1
+        assert replay_local_log('sheets', delete=True)['kept'] == 0
+
+    assert len(segment) == 1
+    assert stored_logs(app) == 1
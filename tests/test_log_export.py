@@ -0,0 +1,138 @@
+import io
+import csv
+import gzip
+import json
+import datetime
+import pytest
+from config import Config
+from models import db, ConversationLog, LogArchive
+from utils import log_export
+from utils.log_retention import LOG_FIELDS
+
+EXPORT = '/api/logs/export'
+OUTLET = 'Export Test'
+ARCHIVED_MONTH = '2024-11'
+
+
+@pytest.fixture
+def logs(app, monkeypatch):
+    """Three logs for OUTLET in March 2026, the last with a transcript CSV has to quote"""
+    from api.post_call_analysis import log_search
+
+    # Small batches and chunks, so exports span several of each
+    monkeypatch.setattr(Config, 'LOG_EXPORT_BATCH_SIZE', 2)
+    monkeypatch.setattr(log_export, 'CHUNK_BYTES', 64)
+
+    def clear():
+        with app.app_context():
+            # Indexed like any saved log, so they leave the index with the rows
+            log_search.remove(db.session.query(ConversationLog.id, ConversationLog.conversation_text)
+                              .filter_by(outlet_name=OUTLET).all())
+            ConversationLog.query.filter_by(outlet_name=OUTLET).delete()
+            LogArchive.query.filter_by(month=ARCHIVED_MONTH).delete()
+            db.session.commit()
+
+    clear()
+    with app.app_context():
+        saved = [
+            ConversationLog(modality='Call', call_time=datetime.datetime(2026, 3, day, 6, 0), phone_number='9666666666',
+                            call_outcome=outcome, outlet_name=OUTLET, conversation_text=transcript)
+            for day, outcome, transcript in (
+                (10, 'Enquiry', 'USER: What time do you open?'),
+                (11, 'Availability', 'USER: A table for 4.'),
+                (12, 'Enquiry', 'USER: "Veg", please,\nand no onions.')
+            )
+        ]
+        db.session.add_all(saved)
+        log_search.add(saved)
+        db.session.commit()
+        ids = [log.id for log in saved]
+    yield ids
+    clear()
+
+
+def export(client, **params):
+    response = client.get(EXPORT, query_string={'outlet': OUTLET, **params})
+    assert response.status_code == 200
+    return response
+
+
+def test_csv_has_a_header_and_only_the_chosen_fields(client, logs):
+    response = export(client, fields='id,call_time,call_outcome,conversation_text')
+
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=conversation_logs.csv'
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows == [
+        ['id', 'call_time', 'call_outcome', 'conversation_text'],
+        [str(logs[0]), '2026-03-10 06:00:00', 'Enquiry', 'USER: What time do you open?'],
+        [str(logs[1]), '2026-03-11 06:00:00', 'Availability', 'USER: A table for 4.'],
+        [str(logs[2]), '2026-03-12 06:00:00', 'Enquiry', 'USER: "Veg", please,\nand no onions.']
+    ]
+
+    rows = list(csv.reader(io.StringIO(export(client).get_data(as_text=True))))
+    assert rows[0] == list(LOG_FIELDS)
+    assert len(rows) == 4
+
+
+def test_gzipped_ndjson_round_trips(client, logs):
+    response = export(client, format='ndjson', gzip='1', outcome='Enquiry')
+
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=conversation_logs.ndjson.gz'
+    records = [json.loads(line) for line in gzip.decompress(response.get_data()).decode('utf-8').splitlines()]
+    assert [record['id'] for record in records] == [logs[0], logs[2]]
+    assert list(records[0]) == list(LOG_FIELDS)
+    assert records[1]['conversation_text'] == 'USER: "Veg", please,\nand no onions.'
+
+    plain = export(client, format='ndjson', outcome='Enquiry')
+    assert plain.mimetype == 'application/x-ndjson'
+    assert plain.get_data() == gzip.decompress(response.get_data())
+
+
+def test_dates_are_whole_ist_days(client, logs):
+    response = export(client, format='ndjson', fields='id', date_from='2026-03-11', date_to='2026-03-11')
+
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == [{'id': logs[1]}]
+
+
+@pytest.mark.parametrize('params, message', [
+    ({'fields': 'id,secret,password'}, 'Unknown fields: secret, password'),
+    ({'format': 'xml'}, "Format must be 'csv' or 'ndjson'"),
+    ({'date_from': '10/03/2026'}, 'Dates must be in YYYY-MM-DD format'),
+    ({'date_to': '2026-02-30'}, 'Dates must be in YYYY-MM-DD format')
+])
+def test_bad_export_requests_are_rejected(client, params, message):
+    response = client.get(EXPORT, query_string=params)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'status': 'error', 'message': message}
+
+
+def test_archived_logs_are_exported_on_request(app, client, logs):
+    from api.post_call_analysis import log_retention, log_search
+
+    with app.app_context():
+        old = ConversationLog(modality='Call', call_time=datetime.datetime(2024, 11, 15, 6, 0),
+                              phone_number='9666666666', call_outcome='Enquiry', outlet_name=OUTLET,
+                              conversation_text='USER: Are you open on Diwali?')
+        db.session.add(old)
+        log_search.record(old)
+        db.session.commit()
+        old_id = old.id
+        assert log_retention.archive_month(ARCHIVED_MONTH) == 1
+        assert db.session.get(ConversationLog, old_id) is None
+        db.session.commit()
+
+    def exported(**params):
+        response = export(client, format='ndjson', fields='id,call_time,conversation_text', **params)
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert [record['id'] for record in exported()] == logs
+    # Archived months come first
+    records = exported(archived='1')
+    assert [record['id'] for record in records] == [old_id] + logs
+    assert records[0] == {'id': old_id, 'call_time': '2024-11-15 06:00:00',
+                          'conversation_text': 'USER: Are you open on Diwali?'}
+    assert [record['id'] for record in exported(archived='1', date_from='2026-01-01')] == logs
+    assert [record['id'] for record in exported(archived='1', date_to='2024-12-31')] == [old_id]
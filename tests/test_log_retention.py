@@ -0,0 +1,57 @@
+import datetime
+import threading
+from models import db, ConversationLog, LogArchive
+from utils import log_retention
+from utils.log_retention import LogRetention, read_archive
+
+OLD_CALL = datetime.datetime(2025, 1, 15, 13, 30)
+
+
+def conversation_log(call_time):
+    return ConversationLog(modality='Call', call_time=call_time, phone_number='9222222222',
+                           call_outcome='Enquiry', outlet_name='Saket', conversation_text='hello')
+
+
+def test_calls_are_logged_while_a_month_is_archived(app, tmp_path, monkeypatch):
+    from api.post_call_analysis import log_search
+
+    with app.app_context():
+        ConversationLog.query.delete()
+        LogArchive.query.delete()
+        logs = [conversation_log(OLD_CALL) for _ in range(50)]
+        db.session.add_all(logs)
+        log_search.add(logs)
+        db.session.commit()
+        ids = [log.id for log in logs]
+
+    # Part way through the archive file, another request saves a call
+    saved = []
+    record = log_retention.log_record
+
+    def save_call():
+        with app.app_context():
+            log = conversation_log(datetime.datetime.utcnow())
+            db.session.add(log)
+            log_search.add([log])
+            db.session.commit()
+            saved.append(True)
+
+    def log_record(log):
+        if log.id == ids[24]:
+            writer = threading.Thread(target=save_call)
+            writer.start()
+            writer.join()
+        return record(log)
+
+    monkeypatch.setattr(log_retention, 'log_record', log_record)
+    retention = LogRetention(log_search, archive_dir=str(tmp_path), batch_size=10)
+    with app.app_context():
+        run = retention.run(retention_days=30)
+        archives = retention.archives()
+        remaining = ConversationLog.query.count()
+        db.session.commit()
+
+    assert saved == [True]
+    assert run['error'] is None and run['archived'] == {'2025-01': 50}
+    assert [log['id'] for log in read_archive(archives[0]['path'])] == ids
+    assert remaining == 1
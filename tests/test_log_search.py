@@ -0,0 +1,138 @@
+import datetime
+import pytest
+from models import db, ConversationLog
+from utils.log_search import fts5_query, snippet
+
+PHONE = '9555555555'
+SEARCH = '/api/logs/search'
+# 10:00 IST on 2026-03-10 and 2026-03-12
+MARCH_10 = datetime.datetime(2026, 3, 10, 4, 30)
+MARCH_12 = datetime.datetime(2026, 3, 12, 4, 30)
+
+
+@pytest.fixture
+def add_logs(app):
+    """Save logs with their search index entries; returns a function taking (transcript, fields) pairs"""
+    from api.post_call_analysis import log_search
+
+    def clear():
+        with app.app_context():
+            ConversationLog.query.filter_by(phone_number=PHONE).delete()
+            db.session.commit()
+            # Drops index entries left by tests that deleted logs directly
+            log_search.rebuild()
+
+    def add(*logs):
+        with app.app_context():
+            saved = [ConversationLog(modality='Call', phone_number=PHONE, call_time=fields.get('call_time', MARCH_10),
+                                     call_outcome=fields.get('outcome', 'Enquiry'),
+                                     outlet_name=fields.get('outlet', 'Saket'), conversation_text=transcript)
+                     for transcript, fields in logs]
+            db.session.add_all(saved)
+            log_search.add(saved)
+            db.session.commit()
+            return [log.id for log in saved]
+
+    clear()
+    yield add
+    clear()
+
+
+def search(client, q, **params):
+    response = client.get(SEARCH, query_string={'q': q, **params})
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+
+def ids(data):
+    return [result['id'] for result in data['results']]
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('cancel booking', '"cancel" "booking"'),
+    ('refund OR NOT', '"refund" "OR" "NOT"'),
+    ('NEAR(a b)', '"NEAR(a" "b)"'),
+    ('outlet:saket', '"outlet:saket"'),
+    ('"table for four"', '"table for four"'),
+    ('say "hi', '"say" """hi"'),
+    ('canc* "he said"', '"canc"* "he said"'),
+    ('- * ( )', '')
+])
+def test_fts5_query_quotes_every_term(query, expected):
+    assert fts5_query(query) == expected
+
+
+def test_operators_are_searched_for_as_words(client, add_logs):
+    both, refund_only = add_logs(
+        ('USER: I do not want a zanzibar refund or a new date.', {}),
+        ('USER: A zanzibar refund please.', {})
+    )
+
+    # Neither OR nor a leading '-' is an operator: every word must be there
+    assert ids(search(client, 'zanzibar refund OR NOT')) == [both]
+    assert sorted(ids(search(client, 'zanzibar -refund'))) == sorted([both, refund_only])
+    assert ids(search(client, 'zanzibar AND')) == []
+    assert sorted(ids(search(client, 'zanzibar refund'))) == sorted([both, refund_only])
+    assert ids(search(client, '"zanzibar refund please"')) == [refund_only]
+    assert search(client, '* ( )')['results'] == []
+
+
+def test_prefix_search(client, add_logs):
+    (log_id,) = add_logs(('USER: Is the quokkaburger on the menu?', {}))
+
+    assert ids(search(client, 'quokka*')) == [log_id]
+    assert ids(search(client, 'quokka')) == []
+    (result,) = search(client, 'quokka*')['results']
+    assert '<mark>quokkaburger</mark>' in result['snippet']
+
+
+def test_snippet_is_html_escaped(client, add_logs):
+    add_logs(('USER: <script>alert(1)</script> Tom & Jerry asked about the wombat platter', {}))
+
+    (result,) = search(client, 'wombat')['results']
+    assert result['snippet'] == ('…&lt;script&gt;alert(1)&lt;/script&gt; Tom &amp; Jerry asked about the '
+                                 '<mark>wombat</mark> platter')
+
+    long_text = 'lorem ' * 60 + '<b>wombat</b> ' + 'ipsum ' * 60
+    cut = snippet(long_text, 'wombat', chars=60)
+    assert cut.startswith('…') and cut.endswith('…')
+    assert '&lt;b&gt;<mark>wombat</mark>&lt;/b&gt;' in cut
+
+
+def test_filters_apply_with_the_search(client, add_logs):
+    saket_enquiry, saket_booking, whitefield, later = add_logs(
+        ('USER: Do you serve capybara kebabs?', {}),
+        ('USER: Book the capybara kebab table.', {'outcome': 'Availability'}),
+        ('USER: Capybara kebabs in Whitefield?', {'outlet': 'Whitefield'}),
+        ('USER: Capybara kebabs again.', {'call_time': MARCH_12})
+    )
+    add_logs(('USER: Do you serve mutton kebabs?', {}))
+
+    assert sorted(ids(search(client, 'capybara', outlet='Saket'))) == sorted([saket_enquiry, saket_booking, later])
+    assert sorted(ids(search(client, 'capybara', outcome='Enquiry', outlet='Saket'))) == sorted([saket_enquiry, later])
+    assert ids(search(client, 'capybara', date_from='2026-03-11')) == [later]
+    assert sorted(ids(search(client, 'capybara', date_to='2026-03-10', outlet='Saket'))) == \
+        sorted([saket_enquiry, saket_booking])
+    assert ids(search(client, 'capybara', outlet='Whitefield', sort='recent')) == [whitefield]
+    assert search(client, 'capybara', outlet='Koramangala')['results'] == []
+
+
+def test_pages_report_whether_more_follow(client, add_logs):
+    log_ids = add_logs(*[(f"USER: Pangolin question number {number}.", {}) for number in range(5)])
+
+    pages = [search(client, 'pangolin', sort='recent', page=page, per_page=2) for page in (1, 2, 3)]
+
+    assert [ids(page) for page in pages] == [log_ids[4:2:-1], log_ids[2:0:-1], log_ids[:1]]
+    assert [page['has_more'] for page in pages] == [True, True, False]
+    ranked = [search(client, 'pangolin', page=page, per_page=2) for page in (1, 2, 3)]
+    assert sorted(sum((ids(page) for page in ranked), [])) == sorted(log_ids)
+    assert [page['has_more'] for page in ranked] == [True, True, False]
+    assert search(client, 'pangolin', page=4, per_page=2) == {
+        'query': 'pangolin', 'sort': 'relevance', 'page': 4, 'per_page': 2, 'has_more': False, 'results': []
+    }
+
+
+def test_bad_search_requests_are_rejected(client):
+    assert client.get(SEARCH).status_code == 400
+    assert client.get(SEARCH, query_string={'q': 'kebab', 'sort': 'oldest'}).status_code == 400
+    assert client.get(SEARCH, query_string={'q': 'kebab', 'date_from': '10/03/2026'}).status_code == 400
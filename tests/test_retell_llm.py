@@ -0,0 +1,141 @@
+import json
+import pytest
+from api import retell_llm
+from api.retell_llm import RetellLLMSession, serve_session, GREETING
+from utils.metrics import LatencyTracker
+from utils.retell_simulator import LocalTransport, SimulatedRetellClient, DEFAULT_SCRIPT
+
+OUTLETS = "Hi, where are your outlets in Delhi?"
+PARKING = "Do you have parking?"
+
+
+@pytest.fixture(autouse=True)
+def latency(monkeypatch):
+    """Fresh server-side latency trackers for each test"""
+    monkeypatch.setattr(retell_llm, 'first_chunk_latency', LatencyTracker())
+    monkeypatch.setattr(retell_llm, 'turn_latency', LatencyTracker())
+    return retell_llm
+
+
+def user(content):
+    return [{'role': 'user', 'content': content}]
+
+
+def response_required(response_id, content):
+    return {'interaction_type': 'response_required', 'response_id': response_id, 'transcript': user(content)}
+
+
+def run_session(events, session=None):
+    """Play events through serve_session in this thread and return every message sent back"""
+    frames = [json.dumps(event) for event in events]
+    sent = []
+    serve_session(session or RetellLLMSession('test-call'),
+                  lambda timeout=None: frames.pop(0) if frames else None, sent.append)
+    return [json.loads(message) for message in sent]
+
+
+def replies(messages, response_id):
+    return [message for message in messages
+            if message['response_type'] == 'response' and message['response_id'] == response_id]
+
+
+def planned_reply(utterance):
+    return RetellLLMSession('expected')._plan_reply(utterance)[2]
+
+
+def test_config_greeting_and_ping_pong():
+    messages = run_session([{'interaction_type': 'ping_pong', 'timestamp': 1700000000000}])
+
+    assert messages[0] == {'response_type': 'config', 'config': {'auto_reconnect': True, 'call_details': True}}
+    assert (messages[1]['response_id'], messages[1]['content'], messages[1]['content_complete']) == (0, GREETING, True)
+    assert messages[2:] == [{'response_type': 'ping_pong', 'timestamp': 1700000000000}]
+    # Only response_required and reminder_required are timed
+    assert retell_llm.turn_latency.count == 0
+
+
+def test_reply_is_streamed_sentence_by_sentence(latency):
+    messages = run_session([response_required(1, OUTLETS)])
+
+    chunks = replies(messages, 1)
+    assert len(chunks) > 2
+    assert all(chunk['content'].endswith(('. ', '? ', '! ')) for chunk in chunks[:-1])
+    assert not any(chunk['content_complete'] for chunk in chunks[:-1])
+    assert (chunks[-1]['content'], chunks[-1]['content_complete'], chunks[-1]['end_call']) == ('', True, False)
+    assert ''.join(chunk['content'] for chunk in chunks).strip() == planned_reply(OUTLETS)
+
+    assert latency.first_chunk_latency.count == latency.turn_latency.count == 1
+    assert latency.first_chunk_latency.percentiles()['p50'] <= latency.turn_latency.percentiles()['p50']
+
+
+def test_update_only_prepares_the_reply_for_response_required(monkeypatch):
+    planned = []
+    plan_reply = RetellLLMSession._plan_reply
+
+    def recording_plan_reply(self, utterance, deadline=None):
+        planned.append(utterance)
+        return plan_reply(self, utterance, deadline)
+
+    monkeypatch.setattr(RetellLLMSession, '_plan_reply', recording_plan_reply)
+    words = PARKING.split()
+    partials = [{'interaction_type': 'update_only', 'transcript': user(' '.join(words[:i]))}
+                for i in range(1, len(words) + 1)]
+
+    messages = run_session(partials + [partials[-1], response_required(1, PARKING)])
+
+    # Partial transcripts send nothing back, a repeated one is not planned again,
+    # and the final utterance reuses the reply prepared from the last partial
+    assert len(messages) == 2 + len(replies(messages, 1))
+    assert planned == [' '.join(words[:i]) for i in range(1, len(words) + 1)]
+    assert ''.join(chunk['content'] for chunk in replies(messages, 1)).strip() == planned_reply(PARKING)
+
+
+def test_superseded_response_stops_streaming(latency):
+    # The second event is already waiting when the first reply starts streaming
+    messages = run_session([response_required(1, OUTLETS), response_required(2, PARKING)])
+
+    stale = replies(messages, 1)
+    assert len(stale) == 1
+    assert not stale[0]['content_complete']
+    current = replies(messages, 2)
+    assert current[-1]['content_complete']
+    assert ''.join(chunk['content'] for chunk in current).strip() == planned_reply(PARKING)
+    assert latency.turn_latency.count == 2
+
+
+def test_simulated_call_reports_latency_percentiles(latency):
+    transport = LocalTransport('simulated-test-call')
+    client = SimulatedRetellClient(transport, timeout=30)
+    try:
+        client.start()
+        answers = [client.say(utterance) for utterance in DEFAULT_SCRIPT]
+    finally:
+        transport.close()
+    transport.thread.join(timeout=5)
+
+    assert client.transcript[0] == {'role': 'agent', 'content': GREETING}
+    assert all(answers)
+    assert answers[-1] == planned_reply('Thanks, bye')
+
+    for tracker in (client.first_chunk_latency, client.turn_latency,
+                    latency.first_chunk_latency, latency.turn_latency):
+        summary = tracker.percentiles()
+        assert summary['count'] == len(DEFAULT_SCRIPT)
+        assert 0 <= summary['p50'] <= summary['p90'] <= summary['p99'] <= summary['max']
+    assert client.report() == {
+        'first_chunk_latency_ms': client.first_chunk_latency.percentiles(),
+        'turn_latency_ms': client.turn_latency.percentiles()
+    }
+
+
+def test_latency_tracker_uses_nearest_rank_over_its_window():
+    tracker = LatencyTracker(window=100)
+    assert tracker.percentiles() == {'count': 0, 'p50': None, 'p90': None, 'p99': None, 'max': None}
+
+    for latency_ms in range(100, 0, -1):
+        tracker.record(latency_ms)
+    assert tracker.percentiles() == {'count': 100, 'p50': 50, 'p90': 90, 'p99': 99, 'max': 100}
+
+    # 100 to 51 drop out of the window, but the total keeps counting
+    for latency_ms in range(101, 151):
+        tracker.record(latency_ms)
+    assert tracker.percentiles() == {'count': 150, 'p50': 50, 'p90': 140, 'p99': 149, 'max': 150}
@@ -0,0 +1,105 @@
+import json
+import datetime
+import pytest
+from scripts.fake_sheets_server import FakeSheetsServer, service_account_info
+from utils.sheets_client import SheetsClientHolder
+
+SHEET_ID = 'fake-sheet'
+
+
+@pytest.fixture(scope='module')
+def key_info():
+    # Generating the RSA key is the slow part, so it is shared
+    return service_account_info('')
+
+
+@pytest.fixture
+def sheets(key_info, monkeypatch):
+    server = FakeSheetsServer().start()
+    monkeypatch.delenv('GOOGLE_APPLICATION_CREDENTIALS', raising=False)
+    monkeypatch.setenv('GOOGLE_CREDENTIALS_JSON', json.dumps(dict(key_info, token_uri=f"{server.url}/token")))
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def holder(sheets):
+    return SheetsClientHolder(refresh_margin_seconds=300, api_base_url=sheets.url, timeout=5)
+
+
+def api_calls(sheets, method):
+    return [path for request_method, path in sheets.requests if request_method == method]
+
+
+def test_client_and_worksheet_are_reused(sheets, holder):
+    for number in range(3):
+        assert holder.append_rows(SHEET_ID, [[f"call-{number}", 'Enquiry']])
+
+    assert sheets.rows[SHEET_ID] == [['call-0', 'Enquiry'], ['call-1', 'Enquiry'], ['call-2', 'Enquiry']]
+    assert sheets.tokens_issued == 1
+    assert len(api_calls(sheets, 'POST')) == 3
+    # The spreadsheet is only opened for the first row
+    assert api_calls(sheets, 'GET') == api_calls(sheets, 'GET')[:1] * len(api_calls(sheets, 'GET'))
+    assert holder.stats()['authorizations'] == 1
+    assert holder.stats()['open_worksheets'] == 1
+
+
+def test_token_is_refreshed_before_it_expires(sheets, holder):
+    assert holder.append_rows(SHEET_ID, [['first']])
+    assert holder.refreshes == 0
+
+    # Four minutes left, inside the five-minute margin
+    holder.client.http_client.auth.expiry = datetime.datetime.utcnow() + datetime.timedelta(minutes=4)
+    assert holder.append_rows(SHEET_ID, [['second']])
+
+    assert holder.refreshes == 1
+    assert sheets.tokens_issued == 2
+    assert holder.stats()['authorizations'] == 1
+    assert sheets.rows[SHEET_ID] == [['first'], ['second']]
+
+
+def test_single_401_is_handled_by_a_token_refresh(sheets, holder):
+    assert holder.append_rows(SHEET_ID, [['first']])
+
+    # google-auth refreshes the token and retries on its own
+    sheets.revoke_tokens()
+    assert holder.append_rows(SHEET_ID, [['second']])
+
+    assert holder.rebuilds == 0
+    assert sheets.tokens_issued == 2
+    assert sheets.rows[SHEET_ID] == [['first'], ['second']]
+
+
+# google-auth retries a 401 twice with a new token, so three in a row reach the holder
+@pytest.mark.parametrize('failures', [[403], [401, 401, 401]])
+def test_client_is_rebuilt_once_on_an_auth_error(sheets, holder, failures):
+    assert holder.append_rows(SHEET_ID, [['first']])
+
+    sheets.failures.extend(failures)
+    assert holder.append_rows(SHEET_ID, [['second']])
+
+    assert holder.rebuilds == 1
+    assert holder.stats()['authorizations'] == 2
+    assert sheets.rows[SHEET_ID] == [['first'], ['second']]
+
+
+def test_auth_error_after_the_rebuild_is_raised(sheets, holder):
+    assert holder.append_rows(SHEET_ID, [['first']])
+
+    # The second 403 is for reopening the spreadsheet on the new client
+    sheets.failures.extend([403, 403])
+    with pytest.raises(PermissionError):
+        holder.append_rows(SHEET_ID, [['second']])
+
+    assert holder.rebuilds == 1
+    assert holder.stats()['authorizations'] == 2
+    assert sheets.rows[SHEET_ID] == [['first']]
+
+
+def test_no_credentials_means_not_configured(monkeypatch):
+    monkeypatch.delenv('GOOGLE_APPLICATION_CREDENTIALS', raising=False)
+    monkeypatch.delenv('GOOGLE_CREDENTIALS_JSON', raising=False)
+    holder = SheetsClientHolder()
+
+    assert not holder.configured()
+    assert holder.append_rows(SHEET_ID, [['row']]) is False
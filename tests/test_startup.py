@@ -0,0 +1,43 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(tmp_path, *args, cli=False, code='import app', **env):
+    env = {**os.environ, 'DATABASE_URL': f"sqlite:///{tmp_path / 'startup.db'}", **env}
+    command = [sys.executable, '-m', 'flask', '--app', 'app', *args] if cli else [sys.executable, '-c', code]
+    return subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+
+
+def test_workers_refuse_to_start_until_migrations_are_applied(tmp_path):
+    # A new database is created and migrated at startup
+    assert run(tmp_path).returncode == 0
+
+    with sqlite3.connect(tmp_path / 'startup.db') as connection:
+        connection.execute("DELETE FROM schema_migrations WHERE id = '0007_idempotency_fingerprint'")
+
+    refused = run(tmp_path)
+    assert refused.returncode != 0
+    assert "Database migrations pending: 0007_idempotency_fingerprint" in refused.stderr
+
+    upgraded = run(tmp_path, 'db', 'upgrade', cli=True)
+    assert "Applied 1 migration(s): 0007_idempotency_fingerprint" in upgraded.stdout
+    assert run(tmp_path).returncode == 0
+
+
+def test_only_the_server_entry_point_starts_task_workers(tmp_path):
+    threads = "import threading; print(sorted(thread.name for thread in threading.enumerate()))"
+
+    # CLI commands import the app as well; their workers would die with the command
+    imported = run(tmp_path, code=f"import app; {threads}", TASK_WORKERS='2')
+    assert imported.returncode == 0
+    assert 'task-worker' not in imported.stdout
+    assert 'sheets-writer' not in imported.stdout
+
+    served = run(tmp_path, code=f"import main; {threads}", TASK_WORKERS='2')
+    assert served.returncode == 0
+    assert "'task-worker-0', 'task-worker-1'" in served.stdout
+    assert 'sheets-writer' in served.stdout
@@ -0,0 +1,164 @@
+import json
+import datetime
+import pytest
+from models import db, Task, ConversationLog
+from utils.task_queue import TaskQueue
+
+PHONE = '9444444444'
+
+
+@pytest.fixture
+def queue(app):
+    with app.app_context():
+        Task.query.delete()
+        ConversationLog.query.filter_by(phone_number=PHONE).delete()
+        db.session.commit()
+    return TaskQueue(visibility_timeout_seconds=60, max_attempts=3, retry_backoff_seconds=2.0)
+
+
+def make_due(task_id):
+    """Skip the rest of a retry delay or lease"""
+    Task.query.filter_by(id=task_id).update({'run_at': datetime.datetime.utcnow() - datetime.timedelta(seconds=1)})
+    db.session.commit()
+
+
+def run_once(queue, worker='worker-a'):
+    (row,) = queue.claim(worker)
+    return queue.run(worker, row)
+
+
+def saved_log(payload):
+    db.session.add(ConversationLog(modality='Call', phone_number=PHONE, conversation_text=payload['text']))
+
+
+def test_failed_task_is_retried_with_backoff(app, queue):
+    failures = ['timeout', 'timeout']
+
+    @queue.handler('flaky')
+    def flaky(payload):
+        if failures:
+            raise RuntimeError(failures.pop())
+        saved_log(payload)
+
+    with app.app_context():
+        task_id = queue.enqueue('flaky', {'text': 'hello'})
+        delays = []
+        for _ in range(2):
+            before = datetime.datetime.utcnow()
+            assert run_once(queue) == 'retry'
+            task = db.session.get(Task, task_id)
+            delays.append((task.run_at - before).total_seconds())
+            assert (task.status, task.locked_by, task.last_error) == ('queued', None, 'RuntimeError: timeout')
+            db.session.commit()
+            # Not due again until the delay has passed
+            assert queue.claim('worker-a') == []
+            make_due(task_id)
+
+        assert run_once(queue) == 'done'
+        assert db.session.get(Task, task_id) is None
+        assert ConversationLog.query.filter_by(phone_number=PHONE).count() == 1
+        assert queue.stats()['tasks']['flaky']['retried'] == 2
+
+    # 2s, then 4s, each with up to half taken off
+    assert 1.0 <= delays[0] <= 2.1
+    assert 2.0 <= delays[1] <= 4.1
+
+
+def test_task_is_dead_lettered_after_max_attempts_and_can_be_retried(app, queue):
+    dead_letters = []
+    broken = [True]
+
+    def dead_letter(payload, error):
+        dead_letters.append((payload, error))
+
+    @queue.handler('broken', dead_letter=dead_letter)
+    def handler(payload):
+        if broken:
+            raise ValueError('bad row')
+        saved_log(payload)
+
+    with app.app_context():
+        task_id = queue.enqueue('broken', {'text': 'hello'})
+        outcomes = []
+        for _ in range(3):
+            outcomes.append(run_once(queue))
+            make_due(task_id)
+        assert outcomes == ['retry', 'retry', 'dead']
+
+        task = db.session.get(Task, task_id)
+        assert (task.status, task.attempts) == ('dead', 3)
+        db.session.commit()
+        assert dead_letters == [({'text': 'hello'}, 'ValueError: bad row')]
+        assert queue.claim('worker-a') == []
+        assert queue.counts()['dead'] == 1
+
+        broken.clear()
+        assert queue.retry_dead(name='other') == 0
+        assert queue.retry_dead(name='broken') == 1
+        task = db.session.get(Task, task_id)
+        assert (task.status, task.attempts) == ('queued', 0)
+        db.session.commit()
+        assert run_once(queue) == 'done'
+        assert ConversationLog.query.filter_by(phone_number=PHONE).count() == 1
+
+
+def test_expired_lease_is_reclaimed_and_the_first_worker_loses(app, queue):
+    queue.handler('save')(saved_log)
+
+    with app.app_context():
+        task_id = queue.enqueue('save', {'text': 'hello'})
+        (first,) = queue.claim('worker-a')
+        # Worker A stalls past its lease and worker B takes the task over
+        assert queue.claim('worker-b') == []
+        make_due(task_id)
+        (second,) = queue.claim('worker-b')
+        assert (second.id, second.attempts) == (task_id, 2)
+
+        assert queue.run('worker-b', second) == 'done'
+        assert queue.run('worker-a', first) == 'lost'
+        # Only the run that finished the task kept its writes
+        assert ConversationLog.query.filter_by(phone_number=PHONE).count() == 1
+        assert queue.stats()['tasks']['save']['lost'] == 1
+
+
+def test_logged_call_is_saved_with_its_delivery_task(app, client, queue, monkeypatch):
+    import api.post_call_analysis as post_call
+    task_queue = post_call.task_queue
+
+    response = client.post('/api/logs/log', json={
+        'modality': 'Call', 'phone_number': PHONE, 'conversation': 'USER: What time do you open?'
+    })
+    assert response.status_code == 202
+    task_id = response.get_json()['task_id']
+
+    with app.app_context():
+        # Queueing the delivery fails: the log row must not be saved without it
+        enqueue = task_queue.enqueue
+
+        def failing_enqueue(*args, **kwargs):
+            raise RuntimeError('database is locked')
+        monkeypatch.setattr(task_queue, 'enqueue', failing_enqueue)
+        assert run_once(task_queue) == 'retry'
+        assert ConversationLog.query.filter_by(phone_number=PHONE).count() == 0
+        assert [task.name for task in Task.query] == ['post_call.analyze']
+        db.session.commit()
+
+        monkeypatch.setattr(task_queue, 'enqueue', enqueue)
+        make_due(task_id)
+        assert run_once(task_queue) == 'done'
+        assert ConversationLog.query.filter_by(phone_number=PHONE).count() == 1
+        (delivery,) = Task.query.all()
+        assert (delivery.name, delivery.status) == ('post_call.deliver', 'queued')
+        row = json.loads(delivery.payload)['row']
+        db.session.commit()
+
+        sent = []
+        monkeypatch.setenv('GOOGLE_SHEETS_ID', 'test-sheet')
+        monkeypatch.setattr(post_call.sheets_holder, 'configured', lambda: True)
+        monkeypatch.setattr(post_call.sheets_writer, 'enqueue', lambda sheet_id, row: sent.append(row))
+        assert run_once(task_queue) == 'done'
+        assert Task.query.count() == 0
+        db.session.commit()
+
+    assert sent == [row]
+    assert row[2] == PHONE
@@ -0,0 +1,39 @@
+import datetime
+from models import db, WaitlistEntry
+from tests.test_availability import OUTLET_ID, SLOT_DATE, booking
+
+
+def fill_slot(client):
+    """Book all 120 seats at 19:00; returns the booking IDs"""
+    responses = [client.post('/api/booking/create', json=booking(guests=10)) for _ in range(12)]
+    assert [response.status_code for response in responses] == [201] * 12
+    return [response.get_json()['data']['booking_id'] for response in responses]
+
+
+def test_join_rejects_parties_that_can_never_fit(client):
+    fill_slot(client)
+
+    for guests, status in ((500, 400), (0, 400), (-3, 400)):
+        assert client.post('/api/booking/waitlist', json=booking(guests=guests)).status_code == status
+    assert client.post('/api/booking/waitlist', json=booking(time='03:00')).status_code == 400
+    assert client.post('/api/booking/waitlist', json=booking(outlet_id='NOPE')).status_code == 404
+
+
+def test_promotion_skips_parties_that_can_never_fit(app, client):
+    booking_ids = fill_slot(client)
+    with app.app_context():
+        # Queued before joining checked party sizes
+        db.session.add(WaitlistEntry(
+            outlet_id=OUTLET_ID, slot_date=datetime.date.fromisoformat(SLOT_DATE), slot_time=datetime.time(19, 0),
+            booking_time=datetime.time(19, 0), guests=500, customer_name='Huge Party', phone='9000000000'
+        ))
+        db.session.commit()
+    joined = client.post('/api/booking/waitlist', json=booking(guests=4))
+    assert joined.status_code == 201
+    assert joined.get_json()['data']['position'] == 2
+
+    cancelled = client.post('/api/booking/cancel', json={'booking_id': booking_ids[0]})
+
+    assert cancelled.get_json()['data']['waitlist_promoted'] == 1
+    entry = client.get(f"/api/booking/waitlist?entry_id={joined.get_json()['data']['entry_id']}").get_json()['data']
+    assert entry['status'] == 'promoted'
@@ -0,0 +1,434 @@
+import logging
+import datetime
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from models import db, Booking, SlotOccupancy
+
+logger = logging.getLogger(__name__)
+
+# Booking statuses that no longer hold a table
+RELEASED_STATUSES = ('cancelled',)
+
+
+class SlotUnavailableError(Exception):
+    """Raised when a slot does not have enough free seats for a booking"""
+
+    def __init__(self, outlet_id, slot_date, slot_time, available, outlet_name=None):
+        self.outlet_id = outlet_id
+        self.slot_date = slot_date
+        self.slot_time = slot_time
+        self.available = available
+        super().__init__(
+            f"Only {available} seats are available at {outlet_name or outlet_id} on "
+            f"{slot_date.strftime('%Y-%m-%d')} at {slot_time.strftime('%H:%M')}"
+        )
+
+
+class UnknownOutletError(ValueError):
+    """Raised when a booking names an outlet that does not exist"""
+
+    def __init__(self, outlet_id):
+        self.outlet_id = outlet_id
+        super().__init__(f"Outlet not found with ID: {outlet_id}")
+
+
+def holds_table(status):
+    """Whether a booking with this status counts against capacity"""
+    return status not in RELEASED_STATUSES
+
+
+def parse_opening_hours(opening_hours):
+    """
+    Parse an outlet's opening hours.
+
+    Args:
+        opening_hours (str): Hours such as '12:00 PM - 11:00 PM'
+
+    Returns:
+        tuple: (opening time, closing time) as datetime.time
+    """
+    opens, closes = [part.strip() for part in opening_hours.split('-')]
+    return (
+        datetime.datetime.strptime(opens, '%I:%M %p').time(),
+        datetime.datetime.strptime(closes, '%I:%M %p').time()
+    )
+
+
+class AvailabilityEngine:
+    """
+    Per-outlet, per-date, per-slot occupancy counters backing availability.
+
+    Counters live in the slot_occupancy table and are adjusted in the same
+    transaction as the booking change, so an availability check reads one
+    row per slot instead of scanning bookings.
+
+    Seats are reserved with a single conditional UPDATE that only succeeds
+    while the slot has room. The database serialises concurrent updates of
+    the same row (a row lock on PostgreSQL, the write lock on SQLite), so two
+    requests can never both take the last seats.
+    """
+
+    def __init__(self, outlets, slot_minutes=30, last_seating_minutes=60):
+        """
+        Initialize the engine.
+
+        Args:
+            outlets (list): Outlet records with 'id', 'capacity' and 'opening_hours'
+            slot_minutes (int): Length of a booking slot
+            last_seating_minutes (int): Last slot starts this long before closing
+        """
+        self.slot_minutes = slot_minutes
+        self.outlets = {outlet['id']: outlet for outlet in outlets}
+        self.slots = {}
+
+        for outlet_id, outlet in self.outlets.items():
+            try:
+                opens, closes = parse_opening_hours(outlet['opening_hours'])
+            except (KeyError, ValueError) as e:
+                logger.error(f"Error parsing opening hours for {outlet_id}: {str(e)}")
+                continue
+
+            start = self._minutes(opens)
+            last = self._minutes(closes) - last_seating_minutes
+            self.slots[outlet_id] = [
+                datetime.time(minute // 60, minute % 60)
+                for minute in range(start, last + 1, slot_minutes)
+            ]
+
+    def slot_start(self, booking_time):
+        """Start of the slot a booking time falls in"""
+        minute = self._minutes(booking_time) // self.slot_minutes * self.slot_minutes
+        return datetime.time(minute // 60, minute % 60)
+
+    def capacity(self, outlet_id):
+        """Seats available per slot at an outlet, or None for an unknown outlet"""
+        outlet = self.outlets.get(outlet_id)
+        return outlet.get('capacity') if outlet else None
+
+    def check_booking(self, outlet_id, booking_time, guests):
+        """
+        Check that a party could be seated at an outlet at all, whatever the slot's occupancy.
+
+        Args:
+            outlet_id (str): Outlet ID
+            booking_time (datetime.time): Requested time
+            guests (int): Party size
+
+        Raises:
+            UnknownOutletError: If the outlet does not exist
+            ValueError: If the party is empty or larger than the outlet, or the
+                time is not one of the outlet's slots
+        """
+        capacity = self.capacity(outlet_id)
+        if capacity is None:
+            raise UnknownOutletError(outlet_id)
+        name = self.outlets[outlet_id].get('name') or outlet_id
+        if guests < 1:
+            raise ValueError('Guest count must be at least 1')
+        if guests > capacity:
+            raise ValueError(f"{name} seats at most {capacity} guests")
+
+        slots = self.slots.get(outlet_id)
+        if not slots:
+            raise ValueError(f"{name} is not taking bookings")
+        if self.slot_start(booking_time) not in slots:
+            raise ValueError(
+                f"{name} takes bookings from {slots[0].strftime('%H:%M')} "
+                f"to {self._time(self._minutes(slots[-1]) + self.slot_minutes - 1).strftime('%H:%M')}"
+            )
+
+    def reserve(self, booking):
+        """
+        Count a booking against its slot if the slot has room for it.
+
+        Call before committing the booking, in the same transaction.
+
+        Args:
+            booking (Booking): Booking to seat
+
+        Raises:
+            SlotUnavailableError: If the slot's remaining capacity is too small
+            ValueError: If the booking fails check_booking(); a negative guest
+                count would free seats, and an unknown outlet has no limit
+        """
+        if not holds_table(booking.status):
+            return
+        if booking.guests is None:
+            raise ValueError('Guest count is required')
+        self.check_booking(booking.outlet_id, booking.booking_time, booking.guests)
+
+        capacity = self.capacity(booking.outlet_id)
+        reserved = self._adjust(
+            booking.outlet_id, booking.booking_date, booking.booking_time, booking.guests, 1, capacity
+        )
+        if not reserved:
+            slot_time = self.slot_start(booking.booking_time)
+            booked = db.session.query(SlotOccupancy.guests).filter_by(
+                outlet_id=booking.outlet_id, slot_date=booking.booking_date, slot_time=slot_time
+            ).scalar() or 0
+            raise SlotUnavailableError(
+                booking.outlet_id, booking.booking_date, slot_time, max(capacity - booked, 0),
+                self.outlets[booking.outlet_id].get('name')
+            )
+
+    def release(self, booking):
+        """Stop counting a booking against its slot; call before committing the change"""
+        if holds_table(booking.status):
+            self._adjust(booking.outlet_id, booking.booking_date, booking.booking_time, -booking.guests, -1)
+
+    def count_imported(self, rows):
+        """
+        Count bulk-inserted bookings against their slots without enforcing capacity.
+
+        Args:
+            rows (list): Booking column dicts, as inserted
+        """
+        totals = {}
+        for row in rows:
+            if not holds_table(row['status']):
+                continue
+            key = (row['outlet_id'], row['booking_date'], self.slot_start(row['booking_time']))
+            current = totals.get(key, (0, 0))
+            totals[key] = (current[0] + row['guests'], current[1] + 1)
+
+        if not totals:
+            return
+
+        dialect = db.session.get_bind().dialect.name
+        if dialect not in ('sqlite', 'postgresql'):
+            for (outlet_id, slot_date, slot_time), (guests, bookings) in totals.items():
+                self._adjust(outlet_id, slot_date, slot_time, guests, bookings)
+            return
+
+        # One executemany upsert adding each slot's totals to its counters
+        insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+        statement = insert(SlotOccupancy)
+        statement = statement.on_conflict_do_update(
+            index_elements=['outlet_id', 'slot_date', 'slot_time'],
+            set_={
+                'guests': SlotOccupancy.guests + statement.excluded.guests,
+                'bookings': SlotOccupancy.bookings + statement.excluded.bookings,
+                'updated_at': statement.excluded.updated_at
+            }
+        )
+        now = datetime.datetime.utcnow()
+        db.session.execute(statement, [
+            {
+                'outlet_id': outlet_id,
+                'slot_date': slot_date,
+                'slot_time': slot_time,
+                'guests': guests,
+                'bookings': bookings,
+                'updated_at': now
+            }
+            for (outlet_id, slot_date, slot_time), (guests, bookings) in totals.items()
+        ])
+
+    def availability(self, outlet_id, slot_date, guests=None):
+        """
+        Report free seats for every slot of an outlet on a date.
+
+        Args:
+            outlet_id (str): Outlet ID
+            slot_date (datetime.date): Date to check
+            guests (int, optional): Party size; adds a 'bookable' flag per slot
+
+        Returns:
+            list: One dict per slot with time, booked and available seats
+        """
+        capacity = self.capacity(outlet_id) or 0
+        booked = dict(
+            db.session.query(SlotOccupancy.slot_time, SlotOccupancy.guests)
+            .filter_by(outlet_id=outlet_id, slot_date=slot_date)
+            .all()
+        )
+
+        slots = []
+        for slot_time in self.slots.get(outlet_id, []):
+            available = max(capacity - booked.get(slot_time, 0), 0)
+            slot = {
+                'time': slot_time.strftime('%H:%M'),
+                'booked': booked.get(slot_time, 0),
+                'available': available
+            }
+            if guests is not None:
+                slot['bookable'] = available >= guests
+            slots.append(slot)
+
+        return slots
+
+    def suggest_alternatives(self, outlet_id, slot_date, booking_time, guests, offsets=(30, 60),
+                             outlet_change_minutes=45, limit=3):
+        """
+        Find the nearest slots with room when the requested one is full.
+
+        Candidates are the same outlet a few slots earlier or later, and the
+        other outlets in the same city around the same time. They are read
+        with one primary-key range query and ranked by how far they move the
+        booking: minutes shifted, plus a fixed cost for changing outlet.
+
+        Args:
+            outlet_id (str): Requested outlet
+            slot_date (datetime.date): Requested date
+            booking_time (datetime.time): Requested time
+            guests (int): Party size
+            offsets (tuple): Minutes earlier or later to consider
+            outlet_change_minutes (int): How many minutes of shift a change of outlet is worth
+            limit (int): Most suggestions to return
+
+        Returns:
+            list: Suggestions with outlet_id, outlet, date, time and available seats, best first
+        """
+        outlet = self.outlets.get(outlet_id)
+        if not outlet:
+            return []
+
+        requested = self._minutes(self.slot_start(booking_time))
+        window = max(offsets) if offsets else 0
+        shifts = {0} | {sign * offset for offset in offsets for sign in (-1, 1)}
+        city_outlets = [
+            candidate_id for candidate_id, candidate in self.outlets.items()
+            if candidate.get('city') == outlet.get('city')
+        ]
+
+        booked = {
+            (row_outlet, self._minutes(row_time)): row_guests
+            for row_outlet, row_time, row_guests in db.session.query(
+                SlotOccupancy.outlet_id, SlotOccupancy.slot_time, SlotOccupancy.guests
+            ).filter(
+                SlotOccupancy.outlet_id.in_(city_outlets),
+                SlotOccupancy.slot_date == slot_date,
+                SlotOccupancy.slot_time >= self._time(max(requested - window, 0)),
+                SlotOccupancy.slot_time <= self._time(min(requested + window, 24 * 60 - 1))
+            )
+        }
+
+        suggestions = []
+        for candidate_id in city_outlets:
+            opening_slots = {self._minutes(slot) for slot in self.slots.get(candidate_id, [])}
+            capacity = self.capacity(candidate_id) or 0
+            for shift in shifts:
+                if candidate_id == outlet_id and shift == 0:
+                    continue
+                minute = requested + shift
+                if minute not in opening_slots:
+                    continue
+                available = capacity - booked.get((candidate_id, minute), 0)
+                if available < guests:
+                    continue
+                cost = abs(shift) + (outlet_change_minutes if candidate_id != outlet_id else 0)
+                suggestions.append((cost, minute, candidate_id, available))
+
+        suggestions.sort()
+        return [
+            {
+                'outlet_id': candidate_id,
+                'outlet': self.outlets[candidate_id].get('name'),
+                'date': slot_date.strftime('%Y-%m-%d'),
+                'time': self._time(minute).strftime('%H:%M'),
+                'available': available
+            }
+            for _, minute, candidate_id, available in suggestions[:limit]
+        ]
+
+    def rebuild(self):
+        """
+        Recompute every counter from the bookings table.
+
+        Returns:
+            int: Number of slot rows written
+        """
+        totals = {}
+        rows = db.session.query(
+            Booking.outlet_id,
+            Booking.booking_date,
+            Booking.booking_time,
+            func.sum(Booking.guests),
+            func.count(Booking.id)
+        ).filter(
+            Booking.status.notin_(RELEASED_STATUSES)
+        ).group_by(
+            Booking.outlet_id, Booking.booking_date, Booking.booking_time
+        )
+
+        for outlet_id, booking_date, booking_time, guests, bookings in rows:
+            key = (outlet_id, booking_date, self.slot_start(booking_time))
+            current = totals.get(key, (0, 0))
+            totals[key] = (current[0] + guests, current[1] + bookings)
+
+        db.session.query(SlotOccupancy).delete(synchronize_session=False)
+        db.session.bulk_insert_mappings(SlotOccupancy, [
+            {
+                'outlet_id': outlet_id,
+                'slot_date': slot_date,
+                'slot_time': slot_time,
+                'guests': guests,
+                'bookings': bookings
+            }
+            for (outlet_id, slot_date, slot_time), (guests, bookings) in totals.items()
+        ])
+        db.session.commit()
+
+        return len(totals)
+
+    def ensure_built(self):
+        """Rebuild counters when bookings exist but no counters do, e.g. after upgrading"""
+        if db.session.query(SlotOccupancy.outlet_id).first() is None and \
+                db.session.query(Booking.id).first() is not None:
+            logger.info(f"Built occupancy for {self.rebuild()} slots from existing bookings")
+
+    def _adjust(self, outlet_id, booking_date, booking_time, guests, bookings, capacity=None):
+        """
+        Add to a slot's counters, creating the row if needed.
+
+        Args:
+            capacity (int, optional): Only apply the change if guests stay within this
+
+        Returns:
+            bool: Whether the counters were changed
+        """
+        keys = {
+            'outlet_id': outlet_id,
+            'slot_date': booking_date,
+            'slot_time': self.slot_start(booking_time)
+        }
+        self._ensure_row(keys)
+
+        statement = update(SlotOccupancy).filter_by(**keys).values(
+            guests=SlotOccupancy.guests + guests,
+            bookings=SlotOccupancy.bookings + bookings,
+            updated_at=datetime.datetime.utcnow()
+        )
+        if capacity is not None:
+            statement = statement.where(SlotOccupancy.guests + guests <= capacity)
+
+        return db.session.execute(statement).rowcount > 0
+
+    def _ensure_row(self, keys):
+        """Insert an empty counter row for a slot unless one exists"""
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+            db.session.execute(
+                insert(SlotOccupancy)
+                .values(**keys, guests=0, bookings=0, updated_at=datetime.datetime.utcnow())
+                .on_conflict_do_nothing(index_elements=list(keys))
+            )
+            return
+
+        if db.session.get(SlotOccupancy, tuple(keys.values())) is None:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(SlotOccupancy(**keys, guests=0, bookings=0))
+            except IntegrityError:
+                pass
+
+    @staticmethod
+    def _minutes(value):
+        return value.hour * 60 + value.minute
+
+    @staticmethod
+    def _time(minutes):
+        return datetime.time(minutes // 60, minutes % 60)
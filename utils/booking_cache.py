@@ -0,0 +1,180 @@
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Lifetime of the per-key version counters in Redis; far longer than any database read
+VERSION_TTL_SECONDS = 86400
+
+
+class BookingCache:
+    """
+    Bounded read-through cache for booking lookups with hit-rate metrics.
+
+    Entries are kept in a per-process LRU with a TTL. When a Redis URL is
+    configured they are kept in Redis instead, so every worker shares the
+    cache and sees invalidations immediately. In per-process mode another
+    worker's writes are only picked up once the TTL expires.
+
+    Writers call invalidate() before responding. Readers take a generation
+    number before querying the database and pass it to set(), so a value read
+    before a concurrent invalidation is not cached. In Redis the generation is
+    a version counter per key, bumped by invalidate() in the same transaction
+    that deletes the entry; set() watches it and writes nothing if it moved.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=30, redis_url=None, prefix='booking-cache:'):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Upper bound on entries in the per-process LRU
+            ttl_seconds (int): Lifetime of an entry
+            redis_url (str, optional): Share entries through Redis when set
+            prefix (str): Key prefix used in Redis
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.invalidations = 0
+        self.hits = 0
+        self.misses = 0
+        self.redis = None
+        self.watch_error = None
+
+        if redis_url:
+            try:
+                import redis
+                self.redis = redis.Redis.from_url(redis_url)
+                self.watch_error = redis.WatchError
+            except ImportError:
+                logger.warning("redis package not installed; using a per-process booking cache")
+
+    def get(self, key):
+        """
+        Look up a cached value.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            dict: Cached value, or None on a miss
+        """
+        value = None
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(self.prefix + key)
+                value = json.loads(raw) if raw is not None else None
+            except Exception as e:
+                logger.error(f"Error reading booking cache: {str(e)}")
+        else:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    if entry[0] > time.monotonic():
+                        self.entries.move_to_end(key)
+                        value = entry[1]
+                    else:
+                        del self.entries[key]
+
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def generation(self, key=None):
+        """
+        Token to take before reading from the database, for set().
+
+        Args:
+            key (str, optional): Cache key about to be read; needed in Redis mode
+
+        Returns:
+            int: Generation to pass to set()
+        """
+        if self.redis is not None and key is not None:
+            try:
+                return int(self.redis.get(self._version_key(key)) or 0)
+            except Exception as e:
+                logger.error(f"Error reading booking cache version: {str(e)}")
+                # Matches no version, so nothing read now is cached
+                return -1
+
+        with self.lock:
+            return self.invalidations
+
+    def set(self, key, value, generation=None):
+        """
+        Cache a value.
+
+        Args:
+            key (str): Cache key
+            value (dict): JSON-serialisable value
+            generation (int, optional): From generation(); the value is dropped
+                if anything was invalidated since
+        """
+        if self.redis is not None:
+            try:
+                with self.redis.pipeline() as pipe:
+                    # Watched so that an invalidation between the check and the write aborts it
+                    pipe.watch(self._version_key(key))
+                    if generation is not None and int(pipe.get(self._version_key(key)) or 0) != generation:
+                        return
+                    pipe.multi()
+                    pipe.set(self.prefix + key, json.dumps(value), ex=self.ttl_seconds)
+                    pipe.execute()
+            except self.watch_error:
+                pass
+            except Exception as e:
+                logger.error(f"Error writing booking cache: {str(e)}")
+            return
+
+        with self.lock:
+            if generation is not None and generation != self.invalidations:
+                return
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        """Drop cached values for the given keys"""
+        keys = [key for key in keys if key]
+        with self.lock:
+            self.invalidations += 1
+            for key in keys:
+                self.entries.pop(key, None)
+
+        if self.redis is not None and keys:
+            try:
+                pipe = self.redis.pipeline()
+                for key in keys:
+                    pipe.incr(self._version_key(key))
+                    pipe.expire(self._version_key(key), VERSION_TTL_SECONDS)
+                pipe.delete(*[self.prefix + key for key in keys])
+                pipe.execute()
+            except Exception as e:
+                logger.error(f"Error invalidating booking cache: {str(e)}")
+
+    def stats(self):
+        """Hit-rate metrics for this process"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'redis' if self.redis is not None else 'local',
+                'entries': len(self.entries) if self.redis is None else None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
+
+    def _version_key(self, key):
+        """Redis key of the version counter bumped when `key` is invalidated"""
+        return f"{self.prefix}version:{key}"
@@ -0,0 +1,151 @@
+import os
+import time
+import logging
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Crockford base32: digits and letters without I, L, O and U, so IDs read aloud unambiguously
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+# Letters commonly heard or typed in place of a digit
+READ_ALIASES = str.maketrans({'O': '0', 'I': '1', 'L': '1'})
+
+# Layout of the 50-bit ID: seconds since EPOCH, then worker, then sequence
+EPOCH = int(datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp())
+TIMESTAMP_BITS = 32
+WORKER_BITS = 6
+SEQUENCE_BITS = 12
+ID_LENGTH = 10  # 50 bits in base32 characters
+
+MAX_WORKERS = 1 << WORKER_BITS
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+def encode_base32(value, length=ID_LENGTH):
+    """Encode a non-negative integer as fixed-width Crockford base32"""
+    chars = []
+    for _ in range(length):
+        chars.append(ALPHABET[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+def normalize_booking_id(value):
+    """
+    Tidy up a booking ID as read out or typed by a customer.
+
+    Case, spaces and dashes are ignored and O, I and L are read as digits.
+    Older hex IDs are unaffected, since they contain none of those letters.
+
+    Args:
+        value (str): Booking ID as given
+
+    Returns:
+        str: The ID in its stored form
+    """
+    compact = ''.join(value.split()).replace('-', '').upper()
+    if compact.startswith('BBQ'):
+        return f"BBQ-{compact[3:].translate(READ_ALIASES)}"
+    return value.strip()
+
+
+class BookingIdGenerator:
+    """
+    Time-ordered booking IDs that are unique across workers without a database.
+
+    An ID packs seconds since 2025, a worker number and a per-second sequence
+    into 50 bits, written as 10 Crockford base32 characters after 'BBQ-'. IDs
+    sort in creation order, so inserts into the unique booking_id index land at
+    its right-hand edge rather than on random pages.
+
+    Each process claims a free worker number by taking an exclusive flock on a
+    file in `lock_dir`. The lock lasts as long as the process, so gunicorn
+    workers on one host never share a number. A process forked after claiming
+    claims again. The first ID after a claim waits for the next second, since a
+    worker that has just exited may have used the number this second. Hosts
+    sharing a database should be given distinct numbers through `worker_id`.
+    """
+
+    def __init__(self, prefix='BBQ-', worker_id=None, lock_dir=None):
+        """
+        Initialize the generator.
+
+        Args:
+            prefix (str): Text before the encoded ID
+            worker_id (int, optional): Fixed worker number (0-63) instead of claiming one
+            lock_dir (str, optional): Directory for worker lock files; defaults to the temp dir
+        """
+        if worker_id is not None and not 0 <= worker_id < MAX_WORKERS:
+            raise ValueError(f"Worker ID must be between 0 and {MAX_WORKERS - 1}")
+        self.prefix = prefix
+        self.fixed_worker_id = worker_id
+        self.lock_dir = lock_dir or tempfile.gettempdir()
+        self.lock = threading.Lock()
+        self.worker_id = None
+        self.worker_pid = None
+        self.lock_file = None
+        self.last_timestamp = 0
+        self.sequence = 0
+
+    def generate(self):
+        """Return a new booking ID"""
+        with self.lock:
+            if self.worker_pid != os.getpid():
+                self._claim_worker_id()
+                # The process that held this number before may have used this second,
+                # so the first ID waits for the next one
+                self.last_timestamp = max(int(time.time()) - EPOCH, self.last_timestamp)
+                self.sequence = MAX_SEQUENCE
+
+            timestamp = max(int(time.time()) - EPOCH, self.last_timestamp)
+            if timestamp == self.last_timestamp:
+                self.sequence += 1
+                if self.sequence > MAX_SEQUENCE:
+                    # Sequence used up for this second; wait for the next one
+                    while timestamp <= self.last_timestamp:
+                        time.sleep(0.001)
+                        timestamp = int(time.time()) - EPOCH
+                    self.sequence = 0
+            else:
+                self.sequence = 0
+            self.last_timestamp = timestamp
+
+            value = (timestamp << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self.sequence
+            return self.prefix + encode_base32(value)
+
+    def _claim_worker_id(self):
+        """Take the first worker number no other live process on this host holds"""
+        self.worker_pid = os.getpid()
+        self.lock_file = None
+
+        if self.fixed_worker_id is not None:
+            self.worker_id = self.fixed_worker_id
+            return
+
+        if fcntl is None:
+            self.worker_id = os.getpid() % MAX_WORKERS
+            logger.warning(f"File locks unavailable; using worker ID {self.worker_id} from the process ID")
+            return
+
+        for worker_id in range(MAX_WORKERS):
+            lock_file = open(os.path.join(self.lock_dir, f"bbq-booking-id-worker-{worker_id}.lock"), 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            # Kept open for the life of the process to hold the claim
+            self.lock_file = lock_file
+            self.worker_id = worker_id
+            logger.info(f"Claimed booking ID worker {worker_id}")
+            return
+
+        raise RuntimeError(f"All {MAX_WORKERS} booking ID workers are in use")
@@ -0,0 +1,383 @@
+import io
+import csv
+import json
+import logging
+from datetime import datetime
+from sqlalchemy import func, insert, literal_column
+from sqlalchemy.exc import DataError, IntegrityError
+from models import db, Booking
+from config import Config
+from utils.booking_ids import BookingIdGenerator, normalize_booking_id
+
+logger = logging.getLogger(__name__)
+
+# Fields a booking listing or export can return: column and formatter for the value
+BOOKING_FIELDS = {
+    'id': (Booking.id, None),
+    'booking_id': (Booking.booking_id, None),
+    'outlet_id': (Booking.outlet_id, None),
+    'date': (Booking.booking_date, lambda value: value.strftime('%Y-%m-%d')),
+    'time': (Booking.booking_time, lambda value: value.strftime('%H:%M')),
+    'guests': (Booking.guests, None),
+    'customer_name': (Booking.customer_name, None),
+    'phone': (Booking.phone, None),
+    'status': (Booking.status, None),
+    'created_at': (Booking.created_at, lambda value: value.strftime('%Y-%m-%d %H:%M:%S')),
+    'updated_at': (Booking.updated_at, lambda value: value.strftime('%Y-%m-%d %H:%M:%S')),
+    'version': (Booking.version, None)
+}
+
+# Fields every imported booking must carry, as for POST /api/booking/create
+REQUIRED_FIELDS = ['outlet_id', 'date', 'time', 'guests', 'customer_name', 'phone']
+
+# Errors reported back from an import; further errors are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Longest booking ID the column holds
+BOOKING_ID_LENGTH = Booking.booking_id.type.length
+
+
+# Time-ordered public booking IDs, unique across worker processes
+booking_id_generator = BookingIdGenerator(
+    worker_id=Config.BOOKING_ID_WORKER_ID,
+    lock_dir=Config.BOOKING_ID_LOCK_DIR
+)
+
+
+def generate_booking_id():
+    """Generate a new public booking ID"""
+    return booking_id_generator.generate()
+
+
+def format_booking_row(row, fields):
+    """
+    Turn a query row into a JSON-serialisable dict.
+
+    Args:
+        row: Row whose first values are the columns for `fields`, in order
+        fields (list): Names from BOOKING_FIELDS
+
+    Returns:
+        dict: Formatted booking
+    """
+    booking = {}
+    for index, field in enumerate(fields):
+        value = row[index]
+        formatter = BOOKING_FIELDS[field][1]
+        booking[field] = formatter(value) if formatter and value is not None else value
+    return booking
+
+
+def parse_booking_data(data, availability_engine=None):
+    """
+    Validate and convert incoming booking fields.
+
+    Args:
+        data (dict): Booking with 'date' as YYYY-MM-DD and 'time' as HH:MM
+        availability_engine (AvailabilityEngine, optional): Also check the party fits the outlet
+
+    Returns:
+        dict: Column values for a Booking
+
+    Raises:
+        ValueError: If a required field is missing or a value is invalid
+    """
+    for field in REQUIRED_FIELDS:
+        if data.get(field) in (None, ''):
+            raise ValueError(f'Missing required field: {field}')
+
+    try:
+        booking_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+        booking_time = datetime.strptime(data['time'], '%H:%M').time()
+    except ValueError as e:
+        raise ValueError(f'Invalid date or time format: {str(e)}')
+
+    try:
+        guests = int(data['guests'])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid guest count: {data['guests']}")
+    if guests < 1:
+        raise ValueError('Guest count must be at least 1')
+    if availability_engine is not None:
+        availability_engine.check_booking(data['outlet_id'], booking_time, guests)
+
+    return {
+        'outlet_id': data['outlet_id'],
+        'booking_date': booking_date,
+        'booking_time': booking_time,
+        'guests': guests,
+        'customer_name': data['customer_name'],
+        'phone': str(data['phone']),
+        'status': data.get('status') or 'confirmed'
+    }
+
+
+def parse_booking_changes(data):
+    """
+    Validate and convert the fields of a booking update.
+
+    Args:
+        data (dict): Any of outlet_id, date, time, guests and status, and the
+            version the change was made against
+
+    Returns:
+        tuple: (version or None, column values to change, names of the changed fields)
+
+    Raises:
+        ValueError: If a value is invalid
+    """
+    try:
+        version = int(data['version']) if data.get('version') is not None else None
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid version: {data['version']}")
+
+    changes = {}
+    updated_fields = []
+
+    if data.get('outlet_id'):
+        changes['outlet_id'] = data['outlet_id']
+        updated_fields.append('outlet')
+
+    if data.get('date'):
+        try:
+            changes['booking_date'] = datetime.strptime(data['date'], '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            raise ValueError('Invalid date format. Use YYYY-MM-DD.')
+        updated_fields.append('date')
+
+    if data.get('time'):
+        try:
+            changes['booking_time'] = datetime.strptime(data['time'], '%H:%M').time()
+        except (TypeError, ValueError):
+            raise ValueError('Invalid time format. Use HH:MM.')
+        updated_fields.append('time')
+
+    if data.get('guests') not in (None, ''):
+        try:
+            changes['guests'] = int(data['guests'])
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid guest count: {data['guests']}")
+        if changes['guests'] < 1:
+            raise ValueError('Guest count must be at least 1')
+        updated_fields.append('guest count')
+
+    if data.get('status'):
+        changes['status'] = data['status']
+        updated_fields.append('status')
+
+    return version, changes, updated_fields
+
+
+def read_booking_rows(stream, fmt='csv'):
+    """
+    Stream booking records from a binary file-like object.
+
+    Args:
+        stream: Binary stream (request body or open file)
+        fmt (str): 'csv' with a header row, or 'ndjson'
+
+    Yields:
+        tuple: (line number, dict of raw fields, or None if the line is not valid JSON)
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, record if isinstance(record, dict) else None
+
+
+def import_bookings(records, availability_engine, booking_cache, chunk_size=1000):
+    """
+    Insert bookings in chunks, one executemany and commit per chunk.
+
+    Rows are validated with the same rules as POST /api/booking/create.
+    Invalid rows and booking IDs that already exist are skipped and reported.
+    Given booking IDs are stored in the form find looks them up by. If a
+    chunk is refused by the database, e.g. for an ID taken by a booking made
+    meanwhile, its rows are inserted one by one and the failing lines reported.
+    Slot occupancy counters are updated in the same transaction as each chunk,
+    but capacity is not enforced so historical data imports as-is.
+
+    Args:
+        records: Iterable of (line number, dict) as from read_booking_rows
+        availability_engine (AvailabilityEngine): Counters to update
+        booking_cache (BookingCache): Cache to invalidate for imported phones
+        chunk_size (int): Rows per insert and commit
+
+    Returns:
+        dict: Counts of imported and skipped rows, plus the first errors
+    """
+    summary = {'imported': 0, 'skipped': 0, 'errors': []}
+    chunk = []
+
+    def skip(line, message):
+        summary['skipped'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({'line': line, 'message': message})
+
+    def flush():
+        ids = [row['booking_id'] for _, row in chunk]
+        existing = {
+            booking_id for (booking_id,) in
+            db.session.query(Booking.booking_id).filter(Booking.booking_id.in_(ids))
+        }
+
+        rows, seen = [], set()
+        for line, row in chunk:
+            if row['booking_id'] in existing or row['booking_id'] in seen:
+                skip(line, f"Booking ID already exists: {row['booking_id']}")
+                continue
+            seen.add(row['booking_id'])
+            rows.append((line, row))
+        chunk.clear()
+        if not rows:
+            return
+
+        try:
+            db.session.execute(insert(Booking), [row for _, row in rows])
+            availability_engine.count_imported([row for _, row in rows])
+            db.session.commit()
+        except (IntegrityError, DataError):
+            # A booking created with one of these IDs since the check, or a value
+            # the database refuses; find the rows at fault one at a time
+            db.session.rollback()
+            rows = insert_each(rows)
+
+        booking_cache.invalidate(*{f"phone:{row['phone']}" for _, row in rows})
+        summary['imported'] += len(rows)
+
+    def insert_each(rows):
+        inserted = []
+        for line, row in rows:
+            try:
+                db.session.execute(insert(Booking), [row])
+                availability_engine.count_imported([row])
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                skip(line, f"Booking ID already exists: {row['booking_id']}")
+                continue
+            except DataError as e:
+                db.session.rollback()
+                skip(line, f"Invalid value: {str(e.orig).strip()}")
+                continue
+            inserted.append((line, row))
+        return inserted
+
+    now = datetime.utcnow()
+    for line, record in records:
+        if record is None:
+            skip(line, 'Invalid JSON object')
+            continue
+        try:
+            row = parse_booking_data(record, availability_engine)
+        except ValueError as e:
+            skip(line, str(e))
+            continue
+
+        booking_id = record.get('booking_id')
+        if booking_id in (None, ''):
+            booking_id = generate_booking_id()
+        elif isinstance(booking_id, (str, int)) and not isinstance(booking_id, bool):
+            booking_id = normalize_booking_id(str(booking_id))
+        if not isinstance(booking_id, str) or not booking_id or len(booking_id) > BOOKING_ID_LENGTH:
+            skip(line, f"Invalid booking ID: {record['booking_id']}")
+            continue
+
+        row['booking_id'] = booking_id
+        row['created_at'] = row['updated_at'] = now
+        row['version'] = 1
+        chunk.append((line, row))
+
+        if len(chunk) >= chunk_size:
+            flush()
+
+    if chunk:
+        flush()
+
+    return summary
+
+
+def export_bookings(filters, fields, fmt='csv', batch_size=1000):
+    """
+    Stream bookings as CSV or NDJSON, `batch_size` rows at a time.
+
+    On Postgres the rows come through one server-side cursor. SQLite makes
+    writers wait for open reads, so there each batch is read in its own short
+    transaction, keyed on the booking id.
+
+    Args:
+        filters (list): SQLAlchemy filter expressions
+        fields (list): Names from BOOKING_FIELDS to include
+        fmt (str): 'csv' or 'ndjson'
+        batch_size (int): Rows fetched at a time
+
+    Yields:
+        str: Encoded output in chunks
+    """
+    columns = [BOOKING_FIELDS[field][0] for field in fields]
+
+    # Records are buffered into chunks of about 64KB to keep writes efficient
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(fields)
+
+    for row in _booking_rows(columns, filters, batch_size):
+        booking = format_booking_row(row[1:], fields)
+        if fmt == 'csv':
+            writer.writerow(booking.values())
+        else:
+            buffer.write(json.dumps(booking) + "\n")
+
+        if buffer.tell() > 65536:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def _booking_rows(columns, filters, batch_size):
+    """
+    Read the bookings matching `filters` ordered by id, `batch_size` at a time.
+
+    Args:
+        columns (list): Columns to read, after the Booking.id each row leads with
+        filters (list): SQLAlchemy filter expressions
+        batch_size (int): Rows fetched at a time
+
+    Yields:
+        Row: Booking id, then the values of `columns`
+    """
+    query = db.session.query(Booking.id, *columns).order_by(Booking.id)
+    if db.engine.dialect.name == 'postgresql':
+        # One server-side cursor; the export does not hold up bookings made meanwhile
+        yield from query.filter(*filters).execution_options(yield_per=batch_size)
+        db.session.commit()
+        return
+
+    # If the export read through the outlet or status index, the matches would be
+    # sorted again for every batch. Marking each filter as likely to hold has the
+    # batches walk the primary key instead, which reads the table once over the whole export.
+    query = query.filter(*[func.likelihood(condition, literal_column('0.9')) for condition in filters])
+    after = 0
+    while True:
+        rows = query.filter(Booking.id > after).limit(batch_size).all()
+        db.session.commit()
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        after = rows[-1][0]
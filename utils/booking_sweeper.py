@@ -0,0 +1,171 @@
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import tuple_, update
+from models import db, Booking
+from utils.helpers import get_current_ist_time
+
+logger = logging.getLogger(__name__)
+
+
+class BookingSweeper:
+    """
+    Background job that closes out bookings whose slot has passed.
+
+    Bookings marked 'seated' become 'completed'. Bookings still 'confirmed'
+    become `unseated_status`: 'completed' by default, or 'no_show' for outlets
+    that mark arrivals as 'seated'.
+
+    Work is done in batches of `batch_size` rows. Each batch is its own short
+    transaction that selects row IDs and then runs UPDATE ... WHERE id IN (...).
+    The update re-checks the status, so a booking changed in the meantime is
+    left alone. Between batches the sweeper pauses for at least as long as the
+    batch took, so live booking traffic gets the write lock at least half the
+    time.
+    """
+
+    def __init__(self, booking_cache, after_minutes=180, unseated_status='completed',
+                 batch_size=500, pause_seconds=0.05, interval_seconds=300):
+        """
+        Initialize the sweeper.
+
+        Args:
+            booking_cache (BookingCache): Cache to invalidate for swept bookings
+            after_minutes (int): How long after its start time a booking is swept
+            unseated_status (str): New status for bookings still 'confirmed'
+            batch_size (int): Rows updated per transaction
+            pause_seconds (float): Shortest sleep between batches
+            interval_seconds (int): Time between scheduled sweeps
+        """
+        self.booking_cache = booking_cache
+        self.after_minutes = after_minutes
+        self.transitions = {'seated': 'completed', 'confirmed': unseated_status}
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.interval_seconds = interval_seconds
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.progress = None
+        self.last_run = None
+        self.runs = 0
+        self.swept = 0
+        self.errors = 0
+
+    def sweep(self, now=None):
+        """
+        Sweep every booking that is due, batch by batch.
+
+        Args:
+            now (datetime, optional): Current time in IST, where bookings are made; defaults to now
+
+        Returns:
+            dict: Rows updated per new status, batches, duration and any error
+        """
+        if not self.lock.acquire(blocking=False):
+            logger.info("Booking sweep already running; skipping")
+            return None
+
+        started = time.perf_counter()
+        cutoff = (now or get_current_ist_time()) - timedelta(minutes=self.after_minutes)
+        run = {
+            'started_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+            'cutoff': cutoff.strftime('%Y-%m-%d %H:%M'),
+            'updated': {},
+            'batches': 0,
+            'duration_ms': None,
+            'error': None
+        }
+        self.progress = run
+
+        try:
+            for status, new_status in self.transitions.items():
+                while not self.stopped.is_set():
+                    batch_started = time.perf_counter()
+                    selected, updated = self._sweep_batch(status, new_status, cutoff)
+                    if not selected:
+                        break
+                    run['updated'][new_status] = run['updated'].get(new_status, 0) + updated
+                    run['batches'] += 1
+                    self.swept += updated
+                    if selected < self.batch_size:
+                        break
+                    # Yield at least as long as the batch held the database
+                    time.sleep(max(self.pause_seconds, time.perf_counter() - batch_started))
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error sweeping bookings: {str(e)}")
+            run['error'] = str(e)
+            self.errors += 1
+        finally:
+            run['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            self.last_run = run
+            self.progress = None
+            self.runs += 1
+            self.lock.release()
+
+        total = sum(run['updated'].values())
+        if total:
+            logger.info(f"Swept {total} past bookings in {run['batches']} batches ({run['duration_ms']}ms)")
+        return run
+
+    def _sweep_batch(self, status, new_status, cutoff):
+        """Update one batch of due bookings in its own transaction; returns rows selected and updated"""
+        rows = db.session.query(Booking.id, Booking.booking_id, Booking.phone).filter(
+            Booking.status == status,
+            tuple_(Booking.booking_date, Booking.booking_time) <= (cutoff.date(), cutoff.time())
+        ).order_by(Booking.booking_date, Booking.booking_time).limit(self.batch_size).all()
+        if not rows:
+            db.session.commit()
+            return 0, 0
+
+        result = db.session.execute(
+            update(Booking)
+            .where(Booking.id.in_([row.id for row in rows]), Booking.status == status)
+            .values(status=new_status, updated_at=datetime.utcnow(), version=Booking.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        keys = []
+        for row in rows:
+            keys.extend((f"id:{row.booking_id}", f"phone:{row.phone}"))
+        self.booking_cache.invalidate(*keys)
+        return len(rows), result.rowcount
+
+    def start(self, app):
+        """
+        Run sweeps every `interval_seconds` on a daemon thread.
+
+        Args:
+            app (Flask): Application whose context the sweeps run in
+        """
+        if self.thread is not None:
+            return
+
+        def run():
+            while not self.stopped.wait(self.interval_seconds):
+                with app.app_context():
+                    self.sweep()
+
+        self.thread = threading.Thread(target=run, name='booking-sweeper', daemon=True)
+        self.thread.start()
+        logger.info(f"Booking sweeper scheduled every {self.interval_seconds}s")
+
+    def stop(self):
+        """Stop the scheduled thread after its current batch"""
+        self.stopped.set()
+
+    def stats(self):
+        """Progress of a running sweep, the last finished one, and totals for this process"""
+        progress = self.progress
+        return {
+            'scheduled': self.thread is not None and self.thread.is_alive(),
+            'interval_seconds': self.interval_seconds,
+            'running': dict(progress, updated=dict(progress['updated'])) if progress else None,
+            'last_run': self.last_run,
+            'runs': self.runs,
+            'swept': self.swept,
+            'errors': self.errors
+        }
@@ -0,0 +1,157 @@
+import os
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from utils.helpers import analyze_transcript
+
+logger = logging.getLogger(__name__)
+
+
+def analyze_chunk(conversations):
+    """
+    Analyse a list of transcripts in a pool worker.
+
+    The extraction patterns are compiled once, when utils.helpers is
+    imported, and reused for every chunk the worker handles.
+
+    Returns:
+        list: ('ok', analysis) or ('error', message) per transcript, in order
+    """
+    results = []
+    for conversation in conversations:
+        try:
+            results.append(('ok', analyze_transcript(conversation)))
+        except Exception as e:
+            results.append(('error', str(e)))
+    return results
+
+
+class BulkAnalyzer:
+    """
+    Analyses large numbers of transcripts on a pool of worker processes.
+
+    Transcripts are read from any iterable in chunks of `chunk_size` and
+    analysed in parallel. Results come back in input order as they are ready.
+    At most `max_pending_chunks` chunks are in flight, so memory stays bounded
+    however long the input is. Input that fits in one chunk is analysed in
+    this process, which avoids the cost of the pool for small requests.
+
+    The pool is started on first use and kept for later calls. Its workers
+    are never forked from the server itself: see _pool_context().
+    """
+
+    def __init__(self, workers=None, chunk_size=64, max_pending_chunks=None):
+        """
+        Initialize the analyzer.
+
+        Args:
+            workers (int, optional): Worker processes; defaults to the CPU count
+            chunk_size (int): Transcripts sent to a worker at a time
+            max_pending_chunks (int, optional): Chunks in flight; defaults to twice the workers
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_pending_chunks = max_pending_chunks or self.workers * 2
+        self.lock = threading.Lock()
+        self.pool = None
+        self.pool_pid = None
+
+    def analyze(self, items):
+        """
+        Analyse transcripts, yielding one result per input item in order.
+
+        Args:
+            items (iterable): Transcript strings, or dicts with 'conversation'
+                and an optional 'id' that is copied to the result
+
+        Yields:
+            dict: 'index' and 'id', plus 'analysis' or 'error'
+        """
+        items = iter(items)
+        index = 0
+        first = list(islice(items, self.chunk_size))
+        following = list(islice(items, self.chunk_size)) if len(first) == self.chunk_size else []
+
+        if not following:
+            # Small input: not worth a trip to the pool
+            for result in self._results(index, first, analyze_chunk(self._conversations(first))):
+                yield result
+            return
+
+        pool = self._get_pool()
+        pending = deque()
+        chunks = _chunks(items, self.chunk_size, first, following)
+        for chunk in chunks:
+            pending.append((chunk, pool.submit(analyze_chunk, self._conversations(chunk))))
+            if len(pending) < self.max_pending_chunks:
+                continue
+            chunk, future = pending.popleft()
+            for result in self._results(index, chunk, future.result()):
+                yield result
+            index += len(chunk)
+
+        while pending:
+            chunk, future = pending.popleft()
+            for result in self._results(index, chunk, future.result()):
+                yield result
+            index += len(chunk)
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self.lock:
+            if self.pool is not None and self.pool_pid == os.getpid():
+                self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+    def _get_pool(self):
+        with self.lock:
+            # A pool started before a fork belongs to the parent
+            if self.pool is None or self.pool_pid != os.getpid():
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+                self.pool_pid = os.getpid()
+                logger.info(f"Started {self.workers} transcript analysis workers")
+            return self.pool
+
+    @staticmethod
+    def _conversations(chunk):
+        return [(item.get('conversation') if isinstance(item, dict) else item) or '' for item in chunk]
+
+    @staticmethod
+    def _results(start, chunk, outcomes):
+        for offset, (item, (state, value)) in enumerate(zip(chunk, outcomes)):
+            result = {'index': start + offset, 'id': item.get('id') if isinstance(item, dict) else None}
+            result['analysis' if state == 'ok' else 'error'] = value
+            yield result
+
+
+def _pool_context():
+    """
+    Start method for the analysis workers.
+
+    The server process runs task queue, Sheets writer, sweeper and retention
+    threads, and a child forked while one of them holds a lock (a logging
+    handler, sqlite3, an HTTP connection pool) would hang on it. So workers
+    are forked from a separate forkserver process that has imported only this
+    module, with the extraction patterns compiled, and not the application.
+    Where there is no forkserver they are spawned.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def _chunks(items, size, *ready):
+    """Yield the chunks already read, then the rest of `items` in chunks of `size`"""
+    for chunk in ready:
+        if chunk:
+            yield chunk
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,220 @@
+import logging
+import datetime
+import pytz
+from sqlalchemy import func, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from models import db, ConversationLog, CallStatsHourly
+
+logger = logging.getLogger(__name__)
+
+IST = pytz.timezone('Asia/Kolkata')
+
+# Dimensions stats can be grouped and filtered by, and the rollup column behind each
+DIMENSIONS = {
+    'date': CallStatsHourly.stat_date,
+    'hour': CallStatsHourly.stat_hour,
+    'outlet': CallStatsHourly.outlet_name,
+    'modality': CallStatsHourly.modality,
+    'outcome': CallStatsHourly.call_outcome
+}
+
+
+def is_booked(booking_date, booking_time):
+    """Whether a logged call captured a booking, i.e. both a date and a time"""
+    return booking_date not in (None, '', 'NA') and booking_time not in (None, '', 'NA')
+
+
+class CallStats:
+    """
+    Hourly rollups of conversation logs for the ops dashboard.
+
+    Each row of call_stats_hourly counts the calls, and the calls that
+    captured a booking, for one IST hour, outlet, modality and outcome.
+    Rows are incremented in the same transaction as the log insert, so stats
+    queries read a few rollup rows per hour instead of scanning
+    conversation_logs and its transcripts.
+    """
+
+    def record(self, log):
+        """Count a new ConversationLog; call before committing it"""
+        self.add([log])
+
+    def add(self, logs):
+        """
+        Count several new ConversationLogs with one upsert per rollup row.
+
+        Args:
+            logs (list): ConversationLog objects, not yet committed
+        """
+        totals = {}
+        for log in logs:
+            key = self._key(log.call_time or datetime.datetime.utcnow(), log.outlet_name, log.modality,
+                            log.call_outcome)
+            calls, booked = totals.get(key, (0, 0))
+            totals[key] = (calls + 1, booked + is_booked(log.booking_date, log.booking_time))
+
+        if totals:
+            self._increment(totals)
+
+    def query(self, date_from, date_to, group_by=('date',), outlet=None, modality=None, outcome=None):
+        """
+        Sum rollups over a date range.
+
+        Args:
+            date_from (datetime.date): First IST date
+            date_to (datetime.date): Last IST date, inclusive
+            group_by (tuple): Names from DIMENSIONS to break the counts down by
+            outlet (str, optional): Only this outlet
+            modality (str, optional): Only this modality
+            outcome (str, optional): Only this call outcome
+
+        Returns:
+            list: One dict per group with its dimensions, calls, booked and conversion_rate
+        """
+        columns = [DIMENSIONS[name] for name in group_by]
+        query = db.session.query(
+            *columns,
+            func.sum(CallStatsHourly.calls),
+            func.sum(CallStatsHourly.booked)
+        ).filter(
+            CallStatsHourly.stat_date >= date_from,
+            CallStatsHourly.stat_date <= date_to
+        )
+        for name, value in (('outlet', outlet), ('modality', modality), ('outcome', outcome)):
+            if value:
+                query = query.filter(DIMENSIONS[name] == value)
+        if columns:
+            query = query.group_by(*columns).order_by(*columns)
+
+        groups = []
+        for row in query:
+            calls, booked = row[-2] or 0, row[-1] or 0
+            group = {
+                name: value.strftime('%Y-%m-%d') if name == 'date' else value
+                for name, value in zip(group_by, row)
+            }
+            group.update(
+                calls=calls,
+                booked=booked,
+                conversion_rate=round(booked / calls, 4) if calls else None
+            )
+            groups.append(group)
+        return groups
+
+    def rebuild(self, batch_size=10000, since=None):
+        """
+        Recompute rollups from the conversation_logs table.
+
+        Only the columns the rollups need are read, in batches, so transcripts
+        are never loaded. Logs keep being saved while a rebuild reads, so the
+        read stops at the newest log when it started. Once the old rollups
+        are deleted, nothing else can add to them until the commit, and the
+        logs saved since the snapshot are counted again from the table.
+
+        Args:
+            batch_size (int): Rows read at a time
+            since (datetime, optional): Only rebuild from this time (naive UTC,
+                an IST midnight), keeping earlier rollups, e.g. of archived logs
+
+        Returns:
+            int: Number of rollup rows written
+        """
+        snapshot = db.session.query(func.max(ConversationLog.id)).scalar() or 0
+        db.session.commit()
+
+        rows = db.session.query(
+            ConversationLog.call_time,
+            ConversationLog.outlet_name,
+            ConversationLog.modality,
+            ConversationLog.call_outcome,
+            ConversationLog.booking_date,
+            ConversationLog.booking_time
+        )
+        stale = db.session.query(CallStatsHourly)
+        if since is not None:
+            rows = rows.filter(ConversationLog.call_time >= since)
+            stale = stale.filter(CallStatsHourly.stat_date >= self._key(since, None, None, None)[0])
+        totals = self._count(rows.filter(ConversationLog.id <= snapshot).yield_per(batch_size))
+
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # Held until the commit; concurrent increments wait for it (SQLite locks on the delete)
+            db.session.execute(text("LOCK TABLE call_stats_hourly IN EXCLUSIVE MODE"))
+        stale.delete(synchronize_session=False)
+        db.session.bulk_insert_mappings(CallStatsHourly, [
+            dict(zip(('stat_date', 'stat_hour', 'outlet_name', 'modality', 'call_outcome'), key),
+                 calls=calls, booked=booked)
+            for key, (calls, booked) in totals.items()
+        ])
+
+        # Their increments went with the delete
+        later = self._count(rows.filter(ConversationLog.id > snapshot))
+        if later:
+            self._increment(later)
+        db.session.commit()
+
+        return len(totals.keys() | later.keys())
+
+    def ensure_built(self):
+        """Rebuild rollups when logs exist but no rollups do, e.g. after upgrading"""
+        if db.session.query(CallStatsHourly.stat_date).first() is None and \
+                db.session.query(ConversationLog.id).first() is not None:
+            logger.info(f"Built {self.rebuild()} call stats rollups from existing logs")
+
+    def _count(self, rows):
+        """Sum (calls, booked) per rollup key over rows of the rebuild query"""
+        totals = {}
+        for call_time, outlet_name, modality, call_outcome, booking_date, booking_time in rows:
+            key = self._key(call_time, outlet_name, modality, call_outcome)
+            calls, booked = totals.get(key, (0, 0))
+            totals[key] = (calls + 1, booked + is_booked(booking_date, booking_time))
+        return totals
+
+    def _increment(self, totals):
+        """Add (calls, booked) to each keyed rollup row, creating rows as needed"""
+        dialect = db.session.get_bind().dialect.name
+        rows = [
+            {
+                'stat_date': stat_date,
+                'stat_hour': stat_hour,
+                'outlet_name': outlet_name,
+                'modality': modality,
+                'call_outcome': call_outcome,
+                'calls': calls,
+                'booked': booked
+            }
+            for (stat_date, stat_hour, outlet_name, modality, call_outcome), (calls, booked) in totals.items()
+        ]
+
+        if dialect in ('sqlite', 'postgresql'):
+            insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+            statement = insert(CallStatsHourly)
+            statement = statement.on_conflict_do_update(
+                index_elements=['stat_date', 'stat_hour', 'outlet_name', 'modality', 'call_outcome'],
+                set_={
+                    'calls': CallStatsHourly.calls + statement.excluded.calls,
+                    'booked': CallStatsHourly.booked + statement.excluded.booked
+                }
+            )
+            db.session.execute(statement, rows)
+            return
+
+        for row in rows:
+            keys = {name: value for name, value in row.items() if name not in ('calls', 'booked')}
+            if db.session.get(CallStatsHourly, tuple(keys.values())) is None:
+                try:
+                    with db.session.begin_nested():
+                        db.session.add(CallStatsHourly(**keys, calls=0, booked=0))
+                except IntegrityError:
+                    pass
+            db.session.execute(update(CallStatsHourly).filter_by(**keys).values(
+                calls=CallStatsHourly.calls + row['calls'],
+                booked=CallStatsHourly.booked + row['booked']
+            ))
+
+    @staticmethod
+    def _key(call_time, outlet_name, modality, call_outcome):
+        """Rollup key for a call logged at `call_time` (naive UTC)"""
+        local = pytz.utc.localize(call_time).astimezone(IST)
+        return (local.date(), local.hour, outlet_name or 'NA', modality or 'NA', call_outcome or 'NA')
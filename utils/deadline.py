@@ -0,0 +1,78 @@
+import time
+from flask import request
+from config import Config
+
+# Header carrying the caller's remaining latency budget in milliseconds
+DEADLINE_HEADER = 'X-Request-Deadline-Ms'
+
+
+class Deadline:
+    """
+    Latency budget for one request, passed explicitly to every stage.
+
+    Stages ask how much time is left before doing optional or slow work and
+    record a named degradation when they take a cheaper path instead, so the
+    response can report what was skipped.
+    """
+
+    def __init__(self, budget_ms, expires_at=None):
+        """
+        Initialize the deadline.
+
+        Args:
+            budget_ms (float): Total budget in milliseconds
+            expires_at (float, optional): Absolute time.monotonic() expiry, to share with a parent
+        """
+        self.budget_ms = budget_ms
+        self.expires_at = expires_at if expires_at is not None else time.monotonic() + budget_ms / 1000.0
+        self.degradations = []
+
+    def remaining_ms(self):
+        """Milliseconds left, never negative"""
+        return max(0.0, (self.expires_at - time.monotonic()) * 1000)
+
+    def expired(self):
+        return self.remaining_ms() <= 0
+
+    def has(self, ms):
+        """Whether at least `ms` milliseconds remain"""
+        return self.remaining_ms() >= ms
+
+    def timeout(self, minimum_ms=50):
+        """Remaining time in seconds for I/O timeouts, with a small floor"""
+        return max(self.remaining_ms(), minimum_ms) / 1000.0
+
+    def degrade(self, name):
+        """Record that a stage took a cheaper path to stay within budget"""
+        if name not in self.degradations:
+            self.degradations.append(name)
+
+    def child(self):
+        """A deadline with the same expiry but its own degradation list"""
+        return Deadline(self.budget_ms, expires_at=self.expires_at)
+
+
+def deadline_from_request(endpoint):
+    """
+    Start a deadline for the current request.
+
+    The caller's X-Request-Deadline-Ms header wins; otherwise the per-endpoint
+    default from Config.DEADLINE_DEFAULTS_MS is used. Budgets are capped at
+    Config.DEADLINE_MAX_MS.
+
+    Args:
+        endpoint (str): Key into Config.DEADLINE_DEFAULTS_MS
+
+    Returns:
+        Deadline: Deadline for this request
+    """
+    budget_ms = Config.DEADLINE_DEFAULTS_MS.get(endpoint, Config.DEADLINE_MAX_MS)
+
+    header = request.headers.get(DEADLINE_HEADER)
+    if header:
+        try:
+            budget_ms = float(header)
+        except ValueError:
+            pass
+
+    return Deadline(min(max(budget_ms, 0), Config.DEADLINE_MAX_MS))
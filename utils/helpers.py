@@ -1,4 +1,5 @@
 import re
+import base64
 import json
 import datetime
 import logging
@@ -141,6 +142,16 @@ def validate_phone_number(phone):
         return cleaned[-10:]
     return None
 
+# Patterns used to analyse transcripts, compiled once per process
+PHONE_PATTERN = re.compile(r'(?:\+91|0)?[6-9][0-9]{9}')
+DATE_PATTERN = re.compile(r'\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{4}-\d{2}-\d{2}|\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{2,4}', re.IGNORECASE)
+TIME_PATTERN = re.compile(r'\d{1,2}:\d{2}(?::\d{2})?\s*(?:am|pm)?|\d{1,2}\s*(?:am|pm)', re.IGNORECASE)
+GUESTS_PATTERN = re.compile(r'(\d+)\s+(?:guest|people|person|adult|customer)', re.IGNORECASE)
+NAME_PATTERN = re.compile(r'(?:my name is|this is|I am|I\'m)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,2})')
+BOOKING_PATTERN = re.compile(r'book|reserve|table|reservation', re.IGNORECASE)
+CHANGE_PATTERN = re.compile(r'modify|change|update|cancel|reschedule', re.IGNORECASE)
+ENQUIRY_PATTERN = re.compile(r'question|faq|ask|tell me|how|what|when|where|why', re.IGNORECASE)
+
 def extract_entities_from_text(text, entity_types):
     """
     Extract entities from text using simple regex patterns.
@@ -156,34 +167,34 @@ def extract_entities_from_text(text, entity_types):
     
     if 'phone' in entity_types:
         # Match phone numbers (with or without country code)
-        phone_matches = re.findall(r'(?:\+91|0)?[6-9][0-9]{9}', text)
-        if phone_matches:
-            entities['phone'] = validate_phone_number(phone_matches[0])
+        phone_match = PHONE_PATTERN.search(text)
+        if phone_match:
+            entities['phone'] = validate_phone_number(phone_match.group(0))
     
     if 'date' in entity_types:
         # Match date patterns
-        date_matches = re.findall(r'\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{4}-\d{2}-\d{2}|\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{2,4}', text, re.IGNORECASE)
-        if date_matches:
-            entities['date'] = format_date(date_matches[0])
+        date_match = DATE_PATTERN.search(text)
+        if date_match:
+            entities['date'] = format_date(date_match.group(0))
     
     if 'time' in entity_types:
         # Match time patterns
-        time_matches = re.findall(r'\d{1,2}:\d{2}(?::\d{2})?\s*(?:am|pm)?|\d{1,2}\s*(?:am|pm)', text, re.IGNORECASE)
-        if time_matches:
-            entities['time'] = format_time(time_matches[0])
+        time_match = TIME_PATTERN.search(text)
+        if time_match:
+            entities['time'] = format_time(time_match.group(0))
     
     if 'guests' in entity_types:
         # Match number of guests
-        guest_matches = re.findall(r'(\d+)\s+(?:guest|people|person|adult|customer)', text, re.IGNORECASE)
-        if guest_matches:
-            entities['guests'] = int(guest_matches[0])
+        guest_match = GUESTS_PATTERN.search(text)
+        if guest_match:
+            entities['guests'] = int(guest_match.group(1))
     
     if 'name' in entity_types:
         # This is more complex, might need more sophisticated NLP
         # For now, look for common name patterns
-        name_matches = re.findall(r'(?:my name is|this is|I am|I\'m)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,2})', text)
-        if name_matches:
-            entities['name'] = name_matches[0]
+        name_match = NAME_PATTERN.search(text)
+        if name_match:
+            entities['name'] = name_match.group(1)
     
     return entities
 
@@ -198,29 +209,33 @@ def classify_call_outcome(conversation):
         str: Classified outcome
     """
     # Simple keyword-based classification
-    if re.search(r'book|reserve|table|reservation', conversation, re.IGNORECASE):
-        if re.search(r'modify|change|update|cancel|reschedule', conversation, re.IGNORECASE):
+    if BOOKING_PATTERN.search(conversation):
+        if CHANGE_PATTERN.search(conversation):
             return "Post-Booking"
         return "Availability"
-    elif re.search(r'question|faq|ask|tell me|how|what|when|where|why', conversation, re.IGNORECASE):
+    elif ENQUIRY_PATTERN.search(conversation):
         return "Enquiry"
     else:
         return "Misc"
 
-def generate_call_summary(conversation):
+def generate_call_summary(conversation, outcome=None, entities=None):
     """
     Generate a summary of the call using simple text analysis.
     This would ideally use an AI model, but we're using a simple approach here.
     
     Args:
         conversation (str): Full conversation text
+        outcome (str, optional): Outcome already classified for this conversation
+        entities (dict, optional): Entities already extracted from it
         
     Returns:
         str: Generated summary
     """
     # Extract key information to include in summary
-    outcome = classify_call_outcome(conversation)
-    entities = extract_entities_from_text(conversation, ['date', 'time', 'guests', 'name', 'phone'])
+    if outcome is None:
+        outcome = classify_call_outcome(conversation)
+    if entities is None:
+        entities = extract_entities_from_text(conversation, ['date', 'time', 'guests', 'name', 'phone'])
     
     # Create summary based on outcome type
     if outcome == "Availability":
@@ -246,3 +261,72 @@ def generate_call_summary(conversation):
     else:
         return "The customer contacted for miscellaneous reasons. " + \
                "The conversation did not result in a specific booking or enquiry resolution."
+
+def analyze_transcript(conversation):
+    """
+    Classify a conversation, extract its entities and summarise it in one pass.
+    
+    Args:
+        conversation (str): Full conversation text
+        
+    Returns:
+        dict: Outcome, booking details, customer name, phone number and summary
+    """
+    outcome = classify_call_outcome(conversation)
+    entities = extract_entities_from_text(conversation, ['date', 'time', 'guests', 'name', 'phone'])
+    
+    return {
+        "call_outcome": outcome,
+        "booking_date": entities.get('date', 'NA'),
+        "booking_time": entities.get('time', 'NA'),
+        "customer_name": entities.get('name', 'NA'),
+        "guests": entities.get('guests', 'NA'),
+        "phone_number": entities.get('phone'),
+        "call_summary": generate_call_summary(conversation, outcome, entities)
+    }
+
+def format_sse_event(event, data):
+    """
+    Format a Server-Sent Events message.
+    
+    Args:
+        event (str): Event name
+        data (dict): JSON-serialisable payload
+        
+    Returns:
+        str: Encoded SSE message terminated by a blank line
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def encode_cursor(values):
+    """
+    Encode keyset pagination values as an opaque cursor.
+    
+    Args:
+        values (list): JSON-serialisable sort key of the last row returned
+        
+    Returns:
+        str: URL-safe cursor
+    """
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor.
+    
+    Args:
+        cursor (str): URL-safe cursor
+        
+    Returns:
+        list: Sort key values
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
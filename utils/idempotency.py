@@ -0,0 +1,314 @@
+import json
+import time
+import hashlib
+import logging
+import datetime
+from functools import wraps
+from flask import make_response, request
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from models import db, IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of IdempotencyStore.begin
+PROCEED = 'proceed'
+REPLAY = 'replay'
+IN_PROGRESS = 'in_progress'
+MISMATCH = 'mismatch'
+
+
+def make_idempotency_key(*parts):
+    """
+    Build a fixed-length idempotency key from arbitrary parts.
+
+    Args:
+        *parts: Strings or JSON-serialisable values (dicts are hashed canonically)
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Bounded, TTL-limited store of request outcomes kept in the database so
+    every gunicorn worker sees the same records.
+
+    A request first claims its key with a 'pending' row. The primary key makes
+    the claim atomic, so concurrent retries of the same request cannot both
+    proceed. When the work finishes the response is saved and later replays
+    get it back without redoing anything. A key can carry a fingerprint of
+    the request it was first used for, so the same key sent with a different
+    request is refused rather than answered with the first response.
+    """
+
+    def __init__(self, ttl_seconds=86400, max_entries=50000, wait_seconds=5.0,
+                 pending_timeout_seconds=30, prune_every=200):
+        """
+        Initialize the store.
+
+        Args:
+            ttl_seconds (int): How long a completed response can be replayed
+            max_entries (int): Upper bound on stored records; oldest are pruned first
+            wait_seconds (float): How long a duplicate waits for an in-flight original
+            pending_timeout_seconds (int): Age after which a pending claim is considered abandoned
+            prune_every (int): Prune expired and excess records after this many writes
+        """
+        self.ttl = datetime.timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+        self.wait_seconds = wait_seconds
+        self.pending_timeout = datetime.timedelta(seconds=pending_timeout_seconds)
+        self.prune_every = prune_every
+        self.writes = 0
+
+    def begin(self, key, fingerprint=None):
+        """
+        Claim a key before doing the work it protects.
+
+        Args:
+            key (str): Idempotency key
+            fingerprint (str, optional): Digest of the request; a key already
+                claimed with a different one gives MISMATCH
+
+        Returns:
+            tuple: (outcome, record) where outcome is PROCEED, REPLAY, IN_PROGRESS
+                   or MISMATCH and record is the completed IdempotencyRecord for REPLAY
+        """
+        deadline = time.monotonic() + self.wait_seconds
+
+        while True:
+            now = datetime.datetime.utcnow()
+            try:
+                db.session.execute(insert(IdempotencyRecord).values(
+                    key=key, status='pending', fingerprint=fingerprint, created_at=now, expires_at=now + self.ttl
+                ))
+                db.session.commit()
+                return PROCEED, None
+            except IntegrityError:
+                db.session.rollback()
+
+            record = db.session.get(IdempotencyRecord, key)
+            if record is None:
+                # Deleted between our insert and read; try to claim again
+                continue
+
+            if record.expires_at <= now:
+                IdempotencyRecord.query.filter_by(key=key, expires_at=record.expires_at).delete()
+                db.session.commit()
+                continue
+
+            if fingerprint and record.fingerprint and record.fingerprint != fingerprint:
+                db.session.rollback()
+                return MISMATCH, None
+
+            if record.status == 'complete':
+                return REPLAY, record
+
+            # Take over a claim whose owner has evidently died
+            if record.created_at <= now - self.pending_timeout:
+                taken = IdempotencyRecord.query.filter_by(
+                    key=key, status='pending', created_at=record.created_at
+                ).update({'created_at': now, 'expires_at': now + self.ttl, 'fingerprint': fingerprint})
+                db.session.commit()
+                if taken:
+                    return PROCEED, None
+                continue
+
+            if time.monotonic() >= deadline:
+                return IN_PROGRESS, None
+
+            # The original request is still running; wait for its result
+            db.session.rollback()
+            time.sleep(0.05)
+
+    def complete(self, key, response_body, status_code):
+        """
+        Save the response for a claimed key.
+
+        Args:
+            key (str): Idempotency key
+            response_body (str): Serialised response body
+            status_code (int): HTTP status code
+        """
+        IdempotencyRecord.query.filter_by(key=key).update({
+            'status': 'complete',
+            'response_body': response_body,
+            'status_code': status_code
+        })
+        db.session.commit()
+        self._maybe_prune()
+
+    def abandon(self, key):
+        """Release a claimed key so the request can be retried from scratch"""
+        try:
+            IdempotencyRecord.query.filter_by(key=key, status='pending').delete()
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error releasing idempotency key: {str(e)}")
+            db.session.rollback()
+
+    def prune(self):
+        """
+        Delete expired records and enforce the entry bound.
+
+        Returns:
+            int: Number of records deleted
+        """
+        deleted = IdempotencyRecord.query.filter(
+            IdempotencyRecord.expires_at <= datetime.datetime.utcnow()
+        ).delete(synchronize_session=False)
+
+        # Find the creation time of the oldest record still within the bound
+        cutoff = db.session.query(IdempotencyRecord.created_at).order_by(
+            IdempotencyRecord.created_at.desc()
+        ).offset(self.max_entries).limit(1).scalar()
+        if cutoff is not None:
+            deleted += IdempotencyRecord.query.filter(
+                IdempotencyRecord.created_at <= cutoff,
+                IdempotencyRecord.status == 'complete'
+            ).delete(synchronize_session=False)
+
+        db.session.commit()
+        return deleted
+
+    def _maybe_prune(self):
+        self.writes += 1
+        if self.writes % self.prune_every:
+            return
+        try:
+            deleted = self.prune()
+            if deleted:
+                logger.info(f"Pruned {deleted} idempotency records")
+        except Exception as e:
+            logger.error(f"Error pruning idempotency records: {str(e)}")
+            db.session.rollback()
+
+
+def run_once(store, key, func, should_store, fingerprint=None):
+    """
+    Run a function at most once per idempotency key, outside of a Flask view.
+
+    Args:
+        store (IdempotencyStore): Store shared by all workers
+        key (str): Idempotency key, or None to always run
+        func (callable): Returns (payload dict, status code)
+        should_store (callable): Given (payload, status code), decides whether the result is final
+        fingerprint (str, optional): Digest of the work requested; the same key
+            reused with a different one gets a 422 instead of the first result
+
+    Returns:
+        tuple: (payload dict, status code, replayed flag)
+    """
+    if not key:
+        payload, status_code = func()
+        return payload, status_code, False
+
+    outcome, record = store.begin(key, fingerprint)
+
+    if outcome == MISMATCH:
+        return {
+            "status": "error",
+            "message": "This idempotency key was already used for a different request."
+        }, 422, False
+
+    if outcome == REPLAY:
+        logger.info(f"Replaying stored response for idempotency key {key[:12]}")
+        return json.loads(record.response_body), record.status_code, True
+
+    if outcome == IN_PROGRESS:
+        return {
+            "status": "error",
+            "message": "An identical request is still being processed. Please retry shortly."
+        }, 409, False
+
+    try:
+        payload, status_code = func()
+    except Exception:
+        store.abandon(key)
+        raise
+
+    try:
+        if should_store(payload, status_code):
+            store.complete(key, json.dumps(payload), status_code)
+        else:
+            store.abandon(key)
+    except Exception as e:
+        logger.error(f"Error saving idempotent response: {str(e)}")
+        db.session.rollback()
+
+    return payload, status_code, False
+
+
+def idempotent(store, key_func, should_store=None):
+    """
+    Decorator making a Flask view replay its first response for repeated keys.
+
+    The request body is fingerprinted, and a key reused with a different
+    body gets a 422 instead of the first response.
+
+    Args:
+        store (IdempotencyStore): Store shared by all workers
+        key_func (callable): Returns the idempotency key for the current request, or None to skip
+        should_store (callable, optional): Given the response, decides whether it is final.
+            Responses that are not stored release the key so a retry does the work again.
+            Defaults to storing successful (2xx) responses only, so a request
+            that was refused can be corrected and sent again with its key.
+    """
+    if should_store is None:
+        should_store = lambda response: 200 <= response.status_code < 300
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = key_func()
+            if not key:
+                return view(*args, **kwargs)
+
+            body = request.get_json(silent=True) if request.is_json else request.get_data(as_text=True)
+            outcome, record = store.begin(key, make_idempotency_key(body))
+
+            if outcome == MISMATCH:
+                response = make_response(json.dumps({
+                    "status": "error",
+                    "message": "This idempotency key was already used for a different request."
+                }), 422)
+                response.mimetype = 'application/json'
+                return response
+
+            if outcome == REPLAY:
+                logger.info(f"Replaying stored response for idempotency key {key[:12]}")
+                response = make_response(record.response_body, record.status_code)
+                response.mimetype = 'application/json'
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            if outcome == IN_PROGRESS:
+                response = make_response(json.dumps({
+                    "status": "error",
+                    "message": "An identical request is still being processed. Please retry shortly."
+                }), 409)
+                response.mimetype = 'application/json'
+                response.headers['Retry-After'] = '1'
+                return response
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                store.abandon(key)
+                raise
+
+            try:
+                if should_store(response):
+                    store.complete(key, response.get_data(as_text=True), response.status_code)
+                else:
+                    store.abandon(key)
+            except Exception as e:
+                logger.error(f"Error saving idempotent response: {str(e)}")
+                db.session.rollback()
+
+            return response
+        return wrapper
+    return decorator
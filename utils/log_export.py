@@ -0,0 +1,56 @@
+import io
+import csv
+import json
+import zlib
+
+# Encoded output is collected into chunks of about this size before it is yielded
+CHUNK_BYTES = 65536
+
+
+def export_logs(records, fields, fmt='csv', compress=False, level=6):
+    """
+    Encode conversation logs as CSV or NDJSON, a chunk at a time.
+
+    Only the current chunk and the compressor state are held in memory, so
+    an export of any size streams straight from the query to the caller.
+
+    Args:
+        records: Logs as dicts, e.g. from LogRetention.iter_logs()
+        fields (list): Names from LOG_FIELDS, in column order
+        fmt (str): 'csv' or 'ndjson'
+        compress (bool): Gzip the output as it is produced
+        level (int): Gzip compression level
+
+    Yields:
+        bytes: Encoded, and optionally gzipped, output in chunks
+    """
+    # wbits 31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(fields)
+
+    def flush():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    for record in records:
+        if fmt == 'csv':
+            writer.writerow([record[field] for field in fields])
+        else:
+            buffer.write(json.dumps(record) + "\n")
+
+        if buffer.tell() > CHUNK_BYTES:
+            chunk = flush()
+            # The compressor holds data back until it has a block to emit
+            if chunk:
+                yield chunk
+
+    chunk = flush()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
@@ -0,0 +1,542 @@
+import os
+import gzip
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+import pytz
+from sqlalchemy import func, text, tuple_
+from sqlalchemy.orm import undefer
+from models import db, ConversationLog, LogArchive
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+IST = pytz.timezone('Asia/Kolkata')
+
+
+def month_of(call_time):
+    """IST month, as YYYY-MM, of a call logged at `call_time` (naive UTC)"""
+    return pytz.utc.localize(call_time).astimezone(IST).strftime('%Y-%m')
+
+
+def month_bounds(month):
+    """
+    Start and end of an IST month.
+
+    Args:
+        month (str): YYYY-MM
+
+    Returns:
+        tuple: (start, end) as naive UTC datetimes; the end is the next month's start
+    """
+    start = datetime.strptime(month, '%Y-%m')
+    end = (start + timedelta(days=32)).replace(day=1)
+    return tuple(IST.localize(local).astimezone(pytz.utc).replace(tzinfo=None) for local in (start, end))
+
+
+def next_month(month):
+    """The IST month after `month`"""
+    return ((datetime.strptime(month, '%Y-%m') + timedelta(days=32)).replace(day=1)).strftime('%Y-%m')
+
+
+# Fields of an archived or exported log: column and formatter for the value
+LOG_FIELDS = {
+    'id': (ConversationLog.id, None),
+    'modality': (ConversationLog.modality, None),
+    'call_time': (ConversationLog.call_time, lambda value: value.strftime('%Y-%m-%d %H:%M:%S')),
+    'phone_number': (ConversationLog.phone_number, None),
+    'call_outcome': (ConversationLog.call_outcome, None),
+    'outlet_name': (ConversationLog.outlet_name, None),
+    'booking_date': (ConversationLog.booking_date, None),
+    'booking_time': (ConversationLog.booking_time, None),
+    'guests': (ConversationLog.guests, None),
+    'call_summary': (ConversationLog.call_summary, None),
+    'conversation_text': (ConversationLog.conversation_text, None)
+}
+
+
+def log_record(log):
+    """A conversation log as stored in an archive: to_dict() plus the transcript"""
+    record = log.to_dict()
+    record['conversation_text'] = log.conversation_text
+    return record
+
+
+def format_log_row(row, fields):
+    """
+    Turn a query row into a log record.
+
+    Args:
+        row: Row whose values are the columns for `fields`, in order
+        fields (list): Names from LOG_FIELDS
+
+    Returns:
+        dict: Log with the given fields, formatted as by log_record()
+    """
+    record = {}
+    for index, field in enumerate(fields):
+        value = row[index]
+        formatter = LOG_FIELDS[field][1]
+        record[field] = formatter(value) if formatter and value is not None else value
+    return record
+
+
+def read_archive(path):
+    """
+    Stream the logs of one archive file.
+
+    Yields:
+        dict: Log as written by log_record()
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        for line in archive:
+            yield json.loads(line)
+
+
+def partition_name(month):
+    """Postgres partition holding an IST month of conversation logs"""
+    return 'conversation_logs_p' + month.replace('-', '_')
+
+
+class LogRetention:
+    """
+    Moves old conversation logs out of the database, a month at a time.
+
+    Logs are grouped by the IST month of their call. Once a month is entirely
+    older than `retention_days`, its logs are written to a gzipped NDJSON file
+    in `archive_dir`, the file is recorded in the log_archives table, and the
+    logs are removed from conversation_logs and the search index, which is
+    then compacted. The hourly call stats are kept, so stats still cover
+    archived months.
+
+    On Postgres conversation_logs is partitioned by month (see migrations), so
+    removing a month drops its partition, and partitions for coming months
+    are created ahead of time. Elsewhere the month's rows are deleted in
+    batches with pauses between them. SQLite reuses the freed pages for new
+    logs, so the database file stops growing once the oldest month starts
+    leaving as each new one arrives.
+
+    A month's logs are archived up to the highest log ID present when the
+    file was written. Logs for that month saved later, such as replayed old
+    calls, go into another file on the next run. One process per host
+    archives at a time, so schedule it on one host only.
+
+    iter_logs() reads logs back, from the archives as well when asked.
+    """
+
+    def __init__(self, log_search, archive_dir='archive', retention_days=0, batch_size=2000,
+                 pause_seconds=0.05, interval_seconds=86400, months_ahead=2):
+        """
+        Initialize retention.
+
+        Args:
+            log_search (LogSearch): Search index to remove archived logs from
+            archive_dir (str): Directory for archive files
+            retention_days (int): Archive months older than this; 0 keeps everything
+            batch_size (int): Logs deleted per transaction
+            pause_seconds (float): Shortest sleep between delete batches
+            interval_seconds (int): Time between scheduled runs
+            months_ahead (int): Postgres partitions created ahead of the current month
+        """
+        self.log_search = log_search
+        self.archive_dir = archive_dir
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.interval_seconds = interval_seconds
+        self.months_ahead = months_ahead
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.last_run = None
+        self.runs = 0
+        self.archived = 0
+        self.errors = 0
+
+    def partitioned(self):
+        """Whether conversation_logs is a partitioned Postgres table"""
+        if db.engine.dialect.name != 'postgresql':
+            return False
+        return db.session.execute(text(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('conversation_logs')"
+        )).first() is not None
+
+    def ensure_partitions(self, now=None):
+        """
+        Create Postgres partitions for the current month and `months_ahead` after it.
+
+        Returns:
+            list: Partitions created
+        """
+        if not self.partitioned():
+            return []
+
+        created = []
+        month = month_of(now or datetime.utcnow())
+        for _ in range(self.months_ahead + 1):
+            name = partition_name(month)
+            if db.session.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar() is None:
+                start, end = month_bounds(month)
+                try:
+                    db.session.execute(text(
+                        f"CREATE TABLE {name} PARTITION OF conversation_logs "
+                        f"FOR VALUES FROM ('{start:%Y-%m-%d %H:%M:%S}') TO ('{end:%Y-%m-%d %H:%M:%S}')"
+                    ))
+                    db.session.commit()
+                    created.append(name)
+                except Exception as e:
+                    # E.g. the default partition already holds logs for this month
+                    db.session.rollback()
+                    logger.error(f"Error creating partition {name}: {str(e)}")
+            month = next_month(month)
+        if created:
+            logger.info(f"Created conversation log partitions {', '.join(created)}")
+        return created
+
+    def due_months(self, now=None, retention_days=None):
+        """
+        IST months whose logs are all older than the retention period, oldest first.
+
+        Args:
+            now (datetime, optional): Current time (naive UTC)
+            retention_days (int, optional): Overrides the configured period
+
+        Returns:
+            list: Months, as YYYY-MM, that still have logs in the database
+        """
+        retention_days = self.retention_days if retention_days is None else retention_days
+        if not retention_days:
+            return []
+        cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+        oldest = db.session.query(func.min(ConversationLog.call_time)).scalar()
+        db.session.commit()
+        if oldest is None:
+            return []
+
+        months = []
+        month = month_of(oldest)
+        while month_bounds(month)[1] <= cutoff:
+            start, end = month_bounds(month)
+            if db.session.query(ConversationLog.id).filter(
+                ConversationLog.call_time >= start, ConversationLog.call_time < end
+            ).first() is not None:
+                months.append(month)
+            month = next_month(month)
+        db.session.commit()
+        return months
+
+    def run(self, now=None, retention_days=None):
+        """
+        Archive every month past the retention period.
+
+        Args:
+            now (datetime, optional): Current time (naive UTC)
+            retention_days (int, optional): Overrides the configured period
+
+        Returns:
+            dict: Months archived with their log counts, duration and any error,
+                or None if another run holds the lock
+        """
+        lock_file = self._acquire()
+        if lock_file is None:
+            logger.info("Log retention already running; skipping")
+            return None
+
+        started = time.perf_counter()
+        run = {
+            'started_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+            'archived': {},
+            'duration_ms': None,
+            'error': None
+        }
+        try:
+            self.ensure_partitions(now)
+            for month in self.due_months(now, retention_days):
+                if self.stopped.is_set():
+                    break
+                run['archived'][month] = self.archive_month(month)
+                self.archived += run['archived'][month]
+            if run['archived']:
+                self.log_search.compact(pause_seconds=self.pause_seconds)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error archiving conversation logs: {str(e)}")
+            run['error'] = str(e)
+            self.errors += 1
+        finally:
+            run['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            self.last_run = run
+            self.runs += 1
+            self._release(lock_file)
+
+        if run['archived']:
+            logger.info(f"Archived conversation logs {run['archived']} in {run['duration_ms']}ms")
+        return run
+
+    def archive_month(self, month):
+        """
+        Archive one IST month's logs and remove them from the database.
+
+        Returns:
+            int: Logs archived by this call
+        """
+        start, end = month_bounds(month)
+        in_month = (ConversationLog.call_time >= start, ConversationLog.call_time < end)
+
+        # Finish removing logs an earlier run archived but did not get to delete
+        archived_up_to = db.session.query(func.max(LogArchive.max_log_id)).filter(LogArchive.month == month).scalar() or 0
+        self._delete(in_month, archived_up_to)
+
+        max_log_id = db.session.query(func.max(ConversationLog.id)).scalar() or 0
+        db.session.commit()
+        rows, path, size = self._write(month, in_month, archived_up_to, max_log_id)
+        if rows:
+            db.session.add(LogArchive(month=month, path=path, rows=rows, bytes=size, max_log_id=max_log_id))
+            db.session.commit()
+
+        if not self._drop_partition(month, max_log_id):
+            self._delete(in_month, max_log_id)
+        return rows
+
+    def archived_until(self):
+        """Start of the first month not archived (naive UTC), or None if nothing is archived"""
+        month = db.session.query(func.max(LogArchive.month)).scalar()
+        db.session.commit()
+        return month_bounds(month)[1] if month else None
+
+    def archives(self):
+        """Archive files, oldest month first"""
+        archives = [archive.to_dict() for archive in LogArchive.query.order_by(LogArchive.month, LogArchive.id)]
+        db.session.commit()
+        return archives
+
+    def iter_logs(self, call_time_from=None, call_time_to=None, outlet=None, outcome=None,
+                  include_archived=False, fields=None, batch_size=1000):
+        """
+        Read logs from the database and, if asked, from the archives.
+
+        Archived months come first, in the order their logs were saved, then
+        logs still in the database by call time. The filters are applied in
+        SQL, and only the columns for `fields` are read, so transcripts are
+        not decompressed unless asked for. On Postgres the database is read
+        through a server-side cursor `batch_size` rows at a time; elsewhere in
+        keyset batches of `batch_size`. Archives are read a line at a time, so
+        memory use stays flat however many logs there are.
+
+        Args:
+            call_time_from (datetime, optional): Earliest call time (naive UTC)
+            call_time_to (datetime, optional): Calls before this time (naive UTC)
+            outlet (str, optional): Only this outlet
+            outcome (str, optional): Only this call outcome
+            include_archived (bool): Also read archived months in the range
+            fields (list, optional): Names from LOG_FIELDS; all of them by default
+            batch_size (int): Database rows fetched at a time
+
+        Yields:
+            dict: Log with the given fields, as returned by format_log_row()
+        """
+        fields = list(fields or LOG_FIELDS)
+
+        if include_archived:
+            archives = LogArchive.query.order_by(LogArchive.month, LogArchive.id)
+            if call_time_from is not None:
+                archives = archives.filter(LogArchive.month >= month_of(call_time_from))
+            if call_time_to is not None:
+                archives = archives.filter(LogArchive.month <= month_of(call_time_to))
+            paths = [archive.path for archive in archives]
+            db.session.commit()
+
+            low = call_time_from.strftime('%Y-%m-%d %H:%M:%S') if call_time_from else None
+            high = call_time_to.strftime('%Y-%m-%d %H:%M:%S') if call_time_to else None
+            for path in paths:
+                for record in read_archive(path):
+                    if (low and record['call_time'] < low) or (high and record['call_time'] >= high) or \
+                            (outlet and record['outlet_name'] != outlet) or \
+                            (outcome and record['call_outcome'] != outcome):
+                        continue
+                    yield {field: record.get(field) for field in fields}
+
+        # Each row leads with its sort key, (call_time, id), which the call_time index covers
+        key = (ConversationLog.call_time, ConversationLog.id)
+        query = db.session.query(*key, *[LOG_FIELDS[field][0] for field in fields])
+        if call_time_from is not None:
+            query = query.filter(ConversationLog.call_time >= call_time_from)
+        if call_time_to is not None:
+            query = query.filter(ConversationLog.call_time < call_time_to)
+        if outlet:
+            query = query.filter(ConversationLog.outlet_name == outlet)
+        if outcome:
+            query = query.filter(ConversationLog.call_outcome == outcome)
+        query = query.order_by(*key)
+
+        if db.engine.dialect.name == 'postgresql':
+            # One server-side cursor; readers do not hold up logs being saved meanwhile
+            for row in query.execution_options(yield_per=batch_size):
+                yield format_log_row(row[2:], fields)
+            db.session.commit()
+            return
+
+        # SQLite makes writers wait for open reads, so each batch is its own short transaction
+        after = None
+        while True:
+            page = query if after is None else query.filter(tuple_(*key) > after)
+            rows = page.limit(batch_size).all()
+            db.session.commit()
+            for row in rows:
+                yield format_log_row(row[2:], fields)
+            if len(rows) < batch_size:
+                return
+            after = tuple(rows[-1][:2])
+
+    def start(self, app):
+        """
+        Run retention every `interval_seconds` on a daemon thread.
+
+        Args:
+            app (Flask): Application whose context the runs happen in
+        """
+        if self.thread is not None:
+            return
+
+        def run():
+            while not self.stopped.wait(self.interval_seconds):
+                with app.app_context():
+                    self.run()
+
+        self.thread = threading.Thread(target=run, name='log-retention', daemon=True)
+        self.thread.start()
+        logger.info(f"Log retention scheduled every {self.interval_seconds}s, keeping {self.retention_days} days")
+
+    def stop(self):
+        """Stop the scheduled thread after the month being archived"""
+        self.stopped.set()
+
+    def stats(self):
+        """Schedule, the last run, and totals for this process"""
+        return {
+            'retention_days': self.retention_days,
+            'scheduled': self.thread is not None and self.thread.is_alive(),
+            'interval_seconds': self.interval_seconds,
+            'last_run': self.last_run,
+            'runs': self.runs,
+            'archived': self.archived,
+            'errors': self.errors
+        }
+
+    def _write(self, month, in_month, after_id, max_log_id):
+        """Write a month's logs with IDs in (after_id, max_log_id] to a new archive file"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        part = LogArchive.query.filter(LogArchive.month == month).count()
+        path = os.path.join(self.archive_dir, f"conversation_logs-{month}" + (f".{part}" if part else "") + ".ndjson.gz")
+
+        rows = 0
+        with open(path + '.tmp', 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as archive:
+            for record in self._month_records(in_month, after_id, max_log_id):
+                archive.write(json.dumps(record) + "\n")
+                rows += 1
+            archive.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+
+        if not rows:
+            os.remove(path + '.tmp')
+            return 0, None, 0
+        os.rename(path + '.tmp', path)
+        return rows, path, os.path.getsize(path)
+
+    def _month_records(self, in_month, after_id, max_log_id):
+        """Read a month's logs with IDs in (after_id, max_log_id] as archive records, in ID order"""
+        query = ConversationLog.query.options(undefer(ConversationLog.conversation_text)).filter(
+            *in_month, ConversationLog.id <= max_log_id
+        ).order_by(ConversationLog.id)
+
+        if db.engine.dialect.name == 'postgresql':
+            # One server-side cursor; calls keep being logged while the month is written
+            for log in query.filter(ConversationLog.id > after_id).yield_per(self.batch_size):
+                yield log_record(log)
+            db.session.commit()
+            return
+
+        # SQLite makes writers wait for open reads, so each batch is its own short transaction.
+        # Records are built before the commit, which expires the logs read.
+        while True:
+            logs = query.filter(ConversationLog.id > after_id).limit(self.batch_size).all()
+            records = [log_record(log) for log in logs]
+            db.session.commit()
+            yield from records
+            if len(records) < self.batch_size:
+                return
+            after_id = records[-1]['id']
+
+    def _drop_partition(self, month, max_log_id):
+        """Drop a month's Postgres partition if every log in it is archived; returns whether it did"""
+        if not self.partitioned():
+            return False
+        name = partition_name(month)
+        if db.session.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar() is None:
+            db.session.commit()
+            return False
+
+        try:
+            db.session.execute(text(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE"))
+            if db.session.execute(text(f"SELECT 1 FROM {name} WHERE id > :max_log_id LIMIT 1"),
+                                  {'max_log_id': max_log_id}).first() is not None:
+                # Logs saved while the file was written; they are archived next run
+                db.session.rollback()
+                return False
+            db.session.execute(text(
+                f"DELETE FROM conversation_log_search WHERE log_id IN (SELECT id FROM {name})"
+            ))
+            db.session.execute(text(f"DROP TABLE {name}"))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        logger.info(f"Dropped partition {name}")
+        return True
+
+    def _delete(self, in_month, max_log_id):
+        """Delete a month's logs with IDs up to `max_log_id` in batches, with their search entries"""
+        while not self.stopped.is_set():
+            batch_started = time.perf_counter()
+            rows = db.session.query(ConversationLog.id, ConversationLog.conversation_text).filter(
+                *in_month, ConversationLog.id <= max_log_id
+            ).order_by(ConversationLog.id).limit(self.batch_size).all()
+            if not rows:
+                db.session.commit()
+                return
+
+            self.log_search.remove([(row.id, row.conversation_text) for row in rows])
+            db.session.query(ConversationLog).filter(
+                ConversationLog.id.in_([row.id for row in rows])
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            if len(rows) < self.batch_size:
+                return
+            # Yield at least as long as the batch held the database
+            time.sleep(max(self.pause_seconds, time.perf_counter() - batch_started))
+
+    def _acquire(self):
+        """Take this process's and the host's archiving locks; returns the lock file, or None if busy"""
+        if not self.lock.acquire(blocking=False):
+            return None
+        os.makedirs(self.archive_dir, exist_ok=True)
+        lock_file = open(os.path.join(self.archive_dir, '.lock'), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                self.lock.release()
+                return None
+        return lock_file
+
+    def _release(self, lock_file):
+        lock_file.close()
+        self.lock.release()
@@ -0,0 +1,365 @@
+import re
+import html
+import time
+import logging
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import undefer
+from models import db, ConversationLog
+
+logger = logging.getLogger(__name__)
+
+# Quoted phrases and bare words (a trailing * asks for a prefix match) in a search query
+QUERY_TERMS = re.compile(r'"([^"]*)"|(\S+)')
+WORDS = re.compile(r'\w+')
+
+
+class SearchUnavailableError(Exception):
+    """Raised when the database has no full-text search support"""
+
+
+def fts5_query(query):
+    """
+    Turn a user's search into an FTS5 query.
+
+    Every word and quoted phrase becomes a quoted FTS5 phrase, so operators
+    and punctuation in the input are searched for rather than interpreted.
+    All of them must match.
+
+    Args:
+        query (str): Words, "quoted phrases" and prefix* words
+
+    Returns:
+        str: FTS5 MATCH expression, empty if the query has no terms
+    """
+    phrases = []
+    for phrase, word in QUERY_TERMS.findall(query or ''):
+        prefix = bool(word) and word.endswith('*')
+        value = phrase or word.rstrip('*')
+        if WORDS.search(value):
+            phrases.append('"' + value.replace('"', '""') + '"' + ('*' if prefix else ''))
+    return ' '.join(phrases)
+
+
+def snippet(conversation, query, chars=160, mark=('<mark>', '</mark>')):
+    """
+    Cut the part of a transcript around the first search match.
+
+    The snippet is HTML-escaped and each matched word is wrapped in `mark`.
+    Words match if they start with a search term, which also covers prefix
+    searches and longer forms such as 'cancelled' for 'cancel'.
+
+    Args:
+        conversation (str): Transcript
+        query (str): Search as given by the user
+        chars (int): Approximate snippet length
+
+    Returns:
+        str: Snippet, with '…' where the transcript was cut
+    """
+    conversation = conversation or ''
+    terms = sorted({word.lower() for word in WORDS.findall(query or '')}, key=len, reverse=True)
+    if not terms:
+        return html.escape(conversation[:chars])
+    pattern = re.compile(r'\b(?:' + '|'.join(re.escape(term) for term in terms) + r')\w*', re.IGNORECASE)
+
+    first = pattern.search(conversation)
+    start = max(0, first.start() - chars // 3) if first else 0
+    end = min(len(conversation), start + chars)
+    # Widen to word boundaries
+    while start > 0 and not conversation[start - 1].isspace():
+        start -= 1
+    while end < len(conversation) and not conversation[end].isspace():
+        end += 1
+
+    window = conversation[start:end]
+    parts = []
+    position = 0
+    for match in pattern.finditer(window):
+        parts.append(html.escape(window[position:match.start()]))
+        parts.append(mark[0] + html.escape(match.group()) + mark[1])
+        position = match.end()
+    parts.append(html.escape(window[position:]))
+
+    return ('…' if start > 0 else '') + ''.join(parts).replace('\n', ' ') + \
+        ('…' if end < len(conversation) else '')
+
+
+class LogSearch:
+    """
+    Full-text search over conversation log transcripts.
+
+    On SQLite the index is a contentless FTS5 table, conversation_logs_fts,
+    whose rowid is the log ID. On Postgres it is conversation_log_search, a
+    tsvector per log with a GIN index. Transcripts are stored compressed, so
+    neither database can index them itself. The application adds each log
+    to the index in the same transaction that saves it, and builds snippets
+    from the few transcripts on the page of results. Only transcripts are
+    indexed: they never change once saved, unlike the generated summary.
+    """
+
+    def __init__(self, snippet_chars=160, max_ranked=10000):
+        """
+        Initialize search.
+
+        Args:
+            snippet_chars (int): Approximate length of each result's snippet
+            max_ranked (int): Most recent matches ranked when sorting by relevance
+        """
+        self.snippet_chars = snippet_chars
+        self.max_ranked = max_ranked
+        self.available = None  # Unknown until ensure_index() has run
+
+    def ensure_index(self):
+        """
+        Create the index structures if they are missing.
+
+        Returns:
+            bool: Whether this database supports search
+        """
+        dialect = db.engine.dialect.name
+        try:
+            if dialect == 'sqlite':
+                db.session.execute(text(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS conversation_logs_fts "
+                    "USING fts5(conversation_text, content='', tokenize='porter unicode61')"
+                ))
+            elif dialect == 'postgresql':
+                # No foreign key: conversation_logs is partitioned, and retention removes its own index rows
+                db.session.execute(text(
+                    "CREATE TABLE IF NOT EXISTS conversation_log_search ("
+                    "log_id INTEGER PRIMARY KEY, document TSVECTOR NOT NULL)"
+                ))
+                db.session.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_conversation_log_search_document "
+                    "ON conversation_log_search USING GIN (document)"
+                ))
+            else:
+                self.available = False
+                return False
+            db.session.commit()
+            self.available = True
+        except OperationalError as e:
+            # SQLite built without FTS5
+            db.session.rollback()
+            logger.error(f"Full-text search is not available: {str(e)}")
+            self.available = False
+        return self.available
+
+    def ensure_built(self):
+        """Create the index, and fill it when logs exist but none are indexed, e.g. after upgrading"""
+        if not self.ensure_index():
+            return
+        indexed = db.session.execute(text(
+            "SELECT rowid FROM conversation_logs_fts LIMIT 1" if self._dialect() == 'sqlite'
+            else "SELECT log_id FROM conversation_log_search LIMIT 1"
+        )).first()
+        if indexed is None and db.session.query(ConversationLog.id).first() is not None:
+            logger.info(f"Indexed {self.rebuild()} conversation logs for search")
+
+    def record(self, log):
+        """Index a new ConversationLog; call before committing it"""
+        self.add([log])
+
+    def add(self, logs):
+        """
+        Index new ConversationLogs in the current transaction.
+
+        Args:
+            logs (list): ConversationLog objects, not yet committed
+        """
+        if not logs or self.available is False:
+            return
+        if any(log.id is None for log in logs):
+            db.session.flush()
+        self._insert([{'id': log.id, 'conversation': log.conversation_text or ''} for log in logs])
+
+    def remove(self, logs):
+        """
+        Drop logs from the index in the current transaction.
+
+        Args:
+            logs (list): (log ID, transcript) pairs; a contentless FTS5 index
+                needs the indexed text to remove an entry
+        """
+        if not logs or self.available is False:
+            return
+        if self._dialect() == 'sqlite':
+            db.session.execute(text(
+                "INSERT INTO conversation_logs_fts (conversation_logs_fts, rowid, conversation_text) "
+                "VALUES ('delete', :id, :conversation)"
+            ), [{'id': log_id, 'conversation': conversation or ''} for log_id, conversation in logs])
+        elif self._dialect() == 'postgresql':
+            db.session.execute(
+                text("DELETE FROM conversation_log_search WHERE log_id IN :ids")
+                .bindparams(bindparam('ids', expanding=True)),
+                {'ids': [log_id for log_id, _ in logs]}
+            )
+
+    def compact(self, pages=2000, pause_seconds=0.05):
+        """
+        Merge the FTS5 index a step at a time after many removals.
+
+        A contentless FTS5 index records removals as extra entries, which only
+        go away when segments are merged, so without this the index keeps
+        growing under retention. Each step writes about `pages` pages in its
+        own transaction. Postgres needs nothing here: vacuum reclaims the
+        space.
+
+        Returns:
+            int: Merge steps run
+        """
+        if self.available is False or self._dialect() != 'sqlite':
+            return 0
+        steps = 0
+        while True:
+            step_started = time.perf_counter()
+            before = db.session.execute(text("SELECT total_changes()")).scalar()
+            db.session.execute(text(
+                "INSERT INTO conversation_logs_fts (conversation_logs_fts, rank) VALUES ('merge', :pages)"
+            ), {'pages': -pages})  # Negative: merge segments of any level
+            changed = db.session.execute(text("SELECT total_changes()")).scalar() - before
+            db.session.commit()
+            steps += 1
+            # A step that wrote next to nothing means there is nothing left to merge
+            if changed < 2:
+                return steps
+            time.sleep(max(pause_seconds, time.perf_counter() - step_started))
+
+    def search(self, query, page=1, per_page=20, call_time_from=None, call_time_to=None,
+               outlet=None, outcome=None, sort='relevance'):
+        """
+        Find logs matching a search.
+
+        Ranking every match of a common word costs time in proportion to the
+        number of matches, so by relevance only the `max_ranked` most recent
+        matches are ranked and paged through.
+
+        Args:
+            query (str): Words, "quoted phrases" and prefix* words; all must match
+            page (int): Page of results, from 1
+            per_page (int): Results per page
+            call_time_from (datetime, optional): Earliest call time (naive UTC)
+            call_time_to (datetime, optional): Calls before this time (naive UTC)
+            outlet (str, optional): Only this outlet
+            outcome (str, optional): Only this call outcome
+            sort (str): 'relevance' (best matches first) or 'recent' (newest first)
+
+        Returns:
+            tuple: (list of log dicts with 'score' and 'snippet', whether there are more pages)
+        """
+        dialect = self._dialect()
+        filters = []
+        params = {'limit': per_page + 1, 'offset': (page - 1) * per_page, 'candidates': self.max_ranked}
+        for column, name, value in (('call_time', 'call_time_from', call_time_from),
+                                    ('call_time', 'call_time_to', call_time_to),
+                                    ('outlet_name', 'outlet', outlet),
+                                    ('call_outcome', 'outcome', outcome)):
+            if value is not None:
+                operator = '>=' if name == 'call_time_from' else '<' if name == 'call_time_to' else '='
+                filters.append(f"l.{column} {operator} :{name}")
+                params[name] = value
+        where = ''.join(f" AND {condition}" for condition in filters)
+
+        # Matches newest first, each with its score
+        if dialect == 'sqlite':
+            params['match'] = fts5_query(query)
+            if not params['match']:
+                return [], False
+            # The join is only needed for filters; without it FTS5 reads the matches on its own
+            join = " JOIN conversation_logs AS l ON l.id = f.rowid" if filters else ""
+            matches = (
+                "SELECT f.rowid AS id, -bm25(conversation_logs_fts) AS score "
+                f"FROM conversation_logs_fts AS f{join} "
+                f"WHERE conversation_logs_fts MATCH :match{where} ORDER BY f.rowid DESC"
+            )
+        elif dialect == 'postgresql':
+            params['query'] = query
+            matches = (
+                "SELECT s.log_id AS id, ts_rank_cd(s.document, q) AS score "
+                "FROM conversation_log_search AS s JOIN conversation_logs AS l ON l.id = s.log_id, "
+                "websearch_to_tsquery('english', :query) AS q "
+                f"WHERE s.document @@ q{where} ORDER BY s.log_id DESC"
+            )
+        else:
+            raise SearchUnavailableError(f"Full-text search is not supported on {dialect}")
+
+        if sort == 'recent':
+            statement = f"{matches} LIMIT :limit OFFSET :offset"
+        else:
+            statement = (
+                f"SELECT id, score FROM ({matches} LIMIT :candidates) AS ranked "
+                "ORDER BY score DESC, id DESC LIMIT :limit OFFSET :offset"
+            )
+
+        try:
+            hits = db.session.execute(text(statement), params).all()
+        except OperationalError as e:
+            db.session.rollback()
+            raise SearchUnavailableError(f"Full-text search is not available: {str(e)}")
+        has_more = len(hits) > per_page
+        hits = hits[:per_page]
+
+        logs = {
+            log.id: log for log in ConversationLog.query.filter(ConversationLog.id.in_([hit.id for hit in hits]))
+            .options(undefer(ConversationLog.conversation_text))
+        }
+        results = []
+        for hit in hits:
+            log = logs.get(hit.id)
+            if log is None:
+                continue  # Deleted since it was indexed
+            result = log.to_dict()
+            result['score'] = round(float(hit.score), 6)
+            result['snippet'] = snippet(log.conversation_text, query, self.snippet_chars)
+            results.append(result)
+        db.session.commit()
+        return results, has_more
+
+    def rebuild(self, batch_size=5000):
+        """
+        Re-index every conversation log.
+
+        Returns:
+            int: Logs indexed
+        """
+        if not self.ensure_index():
+            raise SearchUnavailableError("Full-text search is not available on this database")
+        if self._dialect() == 'sqlite':
+            db.session.execute(text("INSERT INTO conversation_logs_fts (conversation_logs_fts) VALUES ('delete-all')"))
+        else:
+            db.session.execute(text("DELETE FROM conversation_log_search"))
+
+        indexed = 0
+        last_id = 0
+        while True:
+            page = db.session.query(ConversationLog.id, ConversationLog.conversation_text).filter(
+                ConversationLog.id > last_id
+            ).order_by(ConversationLog.id).limit(batch_size).all()
+            if not page:
+                break
+            self._insert([{'id': log_id, 'conversation': conversation or ''} for log_id, conversation in page])
+            indexed += len(page)
+            last_id = page[-1].id
+            db.session.commit()
+
+        db.session.commit()
+        return indexed
+
+    def _insert(self, rows):
+        if self._dialect() == 'sqlite':
+            statement = (
+                "INSERT INTO conversation_logs_fts (rowid, conversation_text) VALUES (:id, :conversation)"
+            )
+        elif self._dialect() == 'postgresql':
+            statement = (
+                "INSERT INTO conversation_log_search (log_id, document) "
+                "VALUES (:id, to_tsvector('english', :conversation))"
+            )
+        else:
+            return
+        db.session.execute(text(statement), rows)
+
+    @staticmethod
+    def _dialect():
+        return db.session.get_bind().dialect.name
@@ -0,0 +1,53 @@
+import threading
+from collections import deque
+
+class LatencyTracker:
+    """
+    Thread-safe rolling window of latency samples with percentile reporting.
+    """
+
+    def __init__(self, window=1000):
+        """
+        Initialize the tracker.
+
+        Args:
+            window (int): Number of most recent samples kept for percentiles
+        """
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency_ms):
+        """
+        Record a latency sample.
+
+        Args:
+            latency_ms (float): Latency in milliseconds
+        """
+        with self.lock:
+            self.samples.append(latency_ms)
+            self.count += 1
+
+    def percentiles(self, points=(50, 90, 99)):
+        """
+        Summarise the current window using nearest-rank percentiles.
+
+        Args:
+            points (tuple): Percentiles to report
+
+        Returns:
+            dict: Total sample count plus 'p<N>' and 'max' values in milliseconds
+        """
+        with self.lock:
+            ordered = sorted(self.samples)
+            summary = {'count': self.count}
+
+        for point in points:
+            if ordered:
+                rank = max(0, int(round(point / 100.0 * len(ordered))) - 1)
+                summary[f'p{point}'] = round(ordered[min(rank, len(ordered) - 1)], 2)
+            else:
+                summary[f'p{point}'] = None
+        summary['max'] = round(ordered[-1], 2) if ordered else None
+
+        return summary
@@ -0,0 +1,213 @@
+"""
+Simulated RetellAI client for exercising the custom LLM WebSocket locally.
+
+Plays scripted caller utterances the way RetellAI does: partial transcripts
+arrive as 'update_only' events word by word, then a 'response_required'
+event asks for the reply. Turn latencies are reported as percentiles.
+
+Usage:
+    python -m utils.retell_simulator                      # in-process session
+    python -m utils.retell_simulator --url ws://localhost:5000/api/conversation/retell/llm-websocket/test-call
+"""
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from utils.metrics import LatencyTracker
+
+DEFAULT_SCRIPT = [
+    "Hi, where are your outlets in Delhi?",
+    "What vegetarian food do you have?",
+    "Do you have parking?",
+    "I want to book a table for 4 people tomorrow",
+    "Thanks, bye"
+]
+
+# Marks the end of an in-process connection
+CLOSE = object()
+
+
+class LocalTransport:
+    """Runs a RetellLLMSession in a background thread, connected through queues"""
+
+    def __init__(self, call_id='simulated-call'):
+        from api.retell_llm import RetellLLMSession, serve_session
+
+        self.to_server = queue.Queue()
+        self.to_client = queue.Queue()
+        self.closed = False
+        session = RetellLLMSession(call_id)
+
+        def receive(timeout=None):
+            if self.closed:
+                return None
+            try:
+                message = self.to_server.get_nowait() if timeout == 0 else self.to_server.get(timeout=timeout)
+            except queue.Empty:
+                return None
+            if message is CLOSE:
+                self.closed = True
+                return None
+            return message
+
+        self.thread = threading.Thread(
+            target=serve_session, args=(session, receive, self.to_client.put), daemon=True
+        )
+        self.thread.start()
+
+    def send(self, text):
+        self.to_server.put(text)
+
+    def receive(self, timeout=None):
+        try:
+            return self.to_client.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.to_server.put(CLOSE)
+
+
+class WebSocketTransport:
+    """Connects to a running server's custom LLM WebSocket"""
+
+    def __init__(self, url):
+        from simple_websocket import Client
+        self.ws = Client.connect(url)
+
+    def send(self, text):
+        self.ws.send(text)
+
+    def receive(self, timeout=None):
+        return self.ws.receive(timeout=timeout)
+
+    def close(self):
+        self.ws.close()
+
+
+class SimulatedRetellClient:
+    """
+    Drives a custom LLM endpoint through scripted turns and measures latency.
+    """
+
+    def __init__(self, transport, timeout=10):
+        """
+        Initialize the client.
+
+        Args:
+            transport: LocalTransport or WebSocketTransport
+            timeout (float): Seconds to wait for any single message
+        """
+        self.transport = transport
+        self.timeout = timeout
+        self.transcript = []
+        self.response_id = 0
+        self.first_chunk_latency = LatencyTracker()
+        self.turn_latency = LatencyTracker()
+
+    def start(self):
+        """Consume the config and greeting messages sent on connect"""
+        while True:
+            message = self._receive()
+            if message.get('response_type') == 'response' and message.get('content_complete'):
+                self.transcript.append({"role": "agent", "content": message.get('content', '')})
+                return
+
+    def say(self, utterance):
+        """
+        Play one caller turn and wait for the full reply.
+
+        Args:
+            utterance (str): What the caller says
+
+        Returns:
+            str: The agent's complete reply
+        """
+        # Stream the caller's words as partial transcripts
+        words = utterance.split()
+        for i in range(1, len(words) + 1):
+            partial = self.transcript + [{"role": "user", "content": " ".join(words[:i])}]
+            self._send({"interaction_type": "update_only", "transcript": partial})
+
+        self.transcript.append({"role": "user", "content": utterance})
+        self.response_id += 1
+        started = time.perf_counter()
+        self._send({
+            "interaction_type": "response_required",
+            "response_id": self.response_id,
+            "transcript": self.transcript
+        })
+
+        chunks = []
+        first_chunk_at = None
+        while True:
+            message = self._receive()
+            if message.get('response_type') != 'response' or message.get('response_id') != self.response_id:
+                continue
+            if first_chunk_at is None:
+                first_chunk_at = time.perf_counter()
+                self.first_chunk_latency.record((first_chunk_at - started) * 1000)
+            chunks.append(message.get('content', ''))
+            if message.get('content_complete'):
+                break
+
+        self.turn_latency.record((time.perf_counter() - started) * 1000)
+        reply = "".join(chunks).strip()
+        self.transcript.append({"role": "agent", "content": reply})
+        return reply
+
+    def report(self):
+        """Latency percentiles observed by the client"""
+        return {
+            "first_chunk_latency_ms": self.first_chunk_latency.percentiles(),
+            "turn_latency_ms": self.turn_latency.percentiles()
+        }
+
+    def _send(self, event):
+        self.transport.send(json.dumps(event))
+
+    def _receive(self):
+        raw = self.transport.receive(timeout=self.timeout)
+        if raw is None:
+            raise TimeoutError("No message from the custom LLM endpoint")
+        return json.loads(raw)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate RetellAI calls against the custom LLM endpoint")
+    parser.add_argument('--url', help="WebSocket URL; runs an in-process session when omitted")
+    parser.add_argument('--calls', type=int, default=20, help="Number of scripted calls to play")
+    parser.add_argument('--verbose', action='store_true', help="Print each turn")
+    args = parser.parse_args(argv)
+
+    overall_first_chunk = LatencyTracker(window=100000)
+    overall_turn = LatencyTracker(window=100000)
+
+    for call in range(args.calls):
+        transport = WebSocketTransport(args.url) if args.url else LocalTransport(f"simulated-call-{call}")
+        client = SimulatedRetellClient(transport)
+        try:
+            client.start()
+            for utterance in DEFAULT_SCRIPT:
+                reply = client.say(utterance)
+                if args.verbose:
+                    print(f"USER: {utterance}\nAGENT: {reply}\n")
+        finally:
+            transport.close()
+
+        for sample in client.first_chunk_latency.samples:
+            overall_first_chunk.record(sample)
+        for sample in client.turn_latency.samples:
+            overall_turn.record(sample)
+
+    print(json.dumps({
+        "calls": args.calls,
+        "first_chunk_latency_ms": overall_first_chunk.percentiles(),
+        "turn_latency_ms": overall_turn.percentiles()
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,306 @@
+import os
+import glob
+import gzip
+import json
+import time
+import shutil
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Suffix of the segment a process is still writing to
+OPEN_SUFFIX = '.open'
+
+
+class SegmentLog:
+    """
+    Append-only NDJSON log split into size- and time-bounded segments.
+
+    Each process appends to its own segment,
+    `<prefix>-<YYYYmmddTHHMMSS>-<pid>-<n>.ndjson.open`. The segment is closed,
+    by renaming it without `.open`, once it reaches `max_segment_bytes` or
+    `max_segment_seconds`. With `compress` set, closed segments are gzipped in
+    the background. Segments left open by a process that died are closed the
+    next time a log is opened on the directory.
+
+    Appends use group commit. Every caller waits until its record is fsynced,
+    but callers that arrive while an fsync is running share the next one. A
+    busy log therefore fsyncs once per group of records, not once per record.
+    """
+
+    def __init__(self, directory, prefix='conversation_log', max_segment_bytes=64 * 1024 * 1024,
+                 max_segment_seconds=3600, compress=False):
+        """
+        Initialize the log.
+
+        Args:
+            directory (str): Directory holding the segments
+            prefix (str): Segment file name prefix
+            max_segment_bytes (int): Close a segment once it is this large
+            max_segment_seconds (int): Close a segment once it is this old
+            compress (bool): Gzip segments once they are closed
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.compress = compress
+        self.lock = threading.Lock()
+        self.synced = threading.Condition(self.lock)
+        self.file = None
+        self.path = None
+        self.pid = None
+        self.opened_at = 0.0
+        self.size = 0
+        self.segments = 0
+        self.written = 0  # Records written to the current file
+        self.durable = 0  # Records of the current file covered by an fsync
+        self.syncing = False
+        self.appends = 0
+        self.fsyncs = 0
+
+    def append(self, record):
+        """
+        Append a record and return once it is on disk.
+
+        Args:
+            record (dict): JSON-serialisable record
+        """
+        line = (json.dumps(record, default=str) + "\n").encode('utf-8')
+
+        with self.lock:
+            while self.file is None or self.pid != os.getpid() or self._segment_full():
+                if self.syncing:
+                    # Let the fsync in progress finish before closing its file
+                    self.synced.wait()
+                    continue
+                self._rotate()
+            self.file.write(line)
+            self.size += len(line)
+            self.written += 1
+            self.appends += 1
+            ticket = self.written
+            current = self.file
+
+            while self.durable < ticket and current is self.file:
+                if not self.syncing:
+                    self._sync()
+                else:
+                    self.synced.wait()
+
+    def close(self):
+        """Close the current segment"""
+        with self.lock:
+            self._close_segment()
+
+    def stats(self):
+        """Segment and fsync counts for this process"""
+        with self.lock:
+            return {
+                'segment': os.path.basename(self.path) if self.path else None,
+                'segment_bytes': self.size,
+                'segments_opened': self.segments,
+                'appends': self.appends,
+                'fsyncs': self.fsyncs
+            }
+
+    def _sync(self):
+        """Flush and fsync everything written so far, with the lock released during the fsync"""
+        self.syncing = True
+        target = self.written
+        current = self.file
+        current.flush()
+        self.lock.release()
+        try:
+            os.fsync(current.fileno())
+        finally:
+            self.lock.acquire()
+            self.syncing = False
+            self.fsyncs += 1
+            if current is self.file:
+                self.durable = max(self.durable, target)
+            self.synced.notify_all()
+
+    def _segment_full(self):
+        return (self.size >= self.max_segment_bytes or
+                time.monotonic() - self.opened_at >= self.max_segment_seconds)
+
+    def _rotate(self):
+        """Close the current segment and start a new one; called with no fsync in progress"""
+        if self.pid == os.getpid():
+            self._close_segment()
+        else:
+            # First use in this process: any open segment was inherited from the parent
+            self.file = None
+            os.makedirs(self.directory, exist_ok=True)
+            close_stale_segments(self.directory, self.prefix, self.compress)
+
+        self.pid = os.getpid()
+        self.segments += 1
+        name = f"{self.prefix}-{datetime.now().strftime('%Y%m%dT%H%M%S')}-{self.pid}-{self.segments}.ndjson"
+        self.path = os.path.join(self.directory, name + OPEN_SUFFIX)
+        self.file = open(self.path, 'ab')
+        self.opened_at = time.monotonic()
+        self.size = 0
+        self.written = 0
+        self.durable = 0
+
+    def _close_segment(self):
+        if self.file is None:
+            return
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        # Wake callers waiting on this file; their records were just fsynced
+        self.file = None
+        self.synced.notify_all()
+        closed = self.path[:-len(OPEN_SUFFIX)]
+        os.rename(self.path, closed)
+        self.path = None
+        if self.compress:
+            threading.Thread(target=compress_segment, args=(closed,), daemon=True).start()
+
+
+def compress_segment(path):
+    """Gzip a closed segment to `<path>.gz` and remove the original"""
+    try:
+        with open(path, 'rb') as source, gzip.open(path + '.gz.tmp', 'wb') as target:
+            shutil.copyfileobj(source, target)
+        os.rename(path + '.gz.tmp', path + '.gz')
+        os.remove(path)
+    except OSError as e:
+        logger.error(f"Error compressing log segment {path}: {str(e)}")
+
+
+def close_stale_segments(directory, prefix='conversation_log', compress=False):
+    """
+    Close segments left open by processes that are no longer running.
+
+    Returns:
+        int: Segments closed
+    """
+    closed = 0
+    for path in glob.glob(os.path.join(directory, f"{prefix}-*.ndjson{OPEN_SUFFIX}")):
+        try:
+            pid = int(os.path.basename(path).split('-')[-2])
+        except ValueError:
+            continue
+        # Call before opening a segment: one with this process's ID is left from an earlier run
+        if pid != os.getpid() and _process_alive(pid):
+            continue
+        try:
+            os.rename(path, path[:-len(OPEN_SUFFIX)])
+        except OSError:
+            continue  # Closed by another process first
+        closed += 1
+        if compress:
+            compress_segment(path[:-len(OPEN_SUFFIX)])
+    return closed
+
+
+def list_segments(directory, prefix='conversation_log', include_open=False):
+    """
+    Segment paths in the order they were written.
+
+    Args:
+        directory (str): Directory holding the segments
+        prefix (str): Segment file name prefix
+        include_open (bool): Also list segments still being written
+
+    Returns:
+        list: Paths, oldest first
+    """
+    patterns = [f"{prefix}-*.ndjson", f"{prefix}-*.ndjson.gz"]
+    if include_open:
+        patterns.append(f"{prefix}-*.ndjson{OPEN_SUFFIX}")
+    paths = [path for pattern in patterns for path in glob.glob(os.path.join(directory, pattern))]
+    return sorted(paths, key=_segment_order)
+
+
+def read_segment(path):
+    """
+    Stream the records of one segment.
+
+    A partly written last line, as left by a crash, is skipped.
+
+    Yields:
+        tuple: (line number, record dict)
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as segment:
+        for line_number, line in enumerate(segment, start=1):
+            if not line.endswith(b"\n"):
+                logger.warning(f"Skipping incomplete last line of {path}")
+                break
+            try:
+                yield line_number, json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping unreadable line {line_number} of {path}")
+
+
+def replayed_targets(path):
+    """
+    Destinations a closed segment has already been replayed to.
+
+    Recorded in a `<segment>.replayed` file beside it, so that a segment
+    pending for several destinations is only sent to each of them once.
+
+    Returns:
+        set: Destination names
+    """
+    try:
+        with open(_replayed_path(path)) as f:
+            return set(json.load(f))
+    except FileNotFoundError:
+        return set()
+    except ValueError:
+        logger.warning(f"Ignoring unreadable replay record for {path}")
+        return set()
+
+
+def mark_replayed(path, target):
+    """Record that a segment has been replayed to `target`"""
+    targets = replayed_targets(path) | {target}
+    marker = _replayed_path(path)
+    with open(marker + '.tmp', 'w') as f:
+        json.dump(sorted(targets), f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(marker + '.tmp', marker)
+
+
+def remove_segment(path):
+    """Delete a closed segment and its replay record"""
+    os.remove(path)
+    try:
+        os.remove(_replayed_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def _replayed_path(path):
+    """Replay record beside a segment; shared by its plain and gzipped forms"""
+    if path.endswith('.gz'):
+        path = path[:-len('.gz')]
+    return path + '.replayed'
+
+
+def _segment_order(path):
+    """Sort key: timestamp, process and sequence from the file name"""
+    parts = os.path.basename(path).split('.')[0].split('-')
+    try:
+        return (parts[-3], int(parts[-2]), int(parts[-1]))
+    except (IndexError, ValueError):
+        return (path, 0, 0)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,204 @@
+import os
+import json
+import logging
+import datetime
+import threading
+import gspread
+from gspread.http_client import HTTPClient
+from google.auth.exceptions import GoogleAuthError
+from google.auth.transport.requests import Request
+from oauth2client.service_account import ServiceAccountCredentials
+
+logger = logging.getLogger(__name__)
+
+SCOPE = ['https://spreadsheets.google.com/feeds',
+         'https://www.googleapis.com/auth/drive']
+
+# Hosts of the Google APIs gspread talks to, rewritten when an API URL override is set
+GOOGLE_API_HOSTS = ('https://sheets.googleapis.com', 'https://www.googleapis.com')
+
+
+def redirected_http_client(api_base_url):
+    """
+    gspread HTTP client class that sends every request to `api_base_url`.
+
+    Used to point the client at a local fake Sheets server. The token
+    endpoint comes from the service account's token_uri.
+    """
+    class RedirectedHTTPClient(HTTPClient):
+        def request(self, method, endpoint, *args, **kwargs):
+            for host in GOOGLE_API_HOSTS:
+                if endpoint.startswith(host):
+                    endpoint = api_base_url.rstrip('/') + endpoint[len(host):]
+                    break
+            return super().request(method, endpoint, *args, **kwargs)
+
+    return RedirectedHTTPClient
+
+
+def load_credentials():
+    """
+    Read service account credentials from the environment.
+
+    GOOGLE_APPLICATION_CREDENTIALS (a key file) is tried first, then
+    GOOGLE_CREDENTIALS_JSON (the key itself).
+
+    Returns:
+        ServiceAccountCredentials: Credentials, or None if neither is set
+    """
+    creds_file = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
+    if creds_file and os.path.exists(creds_file):
+        return ServiceAccountCredentials.from_json_keyfile_name(creds_file, SCOPE)
+
+    creds_json = os.environ.get('GOOGLE_CREDENTIALS_JSON')
+    if creds_json:
+        return ServiceAccountCredentials.from_json_keyfile_dict(json.loads(creds_json), SCOPE)
+
+    return None
+
+
+class SheetsClientHolder:
+    """
+    Process-wide Google Sheets client and worksheet handle.
+
+    Authorizing and opening the spreadsheet takes several round trips to
+    Google, so both are done once and reused by every request. The access
+    token is refreshed `refresh_margin_seconds` before it expires. On an
+    authorization error the client is dropped and rebuilt once before giving up.
+    """
+
+    def __init__(self, refresh_margin_seconds=300, api_base_url=None, timeout=None,
+                 credentials_loader=load_credentials):
+        """
+        Initialize the holder.
+
+        Args:
+            refresh_margin_seconds (int): Refresh the token when it has less than this left
+            api_base_url (str, optional): Send API requests here instead of Google, for a fake server
+            timeout (float, optional): HTTP timeout in seconds for Sheets requests
+            credentials_loader (callable): Returns credentials, or None when not configured
+        """
+        self.refresh_margin = datetime.timedelta(seconds=refresh_margin_seconds)
+        self.http_client = redirected_http_client(api_base_url) if api_base_url else HTTPClient
+        self.timeout = timeout
+        self.credentials_loader = credentials_loader
+        self.lock = threading.RLock()
+        self.client = None
+        self.worksheets = {}
+        self.authorizations = 0
+        self.refreshes = 0
+        self.rebuilds = 0
+
+    def get_client(self):
+        """
+        Return the authorized client, building it on first use.
+
+        Returns:
+            gspread.Client: Client, or None if no credentials are configured
+        """
+        with self.lock:
+            if self.client is None:
+                credentials = self.credentials_loader()
+                if credentials is None:
+                    logger.warning("Google credentials not found. Set GOOGLE_APPLICATION_CREDENTIALS or GOOGLE_CREDENTIALS_JSON environment variables to enable Google Sheets logging.")
+                    return None
+                self.client = gspread.authorize(credentials, http_client=self.http_client)
+                self.client.set_timeout(self.timeout)
+                self.authorizations += 1
+            else:
+                self._refresh_if_expiring()
+            return self.client
+
+    def configured(self):
+        """Whether credentials are available, without contacting Google or waiting on the lock"""
+        return self.client is not None or self.credentials_loader() is not None
+
+    def get_worksheet(self, sheet_id):
+        """
+        Return the first worksheet of a spreadsheet, opening it on first use.
+
+        Args:
+            sheet_id (str): Spreadsheet key
+
+        Returns:
+            gspread.Worksheet: Worksheet, or None if no credentials are configured
+        """
+        with self.lock:
+            client = self.get_client()
+            if client is None:
+                return None
+            if sheet_id not in self.worksheets:
+                self.worksheets[sheet_id] = client.open_by_key(sheet_id).sheet1
+            return self.worksheets[sheet_id]
+
+    def append_rows(self, sheet_id, rows):
+        """
+        Append rows to the first worksheet, rebuilding the client once on an auth error.
+
+        Args:
+            sheet_id (str): Spreadsheet key
+            rows (list): Rows of cell values
+
+        Returns:
+            bool: False if no credentials are configured
+
+        Raises:
+            gspread.exceptions.APIError: If Sheets rejects the request
+            PermissionError: If the spreadsheet cannot be opened
+        """
+        for attempt in range(2):
+            try:
+                worksheet = self.get_worksheet(sheet_id)
+                if worksheet is None:
+                    return False
+                worksheet.append_rows(rows)
+                return True
+            except (gspread.exceptions.APIError, GoogleAuthError, PermissionError) as e:
+                if attempt or not self._is_auth_error(e):
+                    raise
+                logger.warning(f"Google Sheets authorization failed, rebuilding client: {str(e)}")
+                self.reset()
+                self.rebuilds += 1
+
+    def reset(self):
+        """Drop the cached client and worksheets"""
+        with self.lock:
+            self.client = None
+            self.worksheets = {}
+
+    def stats(self):
+        """Client reuse counts for this process"""
+        expiry = None
+        if self.client is not None:
+            expiry = getattr(self.client.http_client.auth, 'expiry', None)
+        return {
+            'authorized': self.client is not None,
+            'token_expiry': expiry.strftime('%Y-%m-%d %H:%M:%S') if expiry else None,
+            'authorizations': self.authorizations,
+            'refreshes': self.refreshes,
+            'rebuilds': self.rebuilds,
+            'open_worksheets': len(self.worksheets)
+        }
+
+    def _refresh_if_expiring(self):
+        """Refresh the access token ahead of expiry; drop the client if that fails"""
+        credentials = self.client.http_client.auth
+        expiry = getattr(credentials, 'expiry', None)
+        # google-auth expiry times are naive UTC
+        if expiry is None or expiry - datetime.datetime.utcnow() > self.refresh_margin:
+            return
+        try:
+            credentials.refresh(Request())
+            self.refreshes += 1
+        except GoogleAuthError as e:
+            logger.error(f"Error refreshing Google Sheets token: {str(e)}")
+            self.reset()
+            self.rebuilds += 1
+            self.get_client()
+
+    @staticmethod
+    def _is_auth_error(error):
+        # gspread raises PermissionError when opening a spreadsheet is forbidden
+        if isinstance(error, (GoogleAuthError, PermissionError)):
+            return True
+        return getattr(error, 'code', None) in (401, 403)
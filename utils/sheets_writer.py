@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import logging
+import threading
+import contextlib
+import gspread
+from google.auth.exceptions import GoogleAuthError
+from utils.metrics import LatencyTracker
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Sheets API errors worth retrying; anything else means the rows themselves were rejected
+RETRYABLE_STATUS_CODES = (401, 403, 408, 429, 500, 502, 503, 504)
+
+
+class SheetsWriter:
+    """
+    Appends call log rows to Google Sheets in the background.
+
+    Requests only insert the row into a local SQLite spool, so their latency
+    no longer depends on Google. A daemon thread reads the oldest rows and
+    sends them with one append_rows call once `batch_size` rows are waiting or
+    the oldest has waited `max_wait_seconds`. Calls are spaced at least
+    `min_interval_seconds` apart to stay under the Sheets write quota. Failures
+    are retried with exponential backoff. Rows Sheets rejects outright are
+    handed to `dead_letter` instead.
+
+    Rows leave the spool only after Sheets accepted them. If the process dies
+    between the two, the batch is sent again on restart.
+
+    Every worker on a host shares the spool file. Only the worker holding
+    an exclusive flock on `<spool>.lock` flushes it, and another takes over
+    if that worker exits.
+    """
+
+    def __init__(self, sheets_holder, spool_path, batch_size=100, max_wait_seconds=2.0,
+                 min_interval_seconds=1.0, max_backoff_seconds=60.0, dead_letter=None):
+        """
+        Initialize the writer.
+
+        Args:
+            sheets_holder (SheetsClientHolder): Shared Sheets client
+            spool_path (str): SQLite file holding rows not yet sent
+            batch_size (int): Most rows per append_rows call
+            max_wait_seconds (float): Longest a row waits for a fuller batch
+            min_interval_seconds (float): Shortest time between append_rows calls
+            max_backoff_seconds (float): Cap on the retry delay after failures
+            dead_letter (callable, optional): Called with each row Sheets rejects
+        """
+        self.sheets_holder = sheets_holder
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.dead_letter = dead_letter
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.thread_pid = None
+        self.start_lock = threading.Lock()
+        self.lock_file = None
+        self.last_flush = 0.0
+        self.retry_at = 0.0
+        self.consecutive_failures = 0
+        self.flush_lag = LatencyTracker()
+        self.batch_sizes = LatencyTracker()
+        self.appended = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dead_lettered = 0
+        self.last_error = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(spool_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS spool ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, sheet_id TEXT NOT NULL, "
+                "row_json TEXT NOT NULL, enqueued_at REAL NOT NULL)"
+            )
+
+    def enqueue(self, sheet_id, row):
+        """
+        Spool a row for appending and return immediately.
+
+        Args:
+            sheet_id (str): Spreadsheet key
+            row (list): Cell values
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO spool (sheet_id, row_json, enqueued_at) VALUES (?, ?, ?)",
+                (sheet_id, json.dumps(row), time.time())
+            )
+        self.ensure_started()
+        self.wakeup.set()
+
+    def ensure_started(self):
+        """Start the flush thread in this process if it is not running"""
+        with self.start_lock:
+            if self.thread is not None and self.thread_pid == os.getpid() and self.thread.is_alive():
+                return
+            # A forked process inherits neither the thread nor, usefully, the flusher lock
+            self.lock_file = None
+            self.thread_pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, name='sheets-writer', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Stop the flush thread after its current batch"""
+        self.stopped.set()
+        self.wakeup.set()
+
+    def flush(self):
+        """
+        Send one batch if one is due.
+
+        Returns:
+            float: Seconds to wait before the next attempt
+        """
+        backoff = self.retry_at - time.monotonic()
+        if backoff > 0:
+            return backoff
+
+        with self._connect() as conn:
+            oldest = conn.execute("SELECT sheet_id, enqueued_at FROM spool ORDER BY id LIMIT 1").fetchone()
+            if oldest is None:
+                return self.max_wait_seconds
+            sheet_id, oldest_at = oldest
+            batch = conn.execute(
+                "SELECT id, row_json, enqueued_at FROM spool WHERE sheet_id = ? ORDER BY id LIMIT ?",
+                (sheet_id, self.batch_size)
+            ).fetchall()
+
+        now = time.time()
+        if len(batch) < self.batch_size and now - oldest_at < self.max_wait_seconds:
+            return self.max_wait_seconds - (now - oldest_at)
+
+        # Rate limit: space calls out even when rows keep arriving
+        since_last = time.monotonic() - self.last_flush
+        if since_last < self.min_interval_seconds:
+            return self.min_interval_seconds - since_last
+
+        rows = [json.loads(row_json) for _, row_json, _ in batch]
+        self.last_flush = time.monotonic()
+        rejected = False
+        try:
+            if not self.sheets_holder.append_rows(sheet_id, rows):
+                raise RuntimeError("Google Sheets credentials are not configured")
+        except gspread.exceptions.APIError as e:
+            if e.code in RETRYABLE_STATUS_CODES:
+                return self._failed(e)
+            logger.error(f"Google Sheets rejected {len(rows)} rows, dead-lettering them: {str(e)}")
+            for row in rows:
+                if self.dead_letter:
+                    self.dead_letter(row)
+            self.dead_lettered += len(rows)
+            rejected = True
+        except (GoogleAuthError, PermissionError, RuntimeError, OSError) as e:
+            return self._failed(e)
+
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.executemany("DELETE FROM spool WHERE id = ?", [(row_id,) for row_id, _, _ in batch])
+            conn.execute("COMMIT")
+        self.consecutive_failures = 0
+        if rejected:
+            return 0
+
+        done = time.time()
+        for _, _, enqueued_at in batch:
+            self.flush_lag.record((done - enqueued_at) * 1000)
+        self.batch_sizes.record(len(batch))
+        self.appended += len(batch)
+        self.flushes += 1
+        return 0
+
+    def stats(self):
+        """Spool depth, batch sizes and flush lag"""
+        with self._connect() as conn:
+            depth, oldest_at = conn.execute("SELECT COUNT(*), MIN(enqueued_at) FROM spool").fetchone()
+        return {
+            'queue_depth': depth,
+            'oldest_age_seconds': round(time.time() - oldest_at, 1) if oldest_at else None,
+            'flusher': self.lock_file is not None,
+            'appended': self.appended,
+            'flushes': self.flushes,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'dead_lettered': self.dead_lettered,
+            'last_error': self.last_error,
+            'batch_size': self.batch_sizes.percentiles(),
+            'flush_lag_ms': self.flush_lag.percentiles()
+        }
+
+    def _run(self):
+        while not self.stopped.is_set():
+            delay = self.max_wait_seconds
+            try:
+                if self._is_flusher():
+                    delay = self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing Google Sheets spool: {str(e)}")
+                delay = self._failed(e)
+
+            if delay > 0:
+                self.wakeup.wait(delay)
+                self.wakeup.clear()
+
+    def _failed(self, error):
+        """Record a failed flush and return the backoff delay, with jitter"""
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = str(error)
+        delay = min(self.max_backoff_seconds, self.min_interval_seconds * 2 ** self.consecutive_failures)
+        delay *= random.uniform(0.5, 1.0)
+        self.retry_at = time.monotonic() + delay
+        logger.warning(f"Google Sheets append failed, retrying in {delay:.1f}s: {str(error)}")
+        return delay
+
+    def _is_flusher(self):
+        """Take the host-wide flusher lock if no other worker holds it"""
+        if self.lock_file is not None or fcntl is None:
+            return True
+        lock_file = open(self.spool_path + '.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Autocommit connection to the spool, closed on exit"""
+        conn = sqlite3.connect(self.spool_path, timeout=10, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
@@ -0,0 +1,337 @@
+import os
+import json
+import time
+import random
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, update
+from models import db, Task
+from utils.metrics import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+# A task is claimable while queued, or while running with its lease expired
+CLAIMABLE = ('queued', 'running')
+
+
+class TaskQueue:
+    """
+    Durable queue of background tasks kept in the application database.
+
+    Requests add a row to the `tasks` table and return. Worker threads claim
+    due tasks, run the handler registered for the task's name and delete the
+    row in the same transaction as the handler's own writes. No broker is
+    needed, and every worker process sharing the database shares the queue.
+
+    Claiming a task leases it for `visibility_timeout_seconds` by moving its
+    `run_at` forward. If the worker dies, the task becomes claimable again once
+    the lease runs out. A worker whose lease ran out cannot complete the task,
+    so its writes are rolled back. Failed tasks are retried with exponential
+    backoff. After `max_attempts` they are marked 'dead' and kept for
+    inspection, and the handler's dead-letter callback is called.
+    """
+
+    def __init__(self, visibility_timeout_seconds=60, max_attempts=5, retry_backoff_seconds=2.0,
+                 max_backoff_seconds=300.0, poll_seconds=1.0, claim_batch_size=10):
+        """
+        Initialize the queue.
+
+        Args:
+            visibility_timeout_seconds (int): How long a claimed task is hidden from other workers
+            max_attempts (int): Attempts before a task is dead-lettered
+            retry_backoff_seconds (float): Delay before the first retry; doubled on each later one
+            max_backoff_seconds (float): Cap on the retry delay
+            poll_seconds (float): How often idle workers check for due tasks
+            claim_batch_size (int): Tasks a worker leases at once, run one after another
+        """
+        self.visibility_timeout = timedelta(seconds=visibility_timeout_seconds)
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.poll_seconds = poll_seconds
+        self.claim_batch_size = claim_batch_size
+        self.handlers = {}
+        self.wakeup = threading.Semaphore(0)
+        self.stopped = threading.Event()
+        self.threads = []
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def handler(self, name, dead_letter=None):
+        """
+        Register the decorated function as the handler for tasks called `name`.
+
+        The handler is called with the task's payload inside an app context.
+        Its database writes are committed together with the task's removal.
+
+        Args:
+            name (str): Task name
+            dead_letter (callable, optional): Called with the payload and last error
+                when the task is given up on
+        """
+        def register(function):
+            self.handlers[name] = (function, dead_letter)
+            return function
+        return register
+
+    def enqueue(self, name, payload, delay_seconds=0, commit=True):
+        """
+        Add a task to the queue.
+
+        Args:
+            name (str): Task name, as registered with handler()
+            payload (dict): JSON-serialisable arguments for the handler
+            delay_seconds (float): Run no sooner than this
+            commit (bool): Commit now; pass False to commit with the caller's own writes
+
+        Returns:
+            int: ID of the queued task
+        """
+        now = datetime.utcnow()
+        task = Task(
+            name=name,
+            payload=json.dumps(payload, default=str),
+            status='queued',
+            attempts=0,
+            max_attempts=self.max_attempts,
+            run_at=now + timedelta(seconds=delay_seconds),
+            created_at=now
+        )
+        db.session.add(task)
+        db.session.flush()
+        # Read before committing: a worker may run and delete the task straight after
+        task_id = task.id
+        if commit:
+            db.session.commit()
+            if self.threads:
+                self.wakeup.release()
+        return task_id
+
+    def claim(self, worker, limit=1):
+        """
+        Lease up to `limit` due tasks to a worker.
+
+        Args:
+            worker (str): Worker name, recorded on the tasks
+            limit (int): Most tasks to claim
+
+        Returns:
+            list: Claimed rows (id, name, payload, attempts, max_attempts, created_at)
+        """
+        now = datetime.utcnow()
+        # Core statements on the table: claiming is the hot path and needs no ORM bookkeeping
+        tasks = Task.__table__
+        due = (tasks.c.status.in_(CLAIMABLE), tasks.c.run_at <= now)
+
+        # Look before taking the write lock, so idle workers only ever read
+        if db.session.execute(select(tasks.c.id).where(*due).limit(1)).first() is None:
+            db.session.rollback()
+            return []
+
+        candidates = (
+            select(tasks.c.id).where(*due).order_by(tasks.c.run_at, tasks.c.id).limit(limit)
+            .with_for_update(skip_locked=True)  # Postgres; SQLite runs the statement alone anyway
+        )
+        rows = db.session.execute(
+            update(tasks)
+            .where(tasks.c.id.in_(candidates.scalar_subquery()), *due)
+            .values(status='running', run_at=now + self.visibility_timeout, locked_by=worker,
+                    attempts=tasks.c.attempts + 1)
+            .returning(tasks.c.id, tasks.c.name, tasks.c.payload, tasks.c.attempts,
+                       tasks.c.max_attempts, tasks.c.created_at)
+        ).all()
+        db.session.commit()
+        return rows
+
+    def run(self, worker, row):
+        """
+        Run one claimed task and record the outcome.
+
+        Args:
+            worker (str): Worker that claimed the task
+            row: Row returned by claim()
+
+        Returns:
+            str: 'done', 'retry', 'dead' or 'lost' (the lease ran out before it finished)
+        """
+        metrics = self._metrics(row.name)
+        metrics['wait_ms'].record((datetime.utcnow() - row.created_at).total_seconds() * 1000)
+        started = time.perf_counter()
+        payload = json.loads(row.payload)
+        function, dead_letter = self.handlers.get(row.name, (None, None))
+
+        try:
+            if function is None:
+                raise LookupError(f"No handler registered for task '{row.name}'")
+            if row.attempts > row.max_attempts:
+                raise TimeoutError(f"Lease expired on the last of {row.max_attempts} attempts")
+            function(payload)
+            finished = db.session.execute(
+                Task.__table__.delete().where(Task.id == row.id, Task.locked_by == worker,
+                                              Task.status == 'running')
+            ).rowcount
+            if not finished:
+                # Another worker took the task over after our lease expired
+                db.session.rollback()
+                self._count(metrics, 'lost')
+                return 'lost'
+            db.session.commit()
+            self._count(metrics, 'done')
+            return 'done'
+        except Exception as e:
+            db.session.rollback()
+            return self._failed(worker, row, payload, e, dead_letter, metrics)
+        finally:
+            metrics['run_ms'].record((time.perf_counter() - started) * 1000)
+
+    def work(self, worker):
+        """
+        Claim a batch of due tasks and run them.
+
+        Returns:
+            bool: Whether any task was run
+        """
+        rows = self.claim(worker, self.claim_batch_size)
+        for row in rows:
+            self.run(worker, row)
+        return bool(rows)
+
+    def start(self, app, workers=2):
+        """
+        Run tasks on `workers` daemon threads, adding threads if fewer are running.
+
+        Args:
+            app (Flask): Application whose context the tasks run in
+            workers (int): Worker threads in this process
+        """
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        for number in range(len(self.threads), workers):
+            thread = threading.Thread(target=self._run, args=(app, f"{prefix}:{number}"),
+                                      name=f'task-worker-{number}', daemon=True)
+            self.threads.append(thread)
+            thread.start()
+        logger.info(f"Running {len(self.threads)} task workers")
+
+    def stop(self):
+        """Stop the worker threads after their current task"""
+        self.stopped.set()
+        for _ in self.threads:
+            self.wakeup.release()
+
+    def join(self, timeout=None):
+        """Wait for stopped worker threads to finish"""
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def retry_dead(self, name=None):
+        """
+        Queue dead tasks again with their attempts reset.
+
+        Args:
+            name (str, optional): Only tasks with this name
+
+        Returns:
+            int: Tasks requeued
+        """
+        statement = update(Task).where(Task.status == 'dead').values(
+            status='queued', attempts=0, run_at=datetime.utcnow(), locked_by=None
+        )
+        if name:
+            statement = statement.where(Task.name == name)
+        requeued = db.session.execute(statement.execution_options(synchronize_session=False)).rowcount
+        db.session.commit()
+        return requeued
+
+    def counts(self):
+        """Tasks per status, and the age of the oldest due task in seconds"""
+        now = datetime.utcnow()
+        by_status = dict(db.session.query(Task.status, func.count(Task.id)).group_by(Task.status).all())
+        oldest = db.session.query(func.min(Task.created_at)).filter(
+            Task.status.in_(CLAIMABLE), Task.run_at <= now
+        ).scalar()
+        db.session.commit()
+        return {
+            'queued': by_status.get('queued', 0),
+            'running': by_status.get('running', 0),
+            'dead': by_status.get('dead', 0),
+            'oldest_due_seconds': round((now - oldest).total_seconds(), 1) if oldest else None
+        }
+
+    def stats(self):
+        """Queue depth plus per-task outcomes, queue wait and run time in this process"""
+        with self.lock:
+            tasks = {
+                name: dict(metrics, wait_ms=metrics['wait_ms'].percentiles(), run_ms=metrics['run_ms'].percentiles())
+                for name, metrics in self.metrics.items()
+            }
+        return {
+            'workers': sum(1 for thread in self.threads if thread.is_alive()),
+            'queue': self.counts(),
+            'tasks': tasks
+        }
+
+    def _run(self, app, worker):
+        while not self.stopped.is_set():
+            ran = False
+            try:
+                with app.app_context():
+                    ran = self.work(worker)
+            except Exception as e:
+                logger.error(f"Error in task worker {worker}: {str(e)}")
+            if not ran:
+                self.wakeup.acquire(timeout=self.poll_seconds)
+
+    def _failed(self, worker, row, payload, error, dead_letter, metrics):
+        """Schedule a retry, or dead-letter the task once its attempts are used up"""
+        message = f"{type(error).__name__}: {error}"
+        dead = row.attempts >= row.max_attempts
+        values = {'locked_by': None, 'last_error': message[:2000]}
+        if dead:
+            values['status'] = 'dead'
+        else:
+            delay = min(self.max_backoff_seconds, self.retry_backoff_seconds * 2 ** (row.attempts - 1))
+            delay *= random.uniform(0.5, 1.0)
+            values.update(status='queued', run_at=datetime.utcnow() + timedelta(seconds=delay))
+
+        try:
+            updated = db.session.execute(
+                update(Task).where(Task.id == row.id, Task.locked_by == worker, Task.status == 'running')
+                .values(**values).execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error recording failure of task {row.id}: {str(e)}")
+            return 'retry'  # The lease runs out and the task is claimed again
+
+        if not updated:
+            self._count(metrics, 'lost')
+            return 'lost'
+        if not dead:
+            logger.warning(f"Task {row.name} #{row.id} failed on attempt {row.attempts}, retrying: {message}")
+            self._count(metrics, 'retried')
+            return 'retry'
+
+        logger.error(f"Task {row.name} #{row.id} failed {row.attempts} times, dead-lettering it: {message}")
+        self._count(metrics, 'dead')
+        if dead_letter:
+            try:
+                dead_letter(payload, message)
+            except Exception as e:
+                logger.error(f"Error dead-lettering task {row.id}: {str(e)}")
+        return 'dead'
+
+    def _count(self, metrics, outcome):
+        with self.lock:
+            metrics[outcome] += 1
+
+    def _metrics(self, name):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = {
+                    'done': 0, 'retried': 0, 'dead': 0, 'lost': 0,
+                    'wait_ms': LatencyTracker(), 'run_ms': LatencyTracker()
+                }
+            return self.metrics[name]
@@ -7,15 +7,17 @@ class TokenManager:
     Uses tiktoken for OpenAI-compatible token counting.
     """
     
-    def __init__(self, max_tokens=800, model="gpt-3.5-turbo"):
+    def __init__(self, max_tokens=800, model="gpt-3.5-turbo", min_budget_ms=15):
         """
         Initialize the token manager.
         
         Args:
             max_tokens (int): Maximum token size allowed per response
             model (str): Model name to use for tokenization
+            min_budget_ms (float): Time that must remain on a deadline to run optimization
         """
         self.max_tokens = max_tokens
+        self.min_budget_ms = min_budget_ms
         self.tokenizer = tiktoken.encoding_for_model(model)
     
     def count_tokens(self, text):
@@ -90,19 +92,29 @@ class TokenManager:
             
         return chunks
     
-    def optimize_response(self, data, important_fields=None):
+    def optimize_response(self, data, important_fields=None, deadline=None):
         """
         Optimize a data structure to fit within token limits by prioritizing important fields.
         
         Args:
             data (dict or list): Data structure to optimize
             important_fields (list, optional): List of fields to prioritize
+            deadline (Deadline, optional): Request deadline; when nearly spent, token
+                counting is skipped and only a cheap size cap is applied
             
         Returns:
             dict or list: Optimized data structure
         """
         if important_fields is None:
             important_fields = []
+        
+        if deadline is not None and not deadline.has(self.min_budget_ms):
+            deadline.degrade('token_optimization_skipped')
+            if isinstance(data, list):
+                return data[:5]
+            if isinstance(data, dict) and isinstance(data.get('data'), list):
+                return {**data, 'data': data['data'][:5]}
+            return data
             
         # Convert data to string to count tokens
         data_str = str(data)
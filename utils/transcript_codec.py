@@ -0,0 +1,265 @@
+import zlib
+import struct
+import logging
+import threading
+from collections import Counter
+from sqlalchemy import bindparam, select, type_coerce, update
+from sqlalchemy.types import TypeDecorator, LargeBinary
+
+logger = logging.getLogger(__name__)
+
+# First byte of a stored transcript says how the rest is encoded
+RAW = 0  # UTF-8, for transcripts too short to compress
+DEFLATE = 1  # Raw deflate
+DEFLATE_DICTIONARY = 2  # Raw deflate with a preset dictionary; a 2-byte dictionary ID follows
+
+# Deflate can only refer back 32KB, so a larger dictionary would not help
+MAX_DICTIONARY_BYTES = 32 * 1024
+
+
+class TranscriptCodec:
+    """
+    Compresses conversation transcripts for storage.
+
+    Transcripts are short and repetitive across calls: the same greetings,
+    questions and confirmations appear in almost all of them. Compressed one
+    at a time they share nothing, so a preset dictionary built from past
+    transcripts primes deflate with that common text. Each stored value
+    records the ID of the dictionary it was compressed with. Dictionaries are
+    kept in the transcript_dictionaries table and never change, so a new one
+    can be trained at any time and older rows still decompress.
+    """
+
+    def __init__(self, level=6):
+        """
+        Initialize the codec.
+
+        Args:
+            level (int): zlib compression level
+        """
+        self.level = level
+        self.dictionaries = {}
+        self.current = None
+        self.lock = threading.Lock()
+
+    def compress(self, text):
+        """
+        Encode a transcript for storage.
+
+        Args:
+            text (str): Transcript, or None
+
+        Returns:
+            bytes: Encoded transcript, or None
+        """
+        if text is None:
+            return None
+        data = text.encode('utf-8')
+        dictionary_id = self.current
+
+        if dictionary_id is not None:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15,
+                                          zdict=self.dictionaries[dictionary_id])
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        encoded = self.header(dictionary_id) + compressor.compress(data) + compressor.flush()
+
+        if len(encoded) > len(data):
+            return bytes([RAW]) + data
+        return encoded
+
+    def decompress(self, encoded):
+        """
+        Decode a stored transcript.
+
+        Args:
+            encoded (bytes): Value written by compress(), or None
+
+        Returns:
+            str: Transcript, or None
+        """
+        if encoded is None:
+            return None
+        encoded = bytes(encoded)
+        kind = encoded[0]
+
+        if kind == RAW:
+            return encoded[1:].decode('utf-8')
+        if kind == DEFLATE:
+            return zlib.decompress(encoded[1:], -15).decode('utf-8')
+        if kind == DEFLATE_DICTIONARY:
+            dictionary_id = struct.unpack_from('>H', encoded, 1)[0]
+            dictionary = self.dictionaries.get(dictionary_id) or self._load_dictionary(dictionary_id)
+            decompressor = zlib.decompressobj(-15, zdict=dictionary)
+            return (decompressor.decompress(encoded[3:]) + decompressor.flush()).decode('utf-8')
+        raise ValueError(f"Unknown transcript encoding {kind}")
+
+    def add_dictionary(self, dictionary_id, dictionary):
+        """Make a stored dictionary available, and use it for new transcripts if it is the newest"""
+        with self.lock:
+            self.dictionaries[dictionary_id] = bytes(dictionary)
+            if self.current is None or dictionary_id > self.current:
+                self.current = dictionary_id
+
+    def load(self):
+        """Load every stored dictionary; call at startup inside an app context"""
+        # Imported here because models imports CompressedText from this module
+        from models import db, TranscriptDictionary
+
+        for dictionary_id, dictionary in db.session.query(TranscriptDictionary.id, TranscriptDictionary.data):
+            self.add_dictionary(dictionary_id, dictionary)
+        db.session.commit()
+        if self.current is not None:
+            logger.info(f"Compressing transcripts with dictionary {self.current}")
+
+    def train(self, samples, size=MAX_DICTIONARY_BYTES):
+        """
+        Build a dictionary from sample transcripts, store it and use it from now on.
+
+        Args:
+            samples (list): Transcripts to learn from, ideally recent ones
+            size (int): Dictionary size in bytes, at most 32KB
+
+        Returns:
+            int: ID of the stored dictionary, or None if the samples gave nothing to learn
+        """
+        from models import db, TranscriptDictionary
+
+        dictionary = train_dictionary(samples, size)
+        if not dictionary:
+            return None
+        record = TranscriptDictionary(data=dictionary, samples=len(samples))
+        db.session.add(record)
+        db.session.commit()
+        self.add_dictionary(record.id, dictionary)
+        logger.info(f"Trained transcript dictionary {record.id} ({len(dictionary)} bytes) on {len(samples)} transcripts")
+        return record.id
+
+    def recompress(self, batch_size=5000):
+        """
+        Re-encode stored transcripts not compressed with the current dictionary.
+
+        Returns:
+            int: Transcripts re-encoded
+        """
+        from models import db, ConversationLog
+
+        logs = ConversationLog.__table__
+        # The stored bytes, without decoding them through CompressedText
+        stored = type_coerce(logs.c.conversation_compressed, LargeBinary)
+        current = self.header(self.current)
+        recompressed = 0
+        last_id = 0
+
+        while True:
+            page = db.session.execute(
+                select(logs.c.id, stored).where(logs.c.id > last_id, stored.isnot(None))
+                .order_by(logs.c.id).limit(batch_size)
+            ).all()
+            if not page:
+                return recompressed
+            updates = [
+                {'log_id': log_id, 'encoded': self.compress(self.decompress(encoded))}
+                for log_id, encoded in page
+                if encoded[0] != RAW and bytes(encoded[:len(current)]) != current
+            ]
+            if updates:
+                db.session.execute(
+                    update(logs).where(logs.c.id == bindparam('log_id'))
+                    .values(conversation_compressed=bindparam('encoded', type_=LargeBinary)),
+                    updates
+                )
+                recompressed += len(updates)
+            db.session.commit()
+            last_id = page[-1][0]
+
+    @staticmethod
+    def header(dictionary_id):
+        """Leading bytes of a transcript compressed with the given dictionary, or none"""
+        if dictionary_id is None:
+            return bytes([DEFLATE])
+        return struct.pack('>BH', DEFLATE_DICTIONARY, dictionary_id)
+
+    def _load_dictionary(self, dictionary_id):
+        """Fetch a dictionary trained by another process since this one loaded them"""
+        from models import db, TranscriptDictionary
+
+        # A separate connection: this runs while the session is still reading rows
+        with db.engine.connect() as connection:
+            dictionary = connection.execute(
+                TranscriptDictionary.__table__.select().where(TranscriptDictionary.id == dictionary_id)
+            ).first()
+        if dictionary is None:
+            raise LookupError(f"Transcript dictionary {dictionary_id} not found")
+        self.add_dictionary(dictionary_id, dictionary.data)
+        return self.dictionaries[dictionary_id]
+
+
+def train_dictionary(samples, size=MAX_DICTIONARY_BYTES):
+    """
+    Pick the text most worth having in a deflate preset dictionary.
+
+    Candidates are whole lines, and runs of 4 and 8 words, which catch
+    templated lines that differ only in a name or a number. Each scores its
+    length times the number of samples containing it. The best are taken
+    until the dictionary is full, skipping any already covered. Deflate
+    finds nearby matches more cheaply, so the best candidates go last.
+
+    Args:
+        samples (list): Transcripts
+        size (int): Most bytes to return
+
+    Returns:
+        bytes: Dictionary, empty if nothing occurs in more than one sample
+    """
+    counts = Counter()
+    for text in samples:
+        candidates = set()
+        for line in (text or '').splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            candidates.add(line)
+            words = line.split()
+            for length in (4, 8):
+                for start in range(len(words) - length + 1):
+                    candidates.add(' '.join(words[start:start + length]))
+        counts.update(candidates)
+
+    ranked = sorted(
+        (candidate for candidate, count in counts.items() if count > 1),
+        key=lambda candidate: counts[candidate] * len(candidate), reverse=True
+    )
+    chosen = []
+    chosen_text = ''
+    used = 0
+    for candidate in ranked:
+        encoded = len(candidate.encode('utf-8')) + 1
+        if used + encoded > size:
+            continue
+        if candidate in chosen_text:
+            continue
+        chosen.append(candidate)
+        chosen_text += candidate + "\n"
+        used += encoded
+        if used >= size - 16:
+            break
+
+    return "\n".join(reversed(chosen)).encode('utf-8')[:size]
+
+
+# Shared by the ConversationLog column type and the commands that train dictionaries
+transcript_codec = TranscriptCodec()
+
+
+class CompressedText(TypeDecorator):
+    """Text column stored compressed by transcript_codec"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return transcript_codec.compress(value)
+
+    def process_result_value(self, value, dialect):
+        return transcript_codec.decompress(value)
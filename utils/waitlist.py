@@ -0,0 +1,188 @@
+import time
+import logging
+import datetime
+from models import db, Booking, WaitlistEntry
+from utils.availability import SlotUnavailableError
+from utils.booking_io import generate_booking_id
+from utils.helpers import get_current_ist_time
+from utils.metrics import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+
+class Waitlist:
+    """
+    First come, first served queue of parties waiting for a full slot.
+
+    When seats are freed the queue is promoted in the same transaction: each
+    waiting party in order gets a booking until one no longer fits. Parties
+    that could never fit the outlet are passed over rather than holding up
+    everyone behind them. A party
+    is promoted only if both its seat reservation (a conditional update on
+    the slot counter) and its claim (a conditional update from 'waiting' to
+    'promoted') succeed. So concurrent cancellations can neither oversell the
+    slot nor promote the same party twice.
+    """
+
+    def __init__(self, availability_engine, scan_limit=20):
+        """
+        Initialize the waitlist.
+
+        Args:
+            availability_engine (AvailabilityEngine): Slot counters to reserve seats in
+            scan_limit (int): Most entries considered in one promotion pass
+        """
+        self.availability_engine = availability_engine
+        self.scan_limit = scan_limit
+        self.promotion_latency = LatencyTracker()
+        self.promoted = 0
+
+    def join(self, fields):
+        """
+        Add a party to the queue for its slot; the caller commits.
+
+        Args:
+            fields (dict): Parsed booking fields, as from parse_booking_data
+
+        Returns:
+            WaitlistEntry: The new entry
+        """
+        entry = WaitlistEntry(
+            outlet_id=fields['outlet_id'],
+            slot_date=fields['booking_date'],
+            slot_time=self.availability_engine.slot_start(fields['booking_time']),
+            booking_time=fields['booking_time'],
+            guests=fields['guests'],
+            customer_name=fields['customer_name'],
+            phone=fields['phone'],
+            status='waiting'
+        )
+        db.session.add(entry)
+        db.session.flush()
+        return entry
+
+    def position(self, entry):
+        """1-based place of a waiting entry in its slot's queue, or None"""
+        if entry.status != 'waiting':
+            return None
+        return WaitlistEntry.query.filter(
+            WaitlistEntry.outlet_id == entry.outlet_id,
+            WaitlistEntry.slot_date == entry.slot_date,
+            WaitlistEntry.slot_time == entry.slot_time,
+            WaitlistEntry.status == 'waiting',
+            WaitlistEntry.id <= entry.id
+        ).count()
+
+    def leave(self, entry_id):
+        """
+        Take a waiting party off the queue; the caller commits.
+
+        Returns:
+            bool: Whether the entry was still waiting
+        """
+        return WaitlistEntry.query.filter_by(id=entry_id, status='waiting').update(
+            {'status': 'cancelled'}, synchronize_session=False
+        ) > 0
+
+    def promote(self, outlet_id, slot_date, slot_time):
+        """
+        Turn waiting parties into bookings while the slot has room.
+
+        Call in the transaction that freed the seats, before committing.
+
+        Args:
+            outlet_id (str): Outlet ID
+            slot_date (datetime.date): Slot date
+            slot_time (datetime.time): Slot start
+
+        Returns:
+            list: Bookings created, in queue order
+        """
+        started = time.perf_counter()
+        capacity = self.availability_engine.capacity(outlet_id)
+        if capacity is None:
+            return []
+        entries = WaitlistEntry.query.filter(
+            WaitlistEntry.outlet_id == outlet_id,
+            WaitlistEntry.slot_date == slot_date,
+            WaitlistEntry.slot_time == slot_time,
+            WaitlistEntry.status == 'waiting',
+            WaitlistEntry.guests <= capacity
+        ).order_by(WaitlistEntry.id).limit(self.scan_limit).all()
+
+        promoted = []
+        for entry in entries:
+            booking = Booking(
+                booking_id=generate_booking_id(),
+                outlet_id=entry.outlet_id,
+                booking_date=entry.slot_date,
+                booking_time=entry.booking_time,
+                guests=entry.guests,
+                customer_name=entry.customer_name,
+                phone=entry.phone,
+                status='confirmed'
+            )
+
+            try:
+                self.availability_engine.reserve(booking)
+            except SlotUnavailableError:
+                # Keep the queue fair: later parties wait behind this one
+                break
+            except ValueError as e:
+                # Can never be seated here, e.g. joined before the outlet's hours changed
+                logger.error(f"Skipping waitlist entry {entry.id}: {str(e)}")
+                continue
+
+            claimed = WaitlistEntry.query.filter_by(id=entry.id, status='waiting').update({
+                'status': 'promoted',
+                'booking_id': booking.booking_id,
+                'promoted_at': datetime.datetime.utcnow()
+            }, synchronize_session=False)
+            if not claimed:
+                # Promoted or withdrawn by a concurrent request
+                self.availability_engine.release(booking)
+                continue
+
+            db.session.add(booking)
+            promoted.append(booking)
+
+        if entries:
+            self.promotion_latency.record((time.perf_counter() - started) * 1000)
+        self.promoted += len(promoted)
+        if promoted:
+            logger.info(f"Promoted {len(promoted)} waitlisted parties at {outlet_id} on {slot_date} {slot_time}")
+
+        return promoted
+
+    def promote_all(self, from_date=None):
+        """
+        Promote every slot that has waiting parties, one transaction per slot.
+
+        Args:
+            from_date (datetime.date, optional): Skip earlier slots; defaults to today in IST
+
+        Returns:
+            list: Bookings created
+        """
+        from_date = from_date or get_current_ist_time().date()
+        slots = db.session.query(
+            WaitlistEntry.outlet_id, WaitlistEntry.slot_date, WaitlistEntry.slot_time
+        ).filter(
+            WaitlistEntry.status == 'waiting',
+            WaitlistEntry.slot_date >= from_date
+        ).distinct().all()
+        db.session.commit()
+
+        promoted = []
+        for outlet_id, slot_date, slot_time in slots:
+            promoted.extend(self.promote(outlet_id, slot_date, slot_time))
+            db.session.commit()
+        return promoted
+
+    def stats(self):
+        """Promotion counts and latency for this process"""
+        return {
+            'waiting': WaitlistEntry.query.filter_by(status='waiting').count(),
+            'promoted': self.promoted,
+            'promotion_latency_ms': self.promotion_latency.percentiles()
+        }